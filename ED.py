@@ -6,59 +6,48 @@ import os
 import numpy as np
 import pandas as pd
 import streamlit as st
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LogisticRegression
-from sklearn.ensemble import RandomForestClassifier, StackingClassifier
-from sklearn.metrics import (
-    confusion_matrix,
-    f1_score,
-    accuracy_score,
-    recall_score,
-    precision_score,
-    roc_auc_score,
-    ConfusionMatrixDisplay,
-)
-from xgboost import XGBClassifier
+from sklearn.metrics import ConfusionMatrixDisplay
 import time
 
+# Import trễ: matplotlib.pyplot, seaborn, feedparser, google-genai chỉ được import khi dùng lần đầu
+# (vẽ biểu đồ, đọc tin, gọi AI) để trang đầu tiên hiện ra nhanh hơn
+from lazy_imports import has_module, lazy_module
+
+plt = lazy_module("matplotlib.pyplot")
+sns = lazy_module("seaborn")
+
 # Thư viện RSS Feed
-try:
-    import feedparser
-    _FEEDPARSER_OK = True
-except Exception:
-    feedparser = None
-    _FEEDPARSER_OK = False
-
-# Thư viện GOOGLE GEMINI VÀ OPENAI (Giữ nguyên logic kiểm tra thư viện)
-try:
-    from google import genai
-    from google.genai.errors import APIError
-    _GEMINI_OK = True
-except Exception:
-    genai = None
-    APIError = Exception
-    _GEMINI_OK = False
-
-try:
-    from openai import OpenAI
-    _OPENAI_OK = True
-except Exception:
-    OpenAI = None
-    _OPENAI_OK = False
-
-# Thư viện Word Export
-try:
-    from docx import Document
-    from docx.shared import Inches, Pt, RGBColor
-    from docx.enum.text import WD_ALIGN_PARAGRAPH
-    from docx.oxml.ns import qn
-    from docx.oxml import OxmlElement
-    from io import BytesIO
-    _WORD_OK = True
-except Exception:
-    _WORD_OK = False
+_FEEDPARSER_OK = has_module("feedparser")
+feedparser = lazy_module("feedparser")
+
+# Thư viện GOOGLE GEMINI VÀ OPENAI (chỉ kiểm tra đã cài, chưa import)
+_GEMINI_OK = has_module("google.genai")
+genai = lazy_module("google.genai")
+genai_errors = lazy_module("google.genai.errors")
+
+_OPENAI_OK = has_module("openai")
+
+# Các module dùng chung (tính chỉ số, xuất Word, huấn luyện Stacking)
+from financial_ratios import COMPUTED_COLS, compute_ratios_from_three_sheets
+from word_report import generate_word_report, _WORD_OK
+from stacking_model import MODEL_COLS, train_models
+from univariate_curves import build_univariate_summary
+from attribution import RATIO_LABELS, AttributionEngine, top_drivers, explanation_table
+from calibration import apply_calibration
+from peers import PeerIndex
+from percentiles import PercentileIndex
+from sensitivity import SensitivityEngine
+from tree_engine import ArrayScorer, compile_model, feature_array
+from counterfactual import DEFAULT_TARGET_PD, CounterfactualPlanner, plan_summary
+from scorecard import PDO, Scorecard
+from reverse_stress import SCENARIO_PARAMS, apply_scenario, reverse_stress, reverse_stress_table, stress_targets
+from rerun_profiler import start_rerun, finish_rerun, profiled
+from data_loader import load_training_data, read_training_csv, dataset_fingerprint
+from charts import CHART_CACHE, PERCENTILE_COL, LRUCache, fingerprint, render_pd_curves_chart, render_tornado_chart
+from io import BytesIO
+from batch_reports import prepare_portfolio, read_portfolio, write_reports_zip
+from threshold_optimizer import DEFAULT_THRESHOLD
+from navigation import view_selector, go_to_view, keep_widget_state, persistent_file_uploader
 
 MODEL_NAME = "gemini-2.5-flash"
 
@@ -141,220 +130,6 @@ def classify_pd(pd_value):
             'gradient_color': 'linear-gradient(135deg, #dc3545 0%, #c82333 100%)'
         }
 
-# =========================
-# HÀM TẠO WORD REPORT
-# =========================
-
-def generate_word_report(ratios_display, pd_value, pd_label, ai_analysis, fig_bar, fig_radar, company_name="KHÁCH HÀNG DOANH NGHIỆP"):
-    """
-    Tạo báo cáo Word chuyên nghiệp từ kết quả phân tích tín dụng.
-
-    Parameters:
-    - ratios_display: DataFrame chứa 14 chỉ số tài chính (index = tên chỉ số, column = giá trị)
-    - pd_value: Xác suất vỡ nợ (PD) dưới dạng số float (0-1) hoặc NaN
-    - pd_label: Nhãn dự đoán ("Default" hoặc "Non-Default")
-    - ai_analysis: Text phân tích từ AI
-    - fig_bar: Matplotlib figure của bar chart
-    - fig_radar: Matplotlib figure của radar chart
-    - company_name: Tên công ty (mặc định)
-
-    Returns:
-    - BytesIO object chứa Word document
-    """
-
-    if not _WORD_OK:
-        raise Exception("Thiếu thư viện python-docx. Vui lòng cài đặt: pip install python-docx Pillow")
-
-    # Tạo document mới
-    doc = Document()
-
-    # Cấu hình margin cho document
-    sections = doc.sections
-    for section in sections:
-        section.top_margin = Inches(0.8)
-        section.bottom_margin = Inches(0.8)
-        section.left_margin = Inches(1)
-        section.right_margin = Inches(1)
-
-    # ===== 1. HEADER VỚI LOGO VÀ TIÊU ĐỀ =====
-    # Thêm logo nếu có
-    try:
-        if os.path.exists("logo-agribank.jpg"):
-            doc.add_picture("logo-agribank.jpg", width=Inches(2.5))
-            last_paragraph = doc.paragraphs[-1]
-            last_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    except Exception:
-        pass
-
-    # Tiêu đề chính
-    title = doc.add_heading('BÁO CÁO ĐÁNH GIÁ RỦI RO TÍN DỤNG', 0)
-    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    title_run = title.runs[0]
-    title_run.font.size = Pt(20)
-    title_run.font.color.rgb = RGBColor(194, 24, 91)  # #c2185b
-    title_run.font.bold = True
-
-    # Subtitle
-    subtitle = doc.add_paragraph('Dự báo Xác suất Vỡ nợ KHDN (PD) & Phân tích AI Chuyên sâu')
-    subtitle.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    subtitle_run = subtitle.runs[0]
-    subtitle_run.font.size = Pt(13)
-    subtitle_run.font.color.rgb = RGBColor(255, 107, 157)  # #ff6b9d
-    subtitle_run.font.bold = True
-
-    # Thông tin thời gian
-    date_info = doc.add_paragraph(f"Ngày xuất báo cáo: {datetime.now().strftime('%d/%m/%Y %H:%M')}")
-    date_info.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    date_run = date_info.runs[0]
-    date_run.font.size = Pt(10)
-
-    # Thông tin khách hàng
-    company_info = doc.add_paragraph()
-    company_info.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    company_run = company_info.add_run(f"Tên khách hàng: {company_name}")
-    company_run.font.size = Pt(11)
-    company_run.font.bold = True
-
-    doc.add_paragraph()  # Spacer
-
-    # ===== 2. KẾT QUẢ DỰ BÁO PD =====
-    heading1 = doc.add_heading('1. KẾT QUẢ DỰ BÁO XÁC SUẤT VỠ NỢ (PD)', level=1)
-    heading1_run = heading1.runs[0]
-    heading1_run.font.color.rgb = RGBColor(255, 107, 157)  # #ff6b9d
-
-    pd_para = doc.add_paragraph()
-    if pd.notna(pd_value):
-        pd_para.add_run(f"Xác suất Vỡ nợ (PD): ").bold = True
-        pd_para.add_run(f"{pd_value:.2%}\n")
-        pd_para.add_run("Phân loại: ").bold = True
-        pd_para.add_run(f"{pd_label}\n")
-
-        if "Default" in pd_label and "Non-Default" not in pd_label:
-            risk_run = pd_para.add_run("⚠️ RỦI RO CAO - CẦN XEM XÉT KỸ LƯỠNG")
-            risk_run.bold = True
-            risk_run.font.color.rgb = RGBColor(220, 53, 69)  # Red
-        else:
-            safe_run = pd_para.add_run("✓ RỦI RO THẤP - KHẢ QUAN")
-            safe_run.bold = True
-            safe_run.font.color.rgb = RGBColor(40, 167, 69)  # Green
-    else:
-        pd_para.add_run("Xác suất Vỡ nợ (PD): ").bold = True
-        pd_para.add_run("Không có dữ liệu")
-
-    doc.add_paragraph()  # Spacer
-
-    # ===== 3. BẢNG CHỈ SỐ TÀI CHÍNH =====
-    heading2 = doc.add_heading('2. CHỈ SỐ TÀI CHÍNH CHI TIẾT', level=1)
-    heading2_run = heading2.runs[0]
-    heading2_run.font.color.rgb = RGBColor(255, 107, 157)  # #ff6b9d
-
-    # Tạo bảng
-    table = doc.add_table(rows=1, cols=2)
-    table.style = 'Light Grid Accent 1'
-
-    # Header row
-    hdr_cells = table.rows[0].cells
-    hdr_cells[0].text = 'Chỉ số Tài chính'
-    hdr_cells[1].text = 'Giá trị'
-
-    # Style header
-    for cell in hdr_cells:
-        cell_para = cell.paragraphs[0]
-        cell_run = cell_para.runs[0]
-        cell_run.font.bold = True
-        cell_run.font.size = Pt(11)
-        cell_run.font.color.rgb = RGBColor(255, 255, 255)
-        # Set background color
-        shading_elm = OxmlElement('w:shd')
-        shading_elm.set(qn('w:fill'), 'FF6B9D')  # Pink
-        cell._element.get_or_add_tcPr().append(shading_elm)
-        cell_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-
-    # Data rows
-    for idx, row in ratios_display.iterrows():
-        row_cells = table.add_row().cells
-        row_cells[0].text = str(idx)
-        value = row['Giá trị']
-        row_cells[1].text = f"{value:.4f}" if pd.notna(value) else "N/A"
-        row_cells[1].paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.RIGHT
-
-    doc.add_paragraph()  # Spacer
-
-    # ===== 4. BIỂU ĐỒ VISUALIZATION =====
-    doc.add_page_break()
-    heading3 = doc.add_heading('3. TRỰC QUAN HÓA DỮ LIỆU', level=1)
-    heading3_run = heading3.runs[0]
-    heading3_run.font.color.rgb = RGBColor(255, 107, 157)  # #ff6b9d
-
-    # Bar chart
-    try:
-        doc.add_heading('3.1. Biểu đồ Cột - Giá trị các Chỉ số', level=2)
-        bar_buffer = BytesIO()
-        fig_bar.savefig(bar_buffer, format='png', dpi=150, bbox_inches='tight')
-        bar_buffer.seek(0)
-        doc.add_picture(bar_buffer, width=Inches(6))
-        last_paragraph = doc.paragraphs[-1]
-        last_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        doc.add_paragraph()  # Spacer
-    except Exception as e:
-        doc.add_paragraph(f"Không thể tạo biểu đồ cột: {str(e)}")
-
-    # Radar chart
-    try:
-        doc.add_heading('3.2. Biểu đồ Radar - Phân tích Đa chiều', level=2)
-        radar_buffer = BytesIO()
-        fig_radar.savefig(radar_buffer, format='png', dpi=150, bbox_inches='tight')
-        radar_buffer.seek(0)
-        doc.add_picture(radar_buffer, width=Inches(5))
-        last_paragraph = doc.paragraphs[-1]
-        last_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    except Exception as e:
-        doc.add_paragraph(f"Không thể tạo biểu đồ radar: {str(e)}")
-
-    # ===== 5. PHÂN TÍCH AI =====
-    doc.add_page_break()
-    heading4 = doc.add_heading('4. PHÂN TÍCH AI & KHUYẾN NGHỊ TÍN DỤNG', level=1)
-    heading4_run = heading4.runs[0]
-    heading4_run.font.color.rgb = RGBColor(255, 107, 157)  # #ff6b9d
-
-    if ai_analysis and ai_analysis.strip():
-        # Chia thành các đoạn và thêm vào document
-        analysis_paragraphs = ai_analysis.split('\n')
-        for para_text in analysis_paragraphs:
-            if para_text.strip():
-                para = doc.add_paragraph(para_text)
-                # Highlight keywords
-                if "CHO VAY" in para_text and "KHÔNG CHO VAY" not in para_text:
-                    for run in para.runs:
-                        if "CHO VAY" in run.text:
-                            run.font.color.rgb = RGBColor(40, 167, 69)  # Green
-                            run.bold = True
-                elif "KHÔNG CHO VAY" in para_text:
-                    for run in para.runs:
-                        if "KHÔNG CHO VAY" in run.text:
-                            run.font.color.rgb = RGBColor(220, 53, 69)  # Red
-                            run.bold = True
-    else:
-        doc.add_paragraph("Chưa có phân tích từ AI. Vui lòng click nút 'Yêu cầu AI Phân tích & Đề xuất' để nhận khuyến nghị.")
-
-    # ===== 6. FOOTER =====
-    doc.add_paragraph()
-    footer = doc.add_paragraph(
-        f"Báo cáo này được tạo tự động bởi Hệ thống Đánh giá Rủi ro Tín dụng - Powered by AI & Machine Learning\n"
-        f"© {datetime.now().year} Credit Risk Assessment System | Version 2.0 Premium"
-    )
-    footer.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    footer_run = footer.runs[0]
-    footer_run.font.size = Pt(8)
-    footer_run.font.italic = True
-    footer_run.font.color.rgb = RGBColor(128, 128, 128)  # Grey
-
-    # Save to buffer
-    buffer = BytesIO()
-    doc.save(buffer)
-    buffer.seek(0)
-    return buffer
-
 # =========================
 # CẤU HÌNH TRANG (NÂNG CẤP GIAO DIỆN)
 # =========================
@@ -593,6 +368,52 @@ button[data-testid="stTab"][aria-selected="true"] {
     transform: translateY(-3px);
 }
 
+/* Thanh chọn trang (st.radio key="active_view") hiển thị giống tab */
+.st-key-active_view div[role="radiogroup"] {
+    flex-wrap: wrap !important;
+    gap: 8px 8px !important;
+}
+
+.st-key-active_view div[role="radiogroup"] > label {
+    background: linear-gradient(135deg, #ffffff 0%, #fff5f7 100%);
+    border: 2px solid #ffd4dd;
+    border-radius: 12px 12px 0 0;
+    transition: all 0.3s cubic-bezier(0.4, 0, 0.2, 1);
+    padding: 12px 20px;
+    margin: 0 4px 4px 0;
+    box-shadow: 0 2px 8px rgba(0, 0, 0, 0.05);
+    white-space: nowrap;
+}
+
+.st-key-active_view div[role="radiogroup"] > label > div:first-child {
+    display: none;
+}
+
+.st-key-active_view div[role="radiogroup"] > label p {
+    font-weight: 700;
+    font-size: 0.9rem;
+    color: #4a5568;
+}
+
+.st-key-active_view div[role="radiogroup"] > label:hover {
+    background: linear-gradient(135deg, #ffe8f0 0%, #ffd4dd 100%);
+    border-color: #ff6b9d;
+    transform: translateY(-3px);
+    box-shadow: 0 5px 15px rgba(255, 107, 157, 0.2);
+}
+
+.st-key-active_view div[role="radiogroup"] > label:has(input:checked) {
+    background: linear-gradient(135deg, #ff6b9d 0%, #ff85a1 100%);
+    border-color: #ffb3c6;
+    box-shadow: 0 8px 20px rgba(255, 107, 157, 0.4),
+                inset 0 1px 0 rgba(255, 255, 255, 0.2);
+    transform: translateY(-3px);
+}
+
+.st-key-active_view div[role="radiogroup"] > label:has(input:checked) p {
+    color: #ffffff !important;
+}
+
 /* ========== HEADINGS ========== */
 h1, h2, h3, h4 {
     color: #1a2332 !important;
@@ -810,6 +631,7 @@ div[data-testid="stSpinner"] > div {
 # HÀM GỌI GEMINI API (GIỮ NGUYÊN LOGIC)
 # =========================
 
+@profiled("ai_analysis")
 def get_ai_analysis(data_payload: dict, api_key: str) -> str:
     """
     Sử dụng Gemini API để phân tích chỉ số tài chính.
@@ -823,6 +645,8 @@ def get_ai_analysis(data_payload: dict, api_key: str) -> str:
         "Bạn là chuyên gia phân tích tín dụng doanh nghiệp tại ngân hàng Việt Nam. "
         "Phân tích toàn diện dựa trên 14 chỉ số tài chính được cung cấp và PD (chủ yếu là PD cuối cùng của mô hình Stacking) . Lưu ý PD trong mô hình này được tính theo bối cảnh doanh nghiệp Việt Nam"
         "Nêu rõ: (1) Khả năng sinh lời, (2) Thanh khoản, (3) Cơ cấu nợ, (4) Hiệu quả hoạt động. "
+        "Nếu có kế hoạch cải thiện chỉ số (do mô hình tính), dùng đúng các chỉ số và mức mục tiêu trong đó khi nêu "
+        "doanh nghiệp cần cải thiện gì. "
         "Kết thúc bằng khuyến nghị in hoa: CHO VAY hoặc KHÔNG CHO VAY, kèm 2–3 điều kiện nếu CHO VAY. "
         "Viết bằng tiếng Việt súc tích, chuyên nghiệp."
     )
@@ -839,12 +663,13 @@ def get_ai_analysis(data_payload: dict, api_key: str) -> str:
             config={"system_instruction": sys_prompt}
         )
         return response.text
-    except APIError as e:
+    except genai_errors.APIError as e:
         return f"Lỗi gọi API Gemini: {e}"
     except Exception as e:
         return f"Lỗi không xác định: {e}"
 
 
+@profiled("ai_chat")
 def chat_with_gemini(user_message: str, api_key: str, context_data: dict = None) -> str:
     """
     Chatbot với Gemini AI để trả lời câu hỏi của người dùng về phân tích tín dụng.
@@ -887,7 +712,7 @@ def chat_with_gemini(user_message: str, api_key: str, context_data: dict = None)
             config={"system_instruction": sys_prompt}
         )
         return response.text
-    except APIError as e:
+    except genai_errors.APIError as e:
         return f"Lỗi gọi API Gemini: {e}"
     except Exception as e:
         return f"Lỗi không xác định: {e}"
@@ -897,6 +722,7 @@ def chat_with_gemini(user_message: str, api_key: str, context_data: dict = None)
 # HÀM LẤY DỮ LIỆU TÀI CHÍNH TỰ ĐỘNG TỪ GEMINI API
 # =========================
 
+@profiled("ai_industry_data")
 @st.cache_data(ttl=2592000)  # Cache 30 ngày (tự động cập nhật mỗi tháng)
 def get_industry_data_from_ai(api_key: str, industry_name: str) -> dict:
     """
@@ -965,6 +791,7 @@ def get_industry_data_from_ai(api_key: str, industry_name: str) -> dict:
         return None
 
 
+@profiled("ai_macro_data")
 def get_macro_data_from_ai(api_key: str) -> dict:
     """
     Lấy dữ liệu vĩ mô nền kinh tế Việt Nam từ Gemini API.
@@ -1033,6 +860,7 @@ def get_macro_data_from_ai(api_key: str) -> dict:
         return None
 
 
+@profiled("ai_financial_data")
 def get_financial_data_from_ai(api_key: str) -> pd.DataFrame:
     """
     Tự động lấy dữ liệu tài chính doanh nghiệp Việt Nam từ Gemini API.
@@ -1123,148 +951,6 @@ def get_financial_data_from_ai(api_key: str) -> pd.DataFrame:
         return None
 
 
-# =========================
-# TÍNH X1..X14 TỪ 3 SHEET (CDKT/BCTN/LCTT) - SỬ DỤNG TÊN TIẾNG VIỆT (GIỮ NGUYÊN)
-# =========================
-
-# Bảng ánh xạ Tên chỉ số tiếng Việt
-COMPUTED_COLS = [
-    "Biên Lợi nhuận Gộp (X1)", "Biên Lợi nhuận Tr.Thuế (X2)", "ROA Tr.Thuế (X3)", 
-    "ROE Tr.Thuế (X4)", "Tỷ lệ Nợ/TTS (X5)", "Tỷ lệ Nợ/VCSH (X6)", 
-    "Thanh toán Hiện hành (X7)", "Thanh toán Nhanh (X8)", "Khả năng Trả lãi (X9)", 
-    "Khả năng Trả nợ Gốc (X10)", "Tỷ lệ Tiền/VCSH (X11)", "Vòng quay HTK (X12)", 
-    "Kỳ thu tiền BQ (X13)", "Hiệu suất Tài sản (X14)"
-]
-
-# Alias các dòng quan trọng trong từng sheet (GIỮ NGUYÊN)
-ALIAS_IS = {
-    "doanh_thu_thuan": ["Doanh thu thuần", "Doanh thu bán hàng", "Doanh thu thuần về bán hàng và cung cấp dịch vụ"],
-    "gia_von": ["Giá vốn hàng bán"],
-    "loi_nhuan_gop": ["Lợi nhuận gộp"],
-    "chi_phi_lai_vay": ["Chi phí lãi vay", "Chi phí tài chính (trong đó: chi phí lãi vay)"],
-    "loi_nhuan_truoc_thue": ["Tổng lợi nhuận kế toán trước thuế", "Lợi nhuận trước thuế", "Lợi nhuận trước thuế thu nhập DN"],
-}
-ALIAS_BS = {
-    "tong_tai_san": ["Tổng tài sản"],
-    "von_chu_so_huu": ["Vốn chủ sở hữu", "Vốn CSH"],
-    "no_phai_tra": ["Nợ phải trả"],
-    "tai_san_ngan_han": ["Tài sản ngắn hạn"],
-    "no_ngan_han": ["Nợ ngắn hạn"],
-    "hang_ton_kho": ["Hàng tồn kho"],
-    "tien_tdt": ["Tiền và các khoản tương đương tiền", "Tiền và tương đương tiền"],
-    "phai_thu_kh": ["Phải thu ngắn hạn của khách hàng", "Phải thu khách hàng"],
-    "no_dai_han_den_han": ["Nợ dài hạn đến hạn trả", "Nợ dài hạn đến hạn"],
-}
-ALIAS_CF = {
-    "khau_hao": ["Khấu hao TSCĐ", "Khấu hao", "Chi phí khấu hao"],
-}
-
-def _pick_year_cols(df: pd.DataFrame):
-    """Chọn 2 cột năm gần nhất từ sheet (ưu tiên cột có nhãn là năm)."""
-    numeric_years = []
-    for c in df.columns[1:]:
-        try:
-            y = int(float(str(c).strip()))
-            if 1990 <= y <= 2100:
-                numeric_years.append((y, c))
-        except Exception:
-            continue
-    if numeric_years:
-        numeric_years.sort(key=lambda x: x[0])
-        return numeric_years[-2][1], numeric_years[-1][1]
-    # fallback: 2 cột cuối
-    cols = df.columns[-2:]
-    return cols[0], cols[1]
-
-def _get_row_vals(df: pd.DataFrame, aliases: list[str]):
-    """Tìm dòng theo alias. Trả về (prev, cur) theo 2 cột năm gần nhất."""
-    label_col = df.columns[0]
-    prev_col, cur_col = _pick_year_cols(df)
-    mask = False
-    for alias in aliases:
-        mask = mask | df[label_col].astype(str).str.contains(alias, case=False, na=False)
-    rows = df[mask]
-    if rows.empty:
-        return np.nan, np.nan
-    row = rows.iloc[0]
-
-    def to_num(x):
-        try:
-            # Xóa dấu phẩy, khoảng trắng
-            return float(str(x).replace(",", "").replace(" ", ""))
-        except Exception:
-            return np.nan
-
-    return to_num(row[prev_col]), to_num(row[cur_col])
-
-def compute_ratios_from_three_sheets(xlsx_file) -> pd.DataFrame:
-    """Đọc 3 sheet CDKT/BCTN/LCTT và tính X1..X14 theo yêu cầu."""
-    bs = pd.read_excel(xlsx_file, sheet_name="CDKT", engine="openpyxl")
-    is_ = pd.read_excel(xlsx_file, sheet_name="BCTN", engine="openpyxl")
-    cf = pd.read_excel(xlsx_file, sheet_name="LCTT", engine="openpyxl")
-
-    # ---- Tính toán các biến số tài chính (GIỮ NGUYÊN CÁCH TÍNH)
-    DTT_prev, DTT_cur         = _get_row_vals(is_, ALIAS_IS["doanh_thu_thuan"])
-    GVHB_prev, GVHB_cur = _get_row_vals(is_, ALIAS_IS["gia_von"])
-    LNG_prev, LNG_cur         = _get_row_vals(is_, ALIAS_IS["loi_nhuan_gop"])
-    LNTT_prev, LNTT_cur = _get_row_vals(is_, ALIAS_IS["loi_nhuan_truoc_thue"])
-    LV_prev, LV_cur           = _get_row_vals(is_, ALIAS_IS["chi_phi_lai_vay"])
-    TTS_prev, TTS_cur           = _get_row_vals(bs, ALIAS_BS["tong_tai_san"])
-    VCSH_prev, VCSH_cur         = _get_row_vals(bs, ALIAS_BS["von_chu_so_huu"])
-    NPT_prev, NPT_cur           = _get_row_vals(bs, ALIAS_BS["no_phai_tra"])
-    TSNH_prev, TSNH_cur         = _get_row_vals(bs, ALIAS_BS["tai_san_ngan_han"])
-    NNH_prev, NNH_cur           = _get_row_vals(bs, ALIAS_BS["no_ngan_han"])
-    HTK_prev, HTK_cur           = _get_row_vals(bs, ALIAS_BS["hang_ton_kho"])
-    Tien_prev, Tien_cur         = _get_row_vals(bs, ALIAS_BS["tien_tdt"])
-    KPT_prev, KPT_cur           = _get_row_vals(bs, ALIAS_BS["phai_thu_kh"])
-    NDH_prev, NDH_cur           = _get_row_vals(bs, ALIAS_BS["no_dai_han_den_han"])
-    KH_prev, KH_cur = _get_row_vals(cf, ALIAS_CF["khau_hao"])
-
-    if pd.notna(GVHB_cur): GVHB_cur = abs(GVHB_cur)
-    if pd.notna(LV_cur):      LV_cur     = abs(LV_cur)
-    if pd.notna(KH_cur):      KH_cur     = abs(KH_cur)
-
-    def avg(a, b):
-        if pd.isna(a) and pd.isna(b): return np.nan
-        if pd.isna(a): return b
-        if pd.isna(b): return a
-        return (a + b) / 2.0
-    TTS_avg    = avg(TTS_cur,    TTS_prev)
-    VCSH_avg = avg(VCSH_cur, VCSH_prev)
-    HTK_avg    = avg(HTK_cur,    HTK_prev)
-    KPT_avg    = avg(KPT_cur,    KPT_prev)
-
-    EBIT_cur = (LNTT_cur + LV_cur) if (pd.notna(LNTT_cur) and pd.notna(LV_cur)) else np.nan
-    NDH_cur = 0.0 if pd.isna(NDH_cur) else NDH_cur
-
-    def div(a, b):
-        return np.nan if (b is None or pd.isna(b) or b == 0) else a / b
-
-    # ==== TÍNH X1..X14 ==== (GIỮ NGUYÊN CÔNG THỨC)
-    X1  = div(LNG_cur, DTT_cur)
-    X2  = div(LNTT_cur, DTT_cur)
-    X3  = div(LNTT_cur, TTS_avg)
-    X4  = div(LNTT_cur, VCSH_avg)
-    X5  = div(NPT_cur,  TTS_cur)
-    X6  = div(NPT_cur,  VCSH_cur)
-    X7  = div(TSNH_cur, NNH_cur)
-    X8  = div((TSNH_cur - HTK_cur) if pd.notna(TSNH_cur) and pd.notna(HTK_cur) else np.nan, NNH_cur)
-    X9  = div(EBIT_cur, LV_cur)
-    X10 = div((EBIT_cur + (KH_cur if pd.notna(KH_cur) else 0.0)), (LV_cur + NDH_cur) if pd.notna(LV_cur) else np.nan)
-    X11 = div(Tien_cur, VCSH_cur)
-    X12 = div(GVHB_cur, HTK_avg)
-    turnover = div(DTT_cur, KPT_avg)
-    X13 = div(365.0, turnover) if pd.notna(turnover) and turnover != 0 else np.nan
-    X14 = div(DTT_cur, TTS_avg)
-
-    # Khởi tạo DataFrame với tên cột tiếng Việt mới
-    ratios = pd.DataFrame([[X1, X2, X3, X4, X5, X6, X7, X8, X9, X10, X11, X12, X13, X14]],
-                          columns=COMPUTED_COLS)
-                          
-    # Thêm cột X_1..X_14 ẩn để phục vụ việc dự báo mô hình
-    ratios[[f"X_{i}" for i in range(1, 15)]] = ratios.values
-    return ratios
-
 # =========================
 # HÀM ĐỌC RSS FEED
 # =========================
@@ -1324,6 +1010,12 @@ def fetch_rss_feed(url, source_name):
 # =========================
 np.random.seed(0)
 
+# Bảng profiling cho developer (tắt mặc định): đo thời gian & bộ nhớ từng công đoạn của mỗi rerun
+profiler = start_rerun(st.sidebar.toggle(
+    "🧪 Đo hiệu năng từng rerun (developer)", key="dev_profiler",
+    help="Ghi wall time và bộ nhớ (tracemalloc) của từng công đoạn. Bật tracemalloc sẽ làm app chậm hơn."
+))
+
 # ========================================
 # PREMIUM BANKING HEADER
 # ========================================
@@ -1361,13 +1053,13 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# Load dữ liệu huấn luyện (CSV có default, X_1..X_14) - Giữ nguyên logic load data
-try:
-    df = pd.read_csv('DATASET.csv', encoding='latin-1')
-    # Tên cột cho việc huấn luyện (phải giữ nguyên X_1..X_14)
-    MODEL_COLS = [f"X_{i}" for i in range(1, 15)]
-except Exception:
-    df = None
+# Load dữ liệu huấn luyện (CSV có default, X_1..X_14): chỉ đọc các cột cần dùng (float32/int8),
+# từ lần thứ 2 nạp bằng memory-map từ bản cache .npy cạnh file CSV
+with profiler.stage("data_load"):
+    try:
+        df = load_training_data('DATASET.csv')
+    except Exception:
+        df = None
 
 # ========================================
 # SIDEBAR - HƯỚNG DẪN VÀ UPLOAD FILE
@@ -1376,44 +1068,64 @@ except Exception:
 # Upload file
 uploaded_file = st.sidebar.file_uploader("📂 Tải CSV Dữ liệu Huấn luyện", type=['csv'])
 if uploaded_file is not None:
-    df = pd.read_csv(uploaded_file, encoding='latin-1')
-    MODEL_COLS = [f"X_{i}" for i in range(1, 15)]
+    with profiler.stage("data_load_upload"):
+        df = read_training_csv(uploaded_file)
     
 # Định nghĩa các Tabs
 # ------------------------------------------------------------------------------------------------
-# THAY ĐỔI 4: Vị trí Tabs được giữ nguyên, CSS mới sẽ đảm bảo Tabs có màu
-# Tab mới: Dashboard tài chính doanh nghiệp (GSO) và Tin tức tài chính
+# Thanh chọn trang (giao diện giống tab) thay cho st.tabs: chỉ trang đang mở được chạy,
+# các trang khác (tin RSS, biểu đồ dashboard, ảnh tác giả...) không tốn thời gian mỗi lần rerun
 # ------------------------------------------------------------------------------------------------
-tab_predict, tab_scenario, tab_dashboard, tab_news, tab_authors, tab_build, tab_goal = st.tabs([
-    "🚀 Sử dụng mô hình dự báo",
-    "⚠️ Mô phỏng kịch bản xấu",
-    "📊 Dashboard tài chính doanh nghiệp",
-    "📰 Tin tức tài chính",
-    "👥 Nhóm tác giả",
-    "🛠️ Xây dựng mô hình",
-    "🎯 Mục tiêu của mô hình"
-])
+VIEW_PREDICT = "🚀 Sử dụng mô hình dự báo"
+VIEW_SCENARIO = "⚠️ Mô phỏng kịch bản xấu"
+VIEW_DASHBOARD = "📊 Dashboard tài chính doanh nghiệp"
+VIEW_NEWS = "📰 Tin tức tài chính"
+VIEW_AUTHORS = "👥 Nhóm tác giả"
+VIEW_BUILD = "🛠️ Xây dựng mô hình"
+VIEW_GOAL = "🎯 Mục tiêu của mô hình"
+VIEWS = [VIEW_PREDICT, VIEW_SCENARIO, VIEW_DASHBOARD, VIEW_NEWS, VIEW_AUTHORS, VIEW_BUILD, VIEW_GOAL]
+# Các trang cần mô hình đã huấn luyện
+MODEL_VIEWS = {VIEW_PREDICT, VIEW_SCENARIO, VIEW_BUILD}
+
+# Widget có key ở các trang: giữ giá trị khi người dùng chuyển sang trang khác rồi quay lại
+keep_widget_state({
+    "select_build_col": None,
+    "company_name_word": "KHÁCH HÀNG DOANH NGHIỆP",
+    "cf_target_pd": DEFAULT_TARGET_PD,
+    "batch_workers": os.cpu_count() or 1,
+    "batch_charts": True,
+    "batch_reverse_stress": False,
+    "scenario_type": None,
+    "scenario_roa_roe": -15,
+    "scenario_debt_equity": 15,
+    "scenario_liquidity": -10,
+    "scenario_revenue_profit": -20,
+    "scenario_interest": 15,
+    "analysis_type": None,
+})
+active_view = view_selector(VIEWS)
 
 # --- Logic xử lý khi chưa có data huấn luyện ---
 if df is None:
     st.sidebar.info("💡 Hãy tải file CSV huấn luyện (có cột 'default' và X_1...X_14) để xây dựng mô hình.")
     
     # Logic cho các tab khi thiếu data huấn luyện
-    with tab_predict:
+    if active_view == VIEW_PREDICT:
         st.header("⚡ Dự báo PD & Phân tích AI cho Hồ sơ mới")
         st.warning("⚠️ **Không thể dự báo PD**. Vui lòng tải file **CSV Dữ liệu Huấn luyện** ở sidebar để xây dựng mô hình Logistic Regression.")
         up_xlsx = st.file_uploader("Tải **ho_so_dn.xlsx**", type=["xlsx"], key="ho_so_dn")
         if up_xlsx is None:
             st.info("Hãy tải **ho_so_dn.xlsx** (đủ 3 sheet) để tính X1…X14 và phân tích AI.")
 
-    with tab_goal:
+    if active_view == VIEW_GOAL:
         st.header("🎯 Mục tiêu của Mô hình")
         st.info("Ứng dụng này cần dữ liệu huấn luyện để bắt đầu hoạt động.")
     
-    with tab_build:
+    if active_view == VIEW_BUILD:
           st.header("🛠️ Xây dựng & Đánh giá Mô hình LogReg")
           st.error("❌ **Không thể xây dựng mô hình**. Vui lòng tải file **CSV Dữ liệu Huấn luyện** ở sidebar để bắt đầu.")
           
+    finish_rerun(profiler)
     st.stop()
 # ------------------------------------------------------------------------------------------------
 
@@ -1432,76 +1144,74 @@ required_cols = ['default'] + MODEL_COLS
 missing = [c for c in required_cols if c not in df.columns]
 if missing:
     st.error(f"❌ Thiếu cột: **{missing}**. Vui lòng kiểm tra lại file CSV huấn luyện.")
+    finish_rerun(profiler)
     st.stop()
 
 
 # ================================================================================================
 # NÂNG CẤP MÔ HÌNH: Từ Logistic đơn lẻ lên StackingClassifier với 3 base models
 # ================================================================================================
-X = df[MODEL_COLS] # Chỉ lấy các cột X_1..X_14
-y = df['default'].astype(int)
-
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42, stratify=y
-)
-
-# Định nghĩa 3 Base Models
-model_logistic = LogisticRegression(random_state=42, max_iter=1000, class_weight="balanced", solver="lbfgs")
-model_rf = RandomForestClassifier(n_estimators=100, random_state=42, max_depth=10, class_weight="balanced")
-model_xgb = XGBClassifier(n_estimators=100, random_state=42, max_depth=6, learning_rate=0.1,
-                          use_label_encoder=False, eval_metric='logloss')
-
-# Tạo StackingClassifier với LogisticRegression làm meta-model
-estimators = [
-    ('logistic', model_logistic),
-    ('random_forest', model_rf),
-    ('xgboost', model_xgb)
-]
-model = StackingClassifier(
-    estimators=estimators,
-    final_estimator=LogisticRegression(random_state=42, max_iter=1000),
-    cv=5,  # Cross-validation 5-fold
-    stack_method='predict_proba',  # Dùng probability để stack
-    n_jobs=-1  # Sử dụng tất cả CPU cores
-)
-
-# Train tất cả models
-model.fit(X_train, y_train)
-
-# Dự báo & đánh giá cho Stacking Model (Model chính)
-y_pred_in = model.predict(X_train)
-y_proba_in = model.predict_proba(X_train)[:, 1]
-y_pred_out = model.predict(X_test)
-y_proba_out = model.predict_proba(X_test)[:, 1]
-
-# Train riêng 3 base models để lấy PD riêng biệt (để hiển thị)
-model_logistic.fit(X_train, y_train)
-model_rf.fit(X_train, y_train)
-model_xgb.fit(X_train, y_train)
-
-# Tính PD từ 3 base models trên test set
-y_proba_logistic_out = model_logistic.predict_proba(X_test)[:, 1]
-y_proba_rf_out = model_rf.predict_proba(X_test)[:, 1]
-y_proba_xgb_out = model_xgb.predict_proba(X_test)[:, 1]
-
-metrics_in = {
-    "accuracy_in": accuracy_score(y_train, y_pred_in),
-    "precision_in": precision_score(y_train, y_pred_in, zero_division=0),
-    "recall_in": recall_score(y_train, y_pred_in, zero_division=0),
-    "f1_in": f1_score(y_train, y_pred_in, zero_division=0),
-    "auc_in": roc_auc_score(y_train, y_proba_in),
-}
-metrics_out = {
-    "accuracy_out": accuracy_score(y_test, y_pred_out),
-    "precision_out": precision_score(y_test, y_pred_out, zero_division=0),
-    "recall_out": recall_score(y_test, y_pred_out, zero_division=0),
-    "f1_out": f1_score(y_test, y_pred_out, zero_division=0),
-    "auc_out": roc_auc_score(y_test, y_proba_out),
-}
+@st.cache_resource(max_entries=2, show_spinner="Đang huấn luyện mô hình...")
+def get_trained_models(_df, data_key):
+    """Huấn luyện 1 lần cho mỗi bộ dữ liệu (data_key = mã băm nội dung), dùng lại qua các lần rerun"""
+    trained = train_models(_df)
+    # Đường logistic 1 biến, describe() và mẫu scatter cho tab Xây dựng mô hình (đổi biến không phải fit lại)
+    trained["univariate"] = build_univariate_summary(_df)
+    # Bộ giải thích đóng góp từng chỉ số (cấu trúc cây + thống kê nền tính sẵn 1 lần)
+    trained["attribution"] = AttributionEngine(trained["model"], trained["model_logistic"], trained["model_rf"],
+                                               trained["model_xgb"], trained["X_train"])
+    # Bản biên dịch (mảng node phẳng) của 4 mô hình cho mọi lần chấm PD; bộ giải thích ở trên vẫn đọc mô hình gốc
+    trained["compiled"] = {name: compile_model(trained[name], MODEL_COLS)
+                           for name in ("model", "model_logistic", "model_rf", "model_xgb")}
+    # Chấm 1 hồ sơ trên mảng float32 theo MODEL_COLS (thứ tự cột kiểm tra 1 lần ở đây, không dựng DataFrame mỗi lần)
+    trained["array_scorers"] = {name: ArrayScorer(compiled, MODEL_COLS) for name, compiled in trained["compiled"].items()}
+    # Chỉ mục doanh nghiệp tương tự trên tập train (kèm PD đã hiệu chỉnh và kết quả vỡ nợ thực tế)
+    trained["peers"] = PeerIndex(trained["X_train"], trained["y_train"],
+                                 apply_calibration(trained["y_proba_in"], trained["calibration"]), MODEL_COLS)
+    # Mảng giá trị đã sắp xếp của từng chỉ số trên tập train để xếp hạng phân vị (radar, tô màu, payload AI)
+    trained["percentiles"] = PercentileIndex(trained["X_train"], trained["y_train"])
+    # Lưới giá trị 14 chỉ số cho phân tích độ nhạy PD (partial dependence tính khi mở lần đầu)
+    trained["sensitivity"] = SensitivityEngine(trained["compiled"]["model"], trained["X_train"],
+                                               trained["calibration"])
+    # Bộ tìm kế hoạch cải thiện chỉ số (chiều đơn điệu và khoảng phân vị lấy từ chỉ mục phân vị)
+    trained["counterfactual"] = CounterfactualPlanner(trained["compiled"]["model"], trained["percentiles"],
+                                                      trained["calibration"])
+    # Thẻ điểm WoE (bin đơn điệu + Logistic trên WoE) để chấm minh bạch bằng bảng điểm nguyên
+    trained["scorecard"] = Scorecard(trained["X_train"], trained["y_train"], trained["model_logistic"])
+    # Kết quả phân tích theo hồ sơ (độ nhạy, kế hoạch cải thiện, cú sốc tối thiểu) của mô hình này, dùng lại qua các
+    # lần rerun thay vì chấm lại mỗi lần đổi widget
+    trained["results"] = LRUCache(max_entries=128)
+    return trained
+
+
+# Chỉ các trang dùng mô hình mới cần huấn luyện (trang tin tức, tác giả... mở ngay không phải chờ)
+if active_view in MODEL_VIEWS:
+    with profiler.stage("train"):
+        data_key = dataset_fingerprint(df)
+        trained = get_trained_models(df, data_key)
+    # Các tab chỉ dùng mô hình để chấm PD nên lấy luôn bản biên dịch (cùng predict_proba, nhanh hơn)
+    model = trained["compiled"]["model"]
+    # Chấm 1 hồ sơ (tab dự báo, kịch bản): 4 mô hình trên mảng float32 theo MODEL_COLS
+    array_scorers = trained["array_scorers"]
+    y_test = trained["y_test"]
+    metrics_in = trained["metrics_in"]
+    metrics_out = trained["metrics_out"]
+    evaluation = trained["evaluation"]
+    univariate = trained["univariate"]
+    attribution = trained["attribution"]
+    calibration = trained["calibration"]
+    peer_index = trained["peers"]
+    percentile_index = trained["percentiles"]
+    sensitivity_engine = trained["sensitivity"]
+    counterfactual_planner = trained["counterfactual"]
+    scorecard = trained["scorecard"]
+    results_cache = trained["results"]
+    threshold_info = trained["threshold"]
+    default_threshold = threshold_info["threshold"]
 
 # --- CÁC PHẦN UI DỰA TRÊN TABS ---
 
-with tab_goal:
+if active_view == VIEW_GOAL:
     st.header("🎯 Mục tiêu của Mô hình")
     st.markdown("""
     **Dự báo xác suất vỡ nợ (PD) của khách hàng doanh nghiệp** dựa trên bộ chỉ số $\\text{X1}–\\text{X14}$
@@ -1567,7 +1277,7 @@ with tab_goal:
     st.info("💡 **Lưu ý**: Tất cả 14 chỉ số đều được tính toán tự động. Bạn chỉ cần tải file Excel chứa 3 báo cáo tài chính.")
 
 
-with tab_build:
+if active_view == VIEW_BUILD:
     st.header("🛠️ Xây dựng & Đánh giá Mô hình Stacking Ensemble")
     st.info("**Mô hình Stacking Classifier** đã được huấn luyện với **3 Base Models** (Logistic, RandomForest, XGBoost) + **Meta-Model** (Logistic) trên **20% dữ liệu Test (chưa thấy)**.")
 
@@ -1643,10 +1353,23 @@ with tab_build:
     st.subheader("1. Tổng quan Kết quả Đánh giá (Test Set)")
     col_acc, col_auc, col_f1 = st.columns(3)
     
-    col_acc.metric(label="Độ chính xác (Accuracy)", value=f"{metrics_out['accuracy_out']:.2%}")
+    # Accuracy/F1/ma trận nhầm lẫn: PD đã hiệu chỉnh so với ngưỡng Default tối ưu (cùng quyết định ở tab dự báo)
+    decision_help = f"Gán Default khi PD đã hiệu chỉnh ≥ ngưỡng tối ưu {default_threshold:.2%}"
+    col_acc.metric(label="Độ chính xác (Accuracy)", value=f"{metrics_out['accuracy_out']:.2%}", help=decision_help)
     # Đảm bảo logic delta vẫn đúng
     col_auc.metric(label="Diện tích dưới đường cong (AUC)", value=f"{metrics_out['auc_out']:.3f}", delta=f"{metrics_in['auc_in'] - metrics_out['auc_out']:.3f}", delta_color="inverse")
-    col_f1.metric(label="Điểm F1-Score", value=f"{metrics_out['f1_out']:.3f}")
+    col_f1.metric(label="Điểm F1-Score", value=f"{metrics_out['f1_out']:.3f}", help=decision_help)
+
+    # Chỉ số phân biệt thường dùng trong chấm điểm tín dụng + khoảng tin cậy bootstrap trên tập test
+    ci_out = evaluation["test"]["ci"]
+    ci_pct = f"{evaluation['test']['ci_level']:.0%}"
+    col_ks, col_gini, col_brier = st.columns(3)
+    col_ks.metric(label="KS (Kolmogorov-Smirnov)", value=f"{metrics_out['ks_out']:.3f}")
+    col_ks.caption(f"CI {ci_pct}: {ci_out.loc['ks', 'lower']:.3f} – {ci_out.loc['ks', 'upper']:.3f}")
+    col_gini.metric(label="Hệ số Gini (= 2·AUC − 1)", value=f"{metrics_out['gini_out']:.3f}")
+    col_gini.caption(f"CI {ci_pct}: {ci_out.loc['gini', 'lower']:.3f} – {ci_out.loc['gini', 'upper']:.3f}")
+    col_brier.metric(label="Brier Score (PD thô)", value=f"{metrics_out['brier_out']:.4f}")
+    col_brier.caption(f"CI {ci_pct}: {ci_out.loc['brier', 'lower']:.4f} – {ci_out.loc['brier', 'upper']:.4f}")
     
     st.divider()
 
@@ -1655,7 +1378,7 @@ with tab_build:
     
     with st.expander("📊 Thống kê Mô tả và Dữ liệu Mẫu"):
         st.markdown("##### Thống kê Mô tả các biến $X_1..X_{14}$")
-        st.dataframe(df[MODEL_COLS].describe().style.format("{:.4f}"))
+        st.dataframe(univariate["describe"].style.format("{:.4f}"))
         st.markdown("##### 6 Dòng dữ liệu huấn luyện mẫu (Đầu/Cuối)")
         st.dataframe(pd.concat([df.head(3), df.tail(3)]))
 
@@ -1666,47 +1389,44 @@ with tab_build:
     if col in df.columns:
         try:
             # Dùng Streamlit.pyplot với theme banking hiện đại
-            fig, ax = plt.subplots(figsize=(12, 7))
+            with profiler.stage("chart_build_scatter"):
+                fig, ax = plt.subplots(figsize=(12, 7))
 
-            # Set background color
-            fig.patch.set_facecolor('#f8f9fa')
-            ax.set_facecolor('#ffffff')
+                # Set background color
+                fig.patch.set_facecolor('#f8f9fa')
+                ax.set_facecolor('#ffffff')
 
-            # Scatter plot với màu sắc pink rose theme
-            sns.scatterplot(data=df, x=col, y='default', alpha=0.65, ax=ax, hue='default',
-                          palette=['#ff6b9d', '#ffb3c6'], s=80, edgecolor='white', linewidth=0.5)
-
-            # Vẽ đường logistic regression theo 1 biến
-            x_range = np.linspace(df[col].min(), df[col].max(), 100).reshape(-1, 1)
-            X_temp = df[[col]].copy()
-            y_temp = df['default']
-            lr_temp = LogisticRegression(max_iter=1000)
-            lr_temp.fit(X_temp, y_temp)
-            x_test = pd.DataFrame({col: x_range[:, 0]})
-            y_curve = lr_temp.predict_proba(x_test)[:, 1]
-            ax.plot(x_range, y_curve, color='#c2185b', linewidth=4, label='Đường LogReg',
-                   linestyle='-', alpha=0.9)
-
-            # Styling cho tiêu đề và labels
-            ax.set_title(f'Quan hệ giữa {col} và Xác suất Vỡ nợ', fontsize=16, fontweight='bold', color='#c2185b', pad=20)
-            ax.set_ylabel('Xác suất Default (0: Non-Default, 1: Default)', fontsize=13, fontweight='600', color='#4a5568')
-            ax.set_xlabel(col, fontsize=13, fontweight='600', color='#4a5568')
-
-            # Grid styling
-            ax.grid(True, alpha=0.2, linestyle='--', linewidth=0.8, color='#ff6b9d')
-            ax.spines['top'].set_visible(False)
-            ax.spines['right'].set_visible(False)
-            ax.spines['left'].set_color('#d0d0d0')
-            ax.spines['bottom'].set_color('#d0d0d0')
+                # Scatter plot với màu sắc pink rose theme (dữ liệu lớn chỉ vẽ mẫu con đã lấy sẵn)
+                sns.scatterplot(data=univariate["scatter"], x=col, y='default', alpha=0.65, ax=ax, hue='default',
+                              palette=['#ff6b9d', '#ffb3c6'], s=80, edgecolor='white', linewidth=0.5)
 
-            # Legend styling
-            legend = ax.legend(title='Default Status', title_fontsize=11, fontsize=10,
-                             frameon=True, fancybox=True, shadow=True)
-            legend.get_frame().set_facecolor('#f8f9fa')
-            legend.get_frame().set_alpha(0.9)
+                # Đường logistic regression theo 1 biến (đã fit sẵn cho cả 14 biến khi huấn luyện)
+                ax.plot(univariate["x_grid"][col], univariate["y_curve"][col], color='#c2185b', linewidth=4,
+                        label='Đường LogReg', linestyle='-', alpha=0.9)
 
-            st.pyplot(fig)
-            plt.close(fig)
+                # Styling cho tiêu đề và labels
+                ax.set_title(f'Quan hệ giữa {col} và Xác suất Vỡ nợ', fontsize=16, fontweight='bold', color='#c2185b', pad=20)
+                ax.set_ylabel('Xác suất Default (0: Non-Default, 1: Default)', fontsize=13, fontweight='600', color='#4a5568')
+                ax.set_xlabel(col, fontsize=13, fontweight='600', color='#4a5568')
+
+                # Grid styling
+                ax.grid(True, alpha=0.2, linestyle='--', linewidth=0.8, color='#ff6b9d')
+                ax.spines['top'].set_visible(False)
+                ax.spines['right'].set_visible(False)
+                ax.spines['left'].set_color('#d0d0d0')
+                ax.spines['bottom'].set_color('#d0d0d0')
+
+                # Legend styling
+                legend = ax.legend(title='Default Status', title_fontsize=11, fontsize=10,
+                                 frameon=True, fancybox=True, shadow=True)
+                legend.get_frame().set_facecolor('#f8f9fa')
+                legend.get_frame().set_alpha(0.9)
+
+                st.pyplot(fig)
+                plt.close(fig)
+                if univariate["n_rows"] > len(univariate["scatter"]):
+                    st.caption(f"Scatter vẽ {len(univariate['scatter']):,} điểm lấy mẫu ngẫu nhiên trên "
+                               f"{univariate['n_rows']:,} dòng; đường LogReg được fit trên toàn bộ dữ liệu.")
         except Exception as e:
             st.error(f"Lỗi khi vẽ biểu đồ: {e}")
     else:
@@ -1718,44 +1438,134 @@ with tab_build:
     col_cm, col_metrics_table = st.columns(2)
     
     with col_cm:
-        st.markdown("##### Ma trận Nhầm lẫn (Test Set)")
-        cm = confusion_matrix(y_test, y_pred_out)
+        st.markdown(f"##### Ma trận Nhầm lẫn (Test Set, ngưỡng {default_threshold:.2%})")
+        with profiler.stage("chart_confusion_matrix"):
+            # Đếm sẵn trong evaluation (PD đã hiệu chỉnh so với ngưỡng tối ưu), không phải chấm lại tập test
+            counts = evaluation["test"]["confusion"]
+            cm = np.array([[counts["tn"], counts["fp"]], [counts["fn"], counts["tp"]]])
 
-        # Tạo custom colormap cho pink rose theme
-        from matplotlib.colors import LinearSegmentedColormap
-        colors_pink = ['#fff5f7', '#ffe8f0', '#ffd4dd', '#ff85a1', '#ff6b9d']
-        n_bins = 100
-        cmap_pink = LinearSegmentedColormap.from_list('pink_rose', colors_pink, N=n_bins)
+            # Tạo custom colormap cho pink rose theme
+            from matplotlib.colors import LinearSegmentedColormap
+            colors_pink = ['#fff5f7', '#ffe8f0', '#ffd4dd', '#ff85a1', '#ff6b9d']
+            n_bins = 100
+            cmap_pink = LinearSegmentedColormap.from_list('pink_rose', colors_pink, N=n_bins)
 
-        disp = ConfusionMatrixDisplay(confusion_matrix=cm, display_labels=['Non-Default (0)', 'Default (1)'])
-        fig2, ax = plt.subplots(figsize=(7, 7))
-        fig2.patch.set_facecolor('#f8f9fa')
+            disp = ConfusionMatrixDisplay(confusion_matrix=cm, display_labels=['Non-Default (0)', 'Default (1)'])
+            fig2, ax = plt.subplots(figsize=(7, 7))
+            fig2.patch.set_facecolor('#f8f9fa')
 
-        disp.plot(ax=ax, cmap=cmap_pink, colorbar=True)
+            disp.plot(ax=ax, cmap=cmap_pink, colorbar=True)
 
-        # Styling
-        ax.set_title('Ma trận Nhầm lẫn', fontsize=14, fontweight='bold', color='#c2185b', pad=15)
-        ax.set_xlabel('Predicted Label', fontsize=12, fontweight='600', color='#4a5568')
-        ax.set_ylabel('True Label', fontsize=12, fontweight='600', color='#4a5568')
+            # Styling
+            ax.set_title('Ma trận Nhầm lẫn', fontsize=14, fontweight='bold', color='#c2185b', pad=15)
+            ax.set_xlabel('Predicted Label', fontsize=12, fontweight='600', color='#4a5568')
+            ax.set_ylabel('True Label', fontsize=12, fontweight='600', color='#4a5568')
 
-        st.pyplot(fig2)
-        plt.close(fig2)
+            st.pyplot(fig2)
+            plt.close(fig2)
         
     with col_metrics_table:
         st.markdown("##### Bảng Metrics Chi tiết")
+        metric_labels = {"accuracy": "Accuracy", "precision": "Precision", "recall": "Recall", "f1": "F1-Score",
+                         "auc": "AUC", "ks": "KS", "gini": "Gini", "average_precision": "Average Precision",
+                         "brier": "Brier Score"}
         dt = pd.DataFrame({
-            "Metric": ["Accuracy", "Precision", "Recall", "F1-Score", "AUC"],
-            "Train Set": [metrics_in['accuracy_in'], metrics_in['precision_in'], metrics_in['recall_in'], metrics_in['f1_in'], metrics_in['auc_in']],
-            "Test Set": [metrics_out['accuracy_out'], metrics_out['precision_out'], metrics_out['recall_out'], metrics_out['f1_out'], metrics_out['auc_out']],
+            "Metric": list(metric_labels.values()),
+            "Train Set": [metrics_in[f"{name}_in"] for name in metric_labels],
+            "Test Set": [metrics_out[f"{name}_out"] for name in metric_labels],
+            f"Test CI {ci_pct} (dưới)": [ci_out.loc[name, "lower"] for name in metric_labels],
+            f"Test CI {ci_pct} (trên)": [ci_out.loc[name, "upper"] for name in metric_labels],
         }).set_index("Metric")
         # Thêm styling để làm nổi bật kết quả tốt nhất
         def highlight_max(s):
             is_max = s == s.max()
             return ['background-color: #e0f0ff' if v else '' for v in is_max]
 
-        st.dataframe(dt.style.format("{:.4f}").apply(highlight_max, axis=1), use_container_width=True)
+        st.dataframe(dt.style.format("{:.4f}").apply(highlight_max, axis=1, subset=["Train Set", "Test Set"]),
+                     use_container_width=True)
+        st.caption(f"Khoảng tin cậy bootstrap percentile từ {evaluation['test']['n_bootstrap']:,} mẫu lấy lại tập test.")
+
+    st.markdown("##### Đường ROC và Precision-Recall")
+    with profiler.stage("chart_roc_pr"):
+        fig_curves, (ax_roc, ax_pr) = plt.subplots(1, 2, figsize=(12, 5))
+        fig_curves.patch.set_facecolor('#f8f9fa')
+        for split_name, split_label, color in (("train", "Train", '#ffb3c6'), ("test", "Test", '#c2185b')):
+            split_eval = evaluation[split_name]
+            ax_roc.plot(split_eval["roc"]["fpr"], split_eval["roc"]["tpr"], color=color, linewidth=2.5,
+                        label=f"{split_label} (AUC = {split_eval['metrics']['auc']:.3f})")
+            ax_pr.step(split_eval["pr"]["recall"], split_eval["pr"]["precision"], where='post', color=color,
+                       linewidth=2.5, label=f"{split_label} (AP = {split_eval['metrics']['average_precision']:.3f})")
+        ax_roc.plot([0, 1], [0, 1], color='#d0d0d0', linestyle='--', linewidth=1)
+        ax_roc.set_title('Đường ROC', fontsize=14, fontweight='bold', color='#c2185b')
+        ax_roc.set_xlabel('False Positive Rate', fontsize=12, color='#4a5568')
+        ax_roc.set_ylabel('True Positive Rate', fontsize=12, color='#4a5568')
+        ax_pr.axhline(float(np.mean(y_test)), color='#d0d0d0', linestyle='--', linewidth=1)
+        ax_pr.set_title('Đường Precision-Recall', fontsize=14, fontweight='bold', color='#c2185b')
+        ax_pr.set_xlabel('Recall', fontsize=12, color='#4a5568')
+        ax_pr.set_ylabel('Precision', fontsize=12, color='#4a5568')
+        for ax in (ax_roc, ax_pr):
+            ax.set_facecolor('#ffffff')
+            ax.grid(True, alpha=0.2, linestyle='--', linewidth=0.8, color='#ff6b9d')
+            ax.spines['top'].set_visible(False)
+            ax.spines['right'].set_visible(False)
+            ax.legend(fontsize=10, frameon=True, loc='lower right' if ax is ax_roc else 'upper right')
+        st.pyplot(fig_curves)
+        plt.close(fig_curves)
+
+    st.divider()
+
+    st.subheader("4. Ngưỡng Default tối ưu (Test Set)")
+    curve = threshold_info["curve"]
+    # Dòng của ngưỡng cũ 15% trên đường cong (các ngưỡng xếp giảm dần)
+    old_row = curve.iloc[max(int((curve["threshold"] >= DEFAULT_THRESHOLD).sum()) - 1, 0)]
+    best_row = threshold_info["best"]
+    criterion_label = "Chi phí kỳ vọng nhỏ nhất (LGD × EAD)" if threshold_info["criterion"] == "cost" else "F1 lớn nhất"
+    col_thr, col_cost, col_thr_f1 = st.columns(3)
+    col_thr.metric("Ngưỡng PD gán Default", f"{default_threshold:.2%}",
+                   delta=f"{default_threshold - DEFAULT_THRESHOLD:+.2%} so với 15%", delta_color="off")
+    if best_row is not None:
+        col_cost.metric("Chi phí kỳ vọng / khách hàng (% EAD)", f"{best_row['expected_cost']:.2%}",
+                        delta=f"{best_row['expected_cost'] - old_row['expected_cost']:+.2%} so với ngưỡng 15%",
+                        delta_color="inverse")
+        col_thr_f1.metric("F1 tại ngưỡng tối ưu", f"{best_row['f1']:.3f}",
+                          delta=f"{best_row['f1'] - old_row['f1']:+.3f} so với ngưỡng 15%")
+    st.caption(f"Tiêu chí: **{criterion_label}**. Bỏ sót 1 khách hàng vỡ nợ mất LGD × EAD, từ chối nhầm 1 khách hàng "
+               f"tốt mất {threshold_info['reject_cost_rate']:.0%} × EAD. PD đã qua hiệu chỉnh (calibration); "
+               f"đường cong được tính cho mọi ngưỡng trong 1 lượt sắp xếp + tổng tích lũy.")
+
+    with profiler.stage("chart_threshold_curve"):
+        fig3, ax_cost = plt.subplots(figsize=(12, 5))
+        fig3.patch.set_facecolor('#f8f9fa')
+        ax_cost.set_facecolor('#ffffff')
+        # Bỏ dòng đầu (ngưỡng cao hơn mọi PD) để trục hoành nằm trong khoảng PD thực tế
+        plot_curve = curve.iloc[1:]
+        ax_cost.step(plot_curve["threshold"], plot_curve["expected_cost"], where='post', color='#c2185b',
+                     linewidth=2.5, label='Chi phí kỳ vọng')
+        ax_cost.set_xlabel('Ngưỡng PD', fontsize=12, fontweight='600', color='#4a5568')
+        ax_cost.set_ylabel('Chi phí kỳ vọng / khách hàng', fontsize=12, fontweight='600', color='#c2185b')
+        ax_f1 = ax_cost.twinx()
+        ax_f1.step(plot_curve["threshold"], plot_curve["f1"], where='post', color='#4a90e2', linewidth=2,
+                   linestyle='--', label='F1-Score')
+        ax_f1.set_ylabel('F1-Score', fontsize=12, fontweight='600', color='#4a90e2')
+        ax_cost.axvline(default_threshold, color='#28a745', linewidth=2, label=f'Ngưỡng tối ưu ({default_threshold:.2%})')
+        ax_cost.axvline(DEFAULT_THRESHOLD, color='#6c757d', linewidth=1.5, linestyle=':', label='Ngưỡng cũ (15%)')
+        ax_cost.grid(True, alpha=0.2, linestyle='--', linewidth=0.8, color='#ff6b9d')
+        ax_cost.spines['top'].set_visible(False)
+        ax_f1.spines['top'].set_visible(False)
+        handles = ax_cost.get_legend_handles_labels()[0] + ax_f1.get_legend_handles_labels()[0]
+        ax_cost.legend(handles=handles, fontsize=10, frameon=True, loc='upper right')
+        st.pyplot(fig3)
+        plt.close(fig3)
+
+    with st.expander("📋 Bảng đánh đổi theo ngưỡng"):
+        st.dataframe(
+            curve.iloc[1:].rename(columns={"threshold": "Ngưỡng PD", "expected_cost": "Chi phí kỳ vọng"})
+            .style.format({"Ngưỡng PD": "{:.2%}", "precision": "{:.3f}", "recall": "{:.3f}", "f1": "{:.3f}",
+                           "Chi phí kỳ vọng": "{:.4f}"}),
+            use_container_width=True
+        )
 
-with tab_predict:
+if active_view == VIEW_PREDICT:
     # Trang này được hiển thị mặc định
     st.header("⚡ Dự báo PD & Phân tích AI cho Hồ sơ mới")
     
@@ -1764,13 +1574,13 @@ with tab_predict:
     with input_container:
         st.markdown("##### 📥 Tải lên Hồ sơ Doanh nghiệp (Excel)")
         st.caption("File phải có đủ **3 sheet**: **CDKT** (Bảng Cân đối Kế toán) ; **BCTN** (Báo cáo Kết quả Kinh doanh) ; **LCTT** (Báo cáo Lưu chuyển Tiền tệ).")
-        up_xlsx = st.file_uploader("Tải **ho_so_dn.xlsx**", type=["xlsx"], key="ho_so_dn_main", label_visibility="collapsed")
+        up_xlsx = persistent_file_uploader("Tải **ho_so_dn.xlsx**", type=["xlsx"], key="ho_so_dn_main", label_visibility="collapsed")
     
     if up_xlsx is not None:
         # Tính X1..X14 từ 3 sheet (GIỮ NGUYÊN)
         try:
             # Hiển thị thanh tiến trình giả lập (thêm hiệu ứng động)
-            with st.spinner('Đang đọc và xử lý dữ liệu tài chính...'):
+            with st.spinner('Đang đọc và xử lý dữ liệu tài chính...'), profiler.stage("ratio_computation"):
                 ratios_df = compute_ratios_from_three_sheets(up_xlsx)
             
             # Tách riêng 14 cột tiếng Việt (hiển thị) và 14 cột tiếng Anh (dự báo)
@@ -1780,6 +1590,7 @@ with tab_predict:
             
         except Exception as e:
             st.error(f"❌ Lỗi tính chỉ số tài chính: Vui lòng kiểm tra lại cấu trúc 3 sheet trong file Excel. Chi tiết lỗi: {e}")
+            finish_rerun(profiler)
             st.stop()
 
         st.divider()
@@ -1787,6 +1598,14 @@ with tab_predict:
         
         # Tạo payload data cho AI (Sử dụng tên tiếng Việt)
         data_for_ai = ratios_display.to_dict()['Giá trị']
+
+        # Phân vị của từng chỉ số so với dữ liệu huấn luyện (0 = thấp nhất, 100 = cao nhất)
+        ratio_percentiles = percentile_index.rank(ratios_predict)[0]
+        ratio_risk = dict(zip(COMPUTED_COLS, percentile_index.risk_rank(ratio_percentiles)))
+        ratios_display[PERCENTILE_COL] = ratio_percentiles
+        data_for_ai['Phân vị của từng chỉ số so với dữ liệu huấn luyện (%)'] = {
+            name: round(float(p), 1) for name, p in zip(COMPUTED_COLS, ratio_percentiles) if pd.notna(p)
+        }
         
         # ================================================================================================
         # DỰ BÁO PD TỪ 4 MODELS: 3 Base Models + 1 Stacking Model
@@ -1796,22 +1615,42 @@ with tab_predict:
         probs_logistic = np.nan
         probs_rf = np.nan
         probs_xgb = np.nan
+        explanation = None
+        peer_result = None
+        sensitivity_result = None
+        improvement_plan = None
+        scorecard_result = None
 
         # Kiểm tra mô hình có sẵn sàng dự báo không (đã train và cột khớp)
-        if set(X.columns) == set(ratios_predict.columns):
+        if set(MODEL_COLS) == set(ratios_predict.columns):
             try:
                 # Đảm bảo thứ tự cột cho predict đúng như thứ tự cột huấn luyện
-                X_new = ratios_predict[X.columns]
+                X_new = ratios_predict[MODEL_COLS]
+                # Khóa cache kết quả phân tích của hồ sơ: 14 chỉ số float64 theo MODEL_COLS
+                company_key = X_new.to_numpy(dtype=np.float64).tobytes()
+
+                with profiler.stage("scoring"):
+                    # 4 mô hình cùng chấm 1 mảng float32 (không chọn cột DataFrame ở mỗi predict_proba)
+                    X_array = feature_array(X_new.to_numpy(), MODEL_COLS)
 
-                # 1. PD từ Stacking Model (Model chính - kết quả cuối cùng)
-                probs_array = model.predict_proba(X_new)[:, 1]
-                probs = float(probs_array[0])
-                preds = int(probs >= 0.15)
+                    # 1. PD từ Stacking Model (Model chính - kết quả cuối cùng), quy về PD thực tế qua bảng hiệu chỉnh
+                    probs_array = apply_calibration(array_scorers["model"].predict_proba(X_array)[:, 1], calibration)
+                    probs = float(probs_array[0])
+                    preds = int(probs >= default_threshold)
 
-                # 2. PD từ 3 Base Models (để hiển thị riêng)
-                probs_logistic = float(model_logistic.predict_proba(X_new)[:, 1][0])
-                probs_rf = float(model_rf.predict_proba(X_new)[:, 1][0])
-                probs_xgb = float(model_xgb.predict_proba(X_new)[:, 1][0])
+                    # 2. PD từ 3 Base Models (để hiển thị riêng)
+                    probs_logistic = float(array_scorers["model_logistic"].predict_proba(X_array)[0, 1])
+                    probs_rf = float(array_scorers["model_rf"].predict_proba(X_array)[0, 1])
+                    probs_xgb = float(array_scorers["model_xgb"].predict_proba(X_array)[0, 1])
+
+                # Đóng góp của từng chỉ số vào PD của 4 mô hình
+                with profiler.stage("attribution"):
+                    explanation = attribution.explain(X_new)
+
+                # Điểm thẻ điểm WoE: mỗi chỉ số 1 lần tra bảng điểm theo khoảng giá trị
+                scorecard_result = scorecard.breakdown(X_new)
+                data_for_ai['Điểm thẻ điểm WoE (tổng điểm, PD tương ứng)'] = \
+                    {"điểm": scorecard_result["score"], "PD": round(scorecard_result["pd"], 4)}
 
                 # Thêm PD vào payload AI (chỉ dùng PD từ Stacking - kết quả cuối cùng)
                 data_for_ai['Xác suất Vỡ nợ (PD) - Stacking'] = probs
@@ -1819,6 +1658,25 @@ with tab_predict:
                 data_for_ai['Xác suất Vỡ nợ (PD) - RandomForest'] = probs_rf
                 data_for_ai['Xác suất Vỡ nợ (PD) - XGBoost'] = probs_xgb
                 data_for_ai['Dự đoán PD'] = "Default (Vỡ nợ)" if preds == 1 else "Non-Default (Không vỡ nợ)"
+                # Các chỉ số thực sự làm tăng/giảm PD Stacking (đóng góp theo điểm xác suất) để AI không phải đoán
+                data_for_ai['Chỉ số tác động mạnh nhất đến PD Stacking (đóng góp theo điểm %)'] = \
+                    top_drivers(explanation["stacking_proba"].iloc[0] * 100)
+
+                # Doanh nghiệp tương tự nhất trong dữ liệu lịch sử và tỷ lệ vỡ nợ thực tế của nhóm này
+                with profiler.stage("peers"):
+                    peer_result = peer_index.peers(X_new)
+                data_for_ai[f"Tỷ lệ vỡ nợ thực tế của {peer_result['k']} doanh nghiệp tương tự nhất"] = \
+                    peer_result['default_rate']
+
+                # Độ nhạy: PD khi lần lượt từng chỉ số chạy trên khoảng giá trị của tập train (1 lần predict_proba)
+                with profiler.stage("sensitivity"):
+                    sensitivity_result = results_cache.get_or_compute(("sensitivity", company_key),
+                                                                      lambda: sensitivity_engine.company(X_new))
+                data_for_ai['Chỉ số làm PD thay đổi nhiều nhất (PD khi chỉ số ở mức P10 / P90 của dữ liệu huấn luyện)'] = [
+                    {"chỉ_số": RATIO_LABELS[col], "PD_P10": round(float(row.pd_low), 4),
+                     "PD_P90": round(float(row.pd_high), 4)}
+                    for col, row in sensitivity_result["tornado"].head(3).iterrows()
+                ]
             except Exception as e:
                 # Nếu có lỗi dự báo, chỉ cảnh báo, không dừng app
                 st.warning(f"Không dự báo được PD: {e}")
@@ -1839,8 +1697,9 @@ with tab_predict:
 
         # Hàm styling với màu sắc nhẹ nhàng, ngọt ngào hơn
         def color_ratios(val):
-            """Ánh xạ màu dựa trên tên chỉ số và giá trị với palette màu pastel"""
-            value = val.values[0]
+            """Ánh xạ màu theo phân vị rủi ro của chỉ số so với dữ liệu huấn luyện, palette màu pastel"""
+            # Phân vị đã quy về chiều rủi ro: cao = bất lợi hơn phần lớn doanh nghiệp trong dữ liệu
+            risk = ratio_risk.get(val.name, np.nan)
 
             # Màu pastel nhẹ nhàng
             PASTEL_GREEN = '#d4edda'      # Xanh lá nhạt
@@ -1850,49 +1709,26 @@ with tab_predict:
             PASTEL_RED = '#f8d7da'        # Đỏ nhạt
             PASTEL_PURPLE = '#e7d9f5'     # Tím nhạt
 
-            # Chỉ số Thanh khoản (X7, X8) - Quan trọng cho khả năng thanh toán
-            if "Thanh toán" in val.name:
-                if value < 1.0:
-                    return [f'background-color: {PASTEL_RED}; color: #721c24; font-weight: 600;' for _ in val]  # Nguy hiểm
-                elif value >= 2.0:
-                    return [f'background-color: {PASTEL_GREEN}; color: #155724; font-weight: 600;' for _ in val]  # Rất tốt
-                elif value >= 1.5:
-                    return [f'background-color: {PASTEL_BLUE}; color: #0c5460; font-weight: 500;' for _ in val]  # Tốt
-                else:
-                    return [f'background-color: {PASTEL_YELLOW}; color: #856404; font-weight: 500;' for _ in val]  # Cảnh báo
-
-            # Chỉ số Nợ (X5, X6) - Cơ cấu tài chính
-            if "Tỷ lệ Nợ/" in val.name:
-                if value > 2.0:
-                    return [f'background-color: {PASTEL_RED}; color: #721c24; font-weight: 600;' for _ in val]  # Rủi ro cao
-                elif value > 1.0:
-                    return [f'background-color: {PASTEL_ORANGE}; color: #975a16; font-weight: 500;' for _ in val]  # Cảnh báo
-                elif value < 0.5:
-                    return [f'background-color: {PASTEL_GREEN}; color: #155724; font-weight: 600;' for _ in val]  # Rất tốt
-                else:
-                    return [f'background-color: {PASTEL_BLUE}; color: #0c5460; font-weight: 500;' for _ in val]  # Tốt
-
-            # Chỉ số Sinh lời (X1, X2, X3, X4) - Hiệu quả kinh doanh
-            if "Lợi nhuận" in val.name or "ROA" in val.name or "ROE" in val.name:
-                if value <= 0:
-                    return [f'background-color: {PASTEL_RED}; color: #721c24; font-weight: 600;' for _ in val]  # Lỗ
-                elif value > 0.15:
-                    return [f'background-color: {PASTEL_GREEN}; color: #155724; font-weight: 600;' for _ in val]  # Xuất sắc
-                elif value > 0.08:
-                    return [f'background-color: {PASTEL_BLUE}; color: #0c5460; font-weight: 500;' for _ in val]  # Tốt
-                elif value > 0.03:
-                    return [f'background-color: {PASTEL_YELLOW}; color: #856404; font-weight: 500;' for _ in val]  # Trung bình
-                else:
-                    return [f'background-color: {PASTEL_ORANGE}; color: #975a16; font-weight: 500;' for _ in val]  # Yếu
-
-            # Các chỉ số khác - màu tím pastel nhẹ nhàng
-            return [f'background-color: {PASTEL_PURPLE}; color: #5a395f; font-weight: 500;' for _ in val]
+            # Chỉ số không rõ chiều rủi ro trên dữ liệu huấn luyện (hoặc thiếu giá trị) - màu tím pastel
+            if pd.isna(risk):
+                return [f'background-color: {PASTEL_PURPLE}; color: #5a395f; font-weight: 500;' for _ in val]
+            if risk > 90:
+                return [f'background-color: {PASTEL_RED}; color: #721c24; font-weight: 600;' for _ in val]  # Rủi ro cao
+            if risk > 75:
+                return [f'background-color: {PASTEL_ORANGE}; color: #975a16; font-weight: 500;' for _ in val]  # Cảnh báo
+            if risk > 50:
+                return [f'background-color: {PASTEL_YELLOW}; color: #856404; font-weight: 500;' for _ in val]  # Trung bình
+            if risk > 25:
+                return [f'background-color: {PASTEL_BLUE}; color: #0c5460; font-weight: 500;' for _ in val]  # Tốt
+            return [f'background-color: {PASTEL_GREEN}; color: #155724; font-weight: 600;' for _ in val]  # Rất tốt
+
+        ratio_formats = {'Giá trị': "{:.4f}", PERCENTILE_COL: "P{:.0f}"}
 
         with pd_col_1:
              # Đảm bảo hiển thị Tên biến | Giá trị
              st.markdown("##### **💰 Chỉ số Tài chính (Phần 1)**")
              st.dataframe(
-                 ratios_part1.style.apply(color_ratios, axis=1).format("{:.4f}").set_properties(**{
+                 ratios_part1.style.apply(color_ratios, axis=1).format(ratio_formats, na_rep="N/A").set_properties(**{
                      'font-size': '14px',
                      'border-radius': '5px',
                      'padding': '8px'
@@ -1904,7 +1740,7 @@ with tab_predict:
             # Đảm bảo hiển thị Tên biến | Giá trị
             st.markdown("##### **📈 Chỉ số Tài chính (Phần 2)**")
             st.dataframe(
-                ratios_part2.style.apply(color_ratios, axis=1).format("{:.4f}").set_properties(**{
+                ratios_part2.style.apply(color_ratios, axis=1).format(ratio_formats, na_rep="N/A").set_properties(**{
                     'font-size': '14px',
                     'border-radius': '5px',
                     'padding': '8px'
@@ -1925,83 +1761,15 @@ with tab_predict:
 
         with chart_col1:
             st.markdown("#### 📈 Biểu đồ Cột - Giá trị các Chỉ số")
-            # Tạo bar chart
-            fig_bar, ax_bar = plt.subplots(figsize=(8, 10))
-            fig_bar.patch.set_facecolor('#fff5f7')
-            ax_bar.set_facecolor('#ffffff')
-
-            # Chuẩn bị data cho bar chart
-            indicators = ratios_display.index.tolist()
-            values = ratios_display['Giá trị'].values
-
-            # Tạo màu gradient cho các bars
-            bar_colors = plt.cm.RdPu(np.linspace(0.3, 0.9, len(indicators)))
-
-            # Vẽ horizontal bar chart
-            bars = ax_bar.barh(indicators, values, color=bar_colors, edgecolor='white', linewidth=1.5)
-
-            # Thêm giá trị vào cuối mỗi bar
-            for i, (bar, val) in enumerate(zip(bars, values)):
-                width = bar.get_width()
-                ax_bar.text(width, bar.get_y() + bar.get_height()/2,
-                           f' {val:.3f}', ha='left', va='center',
-                           fontsize=9, fontweight='600', color='#c2185b')
-
-            # Styling
-            ax_bar.set_xlabel('Giá trị', fontsize=12, fontweight='600', color='#4a5568')
-            ax_bar.set_title('Các Chỉ số Tài chính', fontsize=14, fontweight='bold', color='#c2185b', pad=15)
-            ax_bar.grid(True, alpha=0.2, linestyle='--', linewidth=0.8, color='#ff6b9d', axis='x')
-            ax_bar.spines['top'].set_visible(False)
-            ax_bar.spines['right'].set_visible(False)
-            ax_bar.spines['left'].set_color('#d0d0d0')
-            ax_bar.spines['bottom'].set_color('#d0d0d0')
-
-            # Điều chỉnh layout để labels không bị cắt
-            plt.tight_layout()
-            st.pyplot(fig_bar)
-            plt.close(fig_bar)
+            # Ảnh PNG được vẽ 1 lần cho mỗi hồ sơ và dùng lại khi xuất Word
+            with profiler.stage("chart_bar"):
+                st.image(CHART_CACHE.get("bar", ratios_display, probs), use_container_width=True)
 
         with chart_col2:
             st.markdown("#### 🎯 Biểu đồ Radar - Phân tích Đa chiều")
-            # Tạo radar chart (spider chart)
-            fig_radar = plt.figure(figsize=(10, 10))
-            fig_radar.patch.set_facecolor('#fff5f7')
-            ax_radar = fig_radar.add_subplot(111, projection='polar')
-
-            # Chuẩn bị data cho radar chart
-            # Normalize các giá trị về khoảng 0-1 để dễ visualize
-            from sklearn.preprocessing import MinMaxScaler
-            scaler = MinMaxScaler()
-            normalized_values = scaler.fit_transform(values.reshape(-1, 1)).flatten()
-
-            # Tạo các góc cho mỗi chỉ số
-            angles = np.linspace(0, 2 * np.pi, len(indicators), endpoint=False).tolist()
-            normalized_values = normalized_values.tolist()
-
-            # Đóng vòng tròn
-            angles += angles[:1]
-            normalized_values += normalized_values[:1]
-
-            # Vẽ radar chart
-            ax_radar.plot(angles, normalized_values, 'o-', linewidth=2.5, color='#ff6b9d', label='Chỉ số')
-            ax_radar.fill(angles, normalized_values, alpha=0.25, color='#ffb3c6')
-
-            # Thêm labels
-            ax_radar.set_xticks(angles[:-1])
-            # Rút ngắn tên chỉ số để dễ đọc
-            short_labels = [label.split('(')[0].strip()[:20] for label in indicators]
-            ax_radar.set_xticklabels(short_labels, size=8, color='#4a5568', fontweight='600')
-
-            # Styling
-            ax_radar.set_ylim(0, 1)
-            ax_radar.set_title('Phân tích Đa chiều các Chỉ số\n(Normalized 0-1)',
-                              fontsize=14, fontweight='bold', color='#c2185b', pad=20)
-            ax_radar.grid(True, alpha=0.3, linestyle='--', linewidth=0.8, color='#ff6b9d')
-            ax_radar.set_facecolor('#ffffff')
-
-            plt.tight_layout()
-            st.pyplot(fig_radar)
-            plt.close(fig_radar)
+            # Radar chart: phân vị của từng chỉ số so với dữ liệu huấn luyện (mốc so sánh chung giữa các hồ sơ)
+            with profiler.stage("chart_radar"):
+                st.image(CHART_CACHE.get("radar", ratios_display, probs), use_container_width=True)
 
         # Thêm expander với thông tin bổ sung
         with st.expander("ℹ️ Giải thích về Biểu đồ"):
@@ -2012,10 +1780,11 @@ with tab_predict:
             - Giá trị cụ thể được hiển thị bên cạnh mỗi cột
 
             **Biểu đồ Radar (Spider Chart):**
-            - Hiển thị cân bằng tổng thể giữa các chỉ số
-            - Giá trị được chuẩn hóa về thang 0-1 để dễ so sánh
-            - Diện tích vùng phủ thể hiện độ mạnh của các chỉ số
-            - Hình dạng đều = tốt, hình dạng lệch = cần cân bằng
+            - Mỗi trục là **phân vị** của chỉ số so với các doanh nghiệp trong dữ liệu huấn luyện
+              (P50 = ngang trung vị, P90 = cao hơn 90% doanh nghiệp)
+            - Cùng một mốc so sánh nên hình dạng radar của các hồ sơ khác nhau so sánh được với nhau
+            - Màu ở bảng chỉ số cho biết chỉ số đang ở phía rủi ro (đỏ/cam) hay an toàn (xanh) của phân phối,
+              theo chiều tác động tới tỷ lệ vỡ nợ quan sát trên dữ liệu huấn luyện
             """)
 
         st.divider()
@@ -2029,14 +1798,19 @@ with tab_predict:
         # Hiển thị 3 PD từ Base Models trên 1 hàng
         st.markdown("##### 📊 Dự báo từ 3 Mô hình Cơ sở")
         pd_col_logistic, pd_col_rf, pd_col_xgb = st.columns(3)
+        # PD base model là điểm thô (chưa hiệu chỉnh) nên so với mốc cố định, không dùng ngưỡng tối ưu của Stacking
+        base_cutoff_help = (f"Cao/Thấp so với mốc cố định {DEFAULT_THRESHOLD:.0%} trên PD thô của mô hình cơ sở. "
+                            f"Ngưỡng Default tối ưu ({default_threshold:.2%}) chỉ áp cho PD Stacking đã hiệu chỉnh.")
 
         with pd_col_logistic:
             pd_value_log = f"{probs_logistic:.2%}" if pd.notna(probs_logistic) else "N/A"
             st.metric(
                 label="**PD - Logistic**",
                 value=pd_value_log,
-                delta="⬆️ Cao" if pd.notna(probs_logistic) and probs_logistic >= 0.15 else "⬇️ Thấp",
-                delta_color=("inverse" if pd.notna(probs_logistic) and probs_logistic >= 0.15 else "normal")
+                delta=(f"⬆️ Cao (≥ {DEFAULT_THRESHOLD:.0%} cố định)" if pd.notna(probs_logistic) and probs_logistic >= DEFAULT_THRESHOLD
+                       else f"⬇️ Thấp (< {DEFAULT_THRESHOLD:.0%} cố định)"),
+                delta_color=("inverse" if pd.notna(probs_logistic) and probs_logistic >= DEFAULT_THRESHOLD else "normal"),
+                help=base_cutoff_help
             )
 
         with pd_col_rf:
@@ -2044,8 +1818,10 @@ with tab_predict:
             st.metric(
                 label="**PD - RandomForest**",
                 value=pd_value_rf,
-                delta="⬆️ Cao" if pd.notna(probs_rf) and probs_rf >= 0.15 else "⬇️ Thấp",
-                delta_color=("inverse" if pd.notna(probs_rf) and probs_rf >= 0.15 else "normal")
+                delta=(f"⬆️ Cao (≥ {DEFAULT_THRESHOLD:.0%} cố định)" if pd.notna(probs_rf) and probs_rf >= DEFAULT_THRESHOLD
+                       else f"⬇️ Thấp (< {DEFAULT_THRESHOLD:.0%} cố định)"),
+                delta_color=("inverse" if pd.notna(probs_rf) and probs_rf >= DEFAULT_THRESHOLD else "normal"),
+                help=base_cutoff_help
             )
 
         with pd_col_xgb:
@@ -2053,8 +1829,10 @@ with tab_predict:
             st.metric(
                 label="**PD - XGBoost**",
                 value=pd_value_xgb,
-                delta="⬆️ Cao" if pd.notna(probs_xgb) and probs_xgb >= 0.15 else "⬇️ Thấp",
-                delta_color=("inverse" if pd.notna(probs_xgb) and probs_xgb >= 0.15 else "normal")
+                delta=(f"⬆️ Cao (≥ {DEFAULT_THRESHOLD:.0%} cố định)" if pd.notna(probs_xgb) and probs_xgb >= DEFAULT_THRESHOLD
+                       else f"⬇️ Thấp (< {DEFAULT_THRESHOLD:.0%} cố định)"),
+                delta_color=("inverse" if pd.notna(probs_xgb) and probs_xgb >= DEFAULT_THRESHOLD else "normal"),
+                help=base_cutoff_help
             )
 
         # Hiển thị PD Stacking nổi bật ở dưới
@@ -2113,6 +1891,108 @@ with tab_predict:
                 </div>
             </div>
             """, unsafe_allow_html=True)
+            if pd.notna(preds):
+                st.caption(f"Ngưỡng Default tối ưu của mô hình: PD ≥ {default_threshold:.2%} → "
+                           f"**{'Default (Vỡ nợ)' if preds == 1 else 'Non-Default (Không vỡ nợ)'}**")
+
+        if explanation is not None:
+            with st.expander("🔍 Chỉ số nào làm PD tăng/giảm? (Giải thích dự báo)"):
+                st.caption("Đóng góp của từng chỉ số so với mức nền (trung bình tập huấn luyện): dương = làm **tăng** PD, "
+                           "âm = làm **giảm** PD. Tổng đóng góp + giá trị nền = đúng kết quả của mô hình. "
+                           "RandomForest/XGBoost theo TreeSHAP, Logistic theo hệ số, Stacking gộp qua trọng số meta-model.")
+                st.dataframe(
+                    explanation_table(explanation).style.format("{:+.3f}")
+                    .background_gradient(cmap="RdPu", subset=["Stacking (điểm % PD)"]),
+                    use_container_width=True
+                )
+                st.caption(f"PD nền của Stacking: {explanation['stacking_base_proba'][0]:.2%} "
+                           "(đóng góp tính trên điểm Stacking trước khi hiệu chỉnh PD)")
+
+        if peer_result is not None:
+            with st.expander(f"👥 {peer_result['k']} doanh nghiệp tương tự nhất trong dữ liệu lịch sử"):
+                col_peer_rate, col_peer_pd = st.columns(2)
+                col_peer_rate.metric("Tỷ lệ vỡ nợ thực tế của nhóm", f"{peer_result['default_rate']:.0%}")
+                col_peer_pd.metric("PD trung bình của nhóm", f"{peer_result['mean_pd']:.2%}")
+                peer_table = peer_result["table"].rename(columns={
+                    "distance": "Khoảng cách", "default": "Vỡ nợ (1 = có)", "PD": "PD mô hình"
+                })
+                st.dataframe(
+                    peer_table.style.format({"Khoảng cách": "{:.3f}", "PD mô hình": "{:.2%}",
+                                             **{c: "{:.4f}" for c in MODEL_COLS}}),
+                    use_container_width=True
+                )
+                st.caption("Khoảng cách Euclid trên X1–X14 đã chuẩn hóa theo trung vị/IQR của tập huấn luyện; "
+                           "chỉ số dòng là vị trí doanh nghiệp trong file dữ liệu huấn luyện.")
+
+        if sensitivity_result is not None:
+            with st.expander("📈 Độ nhạy của PD theo từng chỉ số (What-if từng biến)"):
+                tornado = sensitivity_result["tornado"]
+
+                # Ảnh PNG vẽ 1 lần cho mỗi (hồ sơ, dữ liệu huấn luyện, ngưỡng), rerun chỉ hiển thị lại
+                chart_key = (fingerprint(ratios_display, probs), data_key, default_threshold)
+                with profiler.stage("chart_tornado"):
+                    st.image(CHART_CACHE.get_or_compute(
+                        ("tornado",) + chart_key,
+                        lambda: render_tornado_chart(sensitivity_result, default_threshold, RATIO_LABELS)
+                    ), use_container_width=True)
+
+                with profiler.stage("chart_pd_curves"):
+                    st.image(CHART_CACHE.get_or_compute(
+                        ("pd_curves",) + chart_key,
+                        lambda: render_pd_curves_chart(sensitivity_result, sensitivity_engine.partial_dependence(),
+                                                       default_threshold, RATIO_LABELS, tornado.index[:6].tolist())
+                    ), use_container_width=True)
+
+                st.caption("Mỗi lần chỉ thay đổi 1 chỉ số, giữ nguyên 13 chỉ số còn lại. Đường đỏ: PD của doanh nghiệp "
+                           "này; đường xanh nét đứt: partial dependence (PD trung bình của "
+                           f"{sensitivity_engine.pdp_sample_size} doanh nghiệp trong tập huấn luyện); đường chấm: giá trị "
+                           "hiện tại; đường hồng: ngưỡng Default. Toàn bộ lưới được chấm trong 1 lần predict_proba.")
+
+        if pd.notna(probs):
+            with st.expander("🛠️ Kế hoạch cải thiện chỉ số để đạt PD mục tiêu"):
+                target_pd = st.select_slider("PD mục tiêu", options=[0.01, 0.02, 0.03, 0.05, 0.10], key="cf_target_pd",
+                                             format_func=lambda v: f"{v:.0%}")
+                # Kế hoạch tính 1 lần cho mỗi (hồ sơ, PD mục tiêu); báo cáo Word và payload AI đọc cùng kết quả này
+                with profiler.stage("counterfactual"):
+                    improvement_plan = results_cache.get_or_compute(
+                        ("counterfactual", company_key, target_pd),
+                        lambda: counterfactual_planner.plan(ratios_predict, target_pd))
+                plan_table = improvement_plan["plan"]
+                if improvement_plan["pd_before"] < target_pd:
+                    st.success(f"PD hiện tại ({improvement_plan['pd_before']:.2%}) đã thấp hơn mục tiêu {target_pd:.0%}.")
+                else:
+                    if improvement_plan["achieved"]:
+                        st.success(f"Đổi {len(plan_table)} chỉ số dưới đây đưa PD từ {improvement_plan['pd_before']:.2%} "
+                                   f"xuống {improvement_plan['pd_after']:.2%} (< {target_pd:.0%}).")
+                    else:
+                        st.warning(f"Không đạt được PD < {target_pd:.0%} trong khoảng giá trị của dữ liệu huấn luyện; "
+                                   f"kế hoạch tốt nhất tìm được đưa PD xuống {improvement_plan['pd_after']:.2%}.")
+                    st.dataframe(
+                        plan_table.rename(columns={
+                            "label": "Chỉ số", "action": "Hành động", "current": "Hiện tại", "target": "Mục tiêu",
+                            "change_pct": "Thay đổi (%)", "percentile_from": "Phân vị hiện tại",
+                            "percentile_to": "Phân vị mục tiêu"
+                        }).style.format({"Hiện tại": "{:.4f}", "Mục tiêu": "{:.4f}", "Thay đổi (%)": "{:+.1f}%",
+                                         "Phân vị hiện tại": "P{:.0f}", "Phân vị mục tiêu": "P{:.0f}"}, na_rep="—"),
+                        use_container_width=True, hide_index=True
+                    )
+                    st.caption("Mỗi chỉ số chỉ đổi theo chiều làm giảm rủi ro (học từ dữ liệu huấn luyện) và trong khoảng "
+                               "P1–P99 của dữ liệu huấn luyện; thay đổi nhỏ nhất tính theo tổng số điểm phân vị. Đã thử "
+                               f"{improvement_plan['n_evaluated']:,} phương án trong {improvement_plan['n_calls']} lần chấm "
+                               "điểm theo lô.")
+                    data_for_ai[f"Kế hoạch cải thiện chỉ số để PD < {target_pd:.0%} (mô hình tính)"] = \
+                        plan_summary(improvement_plan)
+
+        if scorecard_result is not None:
+            with st.expander(f"🧾 Thẻ điểm WoE: {scorecard_result['score']} điểm (PD {scorecard_result['pd']:.2%})"):
+                st.dataframe(
+                    pd.DataFrame(scorecard_result["rows"])[["label", "value", "bin", "points"]].rename(columns={
+                        "label": "Chỉ số", "value": "Giá trị", "bin": "Khoảng giá trị", "points": "Điểm"}),
+                    hide_index=True, use_container_width=True
+                )
+                st.caption(f"Điểm càng cao rủi ro càng thấp: {len(scorecard.features)} chỉ số có IV đủ lớn được "
+                           "chia khoảng đơn điệu theo tỷ lệ vỡ nợ, mỗi khoảng 1 số điểm nguyên (Logistic trên WoE). "
+                           f"Cứ thêm {PDO} điểm thì odds tốt/xấu tăng gấp đôi. PD thẻ điểm có thể khác PD Stacking.")
 
         st.divider()
 
@@ -2215,22 +2095,14 @@ with tab_predict:
             </style>
             """, unsafe_allow_html=True)
 
-            # Khởi tạo session state cho tab navigation
-            if 'navigate_to_dashboard' not in st.session_state:
-                st.session_state['navigate_to_dashboard'] = False
-
+            # Chuyển thẳng sang trang Dashboard (hồ sơ đã tải và kết quả AI vẫn được giữ khi quay lại)
             col_nav = st.columns([1, 2, 1])
             with col_nav[1]:
-                if st.button("📊 Xem thêm DashBoard Tài chính Hỗ trợ Quyết định Cho vay",
-                           use_container_width=True,
-                           type="primary",
-                           key="nav_to_dashboard_btn"):
-                    st.session_state['navigate_to_dashboard'] = True
-                    st.success("✅ Hãy chuyển sang tab **'📊 Dashboard tài chính doanh nghiệp'** ở phía trên để xem phân tích chi tiết!")
-                    st.balloons()
-
-            if st.session_state['navigate_to_dashboard']:
-                st.info("💡 **Hướng dẫn**: Vui lòng click vào tab **'📊 Dashboard tài chính doanh nghiệp'** ở phía trên để xem thêm các biểu đồ và phân tích kinh tế hỗ trợ quyết định cho vay.")
+                st.button("📊 Xem thêm DashBoard Tài chính Hỗ trợ Quyết định Cho vay",
+                          use_container_width=True,
+                          type="primary",
+                          key="nav_to_dashboard_btn",
+                          on_click=go_to_view, args=(VIEW_DASHBOARD,))
 
             # ===== CHATBOT GEMINI AI =====
             st.markdown("---")
@@ -2312,7 +2184,7 @@ with tab_predict:
             col_export1, col_export2 = st.columns([3, 1])
 
             with col_export1:
-                company_name_input = st.text_input("Tên Khách hàng (tùy chọn):", value="KHÁCH HÀNG DOANH NGHIỆP", key="company_name_word")
+                company_name_input = st.text_input("Tên Khách hàng (tùy chọn):", key="company_name_word")
 
             with col_export2:
                 st.write("")  # Spacer
@@ -2326,61 +2198,9 @@ with tab_predict:
                             # Lấy AI analysis từ session_state nếu có
                             ai_analysis_text = st.session_state.get('ai_analysis', '')
 
-                            # Tạo lại figures để export (không hiển thị)
-                            # Bar chart
-                            fig_bar_export, ax_bar_export = plt.subplots(figsize=(8, 10))
-                            fig_bar_export.patch.set_facecolor('#fff5f7')
-                            ax_bar_export.set_facecolor('#ffffff')
-
-                            indicators_export = ratios_display.index.tolist()
-                            values_export = ratios_display['Giá trị'].values
-                            bar_colors_export = plt.cm.RdPu(np.linspace(0.3, 0.9, len(indicators_export)))
-
-                            bars_export = ax_bar_export.barh(indicators_export, values_export, color=bar_colors_export, edgecolor='white', linewidth=1.5)
-
-                            for i, (bar, val) in enumerate(zip(bars_export, values_export)):
-                                width = bar.get_width()
-                                ax_bar_export.text(width, bar.get_y() + bar.get_height()/2,
-                                           f' {val:.3f}', ha='left', va='center',
-                                           fontsize=9, fontweight='600', color='#c2185b')
-
-                            ax_bar_export.set_xlabel('Giá trị', fontsize=12, fontweight='600', color='#4a5568')
-                            ax_bar_export.set_title('Các Chỉ số Tài chính', fontsize=14, fontweight='bold', color='#c2185b', pad=15)
-                            ax_bar_export.grid(True, alpha=0.2, linestyle='--', linewidth=0.8, color='#ff6b9d', axis='x')
-                            ax_bar_export.spines['top'].set_visible(False)
-                            ax_bar_export.spines['right'].set_visible(False)
-                            ax_bar_export.spines['left'].set_color('#d0d0d0')
-                            ax_bar_export.spines['bottom'].set_color('#d0d0d0')
-                            plt.tight_layout()
-
-                            # Radar chart
-                            fig_radar_export = plt.figure(figsize=(10, 10))
-                            fig_radar_export.patch.set_facecolor('#fff5f7')
-                            ax_radar_export = fig_radar_export.add_subplot(111, projection='polar')
-
-                            from sklearn.preprocessing import MinMaxScaler
-                            scaler_export = MinMaxScaler()
-                            normalized_values_export = scaler_export.fit_transform(values_export.reshape(-1, 1)).flatten()
-
-                            angles_export = np.linspace(0, 2 * np.pi, len(indicators_export), endpoint=False).tolist()
-                            normalized_values_list_export = normalized_values_export.tolist()
-
-                            angles_export += angles_export[:1]
-                            normalized_values_list_export += normalized_values_list_export[:1]
-
-                            ax_radar_export.plot(angles_export, normalized_values_list_export, 'o-', linewidth=2.5, color='#ff6b9d', label='Chỉ số')
-                            ax_radar_export.fill(angles_export, normalized_values_list_export, alpha=0.25, color='#ffb3c6')
-
-                            ax_radar_export.set_xticks(angles_export[:-1])
-                            short_labels_export = [label.split('(')[0].strip()[:20] for label in indicators_export]
-                            ax_radar_export.set_xticklabels(short_labels_export, size=8, color='#4a5568', fontweight='600')
-
-                            ax_radar_export.set_ylim(0, 1)
-                            ax_radar_export.set_title('Phân tích Đa chiều các Chỉ số\n(Normalized 0-1)',
-                                              fontsize=14, fontweight='bold', color='#c2185b', pad=20)
-                            ax_radar_export.grid(True, alpha=0.3, linestyle='--', linewidth=0.8, color='#ff6b9d')
-                            ax_radar_export.set_facecolor('#ffffff')
-                            plt.tight_layout()
+                            # Dùng lại ảnh biểu đồ đã vẽ khi hiển thị (không vẽ lại)
+                            bar_png = CHART_CACHE.get("bar", ratios_display, probs)
+                            radar_png = CHART_CACHE.get("radar", ratios_display, probs)
 
                             # Tạo PD label
                             if pd.notna(probs) and pd.notna(preds):
@@ -2394,15 +2214,13 @@ with tab_predict:
                                 pd_value=probs if pd.notna(probs) else np.nan,
                                 pd_label=pd_label_text,
                                 ai_analysis=ai_analysis_text,
-                                fig_bar=fig_bar_export,
-                                fig_radar=fig_radar_export,
-                                company_name=company_name_input
+                                fig_bar=bar_png,
+                                fig_radar=radar_png,
+                                company_name=company_name_input,
+                                improvement_plan=improvement_plan,
+                                scorecard=scorecard_result
                             )
 
-                            # Close figures
-                            plt.close(fig_bar_export)
-                            plt.close(fig_radar_export)
-
                         st.success("✅ Báo cáo Word đã được tạo thành công!")
 
                         # Download button
@@ -2421,10 +2239,55 @@ with tab_predict:
     else:
         st.info("Hãy tải **ho_so_dn.xlsx** (đủ 3 sheet) để tính X1…X14, dự báo PD và phân tích AI.")
 
+    # ===== XUẤT BÁO CÁO WORD HÀNG LOẠT (DANH MỤC) =====
+    st.divider()
+    with st.expander("📦 Xuất Báo cáo Word hàng loạt cho Danh mục Khách hàng"):
+        st.caption("File CSV/Excel: mỗi dòng 1 khách hàng với các cột **X_1..X_14**; tùy chọn cột **PD** "
+                   "(nếu thiếu sẽ chấm bằng mô hình Stacking hiện tại), **Tên khách hàng** và **ai_analysis**.")
+        up_portfolio = st.file_uploader("Tải danh mục", type=["csv", "xlsx"], key="batch_portfolio", label_visibility="collapsed")
+
+        col_batch1, col_batch2 = st.columns(2)
+        with col_batch1:
+            batch_workers = st.number_input("Số process song song", min_value=1, max_value=os.cpu_count() or 1,
+                                            key="batch_workers")
+        with col_batch2:
+            batch_charts = st.checkbox("Kèm biểu đồ cột & radar", key="batch_charts")
+            batch_reverse_stress = st.checkbox("Kèm cú sốc tối thiểu tới hạng kế tiếp / ngưỡng Default",
+                                               key="batch_reverse_stress",
+                                               help="Thêm cột shock_next_rating, shock_default vào file tóm tắt danh mục")
+
+        if up_portfolio is not None and st.button("📦 Tạo file ZIP báo cáo", type="primary", key="batch_export_btn"):
+            if not _WORD_OK:
+                st.error("❌ Thiếu thư viện python-docx. Không thể xuất Word.")
+            else:
+                try:
+                    prepared = prepare_portfolio(read_portfolio(up_portfolio, up_portfolio.name), model, default_threshold,
+                                                 explainer=attribution, calibration=calibration,
+                                                 percentiles=percentile_index, reverse_stress=batch_reverse_stress,
+                                                 scorecard=scorecard)
+                    progress_bar = st.progress(0.0, text=f"Đang tạo 0/{len(prepared)} báo cáo...")
+                    zip_buffer = BytesIO()
+                    with profiler.stage("batch_reports"):
+                        count = write_reports_zip(
+                            prepared, zip_buffer, max_workers=int(batch_workers), render_charts=batch_charts,
+                            progress=lambda done, total: progress_bar.progress(done / total, text=f"Đang tạo {done}/{total} báo cáo..."),
+                            scorecard=scorecard
+                        )
+                    st.success(f"✅ Đã tạo {count} báo cáo Word.")
+                    st.download_button(
+                        label="💾 Tải xuống ZIP báo cáo",
+                        data=zip_buffer.getvalue(),
+                        file_name=f"BaoCao_DanhMuc_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
+                        mime="application/zip",
+                        use_container_width=True
+                    )
+                except Exception as e:
+                    st.error(f"❌ Lỗi khi xuất báo cáo hàng loạt: {str(e)}")
+
 # ========================================
 # TAB: MÔ PHỎNG KỊCH BẢN XẤU
 # ========================================
-with tab_scenario:
+if active_view == VIEW_SCENARIO:
     st.header("⚠️ Mô phỏng Kịch bản Xấu - Stress Testing")
     st.markdown("""
     Mô phỏng tác động của các kịch bản kinh tế bất lợi đến khả năng thanh toán của doanh nghiệp.
@@ -2450,7 +2313,7 @@ with tab_scenario:
     # 1. Upload file dữ liệu
     st.markdown("### 1️⃣ Tải dữ liệu doanh nghiệp")
 
-    uploaded_scenario_file = st.file_uploader(
+    uploaded_scenario_file = persistent_file_uploader(
         "📂 Tải file Excel chứa 14 chỉ số tài chính",
         type=["xlsx"],
         key="scenario_file",
@@ -2546,8 +2409,10 @@ with tab_scenario:
                     st.dataframe(ratio_df, use_container_width=True)
 
                 # Dự báo PD gốc
-                X_original = pd.DataFrame([original_ratios])
-                probs_original = model.predict_proba(X_original)[0][1]
+                X_original = feature_array(original_ratios, MODEL_COLS)
+                with profiler.stage("scenario_scoring"):
+                    probs_original = float(apply_calibration(array_scorers["model"].predict_proba(X_original)[0, 1],
+                                                             calibration))
                 pd_classification_original = classify_pd(probs_original)
 
                 st.markdown("### 2️⃣ PD ban đầu (trước khi áp dụng kịch bản xấu)")
@@ -2559,6 +2424,30 @@ with tab_scenario:
                 with col3:
                     st.metric("Phân loại", pd_classification_original['classification'])
 
+                # Bài toán ngược: cú sốc nhỏ nhất (theo chiều bất lợi) để PD xấu đi 1 hạng hoặc vượt ngưỡng Default
+                with st.expander("🔁 Kiểm định ngược: cú sốc tối thiểu để PD xấu đi 1 hạng / vượt ngưỡng Default"):
+                    # Không phụ thuộc thanh trượt kịch bản: giải 1 lần cho mỗi (bộ chỉ số, ngưỡng), chấm cùng
+                    # ArrayScorer với PD gốc ở trên nên PD nền của bài toán ngược trùng với PD gốc
+                    with profiler.stage("reverse_stress"):
+                        stress_result = results_cache.get_or_compute(
+                            ("reverse_stress", X_original.tobytes(), default_threshold),
+                            lambda: reverse_stress(array_scorers["model"], X_original,
+                                                   stress_targets([probs_original], default_threshold), calibration))
+                    stress_table = reverse_stress_table(stress_result)
+                    if stress_table.empty:
+                        st.info("PD hiện tại đã ở hạng thấp nhất và vượt ngưỡng Default.")
+                    else:
+                        shock_cols = [c for c in stress_table.columns if c.startswith("Sốc")]
+                        st.dataframe(
+                            stress_table.style
+                            .format({c: "{:.1f}%" for c in shock_cols}, na_rep="Không đạt (≤ 100%)")
+                            .format({c: "{:.2%}" for c in stress_table.columns if c not in shock_cols}, na_rep="—"),
+                            use_container_width=True
+                        )
+                        st.caption("Mức sốc theo chiều bất lợi (giảm ROA/ROE, thanh khoản, doanh thu; tăng Nợ/VCSH, "
+                                   "lãi vay), áp như phần mô phỏng bên dưới. Giải bằng dò lưới + chia đôi trên "
+                                   f"{stress_result['n_calls']} lần chấm điểm theo lô (sai số ≈ 0.05%).")
+
                 st.divider()
 
                 # 2. Chọn kịch bản
@@ -2567,7 +2456,8 @@ with tab_scenario:
                 scenario_type = st.selectbox(
                     "Mức độ kịch bản:",
                     ["Biến động nhẹ", "Suy giảm kinh tế", "Khủng hoảng ngành", "Tùy chỉnh"],
-                    help="Chọn mức độ khủng hoảng để mô phỏng"
+                    help="Chọn mức độ khủng hoảng để mô phỏng",
+                    key="scenario_type"
                 )
 
                 # Định nghĩa các kịch bản
@@ -2601,13 +2491,13 @@ with tab_scenario:
 
                     col1, col2 = st.columns(2)
                     with col1:
-                        roa_roe_change = st.slider("ROA/ROE thay đổi (%)", -50, 50, -15, help="Âm = giảm, Dương = tăng")
-                        debt_equity_change = st.slider("Nợ/VCSH thay đổi (%)", -50, 50, 15)
-                        liquidity_change = st.slider("Khả năng thanh toán (CR/QR) thay đổi (%)", -50, 50, -10)
+                        roa_roe_change = st.slider("ROA/ROE thay đổi (%)", -50, 50, help="Âm = giảm, Dương = tăng", key="scenario_roa_roe")
+                        debt_equity_change = st.slider("Nợ/VCSH thay đổi (%)", -50, 50, key="scenario_debt_equity")
+                        liquidity_change = st.slider("Khả năng thanh toán (CR/QR) thay đổi (%)", -50, 50, key="scenario_liquidity")
 
                     with col2:
-                        revenue_profit_change = st.slider("Doanh thu/Lợi nhuận gộp thay đổi (%)", -50, 50, -20)
-                        interest_change = st.slider("Chi phí lãi vay thay đổi (%)", -50, 50, 15)
+                        revenue_profit_change = st.slider("Doanh thu/Lợi nhuận gộp thay đổi (%)", -50, 50, key="scenario_revenue_profit")
+                        interest_change = st.slider("Chi phí lãi vay thay đổi (%)", -50, 50, key="scenario_interest")
 
                     scenario_params = {
                         "roa_roe": roa_roe_change,
@@ -2636,33 +2526,17 @@ with tab_scenario:
                 # 3. Nút mô phỏng
                 if st.button("🔍 Mô phỏng kịch bản", type="primary", use_container_width=True):
                     with st.spinner("Đang mô phỏng kịch bản xấu..."):
-                        # Tạo bản sao và áp dụng thay đổi
-                        stressed_ratios = original_ratios.copy()
-
-                        # Áp dụng thay đổi theo nhóm
-                        # 1. ROA/ROE (X_12, X_13)
-                        stressed_ratios['X_12'] *= (1 + scenario_params['roa_roe'] / 100)
-                        stressed_ratios['X_13'] *= (1 + scenario_params['roa_roe'] / 100)
-
-                        # 2. Nợ/VCSH (X_4)
-                        stressed_ratios['X_4'] *= (1 + scenario_params['debt_equity'] / 100)
-
-                        # 3. Khả năng thanh toán (X_1, X_2, X_3)
-                        stressed_ratios['X_1'] *= (1 + scenario_params['liquidity'] / 100)
-                        stressed_ratios['X_2'] *= (1 + scenario_params['liquidity'] / 100)
-                        stressed_ratios['X_3'] *= (1 + scenario_params['liquidity'] / 100)
-
-                        # 4. Doanh thu và lợi nhuận gộp (X_9, X_10, X_11)
-                        stressed_ratios['X_9'] *= (1 + scenario_params['revenue_profit'] / 100)
-                        stressed_ratios['X_10'] *= (1 + scenario_params['revenue_profit'] / 100)
-                        stressed_ratios['X_11'] *= (1 + scenario_params['revenue_profit'] / 100)
-
-                        # 5. Chi phí lãi vay ảnh hưởng đến Net Profit Margin (X_11)
-                        stressed_ratios['X_11'] *= (1 - scenario_params['interest'] / 100)
+                        # Áp dụng thay đổi theo nhóm (ROA/ROE, Nợ/VCSH, thanh toán, doanh thu/LN gộp, lãi vay),
+                        # cùng công thức với kiểm định ngược (reverse_stress.SCENARIO_GROUPS)
+                        stressed_values = apply_scenario([original_ratios[c] for c in MODEL_COLS],
+                                                         [scenario_params[p] for p in SCENARIO_PARAMS])[0]
+                        stressed_ratios = dict(zip(MODEL_COLS, stressed_values.tolist()))
 
                         # Dự báo PD mới
-                        X_stressed = pd.DataFrame([stressed_ratios])
-                        probs_stressed = model.predict_proba(X_stressed)[0][1]
+                        X_stressed = feature_array(stressed_values, MODEL_COLS)
+                        with profiler.stage("scenario_stress_scoring"):
+                            probs_stressed = float(apply_calibration(array_scorers["model"].predict_proba(X_stressed)[0, 1],
+                                                                     calibration))
                         pd_classification_stressed = classify_pd(probs_stressed)
 
                         # Hiển thị kết quả
@@ -2692,31 +2566,32 @@ with tab_scenario:
                         # Biểu đồ so sánh
                         st.markdown("#### 📊 So sánh PD trước và sau kịch bản")
 
-                        fig, ax = plt.subplots(figsize=(10, 6))
-                        categories = ['PD gốc', f'PD sau\n({scenario_type})']
-                        values = [probs_original * 100, probs_stressed * 100]
-                        colors = [pd_classification_original['color'], pd_classification_stressed['color']]
+                        with profiler.stage("chart_scenario_pd"):
+                            fig, ax = plt.subplots(figsize=(10, 6))
+                            categories = ['PD gốc', f'PD sau\n({scenario_type})']
+                            values = [probs_original * 100, probs_stressed * 100]
+                            colors = [pd_classification_original['color'], pd_classification_stressed['color']]
 
-                        bars = ax.bar(categories, values, color=colors, alpha=0.7, edgecolor='black', linewidth=2)
+                            bars = ax.bar(categories, values, color=colors, alpha=0.7, edgecolor='black', linewidth=2)
 
-                        # Thêm giá trị lên thanh
-                        for bar, val in zip(bars, values):
-                            height = bar.get_height()
-                            ax.text(bar.get_x() + bar.get_width()/2., height,
-                                   f'{val:.2f}%',
-                                   ha='center', va='bottom', fontweight='bold', fontsize=12)
+                            # Thêm giá trị lên thanh
+                            for bar, val in zip(bars, values):
+                                height = bar.get_height()
+                                ax.text(bar.get_x() + bar.get_width()/2., height,
+                                       f'{val:.2f}%',
+                                       ha='center', va='bottom', fontweight='bold', fontsize=12)
 
-                        ax.set_ylabel('Xác suất vỡ nợ (%)', fontsize=12, fontweight='bold')
-                        ax.set_title(f'So sánh PD - Kịch bản: {scenario_type}', fontsize=14, fontweight='bold')
-                        ax.grid(axis='y', alpha=0.3, linestyle='--')
+                            ax.set_ylabel('Xác suất vỡ nợ (%)', fontsize=12, fontweight='bold')
+                            ax.set_title(f'So sánh PD - Kịch bản: {scenario_type}', fontsize=14, fontweight='bold')
+                            ax.grid(axis='y', alpha=0.3, linestyle='--')
 
-                        # Thêm ngưỡng cảnh báo
-                        ax.axhline(y=10, color='orange', linestyle='--', linewidth=2, alpha=0.5, label='Ngưỡng cảnh báo (10%)')
-                        ax.axhline(y=20, color='red', linestyle='--', linewidth=2, alpha=0.5, label='Ngưỡng rủi ro cao (20%)')
-                        ax.legend()
+                            # Thêm ngưỡng cảnh báo
+                            ax.axhline(y=10, color='orange', linestyle='--', linewidth=2, alpha=0.5, label='Ngưỡng cảnh báo (10%)')
+                            ax.axhline(y=20, color='red', linestyle='--', linewidth=2, alpha=0.5, label='Ngưỡng rủi ro cao (20%)')
+                            ax.legend()
 
-                        st.pyplot(fig)
-                        plt.close()
+                            st.pyplot(fig)
+                            plt.close()
 
                         # Mô tả tác động
                         st.markdown("#### 📝 Mô tả tác động")
@@ -2834,7 +2709,7 @@ with tab_scenario:
 # ========================================
 # TAB: DASHBOARD TÀI CHÍNH DOANH NGHIỆP
 # ========================================
-with tab_dashboard:
+if active_view == VIEW_DASHBOARD:
     st.header("📊 Dashboard Tài chính & Kinh tế")
     st.markdown("""
     Dashboard phân tích các chỉ số ngành và vĩ mô để hỗ trợ quyết định cho vay,
@@ -2965,24 +2840,25 @@ with tab_dashboard:
                 st.markdown("#### 💰 Lãi suất Cho vay & Liên ngân hàng")
                 data = macro_data['lending_rate_vs_interbank']
 
-                fig, ax = plt.subplots(figsize=(14, 6))
-                fig.patch.set_facecolor('#fff5f7')
-                ax.set_facecolor('#ffffff')
-
-                ax.plot(data['quarters'], data['lending_rate'], marker='o', linewidth=2.5,
-                       markersize=7, color='#ff6b9d', label='Lãi suất cho vay', alpha=0.9)
-                ax.plot(data['quarters'], data['interbank_rate'], marker='s', linewidth=2.5,
-                       markersize=7, color='#4a90e2', label='Lãi suất liên ngân hàng', alpha=0.9)
-
-                ax.set_xlabel('Quý', fontsize=13, fontweight='600')
-                ax.set_ylabel('Lãi suất (%)', fontsize=13, fontweight='600')
-                ax.set_title('Lãi suất Cho vay & Liên ngân hàng theo Quý', fontsize=16, fontweight='bold', color='#c2185b')
-                ax.grid(True, alpha=0.2, linestyle='--')
-                ax.legend(fontsize=11)
-                plt.xticks(rotation=45, ha='right')
-                plt.tight_layout()
-                st.pyplot(fig)
-                plt.close(fig)
+                with profiler.stage("chart_macro_lending_rate"):
+                    fig, ax = plt.subplots(figsize=(14, 6))
+                    fig.patch.set_facecolor('#fff5f7')
+                    ax.set_facecolor('#ffffff')
+
+                    ax.plot(data['quarters'], data['lending_rate'], marker='o', linewidth=2.5,
+                           markersize=7, color='#ff6b9d', label='Lãi suất cho vay', alpha=0.9)
+                    ax.plot(data['quarters'], data['interbank_rate'], marker='s', linewidth=2.5,
+                           markersize=7, color='#4a90e2', label='Lãi suất liên ngân hàng', alpha=0.9)
+
+                    ax.set_xlabel('Quý', fontsize=13, fontweight='600')
+                    ax.set_ylabel('Lãi suất (%)', fontsize=13, fontweight='600')
+                    ax.set_title('Lãi suất Cho vay & Liên ngân hàng theo Quý', fontsize=16, fontweight='bold', color='#c2185b')
+                    ax.grid(True, alpha=0.2, linestyle='--')
+                    ax.legend(fontsize=11)
+                    plt.xticks(rotation=45, ha='right')
+                    plt.tight_layout()
+                    st.pyplot(fig)
+                    plt.close(fig)
 
                 st.markdown("""
                 **💡 Phân tích**: Chênh lệch lãi suất cho vay và liên ngân hàng phản ánh mức độ rủi ro
@@ -2995,21 +2871,22 @@ with tab_dashboard:
                 st.markdown("#### 📈 Tăng trưởng GDP")
                 data = macro_data['gdp_growth']
 
-                fig, ax = plt.subplots(figsize=(14, 6))
-                fig.patch.set_facecolor('#fff5f7')
-                ax.set_facecolor('#ffffff')
+                with profiler.stage("chart_macro_gdp"):
+                    fig, ax = plt.subplots(figsize=(14, 6))
+                    fig.patch.set_facecolor('#fff5f7')
+                    ax.set_facecolor('#ffffff')
 
-                ax.bar(data['quarters'], data['growth_rate'], color='#50c878', alpha=0.8, edgecolor='white', linewidth=1.5)
-                ax.axhline(y=0, color='red', linestyle='--', linewidth=1)
+                    ax.bar(data['quarters'], data['growth_rate'], color='#50c878', alpha=0.8, edgecolor='white', linewidth=1.5)
+                    ax.axhline(y=0, color='red', linestyle='--', linewidth=1)
 
-                ax.set_xlabel('Quý', fontsize=13, fontweight='600')
-                ax.set_ylabel('Tăng trưởng GDP (%)', fontsize=13, fontweight='600')
-                ax.set_title('Tăng trưởng GDP theo Quý', fontsize=16, fontweight='bold', color='#c2185b')
-                ax.grid(True, alpha=0.2, linestyle='--', axis='y')
-                plt.xticks(rotation=45, ha='right')
-                plt.tight_layout()
-                st.pyplot(fig)
-                plt.close(fig)
+                    ax.set_xlabel('Quý', fontsize=13, fontweight='600')
+                    ax.set_ylabel('Tăng trưởng GDP (%)', fontsize=13, fontweight='600')
+                    ax.set_title('Tăng trưởng GDP theo Quý', fontsize=16, fontweight='bold', color='#c2185b')
+                    ax.grid(True, alpha=0.2, linestyle='--', axis='y')
+                    plt.xticks(rotation=45, ha='right')
+                    plt.tight_layout()
+                    st.pyplot(fig)
+                    plt.close(fig)
 
                 st.markdown("""
                 **💡 Phân tích**: GDP tăng trưởng mạnh cho thấy nền kinh tế phát triển tốt,
@@ -3022,21 +2899,22 @@ with tab_dashboard:
                 st.markdown("#### 👥 Tỷ lệ Thất nghiệp")
                 data = macro_data['unemployment_rate']
 
-                fig, ax = plt.subplots(figsize=(14, 6))
-                fig.patch.set_facecolor('#fff5f7')
-                ax.set_facecolor('#ffffff')
+                with profiler.stage("chart_macro_unemployment"):
+                    fig, ax = plt.subplots(figsize=(14, 6))
+                    fig.patch.set_facecolor('#fff5f7')
+                    ax.set_facecolor('#ffffff')
 
-                ax.plot(data['years'], data['rate'], marker='o', linewidth=3,
-                       markersize=8, color='#ffa500', alpha=0.9)
-                ax.fill_between(data['years'], data['rate'], alpha=0.2, color='#ffa500')
+                    ax.plot(data['years'], data['rate'], marker='o', linewidth=3,
+                           markersize=8, color='#ffa500', alpha=0.9)
+                    ax.fill_between(data['years'], data['rate'], alpha=0.2, color='#ffa500')
 
-                ax.set_xlabel('Năm', fontsize=13, fontweight='600')
-                ax.set_ylabel('Tỷ lệ thất nghiệp (%)', fontsize=13, fontweight='600')
-                ax.set_title('Tỷ lệ Thất nghiệp theo Năm', fontsize=16, fontweight='bold', color='#c2185b')
-                ax.grid(True, alpha=0.2, linestyle='--')
-                plt.tight_layout()
-                st.pyplot(fig)
-                plt.close(fig)
+                    ax.set_xlabel('Năm', fontsize=13, fontweight='600')
+                    ax.set_ylabel('Tỷ lệ thất nghiệp (%)', fontsize=13, fontweight='600')
+                    ax.set_title('Tỷ lệ Thất nghiệp theo Năm', fontsize=16, fontweight='bold', color='#c2185b')
+                    ax.grid(True, alpha=0.2, linestyle='--')
+                    plt.tight_layout()
+                    st.pyplot(fig)
+                    plt.close(fig)
 
                 st.markdown("""
                 **💡 Phân tích**: Tỷ lệ thất nghiệp thấp cho thấy thị trường lao động tốt,
@@ -3049,24 +2927,25 @@ with tab_dashboard:
                 st.markdown("#### ⚠️ Tỷ lệ Nợ xấu & Vỡ nợ")
                 data = macro_data['npl_ratio']
 
-                fig, ax = plt.subplots(figsize=(14, 6))
-                fig.patch.set_facecolor('#fff5f7')
-                ax.set_facecolor('#ffffff')
-
-                ax.plot(data['quarters'], data['npl_rate'], marker='o', linewidth=2.5,
-                       markersize=7, color='#dc3545', label='Tỷ lệ nợ xấu', alpha=0.9)
-                ax.plot(data['quarters'], data['default_rate'], marker='s', linewidth=2.5,
-                       markersize=7, color='#ff6b9d', label='Tỷ lệ vỡ nợ', alpha=0.9)
-
-                ax.set_xlabel('Quý', fontsize=13, fontweight='600')
-                ax.set_ylabel('Tỷ lệ (%)', fontsize=13, fontweight='600')
-                ax.set_title('Tỷ lệ Nợ xấu & Vỡ nợ Hệ thống Ngân hàng VN', fontsize=16, fontweight='bold', color='#c2185b')
-                ax.grid(True, alpha=0.2, linestyle='--')
-                ax.legend(fontsize=11)
-                plt.xticks(rotation=45, ha='right')
-                plt.tight_layout()
-                st.pyplot(fig)
-                plt.close(fig)
+                with profiler.stage("chart_macro_npl"):
+                    fig, ax = plt.subplots(figsize=(14, 6))
+                    fig.patch.set_facecolor('#fff5f7')
+                    ax.set_facecolor('#ffffff')
+
+                    ax.plot(data['quarters'], data['npl_rate'], marker='o', linewidth=2.5,
+                           markersize=7, color='#dc3545', label='Tỷ lệ nợ xấu', alpha=0.9)
+                    ax.plot(data['quarters'], data['default_rate'], marker='s', linewidth=2.5,
+                           markersize=7, color='#ff6b9d', label='Tỷ lệ vỡ nợ', alpha=0.9)
+
+                    ax.set_xlabel('Quý', fontsize=13, fontweight='600')
+                    ax.set_ylabel('Tỷ lệ (%)', fontsize=13, fontweight='600')
+                    ax.set_title('Tỷ lệ Nợ xấu & Vỡ nợ Hệ thống Ngân hàng VN', fontsize=16, fontweight='bold', color='#c2185b')
+                    ax.grid(True, alpha=0.2, linestyle='--')
+                    ax.legend(fontsize=11)
+                    plt.xticks(rotation=45, ha='right')
+                    plt.tight_layout()
+                    st.pyplot(fig)
+                    plt.close(fig)
 
                 st.markdown("""
                 **💡 Phân tích**: Tỷ lệ nợ xấu và vỡ nợ cao cảnh báo rủi ro tín dụng gia tăng trong hệ thống,
@@ -3079,24 +2958,25 @@ with tab_dashboard:
                 st.markdown("#### 📉 Chỉ số Căng thẳng Tài chính (FSI)")
                 data = macro_data['financial_stress_index']
 
-                fig, ax = plt.subplots(figsize=(14, 6))
-                fig.patch.set_facecolor('#fff5f7')
-                ax.set_facecolor('#ffffff')
-
-                colors = ['#28a745' if x < 0.5 else '#ffc107' if x < 0.7 else '#dc3545' for x in data['fsi']]
-                ax.bar(data['months'], data['fsi'], color=colors, alpha=0.8, edgecolor='white', linewidth=1.5)
-                ax.axhline(y=0.5, color='orange', linestyle='--', linewidth=1, label='Ngưỡng cảnh báo')
-                ax.axhline(y=0.7, color='red', linestyle='--', linewidth=1, label='Ngưỡng nguy hiểm')
-
-                ax.set_xlabel('Tháng', fontsize=13, fontweight='600')
-                ax.set_ylabel('FSI', fontsize=13, fontweight='600')
-                ax.set_title('Chỉ số Căng thẳng Tài chính theo Tháng', fontsize=16, fontweight='bold', color='#c2185b')
-                ax.grid(True, alpha=0.2, linestyle='--', axis='y')
-                ax.legend(fontsize=11)
-                plt.xticks(rotation=45, ha='right')
-                plt.tight_layout()
-                st.pyplot(fig)
-                plt.close(fig)
+                with profiler.stage("chart_macro_fsi"):
+                    fig, ax = plt.subplots(figsize=(14, 6))
+                    fig.patch.set_facecolor('#fff5f7')
+                    ax.set_facecolor('#ffffff')
+
+                    colors = ['#28a745' if x < 0.5 else '#ffc107' if x < 0.7 else '#dc3545' for x in data['fsi']]
+                    ax.bar(data['months'], data['fsi'], color=colors, alpha=0.8, edgecolor='white', linewidth=1.5)
+                    ax.axhline(y=0.5, color='orange', linestyle='--', linewidth=1, label='Ngưỡng cảnh báo')
+                    ax.axhline(y=0.7, color='red', linestyle='--', linewidth=1, label='Ngưỡng nguy hiểm')
+
+                    ax.set_xlabel('Tháng', fontsize=13, fontweight='600')
+                    ax.set_ylabel('FSI', fontsize=13, fontweight='600')
+                    ax.set_title('Chỉ số Căng thẳng Tài chính theo Tháng', fontsize=16, fontweight='bold', color='#c2185b')
+                    ax.grid(True, alpha=0.2, linestyle='--', axis='y')
+                    ax.legend(fontsize=11)
+                    plt.xticks(rotation=45, ha='right')
+                    plt.tight_layout()
+                    st.pyplot(fig)
+                    plt.close(fig)
 
                 st.markdown("""
                 **💡 Phân tích**: FSI đo lường mức độ căng thẳng trong hệ thống tài chính.
@@ -3158,23 +3038,24 @@ Trả lời bằng tiếng Việt, có cấu trúc rõ ràng với các điểm
                 st.markdown("#### 💰 Tốc độ Tăng trưởng Doanh thu")
                 data = industry_data['revenue_growth_quarterly']
 
-                fig, ax = plt.subplots(figsize=(14, 6))
-                fig.patch.set_facecolor('#fff5f7')
-                ax.set_facecolor('#ffffff')
-
-                ax.plot(data['quarters'], data['growth_rate'], marker='o', linewidth=3,
-                       markersize=8, color='#ff6b9d', alpha=0.9)
-                ax.fill_between(data['quarters'], data['growth_rate'], alpha=0.2, color='#ffb3c6')
-                ax.axhline(y=0, color='red', linestyle='--', linewidth=1)
-
-                ax.set_xlabel('Quý', fontsize=13, fontweight='600')
-                ax.set_ylabel('Tăng trưởng (%)', fontsize=13, fontweight='600')
-                ax.set_title(f'Tốc độ Tăng trưởng Doanh thu - {selected_analysis}', fontsize=16, fontweight='bold', color='#c2185b')
-                ax.grid(True, alpha=0.2, linestyle='--')
-                plt.xticks(rotation=45, ha='right')
-                plt.tight_layout()
-                st.pyplot(fig)
-                plt.close(fig)
+                with profiler.stage("chart_industry_revenue"):
+                    fig, ax = plt.subplots(figsize=(14, 6))
+                    fig.patch.set_facecolor('#fff5f7')
+                    ax.set_facecolor('#ffffff')
+
+                    ax.plot(data['quarters'], data['growth_rate'], marker='o', linewidth=3,
+                           markersize=8, color='#ff6b9d', alpha=0.9)
+                    ax.fill_between(data['quarters'], data['growth_rate'], alpha=0.2, color='#ffb3c6')
+                    ax.axhline(y=0, color='red', linestyle='--', linewidth=1)
+
+                    ax.set_xlabel('Quý', fontsize=13, fontweight='600')
+                    ax.set_ylabel('Tăng trưởng (%)', fontsize=13, fontweight='600')
+                    ax.set_title(f'Tốc độ Tăng trưởng Doanh thu - {selected_analysis}', fontsize=16, fontweight='bold', color='#c2185b')
+                    ax.grid(True, alpha=0.2, linestyle='--')
+                    plt.xticks(rotation=45, ha='right')
+                    plt.tight_layout()
+                    st.pyplot(fig)
+                    plt.close(fig)
 
                 st.markdown("""
                 **💡 Phân tích**: Tăng trưởng doanh thu dương cho thấy ngành đang phát triển,
@@ -3209,23 +3090,24 @@ Trả lời bằng tiếng Việt, có cấu trúc rõ ràng với các điểm
                 st.markdown("#### 📈 Chỉ số PMI Ngành")
                 data = industry_data['pmi_monthly']
 
-                fig, ax = plt.subplots(figsize=(14, 6))
-                fig.patch.set_facecolor('#fff5f7')
-                ax.set_facecolor('#ffffff')
-
-                colors = ['#28a745' if x >= 50 else '#dc3545' for x in data['pmi']]
-                ax.bar(data['months'], data['pmi'], color=colors, alpha=0.8, edgecolor='white', linewidth=1.5)
-                ax.axhline(y=50, color='black', linestyle='--', linewidth=2, label='Ngưỡng 50')
-
-                ax.set_xlabel('Tháng', fontsize=13, fontweight='600')
-                ax.set_ylabel('PMI', fontsize=13, fontweight='600')
-                ax.set_title(f'Chỉ số PMI - {selected_analysis}', fontsize=16, fontweight='bold', color='#c2185b')
-                ax.grid(True, alpha=0.2, linestyle='--', axis='y')
-                ax.legend(fontsize=11)
-                plt.xticks(rotation=45, ha='right')
-                plt.tight_layout()
-                st.pyplot(fig)
-                plt.close(fig)
+                with profiler.stage("chart_industry_pmi"):
+                    fig, ax = plt.subplots(figsize=(14, 6))
+                    fig.patch.set_facecolor('#fff5f7')
+                    ax.set_facecolor('#ffffff')
+
+                    colors = ['#28a745' if x >= 50 else '#dc3545' for x in data['pmi']]
+                    ax.bar(data['months'], data['pmi'], color=colors, alpha=0.8, edgecolor='white', linewidth=1.5)
+                    ax.axhline(y=50, color='black', linestyle='--', linewidth=2, label='Ngưỡng 50')
+
+                    ax.set_xlabel('Tháng', fontsize=13, fontweight='600')
+                    ax.set_ylabel('PMI', fontsize=13, fontweight='600')
+                    ax.set_title(f'Chỉ số PMI - {selected_analysis}', fontsize=16, fontweight='bold', color='#c2185b')
+                    ax.grid(True, alpha=0.2, linestyle='--', axis='y')
+                    ax.legend(fontsize=11)
+                    plt.xticks(rotation=45, ha='right')
+                    plt.tight_layout()
+                    st.pyplot(fig)
+                    plt.close(fig)
 
                 st.markdown("""
                 **💡 Phân tích**: PMI >50 cho thấy ngành đang mở rộng, <50 cho thấy co hẹp.
@@ -3238,26 +3120,27 @@ Trả lời bằng tiếng Việt, có cấu trúc rõ ràng với các điểm
                 st.markdown("#### 🏢 Doanh nghiệp Đăng ký Mới vs Giải thể")
                 data = industry_data['new_vs_closed_businesses']
 
-                fig, ax = plt.subplots(figsize=(14, 6))
-                fig.patch.set_facecolor('#fff5f7')
-                ax.set_facecolor('#ffffff')
+                with profiler.stage("chart_industry_businesses"):
+                    fig, ax = plt.subplots(figsize=(14, 6))
+                    fig.patch.set_facecolor('#fff5f7')
+                    ax.set_facecolor('#ffffff')
 
-                x = np.arange(len(data['quarters']))
-                width = 0.35
+                    x = np.arange(len(data['quarters']))
+                    width = 0.35
 
-                ax.bar(x - width/2, data['new'], width, label='Đăng ký mới', color='#28a745', alpha=0.8)
-                ax.bar(x + width/2, data['closed'], width, label='Giải thể', color='#dc3545', alpha=0.8)
+                    ax.bar(x - width/2, data['new'], width, label='Đăng ký mới', color='#28a745', alpha=0.8)
+                    ax.bar(x + width/2, data['closed'], width, label='Giải thể', color='#dc3545', alpha=0.8)
 
-                ax.set_xlabel('Quý', fontsize=13, fontweight='600')
-                ax.set_ylabel('Số lượng DN', fontsize=13, fontweight='600')
-                ax.set_title(f'DN Đăng ký Mới vs Giải thể - {selected_analysis}', fontsize=16, fontweight='bold', color='#c2185b')
-                ax.set_xticks(x)
-                ax.set_xticklabels(data['quarters'], rotation=45, ha='right')
-                ax.legend(fontsize=11)
-                ax.grid(True, alpha=0.2, linestyle='--', axis='y')
-                plt.tight_layout()
-                st.pyplot(fig)
-                plt.close(fig)
+                    ax.set_xlabel('Quý', fontsize=13, fontweight='600')
+                    ax.set_ylabel('Số lượng DN', fontsize=13, fontweight='600')
+                    ax.set_title(f'DN Đăng ký Mới vs Giải thể - {selected_analysis}', fontsize=16, fontweight='bold', color='#c2185b')
+                    ax.set_xticks(x)
+                    ax.set_xticklabels(data['quarters'], rotation=45, ha='right')
+                    ax.legend(fontsize=11)
+                    ax.grid(True, alpha=0.2, linestyle='--', axis='y')
+                    plt.tight_layout()
+                    st.pyplot(fig)
+                    plt.close(fig)
 
                 st.markdown("""
                 **💡 Phân tích**: Số DN đăng ký mới > Giải thể cho thấy ngành đang hấp dẫn.
@@ -3308,7 +3191,7 @@ Trả lời bằng tiếng Việt, có cấu trúc rõ ràng với các điểm
 # ========================================
 # TAB: TIN TỨC TÀI CHÍNH
 # ========================================
-with tab_news:
+if active_view == VIEW_NEWS:
     st.header("📰 Tin tức Tài chính")
     st.markdown("""
     Tin tức tài chính mới nhất từ các nguồn uy tín tại Việt Nam.
@@ -3481,7 +3364,7 @@ with tab_news:
 # ========================================
 # TAB: NHÓM TÁC GIẢ
 # ========================================
-with tab_authors:
+if active_view == VIEW_AUTHORS:
     # Header với hiệu ứng gradient
     st.markdown("""
         <div style='text-align: center; padding: 30px; background: linear-gradient(135deg, #fbc2eb 0%, #a6c1ee 100%); border-radius: 15px; margin-bottom: 30px; box-shadow: 0 10px 30px rgba(102, 126, 234, 0.3);'>
@@ -3685,3 +3568,6 @@ st.markdown(f"""
     </p>
 </div>
 """, unsafe_allow_html=True)
+
+# Chốt số liệu profiling của rerun này (chỉ hiển thị khi bật chế độ developer)
+finish_rerun(profiler)
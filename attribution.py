@@ -0,0 +1,289 @@
+"""
+Giải thích từng dự báo PD: chỉ số X_1..X_14 nào làm PD tăng/giảm và bao nhiêu.
+
+- Logistic: đóng góp dạng đóng w_j * (x_j - trung bình tập train) trên thang log-odds.
+- RandomForest: TreeSHAP chính xác (path-dependent, trọng số theo cover của từng node), tính theo từng lá
+  và vector hóa trên cả lô hồ sơ, trên thang xác suất.
+- XGBoost: TreeSHAP có sẵn của XGBoost (pred_contribs), trên thang log-odds.
+- Stacking: meta-model là Logistic trên PD của 3 base models, nên đóng góp của mỗi chỉ số vào log-odds
+  của PD cuối cùng = tổng theo 3 base models của (hệ số meta x đóng góp vào PD của base model đó).
+
+Mọi đóng góp đều cộng đủ: giá trị nền + tổng đóng góp = đầu ra của mô hình (trên thang tương ứng).
+Cấu trúc cây và thống kê nền được tính 1 lần khi tạo AttributionEngine, cache cùng mô hình.
+"""
+from math import factorial
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from financial_ratios import COMPUTED_COLS
+from stacking_model import MODEL_COLS
+
+# Tên tiếng Việt của X_1..X_14 để hiển thị / gửi cho AI
+RATIO_LABELS = dict(zip(MODEL_COLS, COMPUTED_COLS))
+BASE_NAMES = ['logistic', 'random_forest', 'xgboost']
+# Giới hạn số phần tử (hồ sơ x lá) xử lý cùng lúc khi tính TreeSHAP cho lô lớn
+_MAX_BATCH_CELLS = 2_000_000
+
+
+def _sigmoid(z):
+    return 0.5 * (1.0 + np.tanh(0.5 * z))
+
+
+# =========================
+# TREESHAP CHO RANDOM FOREST
+# =========================
+
+class ForestShap:
+    """
+    TreeSHAP chính xác cho RandomForestClassifier của sklearn (xác suất lớp 1).
+
+    Với 1 lá, giá trị kỳ vọng có điều kiện theo tập đặc trưng S là
+        val * Π_{j∈S} s_j * Π_{j∉S} r_j
+    (s_j = hồ sơ thỏa mọi điều kiện trên đặc trưng j dọc đường tới lá, r_j = tích tỷ lệ cover của các nhánh
+    theo j). Shapley của trò chơi tích này có dạng đóng theo đa thức đối xứng sơ cấp của r trên các đặc
+    trưng được thỏa, nên chỉ cần duyệt các lá (không đệ quy theo từng hồ sơ).
+    """
+
+    def __init__(self, forest, n_features: int):
+        self.n_features = n_features
+        leaves = []
+        for tree in forest.estimators_:
+            leaves.extend(self._tree_leaves(tree.tree_, len(forest.estimators_)))
+        self.n_leaves = len(leaves)
+
+        # Gom các lá theo số đặc trưng duy nhất m trên đường đi (thường ít hơn nhiều so với max_depth)
+        # để mỗi nhóm tính với đúng m đặc trưng, không phải đệm tới độ sâu tối đa
+        self.groups = []
+        self.expected_value = 0.0
+        for m in sorted({len(leaf["features"]) for leaf in leaves}):
+            group = [leaf for leaf in leaves if len(leaf["features"]) == m]
+            value = np.array([leaf["value"] for leaf in group])
+            if m == 0:
+                # Cây chỉ có 1 lá: không phụ thuộc đặc trưng nào
+                self.expected_value += float(value.sum())
+                continue
+            conds = [list(leaf["features"].items()) for leaf in group]
+            feature = np.array([[feat for feat, _ in c] for c in conds], dtype=np.intp)          # (L, m)
+            bounds = np.array([[b for _, b in c] for c in conds], dtype=np.float64)              # (L, m, 3)
+            ratio = bounds[..., 2]
+            # Trọng số Shapley w(k, m) = k! (m-k-1)! / m!, k = 0..m-1
+            weights = np.array([factorial(k) * factorial(m - k - 1) / factorial(m) for k in range(m)])
+            scatter = np.zeros((len(group) * m, n_features))
+            scatter[np.arange(len(group) * m), feature.ravel()] = 1.0
+            self.groups.append({
+                "m": m,
+                "feature": feature,
+                "lower": bounds[..., 0].T[:, None, :],        # (m, 1, L)
+                "upper": bounds[..., 1].T[:, None, :],
+                "ratio": ratio.T[:, None, :],
+                "value": value,
+                "weights": weights,
+                "scatter": scatter,
+            })
+            # Giá trị nền = E[f(X)] theo cover = Σ val * Π r
+            self.expected_value += float(np.sum(value * np.prod(ratio, axis=1)))
+
+    @staticmethod
+    def _tree_leaves(tree, n_trees: int) -> List[Dict[str, Any]]:
+        """Các lá của 1 cây: giá trị (xác suất lớp 1 / số cây) và điều kiện gộp theo từng đặc trưng."""
+        value = tree.value[:, 0, :]
+        proba = value[:, 1] / np.maximum(value.sum(axis=1), 1e-300)
+        cover = tree.weighted_n_node_samples
+        leaves = []
+        # Duyệt theo stack: (node, {feature: (lower, upper, ratio)})
+        stack: List[Tuple[int, Dict[int, Tuple[float, float, float]]]] = [(0, {})]
+        while stack:
+            node, conds = stack.pop()
+            left, right = tree.children_left[node], tree.children_right[node]
+            if left == -1:
+                leaves.append({"value": proba[node] / n_trees, "features": conds})
+                continue
+            feat, thr = int(tree.feature[node]), float(tree.threshold[node])
+            lo, hi, ratio = conds.get(feat, (-np.inf, np.inf, 1.0))
+            # sklearn: x <= threshold đi sang trái
+            stack.append((left, {**conds, feat: (lo, min(hi, thr), ratio * cover[left] / cover[node])}))
+            stack.append((right, {**conds, feat: (max(lo, thr), hi, ratio * cover[right] / cover[node])}))
+        return leaves
+
+    def shap_values(self, X: np.ndarray) -> np.ndarray:
+        """Đóng góp (n, n_features) vào xác suất lớp 1; cộng thêm expected_value ra đúng predict_proba."""
+        # sklearn so sánh ngưỡng trên dữ liệu float32
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        out = np.zeros((len(X), self.n_features))
+        for group in self.groups:
+            cells = len(group["value"]) * (group["m"] + 1)
+            chunk = max(1, _MAX_BATCH_CELLS // cells)
+            for start in range(0, len(X), chunk):
+                out[start:start + chunk] += self._shap_group(X[start:start + chunk], group)
+        return out
+
+    @staticmethod
+    def _shap_group(X: np.ndarray, group: Dict[str, Any]) -> np.ndarray:
+        m, r, w = group["m"], group["ratio"], group["weights"]
+        # Mảng xếp theo (đặc trưng/hệ số, hồ sơ, lá) để mỗi lát cắt liền mạch trong bộ nhớ
+        x = np.moveaxis(X[:, group["feature"]], -1, 0)                      # (m, n, L)
+        # Điều kiện theo đặc trưng j: lower < x <= upper (đúng quy tắc rẽ nhánh của sklearn)
+        sat = (x > group["lower"]) & (x <= group["upper"])
+
+        # Q(z) = Π_{j thỏa} (z + r_j), hệ số theo lũy thừa tăng dần
+        Q = np.zeros((m + 1,) + sat.shape[1:])
+        Q[0] = 1.0
+        for d in range(m):
+            expanded = Q * r[d]
+            expanded[1:] += Q[:-1]
+            Q = np.where(sat[d], expanded, Q)
+        # Tích r của các đặc trưng không thỏa
+        R_unsat = np.prod(np.where(sat, 1.0, r), axis=0)                    # (n, L)
+        # Σ_k w_k * hệ số z^k khi đặc trưng i không thỏa (Q đã không chứa i)
+        total_unsat = np.tensordot(w, Q[:m], axes=1)
+
+        phi = np.empty((m,) + sat.shape[1:])
+        P = np.empty((m,) + sat.shape[1:])
+        for i in range(m):
+            # Đặc trưng i thỏa: bỏ nhân tử (z + r_i) khỏi Q bằng phép chia đa thức
+            P[m - 1] = Q[m]
+            for k in range(m - 1, 0, -1):
+                P[k - 1] = Q[k] - r[i] * P[k]
+            total = np.where(sat[i], np.tensordot(w, P, axes=1), total_unsat)
+            R = np.where(sat[i], R_unsat, R_unsat / r[i])
+            phi[i] = (sat[i] - r[i]) * R * total
+        phi *= group["value"]
+        n = X.shape[0]
+        return np.moveaxis(phi, 0, -1).reshape(n, -1) @ group["scatter"]
+
+
+# =========================
+# ENGINE GỘP 3 BASE MODELS + STACKING
+# =========================
+
+class AttributionEngine:
+    """Đóng góp của từng chỉ số vào PD của 3 base models và của mô hình Stacking"""
+
+    def __init__(self, model, model_logistic, model_rf, model_xgb, X_background: pd.DataFrame):
+        self.model = model
+        self.base_models = {'logistic': model_logistic, 'random_forest': model_rf, 'xgboost': model_xgb}
+        # Thống kê nền (cache): trung bình tập train cho Logistic
+        self.background_mean = X_background[MODEL_COLS].to_numpy(dtype=np.float64).mean(axis=0)
+
+        # Base models riêng (để hiển thị) và base models bên trong Stacking (để gộp qua meta-model)
+        self._explainers = {name: self._make_explainer(m) for name, m in self.base_models.items()}
+        stacked = dict(zip([name for name, _ in model.estimators], model.estimators_))
+        self._stacked_explainers = {
+            name: (self._explainers[name] if stacked[name] is self.base_models[name]
+                   else self._make_explainer(stacked[name]))
+            for name in BASE_NAMES
+        }
+        meta = model.final_estimator_
+        self.meta_coef = dict(zip(BASE_NAMES, meta.coef_[0]))
+        self.meta_intercept = float(meta.intercept_[0])
+
+    def _make_explainer(self, estimator):
+        """Hàm x -> (đóng góp (n, 14), giá trị nền, thang) cho 1 base model"""
+        if hasattr(estimator, "coef_"):
+            coef = estimator.coef_[0].astype(np.float64)
+            base = float(estimator.intercept_[0] + coef @ self.background_mean)
+            return lambda X: (coef * (X - self.background_mean), np.full(len(X), base), "logit")
+        if hasattr(estimator, "get_booster"):
+            import xgboost
+            booster = estimator.get_booster()
+
+            def explain_xgb(X):
+                contribs = booster.predict(xgboost.DMatrix(X, feature_names=booster.feature_names),
+                                           pred_contribs=True)
+                return contribs[:, :-1].astype(np.float64), contribs[:, -1].astype(np.float64), "logit"
+            return explain_xgb
+        forest = ForestShap(estimator, len(MODEL_COLS))
+        return lambda X: (forest.shap_values(X), np.full(len(X), forest.expected_value), "proba")
+
+    @staticmethod
+    def _to_proba(contribs: np.ndarray, base: np.ndarray, scale: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Quy đổi đóng góp log-odds sang thang xác suất, chia tỷ lệ để vẫn cộng đủ:
+        Σ đóng góp = p(x) - p(nền).
+        """
+        if scale == "proba":
+            return contribs, base
+        logit_x = base + contribs.sum(axis=1)
+        p_x, p_base = _sigmoid(logit_x), _sigmoid(base)
+        delta = logit_x - base
+        # Khi log-odds gần như không đổi, dùng đạo hàm p(1-p) của sigmoid
+        factor = np.where(np.abs(delta) > 1e-9, (p_x - p_base) / np.where(delta == 0, 1.0, delta),
+                          p_base * (1 - p_base))
+        return contribs * factor[:, None], p_base
+
+    def explain(self, X: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Giải thích 1 hoặc nhiều hồ sơ.
+
+        Returns:
+            dict gồm:
+            - contributions: {tên mô hình: DataFrame (n, X_1..X_14)} — logistic/xgboost/stacking trên thang
+              log-odds, random_forest trên thang xác suất
+            - base_values: {tên mô hình: mảng giá trị nền (n,)}
+            - stacking_proba: DataFrame đóng góp vào PD Stacking quy đổi sang điểm xác suất
+        """
+        values = X[MODEL_COLS].to_numpy(dtype=np.float64)
+        index = X.index
+        contributions, base_values = {}, {}
+        for name, explainer in self._explainers.items():
+            contribs, base, _ = explainer(values)
+            contributions[name] = pd.DataFrame(contribs, index=index, columns=MODEL_COLS)
+            base_values[name] = base
+
+        # Stacking: log-odds(PD) = b0 + Σ_k w_k * p_k(x), p_k = PD của base model k bên trong Stacking
+        meta_contribs = np.zeros_like(values)
+        meta_base = np.full(len(values), self.meta_intercept)
+        for name in BASE_NAMES:
+            contribs, base, scale = self._stacked_explainers[name](values)
+            contribs_p, base_p = self._to_proba(contribs, base, scale)
+            meta_contribs += self.meta_coef[name] * contribs_p
+            meta_base += self.meta_coef[name] * base_p
+        contributions['stacking'] = pd.DataFrame(meta_contribs, index=index, columns=MODEL_COLS)
+        base_values['stacking'] = meta_base
+
+        stacking_p, stacking_base_p = self._to_proba(meta_contribs, meta_base, "logit")
+        return {
+            "contributions": contributions,
+            "base_values": base_values,
+            "stacking_proba": pd.DataFrame(stacking_p, index=index, columns=MODEL_COLS),
+            "stacking_base_proba": stacking_base_p,
+        }
+
+
+def top_drivers(contributions: pd.Series, k: int = 5) -> List[Dict[str, Any]]:
+    """k chỉ số tác động mạnh nhất (theo trị tuyệt đối) của 1 hồ sơ, kèm chiều tác động lên PD."""
+    order = contributions.abs().sort_values(ascending=False).index[:k]
+    return [
+        {
+            "chỉ_số": RATIO_LABELS.get(col, col),
+            "đóng_góp": round(float(contributions[col]), 4),
+            "tác_động": "làm TĂNG PD" if contributions[col] > 0 else "làm GIẢM PD",
+        }
+        for col in order
+    ]
+
+
+def explanation_table(explanation: Dict[str, Any], row: int = 0) -> pd.DataFrame:
+    """Bảng đóng góp của 1 hồ sơ cho cả 4 mô hình, sắp theo mức tác động lên PD Stacking."""
+    contributions = explanation["contributions"]
+    table = pd.DataFrame({
+        "Stacking (điểm % PD)": explanation["stacking_proba"].iloc[row] * 100,
+        "Stacking (log-odds)": contributions["stacking"].iloc[row],
+        "Logistic (log-odds)": contributions["logistic"].iloc[row],
+        "RandomForest (điểm % PD)": contributions["random_forest"].iloc[row] * 100,
+        "XGBoost (log-odds)": contributions["xgboost"].iloc[row],
+    })
+    table = table.reindex(table["Stacking (log-odds)"].abs().sort_values(ascending=False).index)
+    table.index = [RATIO_LABELS.get(col, col) for col in table.index]
+    return table
+
+
+def drivers_summary(explanation: Dict[str, Any], k: int = 3) -> List[str]:
+    """Mỗi hồ sơ 1 chuỗi k chỉ số tác động mạnh nhất lên PD Stacking (dùng cho bảng tổng hợp danh mục)."""
+    proba = explanation["stacking_proba"]
+    values = proba.to_numpy()
+    order = np.argsort(-np.abs(values), axis=1)[:, :k]
+    labels = [RATIO_LABELS.get(col, col) for col in proba.columns]
+    return ["; ".join(f"{labels[j]} ({values[i, j] * 100:+.2f} điểm %)" for j in order[i]) for i in range(len(values))]
@@ -0,0 +1,303 @@
+"""
+Xuất báo cáo Word hàng loạt cho cả danh mục khách hàng, chạy song song trên nhiều process.
+
+Đầu vào là bảng danh mục đã chấm điểm: mỗi dòng 1 khách hàng với X_1..X_14, cột PD (nếu chưa có
+thì chấm bằng mô hình truyền vào), tùy chọn tên khách hàng và nội dung phân tích AI.
+
+- Mỗi worker chỉ tạo template (margin, style, logo, tiêu đề) 1 lần trong initializer, sau đó mở lại
+  từ bytes cho từng báo cáo nên không phải đọc logo/định dạng lại.
+- Các file .docx được ghi lần lượt vào file zip ngay khi worker trả về (không giữ cả danh mục trong RAM).
+
+Chạy từ dòng lệnh:
+
+    python batch_reports.py danh_muc.csv --output bao_cao.zip --workers 4
+    python batch_reports.py danh_muc.csv --train DATASET.csv   # chấm PD nếu thiếu + cột top_drivers, phân vị pct_X_*
+    python batch_reports.py danh_muc.csv --train DATASET.csv --reverse-stress   # + cú sốc tối thiểu tới hạng kế tiếp / Default
+    python batch_reports.py danh_muc.csv --train DATASET.csv --scorecard   # + điểm và PD theo thẻ điểm WoE
+"""
+import argparse
+import multiprocessing
+import os
+import re
+import time
+import unicodedata
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Iterator, Tuple, Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+from financial_ratios import COMPUTED_COLS
+from stacking_model import MODEL_COLS
+from threshold_optimizer import DEFAULT_THRESHOLD
+from word_report import LOGO_PATH, build_report_template, generate_word_report
+
+PD_COL = 'PD'
+COMPANY_COLS = ['company_name', 'Tên khách hàng', 'Tên KH']
+ANALYSIS_COL = 'ai_analysis'
+DRIVERS_COL = 'top_drivers'
+# Cột phân vị so với tập train của từng chỉ số (pct_X_1..pct_X_14), dùng cho radar trong báo cáo
+PERCENTILE_PREFIX = 'pct_'
+# Cú sốc đồng loạt nhỏ nhất (%) để PD xấu đi 1 hạng / vượt ngưỡng Default (reverse_stress.py)
+STRESS_COLS = ['shock_next_rating', 'shock_default']
+# Tổng điểm và PD theo thẻ điểm WoE (scorecard.py)
+SCORECARD_COLS = ['scorecard_score', 'scorecard_pd']
+SUMMARY_FILE = "danh_sach_bao_cao.csv"
+
+# Trạng thái dùng chung trong mỗi worker process (khởi tạo 1 lần bởi _init_worker)
+_worker_state: Dict[str, Any] = {}
+
+
+def _init_worker(logo_path: str, render_charts: bool):
+    """Tạo template báo cáo 1 lần cho mỗi process và lưu dạng bytes để mở lại nhanh."""
+    from io import BytesIO
+    buffer = BytesIO()
+    build_report_template(logo_path).save(buffer)
+    _worker_state["template"] = buffer.getvalue()
+    _worker_state["render_charts"] = render_charts
+
+
+def _slugify(name: str) -> str:
+    """Tên file an toàn (bỏ dấu tiếng Việt, chỉ giữ chữ/số/_)."""
+    ascii_name = unicodedata.normalize("NFKD", name.replace("Đ", "D").replace("đ", "d"))
+    ascii_name = ascii_name.encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"[^A-Za-z0-9]+", "_", ascii_name).strip("_")[:60] or "khach_hang"
+
+
+def _build_report(task: Dict[str, Any]) -> Tuple[str, bytes]:
+    """Tạo 1 báo cáo trong worker, trả về (tên file, nội dung .docx)."""
+    ratios_display = pd.DataFrame({'Giá trị': task["values"]}, index=COMPUTED_COLS)
+    if task.get("percentiles") is not None:
+        from charts import PERCENTILE_COL
+        ratios_display[PERCENTILE_COL] = task["percentiles"]
+    if _worker_state["render_charts"]:
+        from charts import render_bar_chart, render_radar_chart
+        bar_png, radar_png = render_bar_chart(ratios_display), render_radar_chart(ratios_display)
+    else:
+        bar_png = radar_png = None
+
+    buffer = generate_word_report(
+        ratios_display=ratios_display,
+        pd_value=task["pd_value"],
+        pd_label=task["pd_label"],
+        ai_analysis=task["ai_analysis"],
+        fig_bar=bar_png,
+        fig_radar=radar_png,
+        company_name=task["company_name"],
+        template=_worker_state["template"],
+        scorecard=task.get("scorecard"),
+    )
+    return task["filename"], buffer.getvalue()
+
+
+def prepare_portfolio(portfolio: pd.DataFrame, model=None, threshold: float = DEFAULT_THRESHOLD,
+                      explainer=None, calibration=None, percentiles=None,
+                      reverse_stress: bool = False, scorecard=None) -> pd.DataFrame:
+    """
+    Chuẩn hóa bảng danh mục: kiểm tra cột, chấm PD (nếu thiếu), gán nhãn, tên khách hàng và tên file.
+
+    Args:
+        portfolio: DataFrame có X_1..X_14, tùy chọn PD / tên khách hàng / ai_analysis
+        model: Mô hình có predict_proba, dùng khi danh mục chưa có cột PD
+        threshold: Ngưỡng PD để gán nhãn Default
+        explainer: AttributionEngine (tùy chọn) để thêm cột top_drivers (3 chỉ số tác động mạnh nhất)
+        calibration: Bảng tra hiệu chỉnh PD (calibration.py) áp cho PD do model chấm
+        percentiles: PercentileIndex (tùy chọn) để thêm cột phân vị pct_X_1..pct_X_14 so với tập train
+        reverse_stress: Thêm cột STRESS_COLS (cần model): cú sốc đồng loạt nhỏ nhất theo PD do model chấm
+        scorecard: Scorecard (tùy chọn) để thêm cột SCORECARD_COLS (tổng điểm và PD theo thẻ điểm WoE)
+
+    Returns:
+        DataFrame đã bổ sung các cột PD, pd_label, company_name, filename (và top_drivers, pct_X_*, shock_*,
+        scorecard_*)
+    """
+    missing = [c for c in MODEL_COLS if c not in portfolio.columns]
+    if missing:
+        raise ValueError(f"Thiếu cột: {missing}")
+
+    out = portfolio.reset_index(drop=True).copy()
+    if PD_COL not in out.columns:
+        if model is None:
+            raise ValueError(f"Danh mục chưa có cột '{PD_COL}' và không có mô hình để chấm điểm")
+        # Chấm điểm cả danh mục bằng 1 lần predict_proba
+        from calibration import apply_calibration
+        out[PD_COL] = apply_calibration(model.predict_proba(out[MODEL_COLS])[:, 1], calibration)
+
+    pd_values = out[PD_COL].astype(float)
+    out['pd_label'] = np.where(pd_values.isna(), "N/A",
+                               np.where(pd_values >= threshold, "Default (Vỡ nợ)", "Non-Default (Không vỡ nợ)"))
+
+    company_col = next((c for c in COMPANY_COLS if c in out.columns), None)
+    if company_col is None:
+        out['company_name'] = [f"KHÁCH HÀNG {i + 1}" for i in range(len(out))]
+    else:
+        out['company_name'] = out[company_col].fillna("").astype(str).str.strip()
+        empty = out['company_name'] == ""
+        out.loc[empty, 'company_name'] = [f"KHÁCH HÀNG {i + 1}" for i in np.flatnonzero(empty)]
+
+    out['filename'] = [f"{i + 1:04d}_{_slugify(name)}.docx" for i, name in enumerate(out['company_name'])]
+
+    if explainer is not None:
+        # Giải thích cả danh mục trong 1 lần gọi (vector hóa theo lô)
+        from attribution import drivers_summary
+        out[DRIVERS_COL] = drivers_summary(explainer.explain(out[MODEL_COLS]))
+
+    if percentiles is not None:
+        # Xếp hạng cả danh mục trong 1 lần (searchsorted theo cột)
+        ranks = percentiles.rank(out[MODEL_COLS])
+        for j, col in enumerate(MODEL_COLS):
+            out[PERCENTILE_PREFIX + col] = ranks[:, j]
+
+    if reverse_stress:
+        if model is None:
+            raise ValueError("Cần mô hình để tính cú sốc tối thiểu (reverse stress test)")
+        # Cả danh mục giải cùng lúc: 1 lần dò lưới + vài lần chia đôi, mỗi lần 1 predict_proba theo lô
+        from calibration import apply_calibration
+        from reverse_stress import reverse_stress as solve_reverse_stress, stress_targets
+        model_pd = apply_calibration(model.predict_proba(out[MODEL_COLS])[:, 1], calibration)
+        result = solve_reverse_stress(model, out[MODEL_COLS], stress_targets(model_pd, threshold), calibration,
+                                      scenarios=("uniform",))
+        for t, col in enumerate(STRESS_COLS):
+            out[col] = result["shock"][:, 0, t]
+
+    if scorecard is not None:
+        # Cả danh mục: mỗi chỉ số 1 searchsorted trên mép bin + tra bảng điểm nguyên
+        score = scorecard.score(out[MODEL_COLS])
+        out[SCORECARD_COLS[0]] = score
+        out[SCORECARD_COLS[1]] = scorecard.score_to_pd(score)
+    return out
+
+
+def _tasks(prepared: pd.DataFrame, scorecard=None) -> Iterator[Dict[str, Any]]:
+    values = prepared[MODEL_COLS].to_numpy(dtype=float)
+    analyses = prepared[ANALYSIS_COL].fillna("").astype(str) if ANALYSIS_COL in prepared.columns else None
+    pct_cols = [PERCENTILE_PREFIX + c for c in MODEL_COLS]
+    ranks = prepared[pct_cols].to_numpy(dtype=float) if all(c in prepared.columns for c in pct_cols) else None
+    for i, row in enumerate(prepared[[PD_COL, 'pd_label', 'company_name', 'filename']].itertuples(index=False)):
+        yield {
+            "values": values[i],
+            "pd_value": float(row[0]),
+            "pd_label": row[1],
+            "company_name": row[2],
+            "filename": row[3],
+            "ai_analysis": analyses.iloc[i] if analyses is not None else "",
+            "percentiles": ranks[i] if ranks is not None else None,
+            # Bảng điểm từng chỉ số tính ở process chính (worker không cần giữ thẻ điểm)
+            "scorecard": scorecard.breakdown(values[i]) if scorecard is not None else None,
+        }
+
+
+def iter_reports(prepared: pd.DataFrame, max_workers: int = None, logo_path: str = LOGO_PATH,
+                 render_charts: bool = True, scorecard=None) -> Iterator[Tuple[str, bytes]]:
+    """
+    Tạo báo cáo cho từng dòng của danh mục đã chuẩn hóa, trả về lần lượt (tên file, bytes) theo thứ tự.
+
+    Args:
+        prepared: Kết quả của prepare_portfolio
+        max_workers: Số process (mặc định = số CPU; 1 = chạy ngay trong process hiện tại)
+        logo_path: Logo chèn vào header
+        render_charts: Có vẽ biểu đồ cột/radar cho từng báo cáo hay không
+        scorecard: Scorecard (tùy chọn) để thêm mục thẻ điểm WoE vào từng báo cáo
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or len(prepared) <= 1:
+        _init_worker(logo_path, render_charts)
+        for task in _tasks(prepared, scorecard):
+            yield _build_report(task)
+        return
+
+    # spawn: không fork process Streamlit đang chạy nhiều thread
+    ctx = multiprocessing.get_context("spawn")
+    chunksize = max(1, min(8, len(prepared) // (max_workers * 4)))
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=(logo_path, render_charts)) as executor:
+        yield from executor.map(_build_report, _tasks(prepared, scorecard), chunksize=chunksize)
+
+
+def write_reports_zip(prepared: pd.DataFrame, fileobj, max_workers: int = None, logo_path: str = LOGO_PATH,
+                      render_charts: bool = True, progress: Optional[Callable[[int, int], None]] = None,
+                      scorecard=None) -> int:
+    """
+    Ghi toàn bộ báo cáo vào file zip (đường dẫn hoặc file-like), kèm file CSV tóm tắt danh mục.
+
+    Returns:
+        Số báo cáo đã ghi
+    """
+    total = len(prepared)
+    count = 0
+    # .docx đã được nén sẵn nên lưu nguyên (ZIP_STORED) để không tốn CPU nén lại
+    with zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_STORED) as archive:
+        for filename, content in iter_reports(prepared, max_workers, logo_path, render_charts, scorecard):
+            archive.writestr(filename, content)
+            count += 1
+            if progress is not None:
+                progress(count, total)
+        summary_cols = ['filename', 'company_name', PD_COL, 'pd_label']
+        if DRIVERS_COL in prepared.columns:
+            summary_cols.append(DRIVERS_COL)
+        summary_cols += [c for c in STRESS_COLS + SCORECARD_COLS if c in prepared.columns]
+        summary = prepared[summary_cols]
+        archive.writestr(SUMMARY_FILE, summary.to_csv(index=False).encode("utf-8-sig"),
+                         compress_type=zipfile.ZIP_DEFLATED)
+    return count
+
+
+def read_portfolio(source, filename: str = None) -> pd.DataFrame:
+    """Đọc danh mục từ CSV hoặc Excel (source: đường dẫn hoặc file upload, filename để nhận dạng loại file)."""
+    if str(filename or source).lower().endswith((".xlsx", ".xls")):
+        return pd.read_excel(source)
+    return pd.read_csv(source, encoding='utf-8-sig')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Xuất báo cáo Word hàng loạt cho danh mục khách hàng")
+    parser.add_argument("portfolio", help="File CSV/Excel danh mục (X_1..X_14, tùy chọn PD, tên khách hàng)")
+    parser.add_argument("--output", default="bao_cao_danh_muc.zip")
+    parser.add_argument("--workers", type=int, default=None, help="Số process (mặc định = số CPU)")
+    parser.add_argument("--train", default=None,
+                        help="CSV huấn luyện để chấm PD khi danh mục chưa có cột PD và giải thích các chỉ số tác động")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help=f"Ngưỡng PD gán nhãn Default (mặc định: ngưỡng tối ưu khi có --train, ngược lại {DEFAULT_THRESHOLD})")
+    parser.add_argument("--no-charts", action="store_true", help="Không vẽ biểu đồ (nhanh hơn)")
+    parser.add_argument("--reverse-stress", action="store_true",
+                        help="Thêm cú sốc tối thiểu để PD xấu đi 1 hạng / vượt ngưỡng Default (cần --train)")
+    parser.add_argument("--scorecard", action="store_true",
+                        help="Thêm điểm/PD theo thẻ điểm WoE vào file tóm tắt và bảng điểm vào từng báo cáo (cần --train)")
+    args = parser.parse_args()
+
+    model = explainer = calibration = percentiles = scorecard = None
+    threshold = args.threshold
+    if args.train:
+        from attribution import AttributionEngine
+        from data_loader import load_training_data
+        from stacking_model import train_models
+        trained = train_models(load_training_data(args.train))
+        model, calibration = trained["model"], trained["calibration"]
+        if threshold is None:
+            threshold = trained["threshold"]["threshold"]
+        explainer = AttributionEngine(trained["model"], trained["model_logistic"], trained["model_rf"],
+                                      trained["model_xgb"], trained["X_train"])
+        from percentiles import PercentileIndex
+        percentiles = PercentileIndex(trained["X_train"], trained["y_train"])
+        if args.scorecard:
+            from scorecard import Scorecard
+            scorecard = Scorecard(trained["X_train"], trained["y_train"], trained["model_logistic"])
+
+    if threshold is None:
+        threshold = DEFAULT_THRESHOLD
+    if args.reverse_stress and model is None:
+        parser.error("--reverse-stress cần --train để có mô hình chấm điểm")
+    if args.scorecard and scorecard is None:
+        parser.error("--scorecard cần --train để dựng thẻ điểm")
+
+    prepared = prepare_portfolio(read_portfolio(args.portfolio), model, threshold, explainer, calibration, percentiles,
+                                 reverse_stress=args.reverse_stress, scorecard=scorecard)
+    start = time.perf_counter()
+    count = write_reports_zip(prepared, args.output, args.workers, render_charts=not args.no_charts,
+                              progress=lambda done, total: print(f"\r📄 {done}/{total}", end="", flush=True),
+                              scorecard=scorecard)
+    print(f"\n✅ Đã xuất {count} báo cáo vào {args.output} sau {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
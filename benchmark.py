@@ -0,0 +1,554 @@
+"""
+Benchmark độ trễ huấn luyện và chấm điểm cho ứng dụng Streamlit (ED.py).
+
+Đo thời gian:
+- Huấn luyện Stacking + 3 base models (train_models) và biên dịch 4 mô hình (compile_model)
+- Chấm điểm 1 hồ sơ, 4 lần predict_proba: mô hình sklearn trên DataFrame (score_single, mốc so sánh) và đường đang
+  dùng ở tab dự báo / /predict: feature_array + ArrayScorer trên bản biên dịch (score_array)
+- Chấm điểm hàng loạt Stacking trên toàn bộ tập: sklearn (score_batch, mốc so sánh) và bản biên dịch như báo cáo
+  hàng loạt / phân tích độ nhạy (score_compiled)
+- Đọc file Excel 3 sheet CDKT/BCTN/LCTT (compute_ratios_from_three_sheets)
+- Xuất báo cáo Word (generate_word_report)
+
+Dữ liệu X_1..X_14 được sinh tổng hợp theo phân phối của DATASET.csv (Gaussian copula riêng cho
+từng lớp default, giữ nguyên phân phối biên và tương quan hạng), ở các cỡ 1k/100k/1M dòng.
+Kết quả ghi ra JSON kèm commit git để so sánh giữa các commit:
+
+    python benchmark.py run --output bench_results/new.json
+    python benchmark.py compare bench_results/old.json bench_results/new.json --threshold 0.2
+
+Đo thời gian khởi động (phần import đầu ED.py, đo bằng `python -X importtime`), so với 1 commit khác:
+
+    python benchmark.py startup --ref HEAD~1
+
+So sánh mô hình gốc với bản biên dịch (tree_engine.py) ở lô 1 dòng và 10k dòng, mã lỗi 1 nếu lệch PD > 1e-6:
+
+    python benchmark.py trees --sizes 1 10000
+
+Chấm 1 hồ sơ từ dict 14 chỉ số (tab dự báo / kịch bản): DataFrame + chọn cột so với mảng float32 (feature_array +
+ArrayScorer), cùng 4 bản biên dịch:
+
+    python benchmark.py arrays
+"""
+import argparse
+import ast
+import json
+import os
+import platform
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+from datetime import datetime
+from io import BytesIO
+from typing import Dict, Any, List, Callable, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from financial_ratios import COMPUTED_COLS, ALIAS_IS, ALIAS_BS, ALIAS_CF, compute_ratios_from_three_sheets
+from word_report import generate_word_report, _WORD_OK
+from charts import render_bar_chart, render_radar_chart
+from stacking_model import MODEL_COLS, train_models
+from tree_engine import ArrayScorer, compile_model, feature_array, max_abs_diff
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+RESULTS_DIR = "bench_results"
+
+
+# =========================
+# SINH DỮ LIỆU TỔNG HỢP
+# =========================
+
+class SyntheticCreditData:
+    """
+    Sinh dữ liệu X_1..X_14 + default theo phân phối của một tập dữ liệu thật.
+
+    Mỗi lớp default được mô hình hóa bằng Gaussian copula: tương quan giữa các normal score
+    (rank -> ppf) và phân phối biên thực nghiệm (nội suy quantile), nên các giá trị sinh ra
+    nằm trong miền giá trị của dữ liệu gốc với cùng tỷ lệ vỡ nợ.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        df = df.dropna(subset=['default'] + MODEL_COLS)
+        y = df['default'].astype(int).to_numpy()
+        self.default_rate = float(y.mean())
+        self.classes = {}
+        for label in (0, 1):
+            X = df.loc[y == label, MODEL_COLS].to_numpy(dtype=float)
+            n = len(X)
+            scores = stats.norm.ppf(stats.rankdata(X, axis=0) / (n + 1))
+            corr = np.corrcoef(scores, rowvar=False)
+            # Đảm bảo ma trận tương quan xác định dương trước khi phân rã Cholesky
+            corr = np.nan_to_num(corr) + 1e-6 * np.eye(len(MODEL_COLS))
+            np.fill_diagonal(corr, 1.0)
+            self.classes[label] = {
+                "chol": np.linalg.cholesky(corr),
+                "sorted": np.sort(X, axis=0),
+                "grid": (np.arange(1, n + 1)) / (n + 1),
+            }
+
+    def sample(self, n_rows: int, seed: int = 42) -> pd.DataFrame:
+        """Sinh n_rows dòng (đủ cột X_1..X_14 và default)."""
+        rng = np.random.default_rng(seed)
+        y = (rng.random(n_rows) < self.default_rate).astype(int)
+        X = np.empty((n_rows, len(MODEL_COLS)))
+        for label, params in self.classes.items():
+            idx = np.flatnonzero(y == label)
+            z = rng.standard_normal((len(idx), len(MODEL_COLS))) @ params["chol"].T
+            u = stats.norm.cdf(z)
+            for j in range(len(MODEL_COLS)):
+                X[idx, j] = np.interp(u[:, j], params["grid"], params["sorted"][:, j])
+        out = pd.DataFrame(X, columns=MODEL_COLS)
+        out['default'] = y
+        return out
+
+
+def make_financial_workbook(seed: int = 42) -> bytes:
+    """
+    Tạo file Excel tổng hợp có 3 sheet CDKT/BCTN/LCTT với 2 cột năm, dùng đúng tên dòng trong ALIAS_*.
+
+    Returns:
+        Nội dung file .xlsx (bytes)
+    """
+    rng = np.random.default_rng(seed)
+    years = [2023, 2024]
+
+    def sheet(aliases: Dict[str, List[str]], scale: float) -> pd.DataFrame:
+        rows = []
+        for names in aliases.values():
+            base = rng.uniform(0.2, 1.0) * scale
+            rows.append([names[0]] + [round(base * rng.uniform(0.9, 1.1), 2) for _ in years])
+        return pd.DataFrame(rows, columns=["Chỉ tiêu"] + years)
+
+    buffer = BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
+        sheet(ALIAS_BS, 1e11).to_excel(writer, sheet_name="CDKT", index=False)
+        sheet(ALIAS_IS, 5e10).to_excel(writer, sheet_name="BCTN", index=False)
+        sheet(ALIAS_CF, 5e9).to_excel(writer, sheet_name="LCTT", index=False)
+    return buffer.getvalue()
+
+
+# =========================
+# ĐO THỜI GIAN
+# =========================
+
+def time_call(fn: Callable[[], Any], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    """Chạy fn (warmup + repeat lần) và trả về thống kê thời gian (giây)."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples = np.asarray(samples)
+    return {
+        "repeat": int(repeat),
+        "min": float(samples.min()),
+        "median": float(np.median(samples)),
+        "mean": float(samples.mean()),
+        "p95": float(np.percentile(samples, 95)),
+        "max": float(samples.max()),
+    }
+
+
+def git_metadata() -> Dict[str, Any]:
+    """Lấy commit hiện tại và trạng thái working tree (nếu chạy trong repo git)."""
+    def git(*args):
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True).stdout.strip()
+    try:
+        return {
+            "commit": git("rev-parse", "HEAD"),
+            "branch": git("rev-parse", "--abbrev-ref", "HEAD"),
+            "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        }
+    except Exception:
+        return {"commit": None, "branch": None, "dirty": None}
+
+
+def environment_metadata() -> Dict[str, Any]:
+    """Phiên bản Python/thư viện và phần cứng để đối chiếu khi so sánh kết quả."""
+    import sklearn
+    import xgboost
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "scikit-learn": sklearn.__version__,
+        "xgboost": xgboost.__version__,
+    }
+
+
+def run(dataset: str, sizes: List[int], max_train_rows: int, repeat: int, seed: int) -> Dict[str, Any]:
+    """
+    Chạy toàn bộ benchmark.
+
+    Args:
+        dataset: CSV gốc để ước lượng phân phối dữ liệu tổng hợp
+        sizes: Các cỡ dữ liệu tổng hợp (số dòng)
+        max_train_rows: Giới hạn số dòng dùng để huấn luyện ở mỗi cỡ (huấn luyện Stacking trên 1M dòng rất lâu)
+        repeat: Số lần lặp cho các phép đo nhanh (chấm điểm, đọc Excel, xuất Word)
+        seed: Seed sinh dữ liệu
+
+    Returns:
+        Dict kết quả (metadata + danh sách phép đo)
+    """
+    generator = SyntheticCreditData(pd.read_csv(dataset, encoding='latin-1'))
+    results = []
+
+    def record(name: str, n_rows: int, timing: Dict[str, float], dataset_rows: int = None):
+        entry = {"name": name, "n_rows": int(n_rows), "dataset_rows": int(dataset_rows or n_rows), **timing}
+        results.append(entry)
+        print(f"⏱️ {name:<14} n={n_rows:>9,} / {entry['dataset_rows']:>9,} median={timing['median'] * 1000:10.2f} ms")
+
+    for size in sizes:
+        data = generator.sample(size, seed=seed)
+        train_rows = min(size, max_train_rows)
+        train_df = data.iloc[:train_rows]
+
+        start = time.perf_counter()
+        trained = train_models(train_df)
+        elapsed = time.perf_counter() - start
+        record("train", train_rows, {"repeat": 1, "min": elapsed, "median": elapsed,
+                                     "mean": elapsed, "p95": elapsed, "max": elapsed},
+               dataset_rows=size)
+
+        names = ("model", "model_logistic", "model_rf", "model_xgb")
+        start = time.perf_counter()
+        compiled = {name: compile_model(trained[name], MODEL_COLS) for name in names}
+        elapsed = time.perf_counter() - start
+        record("compile", train_rows, {"repeat": 1, "min": elapsed, "median": elapsed,
+                                       "mean": elapsed, "p95": elapsed, "max": elapsed},
+               dataset_rows=size)
+
+        # Mốc so sánh: mô hình sklearn trên DataFrame; đường thực tế: mảng float32 dựng từ 14 giá trị + ArrayScorer
+        models = [trained[name] for name in names]
+        X_one = data[MODEL_COLS].iloc[[0]]
+        record("score_single", 1,
+               time_call(lambda: [m.predict_proba(X_one) for m in models], repeat=repeat * 10),
+               dataset_rows=size)
+        scorers = [ArrayScorer(compiled[name], MODEL_COLS) for name in names]
+        values = X_one.iloc[0].tolist()
+
+        def score_array():
+            X = feature_array(values, MODEL_COLS)
+            return [scorer.predict_proba(X) for scorer in scorers]
+
+        record("score_array", 1, time_call(score_array, repeat=repeat * 10), dataset_rows=size)
+
+        X_all = data[MODEL_COLS]
+        record("score_batch", size,
+               time_call(lambda: trained["model"].predict_proba(X_all), repeat=max(1, repeat // 2)))
+        record("score_compiled", size,
+               time_call(lambda: compiled["model"].predict_proba(X_all), repeat=max(1, repeat // 2)))
+
+    workbook = make_financial_workbook(seed)
+    record("excel_parse", 1, time_call(lambda: compute_ratios_from_three_sheets(BytesIO(workbook)), repeat=repeat))
+
+    if _WORD_OK:
+        ratios_df = compute_ratios_from_three_sheets(BytesIO(workbook))
+        ratios_display = ratios_df[COMPUTED_COLS].T.rename(columns={0: 'Giá trị'})
+
+        def report():
+            # Vẽ lại biểu đồ mỗi lần để đo cả chi phí render (trường hợp cache miss)
+            generate_word_report(ratios_display, 0.0723, "Non-Default (Không vỡ nợ)",
+                                 "Phân tích mẫu.\nKhuyến nghị: CHO VAY",
+                                 render_bar_chart(ratios_display), render_radar_chart(ratios_display))
+
+        record("word_report", 1, time_call(report, repeat=repeat))
+    else:
+        print("⚠️ Thiếu python-docx, bỏ qua benchmark xuất Word.")
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git": git_metadata(),
+        "environment": environment_metadata(),
+        "config": {"dataset": dataset, "sizes": sizes, "max_train_rows": max_train_rows,
+                   "repeat": repeat, "seed": seed},
+        "results": results,
+    }
+
+
+def compare(baseline: Dict[str, Any], candidate: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """
+    So sánh median của từng phép đo (khớp theo name + n_rows + dataset_rows) giữa 2 lần chạy.
+
+    Returns:
+        Danh sách dòng so sánh, 'regression' = True khi chậm hơn quá threshold (tỷ lệ, ví dụ 0.2 = 20%)
+    """
+    def key_of(r):
+        return r["name"], r["n_rows"], r.get("dataset_rows", r["n_rows"])
+
+    base = {key_of(r): r for r in baseline["results"]}
+    rows = []
+    for r in candidate["results"]:
+        key = key_of(r)
+        if key not in base:
+            continue
+        ratio = r["median"] / base[key]["median"] if base[key]["median"] > 0 else float("inf")
+        rows.append({"name": r["name"], "n_rows": r["n_rows"], "dataset_rows": key[2],
+                     "baseline": base[key]["median"], "candidate": r["median"],
+                     "ratio": ratio, "regression": ratio > 1 + threshold})
+    return rows
+
+
+def app_import_header(script_path: str) -> str:
+    """Phần khởi tạo đầu script Streamlit: các câu lệnh top-level trước hàm đầu tiên (import, cờ thư viện)."""
+    with open(script_path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    header = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            break
+        header.append(node)
+    return ast.unparse(ast.Module(body=header, type_ignores=[]))
+
+
+def _parse_importtime(stderr: str) -> Dict[str, int]:
+    """Thời gian import tích lũy (µs) của các module cấp cao nhất trong output của -X importtime."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Module import trực tiếp từ script không thụt lề (chỉ có 1 dấu cách sau '|')
+        if not name.startswith("  "):
+            modules[name.strip()] = int(cumulative)
+    return modules
+
+
+def measure_startup(app_dir: str, script: str = "ED.py", repeat: int = 5) -> Dict[str, Any]:
+    """
+    Đo thời gian import lúc khởi động app: chạy phần đầu script trong process Python mới với -X importtime.
+
+    Returns:
+        {"total_ms": trung vị tổng thời gian import, "modules_ms": trung vị theo module cấp cao nhất}
+    """
+    code = app_import_header(os.path.join(app_dir, script))
+    samples = []
+    # Lần chạy đầu chỉ để tạo file .pyc, không tính
+    for _ in range(repeat + 1):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                              cwd=app_dir, capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"Lỗi khi import {script}: {proc.stderr.strip().splitlines()[-1]}")
+        samples.append(_parse_importtime(proc.stderr))
+    samples = samples[1:]
+
+    names = sorted({name for sample in samples for name in sample})
+    modules_ms = {name: float(np.median([sample.get(name, 0) for sample in samples])) / 1000 for name in names}
+    return {
+        "repeat": repeat,
+        "total_ms": float(np.median([sum(sample.values()) for sample in samples])) / 1000,
+        "modules_ms": dict(sorted(modules_ms.items(), key=lambda item: -item[1])),
+    }
+
+
+def measure_startup_at(ref: str, script: str = "ED.py", repeat: int = 5) -> Dict[str, Any]:
+    """Đo thời gian khởi động của các file .py tại 1 commit git khác (giải nén vào thư mục tạm)."""
+    archive = subprocess.run(["git", "archive", "--format=tar", ref, "--", "*.py"],
+                             capture_output=True, check=True).stdout
+    with tempfile.TemporaryDirectory() as tmp:
+        with tarfile.open(fileobj=BytesIO(archive)) as tar:
+            tar.extractall(tmp, filter="data")
+        return measure_startup(tmp, script, repeat)
+
+
+def compare_compiled(dataset: str, sizes: List[int], repeat: int, seed: int) -> Dict[str, Any]:
+    """
+    Độ trễ predict_proba của 4 mô hình gốc và bản biên dịch (tree_engine) trên cùng dữ liệu tổng hợp.
+
+    Returns:
+        Dict metadata + danh sách phép đo (model, n_rows, original/compiled: thống kê thời gian, speedup,
+        max_abs_diff: lệch PD lớn nhất, None nếu mô hình không biên dịch được)
+    """
+    df = pd.read_csv(dataset, encoding='latin-1')
+    trained = train_models(df)
+    generator = SyntheticCreditData(df)
+    results = []
+    for name in ("model", "model_logistic", "model_rf", "model_xgb"):
+        original = trained[name]
+        start = time.perf_counter()
+        compiled = compile_model(original, MODEL_COLS)
+        compile_seconds = time.perf_counter() - start
+        for size in sizes:
+            X = generator.sample(size, seed=seed)[MODEL_COLS]
+            # Lô nhỏ lặp nhiều lần hơn để median ổn định
+            n_repeat = repeat * 10 if size <= 100 else repeat
+            base = time_call(lambda: original.predict_proba(X), repeat=n_repeat)
+            fast = time_call(lambda: compiled.predict_proba(X), repeat=n_repeat)
+            entry = {"model": name, "n_rows": int(size), "compile_seconds": compile_seconds,
+                     "original": base, "compiled": fast, "speedup": base["median"] / fast["median"],
+                     "max_abs_diff": max_abs_diff(original, compiled, X)}
+            results.append(entry)
+            diff = "không biên dịch" if entry["max_abs_diff"] is None else f"lệch {entry['max_abs_diff']:.1e}"
+            print(f"⏱️ {name:<14} n={size:>9,} {base['median'] * 1000:10.3f} ms -> {fast['median'] * 1000:10.3f} ms "
+                  f"({entry['speedup']:.1f}x, {diff})")
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git": git_metadata(),
+        "environment": environment_metadata(),
+        "config": {"dataset": dataset, "sizes": sizes, "repeat": repeat, "seed": seed},
+        "results": results,
+    }
+
+
+def compare_array_scoring(dataset: str, n_records: int, repeat: int, seed: int) -> Dict[str, Any]:
+    """
+    Độ trễ chấm 1 hồ sơ (dict X_1..X_14 -> PD của 4 mô hình biên dịch) qua DataFrame và qua mảng float32.
+
+    Returns:
+        Dict metadata + danh sách phép đo (path: "dataframe" / "array", thống kê thời gian) và max_abs_diff giữa 2
+        đường đi trên n_records hồ sơ tổng hợp
+    """
+    df = pd.read_csv(dataset, encoding='latin-1')
+    trained = train_models(df)
+    names = ("model", "model_logistic", "model_rf", "model_xgb")
+    compiled = {name: compile_model(trained[name], MODEL_COLS) for name in names}
+    scorers = {name: ArrayScorer(compiled[name], MODEL_COLS) for name in names}
+    records = SyntheticCreditData(df).sample(n_records, seed=seed)[MODEL_COLS].to_dict("records")
+
+    def via_dataframe(record):
+        X = pd.DataFrame([record])
+        return [compiled[name].predict_proba(X)[0, 1] for name in names]
+
+    def via_array(record):
+        X = feature_array(record, MODEL_COLS)
+        return [scorers[name].predict_proba(X)[0, 1] for name in names]
+
+    diff = max(float(np.max(np.abs(np.subtract(via_dataframe(r), via_array(r))))) for r in records)
+    results = []
+    for path, fn in (("dataframe", via_dataframe), ("array", via_array)):
+        timing = time_call(lambda: fn(records[0]), repeat=repeat)
+        results.append({"path": path, **timing})
+        print(f"⏱️ {path:<10} median={timing['median'] * 1e6:9.1f} µs  p95={timing['p95'] * 1e6:9.1f} µs")
+    speedup = results[0]["median"] / results[1]["median"]
+    print(f"🚀 Nhanh hơn {speedup:.1f}x, lệch PD lớn nhất trên {n_records} hồ sơ: {diff:.1e}")
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git": git_metadata(),
+        "environment": environment_metadata(),
+        "config": {"dataset": dataset, "n_records": n_records, "repeat": repeat, "seed": seed},
+        "results": results,
+        "speedup": speedup,
+        "max_abs_diff": diff,
+    }
+
+
+def _write_results(args: argparse.Namespace, payload: Dict[str, Any], default: Optional[str] = None):
+    """Ghi kết quả JSON của 1 lệnh ra --output (hoặc file mặc định của lệnh đó); không có đường dẫn thì bỏ qua"""
+    output = args.output or default
+    if not output:
+        return
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    print(f"✅ Đã ghi kết quả: {output}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark huấn luyện/chấm điểm mô hình PD")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="Chạy benchmark và ghi kết quả JSON")
+    p_run.add_argument("--dataset", default="DATASET.csv")
+    p_run.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    p_run.add_argument("--max-train-rows", type=int, default=20_000)
+    p_run.add_argument("--repeat", type=int, default=5)
+    p_run.add_argument("--seed", type=int, default=42)
+    p_run.add_argument("--output", default=None, help=f"File JSON (mặc định {RESULTS_DIR}/<commit>.json)")
+
+    p_cmp = sub.add_parser("compare", help="So sánh 2 file kết quả, trả mã lỗi 1 nếu có regression")
+    p_cmp.add_argument("baseline")
+    p_cmp.add_argument("candidate")
+    p_cmp.add_argument("--threshold", type=float, default=0.2)
+    p_cmp.add_argument("--output", default=None, help="Ghi kết quả so sánh JSON")
+
+    p_start = sub.add_parser("startup", help="Đo thời gian import lúc khởi động ED.py (python -X importtime)")
+    p_start.add_argument("--script", default="ED.py")
+    p_start.add_argument("--ref", default=None, help="Commit git để so sánh (ví dụ HEAD~1)")
+    p_start.add_argument("--repeat", type=int, default=5)
+    p_start.add_argument("--top", type=int, default=15, help="Số module chậm nhất được in ra")
+    p_start.add_argument("--output", default=None, help="Ghi kết quả JSON")
+
+    p_trees = sub.add_parser("trees", help="So sánh predict_proba của mô hình gốc và bản biên dịch (tree_engine)")
+    p_trees.add_argument("--dataset", default="DATASET.csv")
+    p_trees.add_argument("--sizes", type=int, nargs="+", default=[1, 10_000])
+    p_trees.add_argument("--repeat", type=int, default=5)
+    p_trees.add_argument("--seed", type=int, default=42)
+    p_trees.add_argument("--tolerance", type=float, default=1e-6, help="Lệch PD tối đa cho phép")
+    p_trees.add_argument("--output", default=None, help="Ghi kết quả JSON")
+
+    p_arrays = sub.add_parser("arrays", help="Chấm 1 hồ sơ qua DataFrame so với mảng float32 (ArrayScorer)")
+    p_arrays.add_argument("--dataset", default="DATASET.csv")
+    p_arrays.add_argument("--records", type=int, default=200, help="Số hồ sơ tổng hợp để đo lệch PD")
+    p_arrays.add_argument("--repeat", type=int, default=2000)
+    p_arrays.add_argument("--seed", type=int, default=42)
+    p_arrays.add_argument("--output", default=None, help="Ghi kết quả JSON")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "arrays":
+        result = compare_array_scoring(args.dataset, args.records, args.repeat, args.seed)
+        _write_results(args, result)
+        return 0
+
+    if args.command == "trees":
+        result = compare_compiled(args.dataset, args.sizes, args.repeat, args.seed)
+        _write_results(args, result)
+        mismatched = [row for row in result["results"]
+                      if row["max_abs_diff"] is not None and row["max_abs_diff"] > args.tolerance]
+        for row in mismatched:
+            print(f"❌ {row['model']} n={row['n_rows']:,}: lệch {row['max_abs_diff']:.2e} > {args.tolerance:.0e}")
+        return 1 if mismatched else 0
+
+    if args.command == "startup":
+        result = {"git": git_metadata(), "current": measure_startup(".", args.script, args.repeat)}
+        if args.ref:
+            result["ref"] = args.ref
+            result["baseline"] = measure_startup_at(args.ref, args.script, args.repeat)
+        current = result["current"]["modules_ms"]
+        baseline = result.get("baseline", {}).get("modules_ms", {})
+        names = sorted(set(current) | set(baseline), key=lambda n: -max(current.get(n, 0), baseline.get(n, 0)))
+        for name in names[:args.top]:
+            line = f"{name:<24} {current.get(name, 0):10.1f} ms"
+            if args.ref:
+                line = f"{name:<24} {baseline.get(name, 0):10.1f} ms -> {current.get(name, 0):10.1f} ms"
+            print(line)
+        total = result["current"]["total_ms"]
+        if args.ref:
+            base_total = result["baseline"]["total_ms"]
+            print(f"{'TỔNG':<24} {base_total:10.1f} ms -> {total:10.1f} ms "
+                  f"(tiết kiệm {base_total - total:.1f} ms, {1 - total / base_total:.0%})")
+        else:
+            print(f"{'TỔNG':<24} {total:10.1f} ms")
+        _write_results(args, result)
+        return 0
+
+    if args.command == "run":
+        result = run(args.dataset, args.sizes, args.max_train_rows, args.repeat, args.seed)
+        default = os.path.join(RESULTS_DIR, f"{(result['git']['commit'] or 'local')[:12]}.json")
+        _write_results(args, result, default=default)
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.candidate, encoding="utf-8") as f:
+        candidate = json.load(f)
+    rows = compare(baseline, candidate, args.threshold)
+    for row in rows:
+        flag = "❌" if row["regression"] else "✅"
+        print(f"{flag} {row['name']:<14} n={row['n_rows']:>9,} / {row['dataset_rows']:>9,} "
+              f"{row['baseline'] * 1000:10.2f} ms -> {row['candidate'] * 1000:10.2f} ms ({row['ratio']:.2f}x)")
+    _write_results(args, {"baseline": args.baseline, "candidate": args.candidate, "threshold": args.threshold,
+                          "rows": rows})
+    return 1 if any(row["regression"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Hiệu chỉnh (calibration) PD của mô hình Stacking thành xác suất vỡ nợ thực tế.
+
+predict_proba của Stacking chỉ đúng thứ tự rủi ro, không đúng mức: meta-model học trên điểm của 3 base models
+(class_weight="balanced" đẩy PD lên cao) nên PD 20% chưa chắc tương ứng tỷ lệ vỡ nợ 20%, trong khi classify_pd
+và ngưỡng Default dùng các mốc PD cố định. Ở đây:
+
+- Điểm out-of-fold (OOF) trên tập train được lấy từ các lần cross-validation 5-fold (không chấm lại chính dữ liệu
+  mà mô hình đã học), rồi fit hồi quy isotonic (hoặc Platt) điểm -> tỷ lệ vỡ nợ
+- Kết quả được nén thành bảng tra đơn điệu vài chục điểm nút {"x": điểm, "y": PD}, lưu cùng mô hình
+- Khi chấm điểm chỉ cần np.interp trên bảng (gần như không tốn thời gian, không cần sklearn)
+
+Backend (credit-risk-app/backend/calibration.py) dùng bản sao giống hệt file này: sửa ở đâu thì chép nguyên file
+sang bản còn lại.
+"""
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.isotonic import IsotonicRegression
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import StratifiedKFold, cross_val_predict
+
+CALIBRATION_METHODS = ("auto", "isotonic", "platt")
+# 'auto': isotonic cần đủ nhiều vụ vỡ nợ mới ổn định, ít hơn thì dùng Platt (2 tham số, đường cong trơn)
+MIN_DEFAULTS_ISOTONIC = 200
+# Sàn PD 0,03% (Basel): tránh PD = 0 ở nhóm điểm thấp nhất khi số vụ vỡ nợ quan sát được quá ít
+PD_FLOOR = 0.0003
+PLATT_KNOTS = 64
+
+
+def oof_stacking_scores(model, X: pd.DataFrame, y: pd.Series, cv: int = 5, random_state: int = 42) -> np.ndarray:
+    """
+    Điểm Stacking out-of-fold trên tập train của 1 StackingClassifier đã fit.
+
+    Mỗi base model được cross_val_predict 1 lần (giống bước sinh đặc trưng bên trong StackingClassifier) rồi
+    đưa qua meta-model đã fit, thay vì fit lại toàn bộ Stacking cho từng fold (đỡ 5 lần CV lồng nhau).
+    """
+    folds = StratifiedKFold(n_splits=cv, shuffle=True, random_state=random_state)
+    columns = []
+    for (_, estimator), method in zip(model.estimators, model.stack_method_):
+        preds = cross_val_predict(clone(estimator), X, y, cv=folds, method=method, n_jobs=model.n_jobs)
+        # Bài toán 2 lớp: StackingClassifier chỉ giữ cột xác suất của lớp 1
+        columns.append(preds[:, 1] if preds.ndim == 2 else preds)
+    meta_features = np.column_stack(columns)
+    if model.passthrough:
+        meta_features = np.hstack([meta_features, np.asarray(X, dtype=float)])
+    return model.final_estimator_.predict_proba(meta_features)[:, 1]
+
+
+def _isotonic_table(scores: np.ndarray, y: np.ndarray) -> Dict[str, np.ndarray]:
+    """Mỗi khối của isotonic (các điểm cùng PD) thành 1 điểm nút tại điểm số trung bình của khối."""
+    fitted = IsotonicRegression(out_of_bounds="clip", y_min=0.0, y_max=1.0).fit_transform(scores, y)
+    # fitted không giảm theo scores nên các khối là các đoạn liên tiếp sau khi sắp xếp
+    order = np.argsort(scores, kind="stable")
+    s, f = scores[order], fitted[order]
+    starts = np.flatnonzero(np.r_[True, np.diff(f) > 0])
+    counts = np.diff(np.r_[starts, len(s)])
+    x = np.add.reduceat(s, starts) / counts
+    return {"x": x, "y": f[starts]}
+
+
+def _platt_table(scores: np.ndarray, y: np.ndarray, knots: int = PLATT_KNOTS) -> Dict[str, np.ndarray]:
+    """Platt trên logit của điểm, lấy mẫu tại các phân vị của điểm OOF (thêm 2 đầu mút 0 và 1)."""
+    def logit(p):
+        p = np.clip(p, 1e-6, 1 - 1e-6)
+        return np.log(p / (1 - p))[:, None]
+
+    platt = LogisticRegression(C=1e6, max_iter=1000).fit(logit(scores), y)
+    x = np.unique(np.r_[0.0, np.quantile(scores, np.linspace(0.0, 1.0, knots)), 1.0])
+    return {"x": x, "y": platt.predict_proba(logit(x))[:, 1]}
+
+
+def fit_calibration(scores, y, method: str = "auto") -> Dict[str, Any]:
+    """
+    Fit bảng tra hiệu chỉnh từ điểm OOF và nhãn thật.
+
+    Args:
+        scores: Điểm Stacking out-of-fold (xem oof_stacking_scores)
+        y: Nhãn default 0/1
+        method: 'auto' (mặc định), 'isotonic' hoặc 'platt'
+
+    Returns:
+        dict {"method", "x", "y", "n_samples"}: x tăng dần, y không giảm (float64, vài chục phần tử)
+    """
+    if method not in CALIBRATION_METHODS:
+        raise ValueError(f"Phương pháp hiệu chỉnh không hợp lệ: {method}. Chỉ hỗ trợ: {list(CALIBRATION_METHODS)}")
+    scores = np.asarray(scores, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if method == "auto":
+        method = "isotonic" if y.sum() >= MIN_DEFAULTS_ISOTONIC else "platt"
+    table = _isotonic_table(scores, y) if method == "isotonic" else _platt_table(scores, y)
+    return {
+        "method": method,
+        "x": np.ascontiguousarray(table["x"], dtype=np.float64),
+        "y": np.clip(table["y"], PD_FLOOR, 1.0 - PD_FLOOR),
+        "n_samples": len(scores),
+    }
+
+
+def calibrate_model(model, X: pd.DataFrame, y: pd.Series, method: str = "auto") -> Dict[str, Any]:
+    """Tính điểm OOF của Stacking đã fit trên (X, y) rồi fit bảng tra hiệu chỉnh."""
+    return fit_calibration(oof_stacking_scores(model, X, y), y, method)
+
+
+def apply_calibration(scores, calibration: Optional[Dict[str, Any]]) -> np.ndarray:
+    """
+    PD đã hiệu chỉnh = nội suy tuyến tính trên bảng tra (ngoài khoảng thì lấy giá trị ở đầu mút).
+
+    calibration=None (mô hình cũ chưa có bảng tra): giữ nguyên điểm thô.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    if calibration is None:
+        return scores
+    return np.interp(scores, calibration["x"], calibration["y"])
@@ -0,0 +1,234 @@
+"""
+Vẽ biểu đồ cột và radar của 14 chỉ số tài chính thành ảnh PNG, có cache theo hồ sơ.
+
+Mỗi biểu đồ chỉ được vẽ 1 lần cho mỗi bộ (chỉ số của doanh nghiệp, PD): cùng một ảnh PNG được
+dùng để hiển thị (st.image) và nhúng vào báo cáo Word. Biểu đồ vẽ bằng matplotlib.figure.Figure
+(không qua pyplot) nên không giữ figure nào trong bộ nhớ sau khi đã xuất PNG, và cache LRU
+giới hạn số ảnh được giữ lại. matplotlib chỉ được import khi vẽ biểu đồ đầu tiên.
+
+Radar vẽ phân vị của từng chỉ số so với tập train (cột PERCENTILE_COL, xem percentiles.py) khi có; nếu không
+(ví dụ báo cáo hàng loạt không kèm dữ liệu train) thì quay về chuẩn hóa min-max trên chính hồ sơ.
+
+Biểu đồ độ nhạy (tornado, đường PD theo từng chỉ số) phụ thuộc thêm mô hình và ngưỡng Default nên nơi gọi tự dựng
+khóa (fingerprint hồ sơ + mã dữ liệu huấn luyện + ngưỡng) và lấy ảnh qua CHART_CACHE.get_or_compute.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import Any, Callable, Dict, Hashable, Mapping, Sequence
+
+import numpy as np
+import pandas as pd
+
+CHART_DPI = 150
+# Cột phân vị (0-100) so với tập train trong ratios_display (tùy chọn)
+PERCENTILE_COL = 'Phân vị (%)'
+
+
+def _to_png(fig) -> bytes:
+    buffer = BytesIO()
+    fig.savefig(buffer, format='png', dpi=CHART_DPI, bbox_inches='tight')
+    return buffer.getvalue()
+
+
+def render_bar_chart(ratios_display: pd.DataFrame) -> bytes:
+    """Biểu đồ cột ngang giá trị các chỉ số (ratios_display: index = tên chỉ số, cột 'Giá trị')."""
+    from matplotlib import colormaps
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(8, 10))
+    fig.patch.set_facecolor('#fff5f7')
+    ax_bar = fig.add_subplot(111)
+    ax_bar.set_facecolor('#ffffff')
+
+    indicators = ratios_display.index.tolist()
+    values = ratios_display['Giá trị'].values
+
+    # Tạo màu gradient cho các bars
+    bar_colors = colormaps['RdPu'](np.linspace(0.3, 0.9, len(indicators)))
+    bars = ax_bar.barh(indicators, values, color=bar_colors, edgecolor='white', linewidth=1.5)
+
+    # Thêm giá trị vào cuối mỗi bar
+    for bar, val in zip(bars, values):
+        ax_bar.text(bar.get_width(), bar.get_y() + bar.get_height()/2,
+                    f' {val:.3f}', ha='left', va='center',
+                    fontsize=9, fontweight='600', color='#c2185b')
+
+    # Styling
+    ax_bar.set_xlabel('Giá trị', fontsize=12, fontweight='600', color='#4a5568')
+    ax_bar.set_title('Các Chỉ số Tài chính', fontsize=14, fontweight='bold', color='#c2185b', pad=15)
+    ax_bar.grid(True, alpha=0.2, linestyle='--', linewidth=0.8, color='#ff6b9d', axis='x')
+    ax_bar.spines['top'].set_visible(False)
+    ax_bar.spines['right'].set_visible(False)
+    ax_bar.spines['left'].set_color('#d0d0d0')
+    ax_bar.spines['bottom'].set_color('#d0d0d0')
+
+    fig.tight_layout()
+    return _to_png(fig)
+
+
+def render_radar_chart(ratios_display: pd.DataFrame) -> bytes:
+    """Biểu đồ radar các chỉ số: phân vị so với tập train (cột PERCENTILE_COL), hoặc min-max 0-1 nếu không có."""
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(10, 10))
+    fig.patch.set_facecolor('#fff5f7')
+    ax_radar = fig.add_subplot(111, projection='polar')
+
+    indicators = ratios_display.index.tolist()
+    if PERCENTILE_COL in ratios_display.columns:
+        # Phân vị có mốc chung (phân phối tập train) nên hình dạng so sánh được giữa các hồ sơ; thiếu = trung vị
+        normalized_values = np.nan_to_num(ratios_display[PERCENTILE_COL].values.astype(float) / 100.0, nan=0.5)
+        subtitle = 'Phân vị so với dữ liệu huấn luyện'
+    else:
+        values = ratios_display['Giá trị'].values.astype(float)
+        # Normalize các giá trị về khoảng 0-1 để dễ visualize (tương đương MinMaxScaler)
+        span = np.nanmax(values) - np.nanmin(values)
+        normalized_values = (values - np.nanmin(values)) / span if span > 0 else np.zeros_like(values)
+        subtitle = 'Normalized 0-1'
+
+    # Tạo các góc cho mỗi chỉ số, đóng vòng tròn
+    angles = np.linspace(0, 2 * np.pi, len(indicators), endpoint=False).tolist()
+    normalized_values = normalized_values.tolist()
+    angles += angles[:1]
+    normalized_values += normalized_values[:1]
+
+    ax_radar.plot(angles, normalized_values, 'o-', linewidth=2.5, color='#ff6b9d', label='Chỉ số')
+    ax_radar.fill(angles, normalized_values, alpha=0.25, color='#ffb3c6')
+
+    # Rút ngắn tên chỉ số để dễ đọc
+    ax_radar.set_xticks(angles[:-1])
+    short_labels = [label.split('(')[0].strip()[:20] for label in indicators]
+    ax_radar.set_xticklabels(short_labels, size=8, color='#4a5568', fontweight='600')
+
+    # Styling
+    ax_radar.set_ylim(0, 1)
+    if PERCENTILE_COL in ratios_display.columns:
+        ax_radar.set_yticks([0.25, 0.5, 0.75])
+        ax_radar.set_yticklabels(['P25', 'P50', 'P75'], size=7, color='#8a8a8a')
+    ax_radar.set_title(f'Phân tích Đa chiều các Chỉ số\n({subtitle})',
+                       fontsize=14, fontweight='bold', color='#c2185b', pad=20)
+    ax_radar.grid(True, alpha=0.3, linestyle='--', linewidth=0.8, color='#ff6b9d')
+    ax_radar.set_facecolor('#ffffff')
+
+    fig.tight_layout()
+    return _to_png(fig)
+
+
+def render_tornado_chart(sensitivity: Dict[str, Any], threshold: float, labels: Mapping[str, str],
+                         n_top: int = 8) -> bytes:
+    """Tornado: PD khi từng chỉ số chạy từ P10 đến P90 (sensitivity = SensitivityEngine.company)."""
+    from matplotlib.figure import Figure
+
+    tornado = sensitivity["tornado"]
+    base_pd = sensitivity["base_pd"]
+    top_cols = tornado.index[:n_top].tolist()
+
+    fig = Figure(figsize=(10, 5))
+    fig.patch.set_facecolor('#f8f9fa')
+    ax = fig.add_subplot(111)
+    ax.set_facecolor('#ffffff')
+    # Chỉ số tác động mạnh nhất ở trên cùng
+    positions = np.arange(len(top_cols))[::-1]
+    ax.barh(positions, tornado.loc[top_cols, "pd_low"] - base_pd, left=base_pd, height=0.6,
+            color='#4a90e2', label='Chỉ số ở mức P10')
+    ax.barh(positions, tornado.loc[top_cols, "pd_high"] - base_pd, left=base_pd, height=0.6,
+            color='#ff6b9d', alpha=0.85, label='Chỉ số ở mức P90')
+    ax.axvline(base_pd, color='#4a5568', linewidth=1.5, label=f'PD hiện tại ({base_pd:.2%})')
+    ax.axvline(threshold, color='#c2185b', linewidth=1.5, linestyle='--', label=f'Ngưỡng Default ({threshold:.2%})')
+    ax.set_yticks(positions)
+    ax.set_yticklabels([labels[col] for col in top_cols], fontsize=9)
+    ax.xaxis.set_major_formatter(lambda v, _: f"{v:.1%}")
+    ax.set_xlabel('PD (đã hiệu chỉnh)', fontsize=11, fontweight='600', color='#4a5568')
+    ax.set_title('Tornado: PD khi từng chỉ số chạy từ P10 đến P90 của dữ liệu huấn luyện',
+                 fontsize=12, fontweight='bold', color='#c2185b')
+    ax.grid(True, alpha=0.2, linestyle='--', color='#ff6b9d', axis='x')
+    ax.spines['top'].set_visible(False)
+    ax.spines['right'].set_visible(False)
+    ax.legend(fontsize=8, loc='lower right')
+    return _to_png(fig)
+
+
+def render_pd_curves_chart(sensitivity: Dict[str, Any], pdp: pd.DataFrame, threshold: float,
+                           labels: Mapping[str, str], cols: Sequence[str]) -> bytes:
+    """Lưới 2x3 đường PD của doanh nghiệp và partial dependence của danh mục theo từng chỉ số trong cols."""
+    from matplotlib.figure import Figure
+
+    tornado = sensitivity["tornado"]
+    fig = Figure(figsize=(12, 6.5))
+    fig.patch.set_facecolor('#f8f9fa')
+    axes = fig.subplots(2, 3).ravel()
+    for ax, col in zip(axes, cols):
+        grid_values = sensitivity["grid"][col]
+        ax.set_facecolor('#ffffff')
+        ax.plot(grid_values, sensitivity["curves"][col], color='#c2185b', linewidth=2.5, label='Doanh nghiệp này')
+        ax.plot(grid_values, pdp[col], color='#4a90e2', linewidth=1.8, linestyle='--', label='Trung bình danh mục')
+        ax.axvline(tornado.loc[col, "value"], color='#4a5568', linewidth=1, linestyle=':')
+        ax.axhline(threshold, color='#ff6b9d', linewidth=1, alpha=0.7)
+        ax.set_title(labels[col], fontsize=10, fontweight='bold', color='#c2185b')
+        ax.yaxis.set_major_formatter(lambda v, _: f"{v:.0%}")
+        ax.grid(True, alpha=0.2, linestyle='--', color='#ff6b9d')
+        ax.tick_params(labelsize=8)
+    for ax in axes[len(cols):]:
+        ax.set_visible(False)
+    axes[0].legend(fontsize=8)
+    fig.tight_layout()
+    return _to_png(fig)
+
+
+RENDERERS: Dict[str, Callable[[pd.DataFrame], bytes]] = {
+    "bar": render_bar_chart,
+    "radar": render_radar_chart,
+}
+
+
+def fingerprint(ratios_display: pd.DataFrame, pd_value: float) -> str:
+    """Khóa cache của 1 hồ sơ: tên + giá trị 14 chỉ số (kèm phân vị nếu có) và PD."""
+    h = hashlib.sha1()
+    h.update("\x1f".join(map(str, ratios_display.index)).encode("utf-8"))
+    h.update(np.ascontiguousarray(ratios_display['Giá trị'].to_numpy(dtype=np.float64)).tobytes())
+    if PERCENTILE_COL in ratios_display.columns:
+        h.update(np.ascontiguousarray(ratios_display[PERCENTILE_COL].to_numpy(dtype=np.float64)).tobytes())
+    h.update(np.float64(pd_value).tobytes())
+    return h.hexdigest()
+
+
+class LRUCache:
+    """Cache LRU an toàn giữa các thread: get_or_compute chỉ tính khi khóa chưa có (tính ngoài khóa lock)"""
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+
+        value = compute()
+        with self._lock:
+            self.misses += 1
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+        return value
+
+
+class ChartCache(LRUCache):
+    """Cache LRU ảnh PNG theo (loại biểu đồ, fingerprint hồ sơ, ...), dùng chung giữa các phiên"""
+
+    def get(self, kind: str, ratios_display: pd.DataFrame, pd_value: float = np.nan) -> bytes:
+        """Trả về ảnh PNG của biểu đồ kind ('bar' hoặc 'radar'), chỉ vẽ khi chưa có trong cache."""
+        return self.get_or_compute((kind, fingerprint(ratios_display, pd_value)),
+                                   lambda: RENDERERS[kind](ratios_display))
+
+
+# Cache dùng chung cho cả process Streamlit
+CHART_CACHE = ChartCache()
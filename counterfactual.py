@@ -0,0 +1,198 @@
+"""
+Kế hoạch cải thiện chỉ số (counterfactual): thay đổi nhỏ nhất của X_1..X_14 để PD Stacking xuống dưới mục tiêu.
+
+Gemini được yêu cầu nêu "chỉ số nào cần cải thiện" nhưng trước đây không có gì tính ra con số. Ở đây:
+- Mỗi chỉ số chỉ được đi theo chiều làm giảm rủi ro (chiều đơn điệu học từ tập train trong PercentileIndex,
+  chỉ số không rõ chiều thì giữ nguyên) và nằm trong khoảng phân vị PCT_BOUNDS của tập train
+- Thay đổi được đo trên thang phân vị (cùng đơn vị cho cả 14 chỉ số có đơn vị khác nhau): chi phí = tổng số điểm
+  phân vị phải dịch chuyển; giá trị mục tiêu lấy từ phân phối thực tế của tập train (PercentileIndex.value_at)
+- Mỗi vòng sinh 1 lô lớn ứng viên (dịch 1 chỉ số theo các bước cố định + ứng viên thưa ngẫu nhiên dịch 2-3 chỉ số
+  cùng lúc) và chấm cả lô bằng predict_proba theo khối; có ứng viên đạt mục tiêu thì lấy ứng viên rẻ nhất,
+  chưa có thì đi tham lam theo ứng viên giảm PD nhiều nhất trên mỗi điểm phân vị rồi sinh lô mới
+- Cuối cùng thu gọn: thử đưa từng chỉ số đã đổi lùi về gần giá trị gốc (cũng theo lô), giữ khi PD vẫn đạt mục tiêu
+"""
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from attribution import RATIO_LABELS
+from calibration import apply_calibration
+from percentiles import PercentileIndex
+from stacking_model import MODEL_COLS
+
+DEFAULT_TARGET_PD = 0.05
+PCT_BOUNDS = (1.0, 99.0)
+SINGLE_STEPS = (2.5, 5.0, 10.0, 15.0, 20.0, 30.0, 40.0, 60.0)
+N_RANDOM = 2048
+MAX_RANDOM_SHIFT = 50.0
+MAX_ROUNDS = 15
+SHRINK_FRACTIONS = (0.0, 0.25, 0.5, 0.75)
+MAX_SHRINK_ROUNDS = 8
+_CHUNK_ROWS = 50_000
+
+
+class CounterfactualPlanner:
+    """Tìm thay đổi nhỏ nhất (theo phân vị) của 14 chỉ số để PD đã hiệu chỉnh xuống dưới mục tiêu."""
+
+    def __init__(self, model, percentiles: PercentileIndex, calibration: Optional[Dict[str, Any]] = None,
+                 n_random: int = N_RANDOM, seed: int = 42):
+        self.model = model
+        self.percentiles = percentiles
+        self.calibration = calibration
+        self.n_random = n_random
+        self.seed = seed
+        # Chiều giảm rủi ro của phân vị: -1 = giảm giá trị, +1 = tăng giá trị, 0 = giữ nguyên
+        self.improve = -percentiles.direction.astype(np.float64)
+
+    def _score(self, matrix: np.ndarray) -> np.ndarray:
+        out = np.empty(len(matrix))
+        for start in range(0, len(matrix), _CHUNK_ROWS):
+            chunk = pd.DataFrame(matrix[start:start + _CHUNK_ROWS], columns=MODEL_COLS)
+            out[start:start + _CHUNK_ROWS] = self.model.predict_proba(chunk)[:, 1]
+        return apply_calibration(out, self.calibration)
+
+    def _move(self, current: np.ndarray, shift: np.ndarray) -> np.ndarray:
+        """Dịch phân vị theo chiều giảm rủi ro, không vượt PCT_BOUNDS và không lùi so với vị trí hiện tại."""
+        lo, hi = PCT_BOUNDS
+        down = np.minimum(current, np.maximum(current - shift, lo))
+        up = np.maximum(current, np.minimum(current + shift, hi))
+        moved = np.where(self.improve < 0, down, np.where(self.improve > 0, up, current))
+        return np.where(np.isnan(current), current, moved)
+
+    def _candidates(self, current: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """Lô ứng viên (m, 14) trên thang phân vị quanh vị trí hiện tại."""
+        p = len(MODEL_COLS)
+        movable = np.flatnonzero((self.improve != 0) & ~np.isnan(current))
+        if len(movable) == 0:
+            return np.empty((0, p))
+
+        # Dịch 1 chỉ số theo các bước cố định
+        steps = np.asarray(SINGLE_STEPS)
+        single_shift = np.zeros((len(movable) * len(steps), p))
+        single_shift[np.arange(len(single_shift)), np.repeat(movable, len(steps))] = np.tile(steps, len(movable))
+
+        # Ứng viên thưa ngẫu nhiên: 2-3 chỉ số cùng dịch với biên độ ngẫu nhiên
+        keys = rng.random((self.n_random, len(movable)))
+        k = rng.integers(2, 4, size=self.n_random)[:, None]
+        picked = np.argsort(keys, axis=1) < np.minimum(k, len(movable))
+        random_shift = np.zeros((self.n_random, p))
+        random_shift[:, movable] = picked * rng.uniform(0.0, MAX_RANDOM_SHIFT, size=picked.shape)
+
+        candidates = self._move(current, np.vstack([single_shift, random_shift]))
+        # Bỏ ứng viên không đổi gì (chỉ số đã chạm biên)
+        return candidates[np.abs(np.nan_to_num(candidates - current)).sum(axis=1) > 0]
+
+    def plan(self, x, target_pd: float = DEFAULT_TARGET_PD) -> Dict[str, Any]:
+        """
+        Kế hoạch cải thiện cho 1 doanh nghiệp.
+
+        Args:
+            x: 14 chỉ số theo thứ tự MODEL_COLS (mảng, Series hoặc DataFrame 1 dòng)
+            target_pd: PD (đã hiệu chỉnh) cần đạt, tính theo PD < target_pd
+
+        Returns:
+            dict gồm target_pd, pd_before, pd_after, achieved, plan (DataFrame các chỉ số cần đổi: label, current,
+            target, change_pct, percentile_from, percentile_to, action), cost (tổng điểm phân vị), n_evaluated, n_calls
+        """
+        if isinstance(x, pd.DataFrame):
+            x = x[MODEL_COLS].to_numpy(dtype=np.float64)[0]
+        elif isinstance(x, pd.Series):
+            x = x[MODEL_COLS].to_numpy(dtype=np.float64)
+        x0 = np.asarray(x, dtype=np.float64)
+        p0 = self.percentiles.rank(x0)[0]
+        rng = np.random.default_rng(self.seed)
+        n_evaluated, n_calls = 1, 1
+
+        def to_values(pct: np.ndarray) -> np.ndarray:
+            # Chỉ số không đổi giữ nguyên giá trị gốc (không qua nội suy)
+            pct = np.atleast_2d(pct)
+            return np.where(pct != p0, self.percentiles.value_at(pct), x0)
+
+        def cost(pct: np.ndarray) -> np.ndarray:
+            return np.abs(np.nan_to_num(np.atleast_2d(pct) - p0)).sum(axis=1)
+
+        pd_before = float(self._score(x0[None, :])[0])
+        best, pd_best = p0.copy(), pd_before
+        if pd_before >= target_pd:
+            current, pd_current = p0.copy(), pd_before
+            for _ in range(MAX_ROUNDS):
+                candidates = self._candidates(current, rng)
+                if len(candidates) == 0:
+                    break
+                pds = self._score(to_values(candidates))
+                n_evaluated += len(candidates)
+                n_calls += 1
+                feasible = pds < target_pd
+                if feasible.any():
+                    # Rẻ nhất theo tổng dịch chuyển phân vị, hòa thì PD thấp hơn
+                    idx = np.flatnonzero(feasible)
+                    pick = idx[np.lexsort((pds[idx], cost(candidates[idx])))[0]]
+                    best, pd_best = candidates[pick], float(pds[pick])
+                    break
+                gain = (pd_current - pds) / np.maximum(cost(candidates) - cost(current)[0], 1e-9)
+                pick = int(np.argmax(gain))
+                if pds[pick] >= pd_current:
+                    break
+                current, pd_current = candidates[pick], float(pds[pick])
+                best, pd_best = current, pd_current
+
+            if pd_best < target_pd:
+                # Thu gọn: đưa từng chỉ số đã đổi lùi về gần giá trị gốc khi PD vẫn đạt mục tiêu
+                for _ in range(MAX_SHRINK_ROUNDS):
+                    changed = np.flatnonzero(np.nan_to_num(best - p0) != 0)
+                    if len(changed) == 0:
+                        break
+                    fractions = np.asarray(SHRINK_FRACTIONS)
+                    shrunk = np.repeat(best[None, :], len(changed) * len(fractions), axis=0)
+                    cols = np.repeat(changed, len(fractions))
+                    shrunk[np.arange(len(shrunk)), cols] = p0[cols] + np.tile(fractions, len(changed)) * (best[cols] - p0[cols])
+                    pds = self._score(to_values(shrunk))
+                    n_evaluated += len(shrunk)
+                    n_calls += 1
+                    ok = np.flatnonzero(pds < target_pd)
+                    if len(ok) == 0:
+                        break
+                    pick = ok[np.argmin(cost(shrunk[ok]))]
+                    if cost(shrunk[pick])[0] >= cost(best)[0]:
+                        break
+                    best, pd_best = shrunk[pick], float(pds[pick])
+
+        values = to_values(best)[0]
+        changed = np.flatnonzero(np.nan_to_num(best - p0) != 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change_pct = np.where(x0 != 0, (values - x0) / np.abs(x0) * 100.0, np.nan)
+        plan = pd.DataFrame({
+            "label": [RATIO_LABELS[MODEL_COLS[j]] for j in changed],
+            "current": x0[changed],
+            "target": values[changed],
+            "change_pct": change_pct[changed],
+            "percentile_from": p0[changed],
+            "percentile_to": best[changed],
+            "action": np.where(values[changed] > x0[changed], "Tăng", "Giảm"),
+        }, index=[MODEL_COLS[j] for j in changed])
+        plan = plan.iloc[np.argsort(-np.abs(best[changed] - p0[changed]), kind="stable")]
+        return {
+            "target_pd": target_pd,
+            "pd_before": pd_before,
+            "pd_after": pd_best,
+            "achieved": pd_best < target_pd,
+            "plan": plan,
+            "cost": float(cost(best)[0]),
+            "n_evaluated": n_evaluated,
+            "n_calls": n_calls,
+        }
+
+
+def plan_summary(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Kế hoạch dạng list dict (tên tiếng Việt) cho payload AI và báo cáo Word."""
+    return [
+        {
+            "chỉ_số": row.label,
+            "hành_động": row.action,
+            "hiện_tại": round(float(row.current), 4),
+            "mục_tiêu": round(float(row.target), 4),
+            "phân_vị": f"P{row.percentile_from:.0f} → P{row.percentile_to:.0f}",
+        }
+        for row in result["plan"].itertuples()
+    ]
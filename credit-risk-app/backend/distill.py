@@ -0,0 +1,150 @@
+"""
+Distill Module - Mô hình học trò (student) bắt chước Stacking cho endpoint /predict-fast
+
+Stacking (thầy) chấm PD cho các mẫu tăng cường quanh dữ liệu train, học trò là 1 XGBoost nông học lại PD đó:
+- Tăng cường: chọn ngẫu nhiên 1 dòng train, dịch từng chỉ số trên thang phân vị (nhiễu Gauss AUGMENT_JITTER) rồi
+  đổi ngược về giá trị theo phân phối thực tế của cột, nên mẫu nằm trong miền dữ liệu kể cả với tỷ số đuôi dài
+- Học trò: STUDENT_PARAMS (100 cây sâu 3) fit với nhãn mềm = PD thô của thầy (mỗi mẫu nhân đôi thành nhãn 0/1
+  với trọng số 1 - PD / PD, tương đương log-loss trên nhãn mềm)
+- Chấm: cây được biên dịch bằng tree_engine; 1 hồ sơ đi trên list node thuần Python (vài chục micro giây, không qua
+  pandas/sklearn/XGBoost), lô nhiều dòng dùng CompiledForest
+- Độ trung thành (fidelity) đo trên tập test thật và 1 lô tăng cường độc lập: tương quan Pearson/Spearman của PD,
+  tỷ lệ trùng hạng (mốc 2/5/10/20%) và trùng quyết định Default theo ngưỡng của mô hình
+"""
+
+import math
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy.stats import spearmanr
+
+from calibration import apply_calibration
+from tree_engine import CompiledForest
+
+AUGMENT_FACTOR = 20
+AUGMENT_JITTER = 0.05
+STUDENT_PARAMS = {"n_estimators": 100, "max_depth": 3, "learning_rate": 0.2}
+# Mốc hạng PD (cùng mốc phân loại AAA-AA / A-BBB / BB / B / CCC-D của ứng dụng Streamlit)
+RATING_BOUNDARIES = (0.02, 0.05, 0.10, 0.20)
+
+
+def augment(X: np.ndarray, n_samples: int, jitter: float = AUGMENT_JITTER, seed: int = 42) -> np.ndarray:
+    """
+    Sinh n_samples dòng quanh dữ liệu train
+
+    Args:
+        X: (n, p) dữ liệu train (NaN giữ nguyên NaN ở dòng sinh ra)
+        jitter: Độ lệch chuẩn của nhiễu trên thang phân vị 0-1
+
+    Returns:
+        Mảng (n_samples, p)
+    """
+    rng = np.random.default_rng(seed)
+    rows = rng.integers(0, len(X), size=n_samples)
+    out = np.full((n_samples, X.shape[1]), np.nan)
+    for j in range(X.shape[1]):
+        ref = np.sort(X[~np.isnan(X[:, j]), j])
+        if len(ref) == 0:
+            continue
+        col = X[rows, j]
+        # Phân vị midrank (0-1) của giá trị gốc, dịch ngẫu nhiên rồi nội suy ngược về giá trị
+        rank = (np.searchsorted(ref, col, side="left") + np.searchsorted(ref, col, side="right")) / (2.0 * len(ref))
+        u = np.clip(rank + rng.normal(0.0, jitter, size=n_samples), 0.0, 1.0)
+        out[:, j] = np.interp(u * len(ref) - 0.5, np.arange(len(ref)), ref)
+        out[np.isnan(col), j] = np.nan
+    return out
+
+
+def rating_index(pd_values) -> np.ndarray:
+    """Chỉ số hạng PD (0 = tốt nhất) theo RATING_BOUNDARIES"""
+    return np.searchsorted(np.asarray(RATING_BOUNDARIES), np.asarray(pd_values, dtype=np.float64), side="right")
+
+
+class StudentModel:
+    """XGBoost nông đã biên dịch: predict_proba cho lô, score_one cho 1 hồ sơ"""
+
+    def __init__(self, forest: CompiledForest):
+        self.forest = forest
+        self.feature_cols = forest.feature_names
+        self.fidelity: Dict[str, Any] = {}
+        # List node thuần Python cho score_one (truy cập phần tử list nhanh hơn NumPy với 1 hồ sơ)
+        self._feature = forest.feature.tolist()
+        self._threshold = forest.threshold.astype(np.float64).tolist()
+        self._left = forest.left.tolist()
+        self._right = forest.right.tolist()
+        self._missing_left = forest.missing_left.tolist()
+        self._value = forest.value.tolist()
+        self._roots = forest.roots.tolist()
+        # Lá của CompiledForest trỏ về chính nó
+        self._is_leaf = [left == i for i, left in enumerate(self._left)]
+
+    @classmethod
+    def fit(cls, X: np.ndarray, teacher_pd: np.ndarray, feature_cols: List[str],
+            params: Dict[str, Any] = None) -> "StudentModel":
+        """Fit XGBoost trên nhãn mềm teacher_pd rồi biên dịch"""
+        from xgboost import XGBClassifier
+
+        n = len(X)
+        model = XGBClassifier(**(params or STUDENT_PARAMS))
+        model.fit(np.vstack([X, X]), np.concatenate([np.zeros(n), np.ones(n)]),
+                  sample_weight=np.concatenate([1.0 - teacher_pd, teacher_pd]))
+        return cls(CompiledForest.from_xgboost(model, feature_cols))
+
+    def predict_proba(self, X) -> np.ndarray:
+        return self.forest.predict_proba(X)
+
+    def score_one(self, values: Sequence[float]) -> float:
+        """PD thô (chưa hiệu chỉnh) của 1 hồ sơ, values theo thứ tự feature_cols"""
+        # Ngưỡng là float32 (so sánh x <= t như tree_engine) nên giá trị đầu vào cũng quy về float32
+        x = np.asarray(values, dtype=np.float32).tolist()
+        feature, threshold, left, right = self._feature, self._threshold, self._left, self._right
+        missing_left, is_leaf = self._missing_left, self._is_leaf
+        z = self.forest.base_score
+        for node in self._roots:
+            while not is_leaf[node]:
+                v = x[feature[node]]
+                go_left = v <= threshold[node] if v == v else missing_left[node]
+                node = left[node] if go_left else right[node]
+            z += self._value[node]
+        return 1.0 / (1.0 + math.exp(-z))
+
+
+def fidelity(teacher_pd: np.ndarray, student_pd: np.ndarray, threshold: float) -> Dict[str, float]:
+    """Độ trung thành của học trò so với thầy trên cùng các hồ sơ (PD đã hiệu chỉnh)"""
+    diff = np.abs(student_pd - teacher_pd)
+    return {
+        "n_samples": int(len(teacher_pd)),
+        "pearson": float(np.corrcoef(teacher_pd, student_pd)[0, 1]),
+        "spearman": float(spearmanr(teacher_pd, student_pd)[0]),
+        "rating_agreement": float(np.mean(rating_index(teacher_pd) == rating_index(student_pd))),
+        "decision_agreement": float(np.mean((teacher_pd >= threshold) == (student_pd >= threshold))),
+        "mean_abs_diff": float(diff.mean()),
+        "max_abs_diff": float(diff.max())
+    }
+
+
+def distill(teacher, X_train: pd.DataFrame, X_test: pd.DataFrame, calibration, threshold: float,
+            feature_cols: List[str], factor: int = AUGMENT_FACTOR, seed: int = 42) -> StudentModel:
+    """
+    Huấn luyện học trò trên PD thô của thầy và đo độ trung thành
+
+    Args:
+        teacher: Mô hình có predict_proba (Stacking, nên dùng bản biên dịch vì phải chấm hàng chục nghìn mẫu)
+        X_train, X_test: Dữ liệu train (để tăng cường) và test (đo fidelity)
+        calibration: Bảng tra hiệu chỉnh PD dùng chung với /predict
+        threshold: Ngưỡng Default của mô hình
+        factor: Số mẫu tăng cường trên mỗi dòng train
+
+    Returns:
+        StudentModel với fidelity = {"test": ..., "augmented": ...}
+    """
+    train = X_train[feature_cols].to_numpy(dtype=np.float64)
+    samples = np.vstack([train, augment(train, factor * len(train), seed=seed)])
+    student = StudentModel.fit(samples, teacher.predict_proba(samples)[:, 1], feature_cols)
+
+    holdout = augment(train, len(train) * 5, seed=seed + 1)
+    for name, X in (("test", X_test[feature_cols].to_numpy(dtype=np.float64)), ("augmented", holdout)):
+        student.fidelity[name] = fidelity(apply_calibration(teacher.predict_proba(X)[:, 1], calibration),
+                                          apply_calibration(student.predict_proba(X)[:, 1], calibration), threshold)
+    return student
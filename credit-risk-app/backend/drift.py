@@ -0,0 +1,159 @@
+"""
+Drift Module - Theo dõi hồ sơ mới có còn giống dữ liệu huấn luyện hay không (PSI / KS theo từng chỉ số)
+
+- Khi huấn luyện: lưu mốc chia bin theo phân vị (10 bin) và tần suất tham chiếu của X_1..X_14
+  trên tập train vào model_stacking.pkl (DriftReference)
+- Khi chấm điểm: mỗi hồ sơ được gán bin bằng np.searchsorted (O(14 log 10)), cộng vào bộ đếm cửa sổ trượt
+  của các lần /predict gần nhất (DriftMonitor); 1 lô bất kỳ (CSV) cũng được histogram cùng cách
+- PSI = Σ (cur - ref) * ln(cur / ref) trên các bin; KS = max |CDF_cur - CDF_ref| tại các mốc bin
+  (KS trên histogram nên là cận dưới của KS trên dữ liệu gốc, đủ để cảnh báo)
+
+Ngưỡng PSI thông dụng trong quản trị mô hình tín dụng: < 0.1 ổn định, 0.1 - 0.25 cần theo dõi, > 0.25 drift.
+"""
+
+import threading
+import numpy as np
+import pandas as pd
+from typing import Dict, Any, List
+
+N_BINS = 10
+PSI_WARNING = 0.1
+PSI_DRIFT = 0.25
+# Số lần /predict gần nhất được giữ trong cửa sổ trượt
+STREAM_WINDOW = 1000
+# Dưới số hồ sơ này thì PSI chưa có ý nghĩa thống kê (chỉ báo cáo, không gắn cờ): khi không có drift,
+# PSI kỳ vọng do nhiễu lấy mẫu ≈ (số bin - 1) * (1/n + 1/n_train), với n = 200 còn khoảng 0.07 < PSI_WARNING
+MIN_SAMPLES = 200
+# Làm trơn tần suất bằng 0 để ln(cur / ref) không vô cùng
+_EPS = 1e-4
+
+
+class DriftReference:
+    """Mốc chia bin và tần suất tham chiếu của từng chỉ số (lưu cùng mô hình, pickle được)"""
+
+    def __init__(self, features: List[str], edges: np.ndarray, ref_freq: np.ndarray, n_samples: int):
+        self.features = list(features)
+        self.edges = edges          # (p, N_BINS - 1) mốc trong, cho phép trùng nhau khi biến có ít giá trị
+        self.ref_freq = ref_freq    # (p, N_BINS + 1): N_BINS bin giá trị + 1 bin cho giá trị thiếu
+        self.n_samples = n_samples
+
+    @classmethod
+    def from_training(cls, X: pd.DataFrame, n_bins: int = N_BINS) -> "DriftReference":
+        values = X.to_numpy(dtype=np.float64)
+        qs = np.linspace(0.0, 1.0, n_bins + 1)[1:-1]
+        with np.errstate(all="ignore"):
+            edges = np.nanquantile(values, qs, axis=0).T
+        reference = cls(list(X.columns), np.ascontiguousarray(edges), np.zeros((values.shape[1], n_bins + 1)),
+                        len(values))
+        counts = reference.histogram(values)
+        reference.ref_freq = counts / max(len(values), 1)
+        return reference
+
+    @property
+    def n_bins(self) -> int:
+        return self.edges.shape[1] + 1
+
+    def bin_index(self, values: np.ndarray) -> np.ndarray:
+        """Chỉ số bin (n, p) của từng giá trị; NaN vào bin cuối cùng"""
+        values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+        bins = np.empty(values.shape, dtype=np.int16)
+        for j in range(values.shape[1]):
+            bins[:, j] = np.searchsorted(self.edges[j], values[:, j], side="right")
+        bins[np.isnan(values)] = self.n_bins
+        return bins
+
+    def histogram(self, values: np.ndarray) -> np.ndarray:
+        """Số đếm (p, n_bins + 1) của 1 lô, 1 lần bincount cho cả 14 chỉ số"""
+        bins = self.bin_index(values)
+        width = self.n_bins + 1
+        flat = (bins + width * np.arange(bins.shape[1])).ravel()
+        return np.bincount(flat, minlength=width * bins.shape[1]).reshape(bins.shape[1], width).astype(np.float64)
+
+    def compare(self, counts: np.ndarray) -> Dict[str, Any]:
+        """
+        PSI và KS của 1 histogram so với tham chiếu
+
+        Returns:
+            Dict gồm n_samples, features (chỉ số -> psi, ks, status) và drifting (các chỉ số PSI > PSI_DRIFT)
+        """
+        n = float(counts[0].sum()) if len(counts) else 0.0
+        cur = counts / max(n, 1.0)
+        ref = np.maximum(self.ref_freq, _EPS)
+        cur_smooth = np.maximum(cur, _EPS)
+        psi = ((cur_smooth - ref) * np.log(cur_smooth / ref)).sum(axis=1)
+        ks = np.abs(np.cumsum(cur - self.ref_freq, axis=1)).max(axis=1)
+        enough = n >= MIN_SAMPLES
+
+        features = {}
+        for name, p, k in zip(self.features, psi, ks):
+            if not enough:
+                status = "insufficient_data"
+            elif p > PSI_DRIFT:
+                status = "drift"
+            elif p > PSI_WARNING:
+                status = "warning"
+            else:
+                status = "stable"
+            features[name] = {"psi": float(p), "ks": float(k), "status": status}
+        return {
+            "n_samples": int(n),
+            "min_samples": MIN_SAMPLES,
+            "features": features,
+            "drifting": [name for name, f in features.items() if f["status"] == "drift"],
+            "warning": [name for name, f in features.items() if f["status"] == "warning"],
+        }
+
+    def batch_report(self, X: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Drift của 1 lô hồ sơ (ví dụ file CSV danh mục)
+
+        Dòng trống hoàn toàn (cả 14 chỉ số đều thiếu, thường là các dòng rỗng cuối file Excel/CSV) bị bỏ trước khi
+        histogram, giống khi huấn luyện bỏ các dòng không có nhãn; nếu giữ lại chúng sẽ dồn vào bin giá trị thiếu
+        và làm mọi chỉ số bị gắn cờ drift.
+        """
+        values = X[self.features].to_numpy(dtype=np.float64)
+        values = values[~np.isnan(values).all(axis=1)]
+        return self.compare(self.histogram(values))
+
+
+class DriftMonitor:
+    """Bộ đếm histogram trên cửa sổ trượt các hồ sơ /predict gần nhất (an toàn giữa các thread)"""
+
+    def __init__(self, reference: DriftReference, window: int = STREAM_WINDOW):
+        self.reference = reference
+        self.window = window
+        self._lock = threading.Lock()
+        p = len(reference.features)
+        self._ring = np.zeros((window, p), dtype=np.int16)
+        self._counts = np.zeros((p, reference.n_bins + 1))
+        self._cols = np.arange(p)
+        self._next = 0
+        self._total = 0
+
+    def observe(self, values: np.ndarray):
+        """
+        Cộng các hồ sơ vừa chấm vào cửa sổ; hồ sơ cũ nhất bị trừ ra khi cửa sổ đầy
+
+        Args:
+            values: Mảng (n, p) hoặc (p,), cột theo đúng thứ tự reference.features (nhận mảng thay vì DataFrame
+                để bỏ chi phí chọn cột của pandas trên đường /predict)
+        """
+        bins = self.reference.bin_index(values)
+        with self._lock:
+            for row in bins[-self.window:]:
+                # Mỗi chỉ số 1 ô nên gán chỉ số kiểu fancy-index không bị trùng
+                if self._total >= self.window:
+                    self._counts[self._cols, self._ring[self._next]] -= 1
+                self._counts[self._cols, row] += 1
+                self._ring[self._next] = row
+                self._next = (self._next + 1) % self.window
+                self._total += 1
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = self._counts.copy()
+            total = self._total
+        result = self.reference.compare(counts)
+        result["window"] = self.window
+        result["total_observed"] = total
+        return result
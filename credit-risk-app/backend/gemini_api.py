@@ -5,6 +5,7 @@ Gemini API Module - Tích hợp Google Gemini để phân tích kết quả dự
 import os
 from typing import Dict, Any
 import google.generativeai as genai
+from metrics import span
 
 
 class GeminiAnalyzer:
@@ -40,7 +41,8 @@ class GeminiAnalyzer:
 
         try:
             # Gọi Gemini API
-            response = self.model.generate_content(prompt)
+            with span("gemini_generate"):
+                response = self.model.generate_content(prompt)
             return response.text
         except Exception as e:
             return f"❌ Lỗi khi gọi Gemini API: {str(e)}"
@@ -1,17 +1,21 @@
 """
 FastAPI Backend - Hệ thống Đánh giá Rủi ro Tín dụng
-Endpoints: /train, /predict, /analyze
+Endpoints: /train, /predict, /predict-fast, /peers, /analyze, /metrics, /drift
 """
 
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 from typing import Dict, Any, Optional
 import pandas as pd
 import os
 import tempfile
-from model import credit_model
+from model import MODEL_COLS, credit_model
+from peers import peers_json
+from tree_engine import feature_array
 from gemini_api import get_gemini_analyzer
+import metrics
 
 # Khởi tạo FastAPI app
 app = FastAPI(
@@ -42,6 +46,23 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    """Đo thời gian mỗi request, ghi histogram và trả header Server-Timing"""
+    start = metrics.start_request()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        # Dùng path template của route (vd: /predict) để tránh bùng nổ số nhãn
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        elapsed = metrics.finish_request(start, request.method, path, status)
+    response.headers["Server-Timing"] = metrics.server_timing_header(elapsed)
+    return response
+
+
 # ================================================================================================
 # PYDANTIC MODELS
 # ================================================================================================
@@ -133,6 +154,8 @@ async def predict(input_data: PredictionInput):
     Returns:
         Dict chứa PD từ 4 models và kết quả dự đoán
     """
+    # Thời gian đọc body + validate pydantic (FastAPI thực hiện trước khi vào endpoint)
+    metrics.mark("parse")
     try:
         # Kiểm tra mô hình đã được train chưa
         if credit_model.model is None:
@@ -145,9 +168,9 @@ async def predict(input_data: PredictionInput):
                     detail="Mô hình chưa được huấn luyện. Vui lòng upload file CSV để huấn luyện trước."
                 )
 
-        # Chuyển input thành DataFrame
-        input_dict = input_data.dict()
-        X_new = pd.DataFrame([input_dict])
+        # Dựng thẳng mảng float32 (1, 14) theo MODEL_COLS, không qua DataFrame
+        with metrics.span("input_array"):
+            X_new = feature_array([getattr(input_data, col) for col in MODEL_COLS], MODEL_COLS)
 
         # Dự báo
         result = credit_model.predict(X_new)
@@ -160,6 +183,56 @@ async def predict(input_data: PredictionInput):
         raise HTTPException(status_code=500, detail=f"Lỗi khi dự báo: {str(e)}")
 
 
+@app.post("/predict-fast")
+async def predict_fast(input_data: PredictionInput):
+    """
+    Endpoint sàng lọc nhanh: PD từ mô hình học trò bắt chước Stacking (distill.py)
+
+    Args:
+        input_data: Dict chứa 14 chỉ số X_1 đến X_14
+
+    Returns:
+        Dict chứa PD của học trò (đã hiệu chỉnh và thô) và kết quả phân loại theo ngưỡng của Stacking
+    """
+    metrics.mark("parse")
+    if credit_model.model is None and os.path.exists("model_stacking.pkl"):
+        credit_model.load_model("model_stacking.pkl")
+    if credit_model.student is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Mô hình chưa có học trò cho /predict-fast. Vui lòng huấn luyện lại mô hình."
+        )
+
+    with metrics.span("predict_fast"):
+        return credit_model.predict_fast([getattr(input_data, col) for col in credit_model.student.feature_cols])
+
+
+@app.post("/peers")
+async def find_peers(input_data: PredictionInput, k: int = Query(10, ge=1, le=100)):
+    """
+    Endpoint tìm k doanh nghiệp tương tự nhất trong dữ liệu huấn luyện
+
+    Args:
+        input_data: Dict chứa 14 chỉ số X_1 đến X_14
+        k: Số doanh nghiệp trả về (query parameter, mặc định 10)
+
+    Returns:
+        Dict gồm tỷ lệ vỡ nợ thực tế, PD trung bình của nhóm và danh sách doanh nghiệp (khoảng cách, default, PD)
+    """
+    metrics.mark("parse")
+    if credit_model.model is None and os.path.exists("model_stacking.pkl"):
+        credit_model.load_model("model_stacking.pkl")
+    if credit_model.peers is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Mô hình chưa có chỉ mục doanh nghiệp tương tự. Vui lòng huấn luyện lại mô hình."
+        )
+
+    values = [getattr(input_data, col) for col in credit_model.peers.feature_cols]
+    with metrics.span("peers_query"):
+        return peers_json(credit_model.peers.peers(values, k))
+
+
 @app.post("/analyze")
 async def analyze_with_gemini(prediction_data: Dict[str, Any]):
     """
@@ -171,6 +244,7 @@ async def analyze_with_gemini(prediction_data: Dict[str, Any]):
     Returns:
         Dict chứa kết quả phân tích từ Gemini
     """
+    metrics.mark("parse")
     try:
         # Lấy Gemini analyzer
         analyzer = get_gemini_analyzer()
@@ -243,13 +317,91 @@ async def get_model_info():
             "status": "trained",
             "message": "Mô hình đã sẵn sàng",
             "metrics_train": credit_model.metrics_in,
-            "metrics_test": credit_model.metrics_out
+            "metrics_test": credit_model.metrics_out,
+            # Khoảng tin cậy bootstrap, ma trận nhầm lẫn và đường ROC/PR của từng tập (None với model cũ)
+            "evaluation": credit_model.evaluation,
+            "calibration": None if credit_model.calibration is None else {
+                "method": credit_model.calibration["method"],
+                "knots": len(credit_model.calibration["x"]),
+                "n_samples": credit_model.calibration["n_samples"]
+            },
+            "threshold": credit_model.threshold,
+            # Stacking đang chấm bằng đồ thị ONNX (onnxruntime) hay bản biên dịch (tree_engine)
+            "scoring_backend": "onnx" if credit_model.onnx is not None else "compiled",
+            "onnx": credit_model.onnx_info,
+            # Độ trung thành của mô hình học trò (/predict-fast) so với Stacking trên tập test và mẫu tăng cường
+            "student_fidelity": None if credit_model.student is None else credit_model.student.fidelity,
+            "threshold_info": None if credit_model.threshold_info is None else {
+                "criterion": credit_model.threshold_info["criterion"],
+                "reject_cost_rate": credit_model.threshold_info["reject_cost_rate"],
+                "best": credit_model.threshold_info["best"],
+                "curve": credit_model.threshold_info["curve"].to_dict(orient="list")
+            }
         }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi khi lấy thông tin mô hình: {str(e)}")
 
 
+def _drift_reference_or_400():
+    """Load mô hình nếu cần và trả về bộ theo dõi drift (model cũ chưa có tham chiếu -> 400)"""
+    if credit_model.model is None and os.path.exists("model_stacking.pkl"):
+        credit_model.load_model("model_stacking.pkl")
+    if credit_model.drift is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Mô hình chưa có phân phối tham chiếu để theo dõi drift. Vui lòng huấn luyện lại mô hình."
+        )
+    return credit_model.drift
+
+
+@app.get("/drift")
+async def get_drift():
+    """
+    Endpoint kiểm tra drift của các hồ sơ /predict gần nhất (cửa sổ trượt) so với dữ liệu huấn luyện
+
+    Returns:
+        Dict gồm PSI, KS, trạng thái từng chỉ số X_1..X_14 và danh sách chỉ số đang drift
+    """
+    monitor = _drift_reference_or_400()
+    with metrics.span("drift_report"):
+        return monitor.report()
+
+
+@app.post("/drift")
+async def check_batch_drift(file: UploadFile = File(...)):
+    """
+    Endpoint kiểm tra drift của 1 lô hồ sơ (file CSV có cột X_1 đến X_14)
+
+    Returns:
+        Dict gồm PSI, KS, trạng thái từng chỉ số và danh sách chỉ số đang drift
+    """
+    monitor = _drift_reference_or_400()
+    try:
+        with metrics.span("dataframe"):
+            batch = pd.read_csv(file.file)
+        missing = [c for c in monitor.reference.features if c not in batch.columns]
+        if missing:
+            raise ValueError(f"Thiếu cột: {missing}. Vui lòng kiểm tra lại file CSV.")
+        with metrics.span("drift_report"):
+            return monitor.reference.batch_report(batch)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Lỗi khi kiểm tra drift: {str(e)}")
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Endpoint xuất metrics (histogram thời gian từng công đoạn và từng request) cho Prometheus
+
+    Returns:
+        Text theo Prometheus exposition format
+    """
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 # ================================================================================================
 # MAIN
 # ================================================================================================
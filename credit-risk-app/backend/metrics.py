@@ -0,0 +1,173 @@
+"""
+Metrics Module - Đo thời gian các công đoạn xử lý (span) và xuất histogram dạng Prometheus
+
+- span("ten_cong_doan"): context manager đo thời gian 1 công đoạn, ghi vào histogram
+  credit_risk_stage_duration_seconds{stage=...} và vào danh sách span của request hiện tại
+- mark("ten_cong_doan"): ghi span từ đầu request (hoặc mốc trước đó) tới hiện tại,
+  dùng cho những công đoạn FastAPI làm trước khi vào endpoint (đọc body, validate pydantic)
+- render_prometheus(): xuất toàn bộ metrics theo Prometheus text format (version 0.0.4)
+- server_timing_header(): tạo header Server-Timing từ các span của request hiện tại
+
+Metrics được lưu trong bộ nhớ của từng process: khi chạy nhiều worker uvicorn, mỗi worker có
+số liệu riêng (Prometheus scrape theo từng worker hoặc cộng dồn ở phía Prometheus).
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Tuple, Optional
+
+# Bucket (giây) đủ rộng cho cả predict_proba (ms) lẫn gọi Gemini (hàng chục giây)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Span của request hiện tại: (tên công đoạn, thời lượng giây). None khi chạy ngoài request.
+_request_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_spans", default=None)
+_request_mark: ContextVar[Optional[List[float]]] = ContextVar("request_mark", default=None)
+
+
+class Histogram:
+    """Histogram có nhãn, an toàn khi dùng từ nhiều thread"""
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...],
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # labels -> [số đếm từng bucket (không cộng dồn, phần tử cuối là +Inf), tổng, số lần]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(s[0]), s[1], s[2]) for labels, s in sorted(self._series.items())]
+        for labels, counts, total, count in snapshot:
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+            prefix = f"{base}," if base else ""
+            # Series không nhãn ghi name_sum / name_count không kèm {} (giống Gauge)
+            suffix = f"{{{base}}}" if base else ""
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+
+class Gauge:
+    """Gauge không nhãn (ví dụ số request đang xử lý)"""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+        self._value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            value = self._value
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+STAGE_DURATION = Histogram(
+    "credit_risk_stage_duration_seconds",
+    "Thời gian từng công đoạn xử lý (parse, dataframe, predict_proba, load_model, gemini)",
+    ("stage",),
+)
+REQUEST_DURATION = Histogram(
+    "credit_risk_http_request_duration_seconds",
+    "Tổng thời gian xử lý HTTP request",
+    ("method", "path", "status"),
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "credit_risk_http_requests_in_progress",
+    "Số HTTP request đang được xử lý",
+)
+
+
+def _record(stage: str, seconds: float):
+    STAGE_DURATION.observe(seconds, stage)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+
+@contextmanager
+def span(stage: str):
+    """Đo thời gian khối lệnh và ghi vào histogram + Server-Timing của request hiện tại"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        _record(stage, end - start)
+        marker = _request_mark.get()
+        if marker is not None:
+            marker[0] = end
+
+
+def mark(stage: str):
+    """Ghi span từ mốc gần nhất của request (mặc định là lúc request bắt đầu) tới hiện tại"""
+    marker = _request_mark.get()
+    if marker is None:
+        return
+    now = time.perf_counter()
+    _record(stage, now - marker[0])
+    marker[0] = now
+
+
+def start_request() -> float:
+    """Khởi tạo bộ đếm span cho request mới (gọi trong middleware), trả về thời điểm bắt đầu"""
+    start = time.perf_counter()
+    _request_spans.set([])
+    _request_mark.set([start])
+    REQUESTS_IN_PROGRESS.inc()
+    return start
+
+
+def finish_request(start: float, method: str, path: str, status: int) -> float:
+    """Ghi histogram tổng thời gian request, trả về thời lượng (giây)"""
+    elapsed = time.perf_counter() - start
+    REQUESTS_IN_PROGRESS.dec()
+    REQUEST_DURATION.observe(elapsed, method, path, str(status))
+    return elapsed
+
+
+def server_timing_header(total: float) -> str:
+    """Header Server-Timing (đơn vị ms) cho các span của request hiện tại + tổng thời gian"""
+    spans = _request_spans.get() or []
+    parts = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in spans]
+    parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+def render_prometheus() -> str:
+    """Xuất toàn bộ metrics theo Prometheus text format"""
+    lines = STAGE_DURATION.render() + REQUEST_DURATION.render() + REQUESTS_IN_PROGRESS.render()
+    return "\n".join(lines) + "\n"
@@ -6,23 +6,93 @@ Meta-model: Logistic Regression
 
 import numpy as np
 import pandas as pd
-from sklearn.linear_model import LogisticRegression
-from sklearn.ensemble import RandomForestClassifier, StackingClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
-from xgboost import XGBClassifier
 import pickle
 import os
-from typing import Dict, Tuple, Any
+from typing import Dict, List, Tuple, Any
+from metrics import span
+from calibration import oof_stacking_scores, fit_calibration, apply_calibration
+from threshold_optimizer import DEFAULT_THRESHOLD, EXPOSURE_COLS, optimize_threshold
+from evaluation import evaluate_split, evaluation_json
+from drift import DriftReference, DriftMonitor
+from peers import PeerIndex
+from tree_engine import ArrayScorer, compile_model, feature_array
+from distill import distill
+from onnx_export import _ONNX_EXPORT_OK, _ONNXRUNTIME_OK, ONNX_TOLERANCE, OnnxScorer, export_stacking, onnx_path
 
 # Danh sách 14 chỉ số tài chính
 MODEL_COLS = [f'X_{i}' for i in range(1, 15)]
 
+# "onnx": chấm Stacking bằng đồ thị ONNX (onnxruntime) nếu có file .onnx hợp lệ; mặc định dùng bản biên dịch
+SCORING_BACKEND = os.getenv("SCORING_BACKEND", "compiled")
+
+# Siêu tham số mặc định của 3 base models (có thể được thay bằng cấu hình tốt nhất từ tuning.py)
+DEFAULT_PARAMS = {
+    "logistic": {"C": 1.0},
+    "random_forest": {"n_estimators": 100, "max_depth": 10},
+    "xgboost": {"n_estimators": 100, "max_depth": 6, "learning_rate": 0.1},
+}
+
+
+def merge_params(params: Dict[str, Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+    """Ghép siêu tham số truyền vào với DEFAULT_PARAMS (theo từng base model)"""
+    merged = {name: dict(values) for name, values in DEFAULT_PARAMS.items()}
+    for name, values in (params or {}).items():
+        if name not in merged:
+            raise ValueError(f"Base model không hợp lệ: {name}. Chỉ hỗ trợ: {list(DEFAULT_PARAMS)}")
+        merged[name].update(values)
+    return merged
+
+
+def make_base_estimator(name: str, params: Dict[str, Any] = None, n_jobs: int = None):
+    """
+    Tạo 1 base model với cấu hình cố định của hệ thống + siêu tham số có thể tinh chỉnh
+
+    Args:
+        name: 'logistic', 'random_forest' hoặc 'xgboost'
+        params: Siêu tham số tinh chỉnh (ghi đè DEFAULT_PARAMS)
+        n_jobs: Số luồng cho RandomForest/XGBoost (None = mặc định của thư viện)
+
+    Returns:
+        Estimator chưa huấn luyện
+    """
+    # Import lúc tạo estimator: chỉ train/tuning cần, đường chấm điểm dùng bản biên dịch hoặc đồ thị ONNX
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+    from xgboost import XGBClassifier
+
+    params = merge_params({name: params or {}})[name]
+
+    if name == "logistic":
+        return LogisticRegression(
+            random_state=42,
+            max_iter=1000,
+            class_weight="balanced",
+            solver="lbfgs",
+            **params
+        )
+
+    if name == "random_forest":
+        return RandomForestClassifier(
+            random_state=42,
+            class_weight="balanced",
+            n_jobs=n_jobs,
+            **params
+        )
+
+    return XGBClassifier(
+        random_state=42,
+        use_label_encoder=False,
+        eval_metric='logloss',
+        n_jobs=n_jobs,
+        **params
+    )
+
 
 class CreditRiskModel:
     """Class quản lý mô hình Stacking Classifier cho đánh giá rủi ro tín dụng"""
 
-    def __init__(self):
+    def __init__(self, params: Dict[str, Dict[str, Any]] = None):
+        self.params = merge_params(params)
         self.model = None
         self.model_logistic = None
         self.model_rf = None
@@ -33,32 +103,32 @@ class CreditRiskModel:
         self.y_test = None
         self.metrics_in = {}
         self.metrics_out = {}
+        self.evaluation = None
+        self.tuning = None
+        self.calibration = None
+        self.threshold = DEFAULT_THRESHOLD
+        self.threshold_info = None
+        self.drift = None
+        self.peers = None
+        # Mô hình học trò bắt chước Stacking cho /predict-fast (distill.py)
+        self.student = None
+        # Bản biên dịch của 4 mô hình cho predict() (dựng lại sau train/load_model, không lưu vào pickle)
+        self.compiled = {}
+        # Bọc bản biên dịch để chấm mảng float32 theo MODEL_COLS (thứ tự cột kiểm tra 1 lần trong compile)
+        self.scorers = {}
+        # Đồ thị ONNX của Stacking (OnnxScorer) khi SCORING_BACKEND = "onnx", kèm thông tin lúc xuất
+        self.onnx = None
+        self.onnx_info = None
 
     def build_model(self):
         """Xây dựng mô hình Stacking Classifier"""
-        # Định nghĩa 3 Base Models
-        self.model_logistic = LogisticRegression(
-            random_state=42,
-            max_iter=1000,
-            class_weight="balanced",
-            solver="lbfgs"
-        )
+        from sklearn.ensemble import StackingClassifier
+        from sklearn.linear_model import LogisticRegression
 
-        self.model_rf = RandomForestClassifier(
-            n_estimators=100,
-            random_state=42,
-            max_depth=10,
-            class_weight="balanced"
-        )
-
-        self.model_xgb = XGBClassifier(
-            n_estimators=100,
-            random_state=42,
-            max_depth=6,
-            learning_rate=0.1,
-            use_label_encoder=False,
-            eval_metric='logloss'
-        )
+        # Định nghĩa 3 Base Models (siêu tham số lấy từ self.params)
+        self.model_logistic = make_base_estimator("logistic", self.params["logistic"])
+        self.model_rf = make_base_estimator("random_forest", self.params["random_forest"])
+        self.model_xgb = make_base_estimator("xgboost", self.params["xgboost"])
 
         # Tạo StackingClassifier với LogisticRegression làm meta-model
         estimators = [
@@ -75,6 +145,17 @@ class CreditRiskModel:
             n_jobs=-1  # Sử dụng tất cả CPU cores
         )
 
+    @staticmethod
+    def split(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame, pd.Series, pd.Series]:
+        """Chia train/test 80/20 (stratified) - dùng chung cho huấn luyện và tuning"""
+        from sklearn.model_selection import train_test_split
+
+        # Bỏ các dòng trống (không có nhãn default), thường gặp khi CSV được xuất từ Excel
+        df = df.dropna(subset=['default'])
+        X = df[MODEL_COLS]
+        y = df['default'].astype(int)
+        return train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+
     def train(self, csv_file_path: str) -> Dict[str, Any]:
         """
         Huấn luyện mô hình từ file CSV
@@ -94,14 +175,8 @@ class CreditRiskModel:
         if missing:
             raise ValueError(f"Thiếu cột: {missing}. Vui lòng kiểm tra lại file CSV.")
 
-        # Chuẩn bị dữ liệu
-        X = df[MODEL_COLS]
-        y = df['default'].astype(int)
-
         # Chia train/test
-        self.X_train, self.X_test, self.y_train, self.y_test = train_test_split(
-            X, y, test_size=0.2, random_state=42, stratify=y
-        )
+        self.X_train, self.X_test, self.y_train, self.y_test = self.split(df)
 
         # Xây dựng mô hình
         self.build_model()
@@ -115,29 +190,48 @@ class CreditRiskModel:
         self.model_logistic.fit(self.X_train, self.y_train)
         self.model_rf.fit(self.X_train, self.y_train)
         self.model_xgb.fit(self.X_train, self.y_train)
+        self.compile()
+        # Đồ thị ONNX cũ không còn khớp mô hình vừa train (xuất lại khi save_model)
+        self.onnx = None
+        self.onnx_info = None
+
+        # Bảng tra hiệu chỉnh PD từ điểm out-of-fold của tập train
+        print("📐 Đang hiệu chỉnh PD (calibration)...")
+        self.calibration = fit_calibration(oof_stacking_scores(self.model, self.X_train, self.y_train), self.y_train)
 
-        # Đánh giá mô hình
-        y_pred_in = self.model.predict(self.X_train)
         y_proba_in = self.model.predict_proba(self.X_train)[:, 1]
-        y_pred_out = self.model.predict(self.X_test)
         y_proba_out = self.model.predict_proba(self.X_test)[:, 1]
 
-        # Tính metrics
-        self.metrics_in = {
-            "accuracy": accuracy_score(self.y_train, y_pred_in),
-            "precision": precision_score(self.y_train, y_pred_in, zero_division=0),
-            "recall": recall_score(self.y_train, y_pred_in, zero_division=0),
-            "f1": f1_score(self.y_train, y_pred_in, zero_division=0),
-            "auc": roc_auc_score(self.y_train, y_proba_in),
-        }
+        # Phân phối tham chiếu của X_1..X_14 để theo dõi drift của hồ sơ mới
+        self.drift = DriftMonitor(DriftReference.from_training(self.X_train))
+
+        # Chỉ mục doanh nghiệp tương tự (tập train, kèm PD đã hiệu chỉnh) cho /peers
+        self.peers = PeerIndex(self.X_train, self.y_train, apply_calibration(y_proba_in, self.calibration), MODEL_COLS)
 
-        self.metrics_out = {
-            "accuracy": accuracy_score(self.y_test, y_pred_out),
-            "precision": precision_score(self.y_test, y_pred_out, zero_division=0),
-            "recall": recall_score(self.y_test, y_pred_out, zero_division=0),
-            "f1": f1_score(self.y_test, y_pred_out, zero_division=0),
-            "auc": roc_auc_score(self.y_test, y_proba_out),
+        # Ngưỡng Default tối ưu trên PD đã hiệu chỉnh của tập test (chi phí LGD x EAD nếu CSV có 2 cột này)
+        exposure = df.loc[self.X_test.index, EXPOSURE_COLS] if set(EXPOSURE_COLS) <= set(df.columns) else None
+        self.threshold_info = optimize_threshold(
+            self.y_test, apply_calibration(y_proba_out, self.calibration),
+            lgd=None if exposure is None else exposure['LGD'],
+            ead=None if exposure is None else exposure['EAD']
+        )
+        self.threshold = self.threshold_info["threshold"]
+
+        # Đánh giá: AUC/KS/Brier + ROC/PR trên PD thô, Accuracy/F1/confusion theo PD đã hiệu chỉnh so với ngưỡng tối ưu
+        self.evaluation = {
+            "train": evaluation_json(evaluate_split(self.y_train, y_proba_in, self.threshold,
+                                                    decision=apply_calibration(y_proba_in, self.calibration))),
+            "test": evaluation_json(evaluate_split(self.y_test, y_proba_out, self.threshold,
+                                                   decision=apply_calibration(y_proba_out, self.calibration)))
         }
+        self.metrics_in = self.evaluation["train"]["metrics"]
+        self.metrics_out = self.evaluation["test"]["metrics"]
+
+        # Học trò học lại PD thô của Stacking (bản biên dịch chấm nhanh các mẫu tăng cường)
+        print("🎓 Đang huấn luyện mô hình học trò cho /predict-fast...")
+        with span("distill"):
+            self.student = distill(self.compiled["model"], self.X_train, self.X_test, self.calibration,
+                                   self.threshold, MODEL_COLS)
 
         print("✅ Huấn luyện hoàn tất!")
 
@@ -147,45 +241,97 @@ class CreditRiskModel:
             "train_samples": len(self.X_train),
             "test_samples": len(self.X_test),
             "metrics_train": self.metrics_in,
-            "metrics_test": self.metrics_out
+            "metrics_test": self.metrics_out,
+            "params": self.params,
+            "calibration_method": self.calibration["method"],
+            "threshold": self.threshold,
+            "threshold_criterion": self.threshold_info["criterion"],
+            "student_fidelity": self.student.fidelity
         }
 
-    def predict(self, X_new: pd.DataFrame) -> Dict[str, Any]:
+    def compile(self):
+        """Biên dịch Stacking và 3 base models sang mảng phẳng (tree_engine); mô hình không hỗ trợ giữ nguyên"""
+        with span("compile_models"):
+            self.compiled = {
+                name: compile_model(getattr(self, name), MODEL_COLS)
+                for name in ("model", "model_logistic", "model_rf", "model_xgb")
+            }
+            self.scorers = {name: ArrayScorer(compiled, MODEL_COLS) for name, compiled in self.compiled.items()}
+
+    def predict(self, X_new) -> Dict[str, Any]:
         """
         Dự báo PD cho dữ liệu mới
 
         Args:
-            X_new: DataFrame chứa 14 chỉ số X_1 đến X_14
+            X_new: Mảng float32 (n, 14) theo thứ tự MODEL_COLS (tree_engine.feature_array) hoặc DataFrame chứa
+                14 chỉ số X_1 đến X_14
 
         Returns:
-            Dict chứa PD từ 4 models và kết quả dự đoán
+            Dict chứa PD từ 4 models và kết quả dự đoán (dòng đầu tiên)
         """
         if self.model is None:
             raise ValueError("Mô hình chưa được huấn luyện. Vui lòng huấn luyện trước khi dự báo.")
 
-        # Đảm bảo thứ tự cột đúng
-        X_new = X_new[MODEL_COLS]
+        # DataFrame được quy về mảng float32 theo MODEL_COLS, 4 mô hình chấm chung 1 mảng
+        if isinstance(X_new, pd.DataFrame):
+            X_new = feature_array(X_new[MODEL_COLS].to_numpy(), MODEL_COLS)
 
         # 1. PD từ Stacking Model (kết quả chính)
-        probs_stacking = self.model.predict_proba(X_new)[:, 1]
+        with span("predict_proba_stacking"):
+            scores_stacking = (self.onnx or self.scorers["model"]).predict_proba(X_new)[:, 1]
+        with span("calibration"):
+            probs_stacking = apply_calibration(scores_stacking, self.calibration)
 
         # 2. PD từ 3 Base Models
-        probs_logistic = self.model_logistic.predict_proba(X_new)[:, 1]
-        probs_rf = self.model_rf.predict_proba(X_new)[:, 1]
-        probs_xgb = self.model_xgb.predict_proba(X_new)[:, 1]
+        with span("predict_proba_logistic"):
+            probs_logistic = self.scorers["model_logistic"].predict_proba(X_new)[:, 1]
+        with span("predict_proba_random_forest"):
+            probs_rf = self.scorers["model_rf"].predict_proba(X_new)[:, 1]
+        with span("predict_proba_xgboost"):
+            probs_xgb = self.scorers["model_xgb"].predict_proba(X_new)[:, 1]
 
-        # Ngưỡng phân loại: PD >= 15% = Default
-        preds = (probs_stacking >= 0.15).astype(int)
+        # Cộng hồ sơ vào cửa sổ theo dõi drift (vài micro giây)
+        if self.drift is not None:
+            with span("drift"):
+                self.drift.observe(X_new)
+
+        # Ngưỡng phân loại: ngưỡng tối ưu lưu cùng mô hình (model cũ: 15%)
+        preds = (probs_stacking >= self.threshold).astype(int)
 
         return {
             "pd_stacking": float(probs_stacking[0]),
+            "pd_stacking_raw": float(scores_stacking[0]),
             "pd_logistic": float(probs_logistic[0]),
             "pd_random_forest": float(probs_rf[0]),
             "pd_xgboost": float(probs_xgb[0]),
             "prediction": int(preds[0]),
+            "threshold": self.threshold,
             "prediction_label": "Default (Vỡ nợ)" if preds[0] == 1 else "Non-Default (Không vỡ nợ)"
         }
 
+    def predict_fast(self, values: List[float]) -> Dict[str, Any]:
+        """
+        Dự báo PD bằng mô hình học trò (không qua DataFrame, không cộng vào cửa sổ drift)
+
+        Args:
+            values: 14 chỉ số theo thứ tự MODEL_COLS
+
+        Returns:
+            Dict gồm PD đã hiệu chỉnh/thô của học trò và kết quả phân loại theo ngưỡng của Stacking
+        """
+        if self.student is None:
+            raise ValueError("Mô hình chưa có học trò cho /predict-fast. Vui lòng huấn luyện lại mô hình.")
+        score = self.student.score_one(values)
+        pd_fast = float(apply_calibration(score, self.calibration))
+        prediction = int(pd_fast >= self.threshold)
+        return {
+            "pd_stacking_fast": pd_fast,
+            "pd_stacking_raw_fast": score,
+            "prediction": prediction,
+            "threshold": self.threshold,
+            "prediction_label": "Default (Vỡ nợ)" if prediction == 1 else "Non-Default (Không vỡ nợ)"
+        }
+
     def save_model(self, filepath: str = "model_stacking.pkl"):
         """Lưu mô hình ra file"""
         if self.model is None:
@@ -197,20 +343,67 @@ class CreditRiskModel:
             "model_rf": self.model_rf,
             "model_xgb": self.model_xgb,
             "metrics_in": self.metrics_in,
-            "metrics_out": self.metrics_out
+            "metrics_out": self.metrics_out,
+            "evaluation": self.evaluation,
+            "params": self.params,
+            "tuning": self.tuning,
+            "calibration": self.calibration,
+            "threshold": self.threshold,
+            "threshold_info": self.threshold_info,
+            "drift_reference": None if self.drift is None else self.drift.reference,
+            "peers": self.peers,
+            "student": self.student
         }
+        if _ONNX_EXPORT_OK:
+            self.export_onnx(onnx_path(filepath))
+        model_data["onnx"] = self.onnx_info
 
         with open(filepath, 'wb') as f:
             pickle.dump(model_data, f)
 
         print(f"✅ Mô hình đã được lưu tại: {filepath}")
+        self.load_onnx(filepath)
+
+    def export_onnx(self, filepath: str):
+        """
+        Xuất Stacking ra file ONNX và đo độ lệch PD so với mô hình gốc trên tập train
+
+        Lỗi khi xuất (converter chưa hỗ trợ tham số nào đó...) chỉ in cảnh báo, mô hình vẫn lưu bình thường
+        """
+        self.onnx_info = None
+        try:
+            with span("export_onnx"):
+                info = export_stacking(self.model, MODEL_COLS, filepath)
+            info["max_abs_diff"] = None
+            if _ONNXRUNTIME_OK and self.X_train is not None:
+                scores = OnnxScorer(filepath, MODEL_COLS).predict_proba(self.X_train)[:, 1]
+                info["max_abs_diff"] = float(np.max(np.abs(scores - self.model.predict_proba(self.X_train)[:, 1])))
+            self.onnx_info = info
+            print(f"✅ Đã xuất mô hình ONNX: {filepath} (lệch PD tối đa: {info['max_abs_diff']})")
+        except Exception as e:
+            print(f"⚠️ Không xuất được mô hình ONNX: {e}")
+
+    def load_onnx(self, filepath: str = "model_stacking.pkl"):
+        """Mở đồ thị ONNX cạnh file pickle khi SCORING_BACKEND = "onnx" và độ lệch lúc xuất nằm trong ONNX_TOLERANCE"""
+        self.onnx = None
+        if SCORING_BACKEND != "onnx":
+            return
+        path = onnx_path(filepath)
+        diff = None if self.onnx_info is None else self.onnx_info.get("max_abs_diff")
+        if not _ONNXRUNTIME_OK:
+            print("⚠️ SCORING_BACKEND=onnx nhưng chưa cài onnxruntime, dùng mô hình biên dịch")
+        elif not os.path.exists(path) or diff is None or diff > ONNX_TOLERANCE:
+            print(f"⚠️ Không có đồ thị ONNX hợp lệ cho {filepath} (lệch PD: {diff}), dùng mô hình biên dịch")
+        else:
+            with span("load_onnx"):
+                self.onnx = OnnxScorer(path, MODEL_COLS)
 
     def load_model(self, filepath: str = "model_stacking.pkl"):
         """Load mô hình từ file"""
         if not os.path.exists(filepath):
             raise FileNotFoundError(f"Không tìm thấy file mô hình: {filepath}")
 
-        with open(filepath, 'rb') as f:
+        with span("load_model"), open(filepath, 'rb') as f:
             model_data = pickle.load(f)
 
         self.model = model_data["model"]
@@ -219,6 +412,22 @@ class CreditRiskModel:
         self.model_xgb = model_data["model_xgb"]
         self.metrics_in = model_data["metrics_in"]
         self.metrics_out = model_data["metrics_out"]
+        self.evaluation = model_data.get("evaluation")
+        self.params = merge_params(model_data.get("params"))
+        self.tuning = model_data.get("tuning")
+        # File model cũ (trước khi có calibration) vẫn load được, PD giữ nguyên điểm thô
+        self.calibration = model_data.get("calibration")
+        self.threshold = model_data.get("threshold", DEFAULT_THRESHOLD)
+        self.threshold_info = model_data.get("threshold_info")
+        # Cửa sổ theo dõi drift bắt đầu lại từ đầu mỗi lần load (model cũ chưa có tham chiếu thì bỏ qua)
+        drift_reference = model_data.get("drift_reference")
+        self.drift = None if drift_reference is None else DriftMonitor(drift_reference)
+        self.peers = model_data.get("peers")
+        self.student = model_data.get("student")
+        self.compile()
+        # File model cũ chưa có thông tin ONNX thì luôn chấm bằng bản biên dịch
+        self.onnx_info = model_data.get("onnx")
+        self.load_onnx(filepath)
 
         print(f"✅ Mô hình đã được load từ: {filepath}")
 
@@ -0,0 +1,110 @@
+"""
+ONNX Module - Xuất Stacking (3 base models + meta-model Logistic) thành 1 đồ thị ONNX và chấm bằng onnxruntime
+
+- export_stacking(): skl2onnx chuyển StackingClassifier (XGBoost qua converter của onnxmltools) thành 1 file
+  .onnx đặt cạnh model_stacking.pkl, đầu vào float32 (n, 14) theo thứ tự MODEL_COLS, đầu ra xác suất (n, 2)
+- OnnxScorer: InferenceSession trên CPUExecutionProvider, cùng giao diện predict_proba với mô hình sklearn;
+  lô lớn được onnxruntime chia luồng (intra_op_num_threads)
+
+Cả 3 thư viện skl2onnx, onnxmltools, onnxruntime đều là tùy chọn: thiếu thì bỏ qua bước xuất/chấm ONNX.
+Cây quyết định trong ONNX so sánh trên float32 nên PD có thể lệch rất nhỏ so với sklearn; độ lệch trên tập train
+được đo lúc xuất và lưu cùng mô hình để quyết định có dùng đồ thị hay không.
+"""
+
+import copy
+import importlib.util
+import os
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+_ONNX_EXPORT_OK = all(importlib.util.find_spec(name) is not None for name in ("skl2onnx", "onnxmltools"))
+_ONNXRUNTIME_OK = importlib.util.find_spec("onnxruntime") is not None
+
+# Opset mặc định (ai.onnx) và opset của TreeEnsemble (ai.onnx.ml) khi xuất
+TARGET_OPSET = {"": 17, "ai.onnx.ml": 3}
+# Lệch PD tối đa (trên tập train) để đồ thị ONNX được dùng thay cho mô hình gốc
+ONNX_TOLERANCE = 1e-4
+
+
+def onnx_path(model_path: str) -> str:
+    """Đường dẫn file .onnx đặt cạnh file pickle (model_stacking.pkl -> model_stacking.onnx)"""
+    return os.path.splitext(model_path)[0] + ".onnx"
+
+
+def export_stacking(model, feature_cols: List[str], filepath: str) -> Dict[str, Any]:
+    """
+    Xuất StackingClassifier đã fit ra file ONNX
+
+    Args:
+        model: StackingClassifier (logistic + random_forest + xgboost, meta-model Logistic)
+        feature_cols: Thứ tự 14 cột đầu vào
+        filepath: File .onnx cần ghi
+
+    Returns:
+        Dict gồm path, n_features, opset, size_bytes
+    """
+    if not _ONNX_EXPORT_OK:
+        raise ImportError("Cần cài skl2onnx và onnxmltools để xuất mô hình sang ONNX")
+
+    from skl2onnx import convert_sklearn, update_registered_converter
+    from skl2onnx.common.data_types import FloatTensorType
+    from skl2onnx.common.shape_calculator import calculate_linear_classifier_output_shapes
+    from onnxmltools.convert.xgboost.operator_converters.XGBoost import convert_xgboost
+    from xgboost import XGBClassifier
+
+    # skl2onnx không tự biết XGBClassifier: đăng ký converter của onnxmltools (cho phép tắt zipmap)
+    update_registered_converter(
+        XGBClassifier, "XGBoostXGBClassifier",
+        calculate_linear_classifier_output_shapes, convert_xgboost,
+        options={"nocl": [True, False], "zipmap": [True, False, "columns"]}
+    )
+    # Converter XGBoost chỉ hiểu tên cột dạng f0..f13, còn booster fit trên DataFrame lưu tên X_1..X_14:
+    # xuất trên bản sao đã bỏ tên cột (thứ tự cột không đổi) để không đụng tới mô hình đang phục vụ
+    model = copy.deepcopy(model)
+    for estimator in model.estimators_:
+        if isinstance(estimator, XGBClassifier):
+            estimator.get_booster().feature_names = None
+    # zipmap=False: đầu ra xác suất là tensor (n, 2) thay vì list dict
+    onx = convert_sklearn(
+        model, "credit_risk_stacking",
+        initial_types=[("input", FloatTensorType([None, len(feature_cols)]))],
+        target_opset=TARGET_OPSET,
+        options={id(model): {"zipmap": False}}
+    )
+    with open(filepath, "wb") as f:
+        f.write(onx.SerializeToString())
+
+    return {
+        "path": filepath,
+        "n_features": len(feature_cols),
+        "opset": dict(TARGET_OPSET),
+        "size_bytes": os.path.getsize(filepath)
+    }
+
+
+class OnnxScorer:
+    """Chấm đồ thị ONNX của Stacking bằng onnxruntime (CPU), nhận DataFrame hoặc mảng (n, 14)"""
+
+    def __init__(self, filepath: str, feature_cols: List[str], n_threads: int = 0):
+        if not _ONNXRUNTIME_OK:
+            raise ImportError("Cần cài onnxruntime để chấm mô hình ONNX")
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        # 0 = onnxruntime tự chọn số luồng theo số core (chấm lô lớn song song)
+        options.intra_op_num_threads = n_threads
+        self.session = ort.InferenceSession(filepath, sess_options=options, providers=["CPUExecutionProvider"])
+        self.feature_cols = list(feature_cols)
+        self.input_name = self.session.get_inputs()[0].name
+        outputs = [output.name for output in self.session.get_outputs()]
+        self.output_name = "probabilities" if "probabilities" in outputs else outputs[-1]
+        self.filepath = filepath
+
+    def predict_proba(self, X) -> np.ndarray:
+        if isinstance(X, pd.DataFrame):
+            X = X[self.feature_cols].to_numpy(dtype=np.float32)
+        X = np.ascontiguousarray(np.atleast_2d(X), dtype=np.float32)
+        proba = self.session.run([self.output_name], {self.input_name: X})[0]
+        return np.asarray(proba, dtype=np.float64)
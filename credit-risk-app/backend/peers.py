@@ -0,0 +1,115 @@
+"""
+Tìm các doanh nghiệp tương tự nhất (peers) trong dữ liệu huấn luyện cho 1 hồ sơ mới.
+
+Chỉ số X_1..X_14 được chuẩn hóa robust ((x - trung vị) / IQR) vì nhiều tỷ số có đuôi rất dài (X_9, X_13):
+chuẩn hóa theo độ lệch chuẩn sẽ để vài điểm ngoại lai chi phối thang đo. Chỉ mục được dựng 1 lần cho mỗi
+mô hình (cache cùng get_trained_models trong ED.py, lưu trong model_stacking.pkl cho endpoint /peers):
+- Dữ liệu nhỏ (<= BRUTE_FORCE_MAX dòng): ma trận chuẩn hóa float32 liền mạch + np.argpartition, 1 truy vấn
+  chỉ là 1 phép trừ/bình phương trên vài nghìn dòng (nhanh hơn đi cây với overhead Python)
+- Dữ liệu lớn: sklearn KDTree (pickle được cùng mô hình)
+
+credit-risk-app/backend/peers.py là bản sao giống hệt file này (backend chạy độc lập); sửa 1 bản thì chép nguyên
+file sang bản kia. Thứ tự cột do nơi gọi truyền vào (feature_cols).
+"""
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+BRUTE_FORCE_MAX = 2_000
+DEFAULT_K = 10
+
+
+class PeerIndex:
+    """Chỉ mục láng giềng gần nhất trên các chỉ số đã chuẩn hóa, kèm nhãn default và PD của từng doanh nghiệp."""
+
+    def __init__(self, X: pd.DataFrame, y, pd_values, feature_cols: List[str],
+                 brute_force_max: int = BRUTE_FORCE_MAX):
+        self.feature_cols = list(feature_cols)
+        values = X[self.feature_cols].to_numpy(dtype=np.float64)
+        self.center = np.nanmedian(values, axis=0)
+        q1, q3 = np.nanpercentile(values, [25, 75], axis=0)
+        scale = q3 - q1
+        # Biến gần như hằng số (IQR = 0) thì dùng độ lệch chuẩn, vẫn bằng 0 thì giữ nguyên
+        scale = np.where(scale > 0, scale, np.nanstd(values, axis=0))
+        self.scale = np.where(scale > 0, scale, 1.0)
+
+        self.row_ids = X.index.to_numpy()
+        self.values = values
+        self.default = np.asarray(y, dtype=np.int8)
+        self.pd = np.asarray(pd_values, dtype=np.float64)
+        points = self._standardize(values)
+        if len(points) <= brute_force_max:
+            self.points, self.tree = points, None
+        else:
+            self.points, self.tree = None, KDTree(points)
+
+    def _standardize(self, values: np.ndarray) -> np.ndarray:
+        z = (np.atleast_2d(values) - self.center) / self.scale
+        # Giá trị thiếu coi như bằng trung vị
+        return np.ascontiguousarray(np.nan_to_num(z, nan=0.0), dtype=np.float32)
+
+    def query(self, x, k: int = DEFAULT_K):
+        """
+        k láng giềng gần nhất của 1 hồ sơ.
+
+        Args:
+            x: Các chỉ số theo thứ tự feature_cols (mảng/list), Series hoặc DataFrame 1 dòng
+
+        Returns:
+            (vị trí dòng trong dữ liệu tham chiếu, khoảng cách Euclid trên thang chuẩn hóa), tăng dần theo khoảng cách
+        """
+        if isinstance(x, pd.DataFrame):
+            x = x[self.feature_cols].to_numpy(dtype=np.float64)[0]
+        elif isinstance(x, pd.Series):
+            x = x[self.feature_cols].to_numpy(dtype=np.float64)
+        z = self._standardize(np.asarray(x, dtype=np.float64))
+        k = min(k, len(self.default))
+        if self.tree is not None:
+            dist, pos = self.tree.query(z, k=k)
+            return pos[0], dist[0]
+        d2 = ((self.points - z) ** 2).sum(axis=1)
+        pos = np.argpartition(d2, k - 1)[:k] if k < len(d2) else np.arange(len(d2))
+        pos = pos[np.argsort(d2[pos], kind="stable")]
+        return pos, np.sqrt(d2[pos])
+
+    def peers(self, x, k: int = DEFAULT_K) -> Dict[str, Any]:
+        """
+        Bảng k doanh nghiệp tương tự nhất và tóm tắt.
+
+        Returns:
+            dict gồm table (DataFrame theo row_id: khoảng cách, default, PD, các chỉ số), default_rate, mean_pd, k
+        """
+        pos, dist = self.query(x, k)
+        table = pd.DataFrame(self.values[pos], columns=self.feature_cols, index=self.row_ids[pos])
+        table.insert(0, "PD", self.pd[pos])
+        table.insert(0, "default", self.default[pos])
+        table.insert(0, "distance", dist.astype(np.float64))
+        return {
+            "table": table,
+            "default_rate": float(self.default[pos].mean()) if len(pos) else float("nan"),
+            "mean_pd": float(self.pd[pos].mean()) if len(pos) else float("nan"),
+            "k": len(pos),
+        }
+
+
+def peers_json(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Bản JSON của PeerIndex.peers (endpoint /peers): mỗi doanh nghiệp 1 dict row_id, distance, default, pd, ratios."""
+    table = result["table"]
+    ratio_cols = [c for c in table.columns if c not in ("distance", "default", "PD")]
+    return {
+        "k": result["k"],
+        "default_rate": result["default_rate"] if result["k"] else None,
+        "mean_pd": result["mean_pd"] if result["k"] else None,
+        "peers": [
+            {
+                "row_id": int(row_id),
+                "distance": float(row["distance"]),
+                "default": int(row["default"]),
+                "pd": float(row["PD"]),
+                "ratios": {c: float(row[c]) for c in ratio_cols}
+            }
+            for row_id, row in table.iterrows()
+        ]
+    }
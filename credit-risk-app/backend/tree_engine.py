@@ -0,0 +1,419 @@
+"""
+Chấm điểm RandomForest / XGBoost / Stacking trên mảng NumPy phẳng (không qua sklearn hay DMatrix của XGBoost).
+
+File này có 2 bản giống hệt nhau: tree_engine.py (ứng dụng Streamlit ED.py) và credit-risk-app/backend/tree_engine.py
+(API FastAPI, chạy độc lập nên không import được từ gốc repo). Sửa 1 bản thì chép nguyên file sang bản kia; vì vậy
+module không import gì từ phần còn lại của repo, thứ tự cột luôn do nơi gọi truyền vào (feature_names).
+
+predict_proba 1 hồ sơ trên RandomForest 100 cây mất vài ms (vòng lặp Python theo từng cây), XGBoost ~1-2 ms
+(DataFrame -> DMatrix), còn Stacking gọi lại cả 3 base models. Ở đây mỗi rừng cây được biên dịch 1 lần thành các
+mảng node liên tục (feature, threshold, left, right, value, hướng của giá trị thiếu) và chấm theo 2 cách cho cùng
+kết quả:
+- Lô nhỏ (<= TRAVERSAL_MAX_ROWS dòng): duyệt cây vector hóa, mọi cặp (hồ sơ, cây) cùng đi xuống 1 mức mỗi bước
+- Lô lớn: bảng bitmask theo từng chỉ số (kiểu QuickScorer). Lá của mỗi cây đánh số từ trái sang phải; node có điều
+  kiện sai (hồ sơ rẽ phải) loại các lá của cây con trái. Với chỉ số j, tập node sai luôn là 1 tiền tố của danh sách
+  node sắp theo ngưỡng tăng dần, nên AND của từng tiền tố được tính sẵn: mỗi hồ sơ chỉ cần 1 searchsorted và 1 dòng
+  bảng cho mỗi chỉ số, AND 14 dòng, lá thoát là bit 1 thấp nhất
+Ngưỡng được quy về float32 với phép so sánh x <= t, đúng như sklearn/XGBoost so sánh trên dữ liệu float32, nên xác
+suất khớp mô hình gốc (chỉ khác ở sai số cộng dồn, < 1e-6).
+
+Với 1 hồ sơ, dựng DataFrame rồi chọn cột theo tên ở mỗi predict_proba còn tốn hơn cả phần chấm: feature_array dựng
+thẳng mảng float32 (n, 14) theo thứ tự cột chuẩn, ArrayScorer kiểm tra thứ tự cột của mô hình 1 lần lúc tạo rồi chấm mảng
+đó trực tiếp (bản biên dịch dùng luôn mảng, không sao chép).
+"""
+import json
+from collections.abc import Mapping
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.special import expit
+from sklearn.ensemble import RandomForestClassifier, StackingClassifier
+from sklearn.linear_model import LogisticRegression
+
+# Lô từ mức này trở xuống duyệt cây trực tiếp (chi phí ~ số dòng x số cây x độ sâu), lớn hơn thì dùng bảng bitmask
+TRAVERSAL_MAX_ROWS = 8
+# Kích thước mỗi bộ đệm khối khi AND bảng bitmask (2 bộ đệm nằm gọn trong cache L2)
+_CHUNK_BYTES = 256 * 1024
+# np.bitwise_count (popcount) chỉ có từ NumPy 2.0; backend còn chạy NumPy 1.x (requirements.txt)
+_HAS_BITWISE_COUNT = hasattr(np, "bitwise_count")
+
+# 1 cây: (feature, threshold float32, left, right, missing_left, value) theo chỉ số node cục bộ, lá có left = -1
+Tree = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+def _float32_floor(threshold: np.ndarray) -> np.ndarray:
+    """Số float32 lớn nhất <= ngưỡng float64: với x float32, x <= t tương đương x <= _float32_floor(t)."""
+    threshold = np.asarray(threshold, dtype=np.float64)
+    rounded = threshold.astype(np.float32)
+    return np.where(rounded.astype(np.float64) > threshold, np.nextafter(rounded, np.float32(-np.inf)), rounded)
+
+
+def _order_key(values: np.ndarray) -> np.ndarray:
+    """Khóa int32 cùng thứ tự với float32 (searchsorted trên số nguyên nhanh hơn trên số thực); -0.0 coi như 0.0."""
+    bits = (np.asarray(values, dtype=np.float32) + np.float32(0.0)).view(np.int32)
+    return bits ^ ((bits >> 31) & np.int32(0x7FFFFFFF))
+
+
+def _lowest_bit(mask: np.ndarray) -> np.ndarray:
+    """1 + vị trí bit 1 thấp nhất của từng phần tử (mask khác 0, kiểu unsigned), tức popcount(m ^ (m - 1))."""
+    if _HAS_BITWISE_COUNT:
+        return np.bitwise_count(mask ^ (mask - mask.dtype.type(1))).astype(np.intp)
+    # NumPy 1.x: m & -m chỉ giữ bit thấp nhất = 2^k, đổi sang float64 là chính xác và frexp trả số mũ k + 1
+    lowest = mask & (~mask + mask.dtype.type(1))
+    return np.frexp(lowest.astype(np.float64))[1].astype(np.intp)
+
+
+def _as_matrix(X, feature_names: Sequence[str], dtype) -> np.ndarray:
+    """(n, p) liên tục theo thứ tự feature_names; DataFrame được chọn cột theo tên, mảng giữ nguyên thứ tự cột."""
+    if isinstance(X, pd.DataFrame):
+        X = X[list(feature_names)].to_numpy(dtype=np.float64)
+    elif isinstance(X, np.ndarray) and X.dtype == dtype and X.ndim == 2 and X.flags.c_contiguous:
+        return X
+    with np.errstate(over="ignore"):
+        return np.ascontiguousarray(np.atleast_2d(np.asarray(X, dtype=np.float64)), dtype=dtype)
+
+
+def _feature_names(model, feature_names: Optional[Sequence[str]]) -> List[str]:
+    """Tên cột lúc fit (feature_names_in_) nếu có, không thì theo feature_names truyền vào."""
+    names = getattr(model, "feature_names_in_", None)
+    if names is None and feature_names is None:
+        raise NotImplementedError("Mô hình không lưu tên cột, cần truyền feature_names")
+    return list(feature_names if names is None else names)
+
+
+def _proba_columns(p: np.ndarray) -> np.ndarray:
+    return np.column_stack([1.0 - p, p])
+
+
+def _walk(left: np.ndarray, right: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """Thứ tự lá từ trái sang phải, khoảng lá [first, last] của cây con tại mỗi node và độ sâu của 1 cây."""
+    leaves, internal, stack = [], [], [(0, 0)]
+    depth = 0
+    while stack:
+        node, level = stack.pop()
+        depth = max(depth, level)
+        if left[node] < 0:
+            leaves.append(node)
+        else:
+            internal.append(node)
+            stack.extend(((right[node], level + 1), (left[node], level + 1)))
+    first = np.zeros(len(left), dtype=np.int64)
+    last = np.zeros(len(left), dtype=np.int64)
+    first[leaves] = last[leaves] = np.arange(len(leaves))
+    # Duyệt ngược thứ tự tiền tự: node con luôn được tính trước node cha
+    for node in reversed(internal):
+        first[node], last[node] = first[left[node]], last[right[node]]
+    return np.asarray(leaves, dtype=np.int64), first, last, depth
+
+
+class CompiledForest:
+    """
+    Rừng cây đã biên dịch (RandomForest hoặc XGBoost nhị phân): đầu ra = base_score + tổng giá trị lá của các cây,
+    qua sigmoid nếu link = 'logit'.
+    """
+
+    def __init__(self, trees: List[Tree], feature_names: Sequence[str], base_score: float = 0.0,
+                 link: str = "identity", allow_inf: bool = True):
+        self.feature_names = list(feature_names)
+        self.base_score = float(base_score)
+        self.link = link
+        self.allow_inf = allow_inf
+        self.n_trees = len(trees)
+
+        # Mảng node liên tục của cả rừng; lá trỏ về chính nó (ngưỡng +inf) nên duyệt đủ depth bước vẫn đứng yên
+        sizes = [len(tree[2]) for tree in trees]
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.intp)
+        feature, threshold, left, right, missing_left, value = (
+            [np.asarray(tree[k]) for tree in trees] for k in range(6))
+        is_leaf = [child < 0 for child in left]
+        local = [np.arange(size) for size in sizes]
+        self.feature = np.concatenate([np.where(leaf, 0, f) for leaf, f in zip(is_leaf, feature)]).astype(np.intp)
+        self.threshold = np.concatenate([np.where(leaf, np.float32(np.inf), t).astype(np.float32)
+                                         for leaf, t in zip(is_leaf, threshold)])
+        self.left = np.concatenate([np.where(leaf, i, c) + off for leaf, i, c, off
+                                    in zip(is_leaf, local, left, offsets)]).astype(np.intp)
+        self.right = np.concatenate([np.where(leaf, i, c) + off for leaf, i, c, off
+                                     in zip(is_leaf, local, right, offsets)]).astype(np.intp)
+        self.missing_left = np.concatenate(missing_left).astype(bool)
+        self.value = np.concatenate([np.where(leaf, v, 0.0) for leaf, v in zip(is_leaf, value)]).astype(np.float64)
+        self.roots = offsets
+
+        walks = [_walk(tree[2], tree[3]) for tree in trees]
+        self.depth = max(walk[3] for walk in walks)
+        self._build_tables(trees, walks)
+
+    def _build_tables(self, trees: List[Tree], walks: List[Tuple[np.ndarray, np.ndarray, np.ndarray, int]]):
+        """Bảng AND tiền tố theo từng chỉ số (xem docstring module) và bảng giá trị lá theo thứ tự trái -> phải."""
+        max_leaves = max(len(walk[0]) for walk in walks)
+        # Mask hẹp nhất chứa đủ số lá của cây lớn nhất (cây lớn hơn 64 lá dùng nhiều word)
+        self._bits = next((bits for bits in (8, 16, 32) if max_leaves <= bits), 64)
+        self._dtype = {8: np.uint8, 16: np.uint16, 32: np.uint32, 64: np.uint64}[self._bits]
+        self._words = -(-max_leaves // self._bits)
+        full = (1 << (self._bits * self._words)) - 1
+        word_mask = (1 << self._bits) - 1
+
+        self._leaf_value = np.zeros((self.n_trees, self._bits * self._words))
+        nodes = [[] for _ in self.feature_names]
+        for t, (tree, (order, first, last, _)) in enumerate(zip(trees, walks)):
+            feature, threshold, left, _, missing_left, value = tree
+            self._leaf_value[t, :len(order)] = np.asarray(value, dtype=np.float64)[order]
+            for node in np.flatnonzero(np.asarray(left) >= 0):
+                a, b = int(first[left[node]]), int(last[left[node]])
+                mask = full ^ ((1 << (b + 1)) - (1 << a))
+                words = [(mask >> (w * self._bits)) & word_mask for w in range(self._words)]
+                nodes[feature[node]].append((np.float32(threshold[node]), t, words, bool(missing_left[node])))
+
+        self._features, self._keys, self._tables = [], [], []
+        for j, entries in enumerate(nodes):
+            if not entries:
+                continue
+            entries.sort(key=lambda entry: entry[0])
+            k = len(entries)
+            # Dòng i = AND mask của i node đầu (ngưỡng nhỏ nhất); dòng k + 1 = các node đưa giá trị thiếu sang phải
+            table = np.full((k + 2, self.n_trees, self._words), word_mask, dtype=self._dtype)
+            trees_of = np.asarray([entry[1] for entry in entries])
+            table[1 + np.arange(k), trees_of] = np.asarray([entry[2] for entry in entries], dtype=self._dtype)
+            np.bitwise_and.accumulate(table[:k + 1], axis=0, out=table[:k + 1])
+            for _, t, words, missing_left in entries:
+                if not missing_left:
+                    table[k + 1, t] &= np.asarray(words, dtype=self._dtype)
+            self._features.append(j)
+            self._keys.append(_order_key(np.asarray([entry[0] for entry in entries], dtype=np.float32)))
+            self._tables.append(table.reshape(k + 2, -1))
+        self._leaf_offset = (np.arange(self.n_trees) * self._bits * self._words - 1).astype(np.intp)
+        self._chunk_rows = max(64, _CHUNK_BYTES // self._tables[0][0].nbytes) if self._tables else 1
+
+    @classmethod
+    def from_sklearn(cls, forest: RandomForestClassifier, feature_names: Sequence[str] = None) -> "CompiledForest":
+        """RandomForestClassifier nhị phân: xác suất lớp 1 = trung bình tỷ lệ lớp 1 tại lá của các cây."""
+        if len(forest.classes_) != 2:
+            raise NotImplementedError("Chỉ hỗ trợ RandomForest 2 lớp")
+        trees = []
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            counts = tree.value[:, 0, :]
+            with np.errstate(invalid="ignore"):
+                value = counts[:, 1] / counts.sum(axis=1) / len(forest.estimators_)
+            trees.append((tree.feature, _float32_floor(tree.threshold), tree.children_left, tree.children_right,
+                          tree.missing_go_to_left.astype(bool), value))
+        # sklearn từ chối giá trị vô cùng (NaN thì đi theo missing_go_to_left)
+        return cls(trees, _feature_names(forest, feature_names), allow_inf=False)
+
+    @classmethod
+    def from_xgboost(cls, model, feature_names: Sequence[str] = None) -> "CompiledForest":
+        """XGBClassifier nhị phân (binary:logistic): đọc cây từ JSON của booster, giữ nguyên ngưỡng float32."""
+        if getattr(model, "best_iteration", None) is not None:
+            raise NotImplementedError("Mô hình dùng early stopping (best_iteration), chưa hỗ trợ")
+        learner = json.loads(model.get_booster().save_raw("json"))["learner"]
+        if learner["objective"]["name"] != "binary:logistic":
+            raise NotImplementedError(f"Chưa hỗ trợ objective {learner['objective']['name']}")
+        booster = learner["gradient_booster"]
+        if booster.get("name") != "gbtree":
+            raise NotImplementedError(f"Chưa hỗ trợ booster {booster.get('name')}")
+
+        trees = []
+        for tree in booster["model"]["trees"]:
+            if any(tree.get("split_type", [])):
+                raise NotImplementedError("Cây có split theo biến phân loại, chưa hỗ trợ")
+            condition = np.asarray(tree["split_conditions"], dtype=np.float32)
+            # XGBoost rẽ trái khi x < ngưỡng: với float32 tương đương x <= số float32 liền trước ngưỡng.
+            # Tại lá, split_conditions là giá trị lá (đã nhân learning rate)
+            trees.append((np.asarray(tree["split_indices"]), np.nextafter(condition, np.float32(-np.inf)),
+                          np.asarray(tree["left_children"]), np.asarray(tree["right_children"]),
+                          np.asarray(tree["default_left"], dtype=bool), condition.astype(np.float64)))
+        # base_score lưu trên thang xác suất ('0.5' hoặc '[5E-1]' tùy phiên bản)
+        base = float(str(learner["learner_model_param"]["base_score"]).strip("[]"))
+        names = model.get_booster().feature_names
+        if not names and feature_names is None:
+            raise NotImplementedError("Mô hình không lưu tên cột, cần truyền feature_names")
+        return cls(trees, names or feature_names, base_score=np.log(base / (1.0 - base)), link="logit")
+
+    def _traverse(self, X32: np.ndarray) -> np.ndarray:
+        """Duyệt cây vector hóa: (n, số cây) vị trí node, mỗi bước mọi cặp (hồ sơ, cây) xuống 1 mức."""
+        node = np.broadcast_to(self.roots, (len(X32), self.n_trees))
+        rows = np.arange(len(X32))[:, None]
+        has_nan = np.isnan(X32).any()
+        for _ in range(self.depth):
+            x = X32[rows, self.feature[node]]
+            go_left = x <= self.threshold[node]
+            if has_nan:
+                go_left |= np.isnan(x) & self.missing_left[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        return self.value[node]
+
+    def _lookup(self, X32: np.ndarray) -> np.ndarray:
+        """Bảng bitmask: mỗi chỉ số 1 searchsorted + 1 dòng bảng, AND theo khối _chunk_rows dòng."""
+        n = len(X32)
+        keys = np.ascontiguousarray(_order_key(X32).T)
+        missing = np.isnan(X32)
+        has_nan = missing.any()
+        ranks = []
+        for j, sorted_keys in zip(self._features, self._keys):
+            rank = np.searchsorted(sorted_keys, keys[j])
+            if has_nan:
+                rank[missing[:, j]] = len(sorted_keys) + 1
+            ranks.append(rank)
+
+        out = np.empty((n, self.n_trees))
+        chunk = min(n, self._chunk_rows)
+        acc = np.empty((chunk, self._tables[0].shape[1]), dtype=self._dtype)
+        buf = np.empty_like(acc)
+        for start in range(0, n, chunk):
+            stop = min(start + chunk, n)
+            a, b = acc[:stop - start], buf[:stop - start]
+            np.take(self._tables[0], ranks[0][start:stop], axis=0, out=a)
+            for table, rank in zip(self._tables[1:], ranks[1:]):
+                np.take(table, rank[start:stop], axis=0, out=b)
+                np.bitwise_and(a, b, out=a)
+            # Lá thoát = bit 1 thấp nhất: _lowest_bit(m) - 1 (đã gộp -1 vào _leaf_offset);
+            # trên uint8/uint16 chậm hơn nhiều nên đổi sang uint32 trước
+            words = a.reshape(len(a), self.n_trees, self._words)
+            if self._words == 1:
+                mask = words[:, :, 0].astype(np.uint32) if self._bits < 32 else words[:, :, 0]
+                leaf = _lowest_bit(mask)
+            else:
+                first = np.argmax(words != 0, axis=2)
+                mask = np.take_along_axis(words, first[:, :, None], axis=2)[:, :, 0]
+                leaf = _lowest_bit(mask) + first * self._bits
+            leaf += self._leaf_offset
+            out[start:stop] = self._leaf_value.take(leaf)
+        return out
+
+    def raw_score(self, X) -> np.ndarray:
+        """base_score + tổng giá trị lá (xác suất với RandomForest, log-odds với XGBoost)."""
+        X32 = _as_matrix(X, self.feature_names, np.float32)
+        if not self.allow_inf and np.isinf(X32).any():
+            raise ValueError("Dữ liệu có giá trị vô cùng hoặc vượt quá giới hạn float32")
+        values = self._traverse(X32) if len(X32) <= TRAVERSAL_MAX_ROWS or not self._tables else self._lookup(X32)
+        return values.sum(axis=1) + self.base_score
+
+    def predict_proba(self, X) -> np.ndarray:
+        score = self.raw_score(X)
+        if self.link == "logit":
+            score = expit(score)
+        return _proba_columns(score)
+
+
+class CompiledLogistic:
+    """LogisticRegression nhị phân: sigmoid(X @ coef + intercept) trên float64 như sklearn."""
+
+    def __init__(self, model: LogisticRegression, feature_names: Sequence[str] = None):
+        if len(model.classes_) != 2:
+            raise NotImplementedError("Chỉ hỗ trợ Logistic 2 lớp")
+        self.feature_names = _feature_names(model, feature_names)
+        self.coef = model.coef_[0].astype(np.float64)
+        self.intercept = float(model.intercept_[0])
+
+    def predict_proba(self, X) -> np.ndarray:
+        X = _as_matrix(X, self.feature_names, np.float64)
+        if not np.isfinite(X).all():
+            raise ValueError("Dữ liệu có giá trị thiếu (NaN) hoặc vô cùng, Logistic không chấm được")
+        return _proba_columns(expit(X @ self.coef + self.intercept))
+
+
+class CompiledStacking:
+    """StackingClassifier 2 lớp (stack_method='predict_proba'): base models và meta-model đều đã biên dịch."""
+
+    def __init__(self, model: StackingClassifier, feature_names: Sequence[str] = None):
+        if len(model.classes_) != 2 or any(method != "predict_proba" for method in model.stack_method_):
+            raise NotImplementedError("Chỉ hỗ trợ Stacking 2 lớp với stack_method='predict_proba'")
+        self.feature_names = _feature_names(model, feature_names)
+        self.estimators = []
+        for estimator in model.estimators_:
+            if isinstance(estimator, str):  # 'drop'
+                continue
+            compiled = compile_model(estimator, self.feature_names)
+            if compiled is estimator:
+                raise NotImplementedError(f"Chưa biên dịch được base model {type(estimator).__name__}")
+            self.estimators.append(compiled)
+        self.passthrough = model.passthrough
+        n_meta = len(self.estimators) + (len(self.feature_names) if self.passthrough else 0)
+        self.final = CompiledLogistic(model.final_estimator_, feature_names=[f"stack_{i}" for i in range(n_meta)])
+
+    def predict_proba(self, X) -> np.ndarray:
+        X = _as_matrix(X, self.feature_names, np.float64)
+        # Bài toán 2 lớp: mỗi base model đóng góp 1 cột (xác suất lớp 1), theo đúng thứ tự estimators như sklearn
+        meta = [estimator.predict_proba(X)[:, 1] for estimator in self.estimators]
+        if self.passthrough:
+            meta.extend(X.T)
+        return self.final.predict_proba(np.column_stack(meta))
+
+
+def compile_model(estimator, feature_names: Sequence[str] = None) -> Any:
+    """
+    Bản biên dịch của 1 mô hình (cùng giao diện predict_proba, nhận DataFrame hoặc mảng theo thứ tự feature_names).
+
+    Args:
+        estimator: Stacking, RandomForest, Logistic hoặc XGBoost đã fit
+        feature_names: Thứ tự cột khi mô hình được fit trên mảng (không có feature_names_in_)
+
+    Returns:
+        Bản biên dịch, hoặc chính estimator nếu chưa hỗ trợ (đa lớp, XGBoost có early stopping/biến phân loại, mô
+        hình không lưu tên cột mà không có feature_names, ...), nên nơi gọi luôn dùng được như 1 mô hình sklearn
+    """
+    try:
+        if isinstance(estimator, StackingClassifier):
+            return CompiledStacking(estimator, feature_names)
+        if isinstance(estimator, RandomForestClassifier):
+            return CompiledForest.from_sklearn(estimator, feature_names)
+        if isinstance(estimator, LogisticRegression):
+            return CompiledLogistic(estimator, feature_names)
+        if hasattr(estimator, "get_booster"):
+            return CompiledForest.from_xgboost(estimator, feature_names)
+    except NotImplementedError:
+        pass
+    return estimator
+
+
+def feature_array(rows, feature_names: Sequence[str]) -> np.ndarray:
+    """
+    Mảng float32 (n, p) liên tục theo thứ tự feature_names, đầu vào của ArrayScorer.
+
+    Args:
+        rows: 1 dict (tên chỉ số -> giá trị), list dict, hoặc mảng/list giá trị đã theo đúng thứ tự feature_names
+    """
+    if isinstance(rows, Mapping):
+        rows = [rows]
+    if len(rows) and isinstance(rows[0], Mapping):
+        rows = [[row[name] for name in feature_names] for row in rows]
+    # Giá trị vượt giới hạn float32 thành vô cùng (như _as_matrix), mô hình tự báo lỗi nếu không chấm được
+    with np.errstate(over="ignore"):
+        return np.ascontiguousarray(np.atleast_2d(np.asarray(rows, dtype=np.float64)), dtype=np.float32)
+
+
+class ArrayScorer:
+    """
+    predict_proba trên mảng float32 (n, p) theo thứ tự feature_names, không qua pandas.
+
+    Thứ tự cột của mô hình (feature_names của bản biên dịch, feature_names_in_ của sklearn) được kiểm tra 1 lần lúc
+    tạo, mỗi lần chấm chỉ kiểm tra dtype/shape. Mô hình không biên dịch được (compile_model trả lại nguyên vẹn) vẫn
+    nhận DataFrame để sklearn không cảnh báo thiếu tên cột.
+    """
+
+    def __init__(self, model, feature_names: Sequence[str]):
+        self.model = model
+        self.feature_names = list(feature_names)
+        names = getattr(model, "feature_names", None)
+        self._frame = names is None
+        if names is None:
+            names = getattr(model, "feature_names_in_", None)
+        if names is not None and list(names) != self.feature_names:
+            raise ValueError(f"Thứ tự cột của {type(model).__name__} khác thứ tự chuẩn: {list(names)}")
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        if not (isinstance(X, np.ndarray) and X.dtype == np.float32 and X.ndim == 2
+                and X.shape[1] == len(self.feature_names) and X.flags.c_contiguous):
+            raise ValueError(f"Cần mảng float32 liên tục (n, {len(self.feature_names)}) theo thứ tự cột chuẩn "
+                             f"(feature_array), nhận {type(X).__name__} {getattr(X, 'dtype', '')} "
+                             f"{getattr(X, 'shape', '')}")
+        if self._frame:
+            return self.model.predict_proba(pd.DataFrame(X, columns=self.feature_names))
+        return self.model.predict_proba(X)
+
+
+def max_abs_diff(original, compiled, X) -> Optional[float]:
+    """Sai khác tuyệt đối lớn nhất giữa xác suất lớp 1 của mô hình gốc và bản biên dịch (None nếu không biên dịch)."""
+    if compiled is original:
+        return None
+    return float(np.max(np.abs(original.predict_proba(X)[:, 1] - compiled.predict_proba(X)[:, 1])))
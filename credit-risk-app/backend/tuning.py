@@ -0,0 +1,330 @@
+"""
+Tuning Module - Tìm kiếm siêu tham số song song cho 3 base models của Stacking Classifier
+Randomized search / Successive halving chạy trên process pool, dùng chung các fold CV đã cache
+Kết quả lưu vào trials store (JSON Lines), cấu hình tốt nhất được đưa vào file mô hình
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any
+
+import numpy as np
+import pandas as pd
+from scipy.stats import loguniform
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import StratifiedKFold, ParameterSampler
+
+from model import CreditRiskModel, MODEL_COLS, DEFAULT_PARAMS, make_base_estimator
+
+# Không gian tìm kiếm cho từng base model (tên trùng với tên estimator trong StackingClassifier)
+SEARCH_SPACE = {
+    "logistic": {
+        "C": loguniform(1e-3, 1e2),
+    },
+    "random_forest": {
+        "n_estimators": [100, 200, 300],
+        "max_depth": [4, 6, 8, 10, 12, None],
+        "min_samples_leaf": [1, 2, 4, 8],
+        "max_features": ["sqrt", 0.5, None],
+    },
+    "xgboost": {
+        "n_estimators": [100, 200, 400],
+        "max_depth": [3, 4, 5, 6, 8],
+        "learning_rate": loguniform(0.02, 0.3),
+        "subsample": [0.7, 0.85, 1.0],
+        "colsample_bytree": [0.6, 0.8, 1.0],
+        "min_child_weight": [1, 3, 5],
+    },
+}
+
+TRIALS_FILE = "tuning_trials.jsonl"
+CACHE_DIR = ".tuning_cache"
+
+# Dữ liệu dùng chung trong mỗi worker process (load 1 lần qua initializer)
+_WORKER_DATA = {}
+
+
+# ================================================================================================
+# CACHE FOLD CV
+# ================================================================================================
+
+def prepare_fold_cache(X: np.ndarray, y: np.ndarray, n_folds: int = 5,
+                       cache_dir: str = CACHE_DIR, random_state: int = 42) -> Dict[str, Any]:
+    """
+    Ghi X, y và fold id ra file .npy để mọi worker memory-map dùng chung
+
+    Args:
+        X: Ma trận 14 chỉ số (n_samples, 14)
+        y: Nhãn default (0/1)
+        n_folds: Số fold Stratified K-Fold
+        cache_dir: Thư mục cache
+        random_state: Seed chia fold
+
+    Returns:
+        Dict thông tin cache (đường dẫn, data_hash, n_folds)
+    """
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    y = np.ascontiguousarray(y, dtype=np.int8)
+
+    digest = hashlib.sha1()
+    digest.update(X.tobytes())
+    digest.update(y.tobytes())
+    digest.update(f"{n_folds}-{random_state}".encode())
+    data_hash = digest.hexdigest()[:16]
+
+    path = os.path.join(cache_dir, data_hash)
+    if not os.path.exists(os.path.join(path, "folds.npy")):
+        os.makedirs(path, exist_ok=True)
+        folds = np.empty(len(y), dtype=np.int8)
+        skf = StratifiedKFold(n_splits=n_folds, shuffle=True, random_state=random_state)
+        for fold_id, (_, val_idx) in enumerate(skf.split(X, y)):
+            folds[val_idx] = fold_id
+        np.save(os.path.join(path, "X.npy"), X)
+        np.save(os.path.join(path, "y.npy"), y)
+        # Ghi folds.npy sau cùng: file này có nghĩa là cache đã đầy đủ
+        np.save(os.path.join(path, "folds.npy"), folds)
+
+    return {"path": path, "data_hash": data_hash, "n_folds": n_folds}
+
+
+def _init_worker(cache_path: str):
+    """Initializer của process pool: memory-map dữ liệu và fold 1 lần cho mỗi worker"""
+    _WORKER_DATA["X"] = np.load(os.path.join(cache_path, "X.npy"), mmap_mode="r")
+    _WORKER_DATA["y"] = np.load(os.path.join(cache_path, "y.npy"), mmap_mode="r")
+    _WORKER_DATA["folds"] = np.load(os.path.join(cache_path, "folds.npy"), mmap_mode="r")
+
+
+def _evaluate_fold(task: Dict[str, Any]) -> Dict[str, Any]:
+    """Huấn luyện 1 base model trên (k-1) fold và tính AUC trên fold còn lại"""
+    X, y, folds = _WORKER_DATA["X"], _WORKER_DATA["y"], _WORKER_DATA["folds"]
+    val_mask = folds == task["fold"]
+
+    estimator = make_base_estimator(task["model"], task["params"], n_jobs=1)
+    start = time.perf_counter()
+    estimator.fit(X[~val_mask], y[~val_mask])
+    fit_seconds = time.perf_counter() - start
+
+    auc = roc_auc_score(y[val_mask], estimator.predict_proba(X[val_mask])[:, 1])
+    return dict(task, auc=float(auc), fit_seconds=round(fit_seconds, 4))
+
+
+# ================================================================================================
+# TRIALS STORE
+# ================================================================================================
+
+def params_key(params: Dict[str, Any]) -> str:
+    """Khóa ổn định cho 1 cấu hình siêu tham số"""
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+
+
+class TrialsStore:
+    """Lưu kết quả từng (model, cấu hình, fold) vào file JSON Lines để tra cứu và chạy tiếp"""
+
+    def __init__(self, filepath: str = TRIALS_FILE):
+        self.filepath = filepath
+        self.records = {}
+        if os.path.exists(filepath):
+            with open(filepath, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.records[self._key(record)] = record
+
+    @staticmethod
+    def _key(record: Dict[str, Any]) -> tuple:
+        return record["data_hash"], record["model"], record["params_key"], record["fold"]
+
+    def get(self, data_hash: str, model: str, params: Dict[str, Any], fold: int):
+        return self.records.get((data_hash, model, params_key(params), fold))
+
+    def add(self, record: Dict[str, Any]):
+        self.records[self._key(record)] = record
+        with open(self.filepath, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def leaderboard(self, data_hash: str, model: str, n_folds: int) -> List[Dict[str, Any]]:
+        """Các cấu hình đã chạy đủ n_folds, sắp xếp theo AUC trung bình giảm dần"""
+        grouped = {}
+        for (h, m, key, _), record in self.records.items():
+            if h == data_hash and m == model:
+                grouped.setdefault(key, []).append(record)
+
+        board = []
+        for key, records in grouped.items():
+            if len(records) >= n_folds:
+                aucs = [r["auc"] for r in records]
+                board.append({
+                    "params": records[0]["params"],
+                    "params_key": key,
+                    "mean_auc": float(np.mean(aucs)),
+                    "std_auc": float(np.std(aucs)),
+                })
+        return sorted(board, key=lambda r: r["mean_auc"], reverse=True)
+
+
+# ================================================================================================
+# SEARCH
+# ================================================================================================
+
+def _to_builtin(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Chuyển numpy scalar về kiểu Python để lưu JSON"""
+    return {k: (v.item() if isinstance(v, np.generic) else v) for k, v in params.items()}
+
+
+def sample_candidates(model: str, n_candidates: int, random_state: int = 42) -> List[Dict[str, Any]]:
+    """Lấy ngẫu nhiên n cấu hình từ SEARCH_SPACE, luôn giữ cấu hình mặc định làm mốc so sánh"""
+    sampled = [
+        _to_builtin(p)
+        for p in ParameterSampler(SEARCH_SPACE[model], n_iter=max(n_candidates - 1, 0), random_state=random_state)
+    ]
+    candidates = [dict(DEFAULT_PARAMS[model])] + sampled
+    unique = {params_key(p): p for p in candidates}
+    return list(unique.values())
+
+
+def _run_tasks(executor, store: TrialsStore, cache: Dict[str, Any], model: str,
+               candidates: List[Dict[str, Any]], folds: List[int]) -> Dict[str, float]:
+    """Chạy các (cấu hình, fold) chưa có trong store, trả về AUC trung bình theo params_key"""
+    pending = []
+    for params in candidates:
+        for fold in folds:
+            if store.get(cache["data_hash"], model, params, fold) is None:
+                pending.append({
+                    "data_hash": cache["data_hash"],
+                    "model": model,
+                    "params": params,
+                    "params_key": params_key(params),
+                    "fold": fold,
+                })
+
+    for record in executor.map(_evaluate_fold, pending, chunksize=max(1, len(pending) // 32)):
+        record["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        store.add(record)
+
+    return {
+        params_key(params): float(np.mean([
+            store.get(cache["data_hash"], model, params, fold)["auc"] for fold in folds
+        ]))
+        for params in candidates
+    }
+
+
+def search_model(executor, store: TrialsStore, cache: Dict[str, Any], model: str,
+                 n_candidates: int = 27, strategy: str = "halving", eta: int = 3,
+                 random_state: int = 42) -> Dict[str, Any]:
+    """
+    Tìm siêu tham số tốt nhất cho 1 base model
+
+    Args:
+        executor: ProcessPoolExecutor đã khởi tạo với fold cache
+        store: TrialsStore
+        cache: Thông tin fold cache từ prepare_fold_cache
+        model: Tên base model
+        n_candidates: Số cấu hình ban đầu
+        strategy: 'halving' (successive halving theo số fold) hoặc 'random' (chạy đủ fold cho mọi cấu hình)
+        eta: Tỷ lệ loại bỏ mỗi vòng của successive halving
+
+    Returns:
+        Dict cấu hình tốt nhất và AUC trung bình trên toàn bộ fold
+    """
+    n_folds = cache["n_folds"]
+    candidates = sample_candidates(model, n_candidates, random_state)
+
+    if strategy == "halving":
+        # Vòng đầu chạy 1 fold cho mọi cấu hình, mỗi vòng sau giữ 1/eta cấu hình tốt nhất
+        # và tăng số fold, vòng cuối chạy đủ n_folds (kết quả fold cũ được tái sử dụng từ store)
+        n_rounds = max(1, int(np.log(len(candidates)) / np.log(eta) + 1e-9))
+        budgets = np.unique(np.geomspace(1, n_folds, num=n_rounds).round().astype(int))
+        for budget in budgets[:-1]:
+            scores = _run_tasks(executor, store, cache, model, candidates, list(range(budget)))
+            keep = max(1, int(np.ceil(len(candidates) / eta)))
+            candidates = sorted(candidates, key=lambda p: scores[params_key(p)], reverse=True)[:keep]
+    elif strategy != "random":
+        raise ValueError("strategy phải là 'halving' hoặc 'random'")
+
+    # Cấu hình mặc định luôn chạy đủ fold để làm mốc so sánh
+    default = DEFAULT_PARAMS[model]
+    if all(params_key(p) != params_key(default) for p in candidates):
+        candidates = candidates + [default]
+
+    scores = _run_tasks(executor, store, cache, model, candidates, list(range(n_folds)))
+    best = max(candidates, key=lambda p: scores[params_key(p)])
+
+    return {"params": best, "cv_auc": scores[params_key(best)],
+            "default_cv_auc": scores[params_key(default)]}
+
+
+def tune(csv_file_path: str, n_candidates: int = 27, strategy: str = "halving",
+         n_folds: int = 5, max_workers: int = None, trials_path: str = TRIALS_FILE,
+         cache_dir: str = CACHE_DIR, random_state: int = 42) -> Dict[str, Any]:
+    """
+    Tìm siêu tham số cho cả 3 base models trên tập train (cùng cách chia với CreditRiskModel.train)
+
+    Returns:
+        Dict gồm params tốt nhất theo từng base model và bảng tóm tắt AUC
+    """
+    df = pd.read_csv(csv_file_path)
+    missing = [c for c in ['default'] + MODEL_COLS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Thiếu cột: {missing}. Vui lòng kiểm tra lại file CSV.")
+
+    # Chỉ tune trên phần train để tập test của CreditRiskModel.train vẫn là dữ liệu chưa thấy
+    tuner = CreditRiskModel()
+    X_train, _, y_train, _ = tuner.split(df)
+    cache = prepare_fold_cache(X_train.to_numpy(), y_train.to_numpy(), n_folds, cache_dir, random_state)
+    store = TrialsStore(trials_path)
+
+    start = time.perf_counter()
+    summary = {}
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(cache["path"],)) as executor:
+        for model in DEFAULT_PARAMS:
+            summary[model] = search_model(executor, store, cache, model, n_candidates,
+                                          strategy, random_state=random_state)
+            print(f"🔧 {model}: CV AUC = {summary[model]['cv_auc']:.4f} (mặc định {summary[model]['default_cv_auc']:.4f}) | params = {summary[model]['params']}")
+
+    return {
+        "params": {model: result["params"] for model, result in summary.items()},
+        "summary": summary,
+        "data_hash": cache["data_hash"],
+        "strategy": strategy,
+        "elapsed_seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def promote(csv_file_path: str, tuning_result: Dict[str, Any],
+            model_path: str = "model_stacking.pkl") -> Dict[str, Any]:
+    """Huấn luyện lại Stacking với cấu hình tốt nhất và ghi đè file mô hình"""
+    model = CreditRiskModel(params=tuning_result["params"])
+    result = model.train(csv_file_path)
+    model.tuning = {k: v for k, v in tuning_result.items() if k != "params"}
+    model.save_model(model_path)
+    return result
+
+
+# ================================================================================================
+# MAIN
+# ================================================================================================
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tìm siêu tham số cho Stacking Classifier")
+    parser.add_argument("csv", help="File CSV huấn luyện (cột default, X_1..X_14)")
+    parser.add_argument("--n-candidates", type=int, default=27, help="Số cấu hình ban đầu cho mỗi base model")
+    parser.add_argument("--strategy", choices=["halving", "random"], default="halving")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None, help="Số process (mặc định = số CPU)")
+    parser.add_argument("--trials", default=TRIALS_FILE, help="File trials store (JSON Lines)")
+    parser.add_argument("--model-path", default="model_stacking.pkl")
+    parser.add_argument("--no-promote", action="store_true", help="Chỉ tìm kiếm, không ghi đè file mô hình")
+    args = parser.parse_args()
+
+    tuning_result = tune(args.csv, args.n_candidates, args.strategy, args.folds, args.workers, args.trials)
+    print(f"⏱️ Tuning hoàn tất sau {tuning_result['elapsed_seconds']}s")
+
+    if not args.no_promote:
+        train_result = promote(args.csv, tuning_result, args.model_path)
+        print(f"✅ AUC test với cấu hình tốt nhất: {train_result['metrics_test']['auc']:.4f}")
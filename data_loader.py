@@ -0,0 +1,140 @@
+"""
+Đọc dữ liệu huấn luyện gọn nhẹ: chỉ các cột default + X_1..X_14 (+ LGD, EAD nếu có), feature float32 và nhãn int8.
+
+Với file CSV trên đĩa, lần đọc đầu tiên sẽ ghi thêm bản nhị phân dạng cột (.npy) vào thư mục
+ẩn cạnh file CSV (ví dụ .DATASET.csv.cache/). Các lần sau nạp bằng memory-map nên gần như tức thời
+và chỉ tốn nửa bộ nhớ so với float64. Bản cache tự làm mới khi kích thước hoặc thời điểm sửa
+của file CSV thay đổi.
+"""
+import hashlib
+import json
+import os
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from stacking_model import MODEL_COLS
+from threshold_optimizer import EXPOSURE_COLS
+
+TARGET_COL = 'default'
+CACHE_VERSION = 2
+
+
+def _available_columns(source, encoding: str) -> List[str]:
+    """Các cột cần dùng có mặt trong file (để app tự báo lỗi thiếu cột thay vì pandas raise)."""
+    header = pd.read_csv(source, encoding=encoding, nrows=0).columns
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return [c for c in [TARGET_COL] + MODEL_COLS + EXPOSURE_COLS if c in header]
+
+
+def read_training_csv(source, encoding: str = 'latin-1') -> pd.DataFrame:
+    """
+    Đọc CSV chỉ với các cột default + X_1..X_14 (+ LGD, EAD nếu có), feature float32, nhãn int8.
+
+    Args:
+        source: Đường dẫn hoặc file-like (ví dụ file upload của Streamlit)
+        encoding: Encoding của file CSV
+
+    Returns:
+        DataFrame (bỏ các dòng không có nhãn default)
+    """
+    columns = _available_columns(source, encoding)
+    dtypes = {c: np.float32 for c in columns if c != TARGET_COL}
+    df = pd.read_csv(source, encoding=encoding, usecols=columns, dtype=dtypes)
+    if TARGET_COL in df.columns:
+        # Bỏ các dòng trống không có nhãn (ví dụ dòng thừa cuối file Excel xuất ra CSV)
+        df = df.dropna(subset=[TARGET_COL])
+        df[TARGET_COL] = df[TARGET_COL].astype(np.int8)
+    return df[columns].reset_index(drop=True)
+
+
+def cache_dir_for(csv_path: str) -> str:
+    """Thư mục cache ẩn nằm cạnh file CSV: <thư mục>/.<tên file>.cache"""
+    folder, name = os.path.split(os.path.abspath(csv_path))
+    return os.path.join(folder, f".{name}.cache")
+
+
+def _source_signature(csv_path: str, encoding: str) -> dict:
+    stat = os.stat(csv_path)
+    return {"version": CACHE_VERSION, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "encoding": encoding}
+
+
+def _write_cache(cache_dir: str, df: pd.DataFrame, signature: dict):
+    os.makedirs(cache_dir, exist_ok=True)
+    features = [c for c in df.columns if c != TARGET_COL]
+    # Lưu theo cột (Fortran order) để mỗi cột X_i liền mạch trong bộ nhớ khi memory-map
+    arrays = {
+        "X.npy": np.asfortranarray(df[features].to_numpy(dtype=np.float32)),
+        "y.npy": df[TARGET_COL].to_numpy(dtype=np.int8) if TARGET_COL in df.columns else None,
+    }
+    for filename, array in arrays.items():
+        if array is None:
+            continue
+        tmp_path = os.path.join(cache_dir, f"{filename}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+        os.replace(tmp_path, os.path.join(cache_dir, filename))
+    # meta.json ghi sau cùng: chỉ khi meta khớp thì các file .npy mới được coi là hợp lệ
+    meta = dict(signature, features=features, has_target=TARGET_COL in df.columns)
+    tmp_path = os.path.join(cache_dir, "meta.json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(cache_dir, "meta.json"))
+
+
+def _read_cache(cache_dir: str, signature: dict):
+    try:
+        with open(os.path.join(cache_dir, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if any(meta.get(k) != v for k, v in signature.items()):
+        return None
+
+    X = np.load(os.path.join(cache_dir, "X.npy"), mmap_mode="r")
+    # Feature dạng Fortran order -> X.T liền mạch, pandas giữ nguyên làm block mà không copy
+    df = pd.DataFrame(X, columns=meta["features"], copy=False)
+    if meta["has_target"]:
+        df.insert(0, TARGET_COL, np.load(os.path.join(cache_dir, "y.npy"), mmap_mode="r"))
+    return df
+
+
+def load_training_data(csv_path: str, encoding: str = 'latin-1', use_cache: bool = True) -> pd.DataFrame:
+    """
+    Nạp dữ liệu huấn luyện từ file CSV, ưu tiên bản cache nhị phân memory-map.
+
+    Args:
+        csv_path: Đường dẫn file CSV (có cột default, X_1..X_14)
+        encoding: Encoding của file CSV
+        use_cache: Có đọc/ghi bản cache .npy cạnh file CSV hay không
+
+    Returns:
+        DataFrame gồm default (int8), X_1..X_14 và LGD/EAD nếu có (float32)
+    """
+    if not use_cache:
+        return read_training_csv(csv_path, encoding)
+
+    cache_dir = cache_dir_for(csv_path)
+    signature = _source_signature(csv_path, encoding)
+    cached = _read_cache(cache_dir, signature)
+    if cached is not None:
+        return cached
+
+    df = read_training_csv(csv_path, encoding)
+    try:
+        _write_cache(cache_dir, df, signature)
+    except OSError:
+        # Thư mục chỉ đọc (ví dụ khi deploy): vẫn dùng dữ liệu vừa đọc, chỉ bỏ qua cache
+        pass
+    return df
+
+
+def dataset_fingerprint(df: pd.DataFrame) -> str:
+    """Mã băm nội dung dữ liệu huấn luyện (tên cột + giá trị), dùng làm khóa cache mô hình đã huấn luyện."""
+    h = hashlib.sha1()
+    for col in df.columns:
+        h.update(str(col).encode("utf-8"))
+        h.update(np.ascontiguousarray(df[col].to_numpy()).tobytes())
+    return h.hexdigest()
@@ -0,0 +1,192 @@
+"""
+Đánh giá mô hình từ đúng 1 vector xác suất cho mỗi tập (train/test).
+
+Trước đây mỗi tập gọi model.predict rồi model.predict_proba (predict tính lại predict_proba bên trong) và 5 hàm
+metric của sklearn, mỗi hàm duyệt lại dữ liệu. Ở đây:
+- Nhãn dự báo: mặc định proba > threshold = 0.5 (quy tắc argmax của model.predict). Nơi huấn luyện truyền decision
+  = PD đã hiệu chỉnh và ngưỡng Default tối ưu, khi đó nhãn là decision >= threshold, đúng quy tắc lúc chấm điểm
+  (predict, báo cáo hàng loạt, ED.py) và lúc chọn ngưỡng (threshold_optimizer tính cả PD bằng ngưỡng là Default),
+  để Accuracy/F1/ma trận nhầm lẫn khớp quyết định thực tế; AUC/KS/Brier vẫn tính trên proba
+- Sắp xếp xác suất 1 lần -> TP/FP tích lũy theo từng mức xác suất -> ROC, Precision-Recall, AUC, KS, Gini, AP
+- Khoảng tin cậy bootstrap vector hóa: B lần lấy mẫu lại được biểu diễn bằng ma trận chỉ số (B, n), đổi thành
+  ma trận số lần xuất hiện W (B, n); mọi metric của B mẫu là phép nhân ma trận / tổng tích lũy trên W,
+  không có vòng lặp Python theo từng mẫu
+
+Backend dùng bản sao giống hệt (credit-risk-app/backend/evaluation.py) và lưu kết quả qua evaluation_json để trả
+JSON ở /model-info; sửa 1 bản thì chép nguyên file sang bản kia.
+"""
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+
+N_BOOTSTRAP = 2_000
+CI_LEVEL = 0.95
+# Giới hạn số phần tử của 1 khối ma trận bootstrap (B_khối x n) để bộ nhớ tạm không tăng theo B
+_BOOTSTRAP_BLOCK = 4_000_000
+METRIC_NAMES = ["accuracy", "precision", "recall", "f1", "auc", "ks", "gini", "average_precision", "brier"]
+
+
+def _score_groups(p: np.ndarray):
+    """Sắp xếp giảm dần theo xác suất, trả về thứ tự và vị trí bắt đầu của từng nhóm xác suất bằng nhau."""
+    order = np.argsort(-p, kind="stable")
+    ps = p[order]
+    starts = np.r_[0, np.flatnonzero(ps[1:] != ps[:-1]) + 1]
+    return order, starts
+
+
+def _ranking_metrics(pos: np.ndarray, neg: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    AUC, KS, AP từ trọng số dương/âm theo nhóm xác suất (giảm dần), tính cho nhiều mẫu cùng lúc.
+
+    Args:
+        pos, neg: (B, G) tổng trọng số nhãn 1 / nhãn 0 trong từng nhóm xác suất
+    """
+    tp, fp = np.cumsum(pos, axis=1), np.cumsum(neg, axis=1)
+    n_pos, n_neg = tp[:, -1:], fp[:, -1:]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # AUC = P(điểm dương > điểm âm) + 0.5 P(bằng nhau); số âm có điểm thấp hơn = n_neg - fp
+        auc = ((pos * (n_neg - fp + 0.5 * neg)).sum(axis=1) / (n_pos * n_neg)[:, 0])
+        tpr, fpr = tp / n_pos, fp / n_neg
+        ks = np.abs(tpr - fpr).max(axis=1)
+        # Average precision = tổng (ΔRecall x Precision) tại từng mức xác suất
+        ap = (pos / n_pos * tp / (tp + fp)).sum(axis=1)
+    return {"auc": auc, "ks": ks, "gini": 2 * auc - 1, "average_precision": ap}
+
+
+def _threshold_metrics(tp, fp, fn, tn) -> Dict[str, np.ndarray]:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # zero_division=0 như sklearn
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        f1 = np.where(2 * tp + fp + fn > 0, 2 * tp / (2 * tp + fp + fn), 0.0)
+    return {"accuracy": (tp + tn) / (tp + fp + fn + tn), "precision": precision, "recall": recall, "f1": f1}
+
+
+def _predicted(proba: np.ndarray, threshold: float, decision) -> np.ndarray:
+    """Nhãn Default: proba > threshold (mặc định, như model.predict) hoặc decision >= threshold (ngưỡng tối ưu)."""
+    if decision is None:
+        return proba > threshold
+    return np.asarray(decision, dtype=np.float64) >= threshold
+
+
+def evaluate_scores(y_true, proba, threshold: float = 0.5, decision=None) -> Dict[str, Any]:
+    """
+    Mọi metric + đường cong ROC/PR từ 1 vector xác suất.
+
+    Args:
+        y_true: Nhãn 0/1
+        proba: Xác suất lớp 1 (predict_proba[:, 1])
+        threshold: Ngưỡng gán nhãn Default (0.5 = giống model.predict)
+        decision: Điểm dùng để gán nhãn theo decision >= threshold, ví dụ PD đã hiệu chỉnh so với ngưỡng tối ưu
+            (None = proba > threshold)
+
+    Returns:
+        dict gồm metrics (accuracy, precision, recall, f1, auc, ks, gini, average_precision, brier),
+        confusion (tn, fp, fn, tp), roc (DataFrame fpr/tpr/threshold), pr (DataFrame recall/precision/threshold)
+    """
+    y = np.asarray(y_true, dtype=np.float64)
+    p = np.asarray(proba, dtype=np.float64)
+    order, starts = _score_groups(p)
+    pos = np.add.reduceat(y[order], starts)[None, :]
+    neg = np.add.reduceat(1.0 - y[order], starts)[None, :]
+    group_scores = p[order][starts]
+
+    pred = _predicted(p, threshold, decision)
+    tp = float((y * pred).sum())
+    fp = float(pred.sum() - tp)
+    fn = float(y.sum() - tp)
+    tn = float(len(y) - tp - fp - fn)
+
+    metrics = {k: float(v[0]) for k, v in _ranking_metrics(pos, neg).items()}
+    metrics.update({k: float(v) for k, v in _threshold_metrics(tp, fp, fn, tn).items()})
+    metrics["brier"] = float(np.mean((p - y) ** 2))
+
+    tp_curve, fp_curve = np.cumsum(pos[0]), np.cumsum(neg[0])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        roc = pd.DataFrame({
+            "fpr": np.r_[0.0, fp_curve / fp_curve[-1]],
+            "tpr": np.r_[0.0, tp_curve / tp_curve[-1]],
+            "threshold": np.r_[np.inf, group_scores],
+        })
+        pr = pd.DataFrame({
+            "recall": tp_curve / tp_curve[-1],
+            "precision": tp_curve / (tp_curve + fp_curve),
+            "threshold": group_scores,
+        })
+    return {
+        "metrics": {name: metrics[name] for name in METRIC_NAMES},
+        "confusion": {"tn": int(tn), "fp": int(fp), "fn": int(fn), "tp": int(tp)},
+        "roc": roc,
+        "pr": pr,
+    }
+
+
+def bootstrap_metrics(y_true, proba, threshold: float = 0.5, n_boot: int = N_BOOTSTRAP,
+                      seed: int = 42, decision=None) -> pd.DataFrame:
+    """
+    Metric của n_boot mẫu bootstrap (lấy lại n dòng có hoàn lại), vector hóa theo khối mẫu.
+
+    Returns:
+        DataFrame (n_boot dòng, cột = METRIC_NAMES); mẫu không có đủ 2 lớp cho AUC/KS/AP = NaN
+    """
+    y = np.asarray(y_true, dtype=np.float64)
+    p = np.asarray(proba, dtype=np.float64)
+    n = len(y)
+    order, starts = _score_groups(p)
+    y_sorted, p_sorted = y[order], p[order]
+    pred_sorted = _predicted(p, threshold, decision)[order].astype(np.float64)
+    sq_err = (p_sorted - y_sorted) ** 2
+
+    rng = np.random.default_rng(seed)
+    block = max(1, _BOOTSTRAP_BLOCK // max(n, 1))
+    results = []
+    for b0 in range(0, n_boot, block):
+        b = min(block, n_boot - b0)
+        # Ma trận chỉ số (b, n) -> số lần xuất hiện của từng dòng (đã theo thứ tự sắp xếp) trong mỗi mẫu
+        idx = rng.integers(0, n, size=(b, n))
+        W = np.bincount((idx + n * np.arange(b)[:, None]).ravel(), minlength=b * n).reshape(b, n)
+        W = W.astype(np.float64)
+
+        tp = W @ (y_sorted * pred_sorted)
+        fp = W @ ((1.0 - y_sorted) * pred_sorted)
+        fn = W @ y_sorted - tp
+        tn = n - tp - fp - fn
+        block_metrics = _threshold_metrics(tp, fp, fn, tn)
+        block_metrics.update(_ranking_metrics(np.add.reduceat(W * y_sorted, starts, axis=1),
+                                              np.add.reduceat(W * (1.0 - y_sorted), starts, axis=1)))
+        block_metrics["brier"] = W @ sq_err / n
+        results.append(pd.DataFrame(block_metrics))
+    return pd.concat(results, ignore_index=True)[METRIC_NAMES]
+
+
+def confidence_intervals(samples: pd.DataFrame, level: float = CI_LEVEL) -> pd.DataFrame:
+    """Khoảng tin cậy percentile từ các mẫu bootstrap: DataFrame (index = metric) với cột lower, upper."""
+    alpha = (1.0 - level) / 2
+    values = samples.to_numpy()
+    with np.errstate(all="ignore"):
+        lower, upper = np.nanquantile(values, [alpha, 1.0 - alpha], axis=0)
+    return pd.DataFrame({"lower": lower, "upper": upper}, index=samples.columns)
+
+
+def evaluate_split(y_true, proba, threshold: float = 0.5, n_boot: int = N_BOOTSTRAP,
+                   level: float = CI_LEVEL, seed: int = 42, decision=None) -> Dict[str, Any]:
+    """evaluate_scores + khoảng tin cậy bootstrap (ci: DataFrame lower/upper theo metric) cho 1 tập dữ liệu."""
+    result = evaluate_scores(y_true, proba, threshold, decision)
+    result["ci"] = confidence_intervals(bootstrap_metrics(y_true, proba, threshold, n_boot, seed, decision), level)
+    result["threshold"] = threshold
+    result["ci_level"] = level
+    result["n_bootstrap"] = n_boot
+    return result
+
+
+def evaluation_json(result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Bản JSON của evaluate_split: roc {fpr, tpr}, pr {recall, precision} thành list (bỏ cột threshold, có inf),
+    ci thành {metric: [lower, upper]}.
+    """
+    out = dict(result)
+    out["roc"] = {"fpr": result["roc"]["fpr"].tolist(), "tpr": result["roc"]["tpr"].tolist()}
+    out["pr"] = {"recall": result["pr"]["recall"].tolist(), "precision": result["pr"]["precision"].tolist()}
+    out["ci"] = {name: [float(row.lower), float(row.upper)] for name, row in result["ci"].iterrows()}
+    return out
@@ -0,0 +1,149 @@
+"""
+Tính 14 chỉ số tài chính X1..X14 từ file Excel 3 sheet (CDKT/BCTN/LCTT).
+
+Tách riêng khỏi ED.py để dùng chung cho ứng dụng Streamlit, xuất báo cáo hàng loạt và benchmark.
+"""
+import numpy as np
+import pandas as pd
+
+# =========================
+# TÍNH X1..X14 TỪ 3 SHEET (CDKT/BCTN/LCTT) - SỬ DỤNG TÊN TIẾNG VIỆT (GIỮ NGUYÊN)
+# =========================
+
+# Bảng ánh xạ Tên chỉ số tiếng Việt
+COMPUTED_COLS = [
+    "Biên Lợi nhuận Gộp (X1)", "Biên Lợi nhuận Tr.Thuế (X2)", "ROA Tr.Thuế (X3)", 
+    "ROE Tr.Thuế (X4)", "Tỷ lệ Nợ/TTS (X5)", "Tỷ lệ Nợ/VCSH (X6)", 
+    "Thanh toán Hiện hành (X7)", "Thanh toán Nhanh (X8)", "Khả năng Trả lãi (X9)", 
+    "Khả năng Trả nợ Gốc (X10)", "Tỷ lệ Tiền/VCSH (X11)", "Vòng quay HTK (X12)", 
+    "Kỳ thu tiền BQ (X13)", "Hiệu suất Tài sản (X14)"
+]
+
+# Alias các dòng quan trọng trong từng sheet (GIỮ NGUYÊN)
+ALIAS_IS = {
+    "doanh_thu_thuan": ["Doanh thu thuần", "Doanh thu bán hàng", "Doanh thu thuần về bán hàng và cung cấp dịch vụ"],
+    "gia_von": ["Giá vốn hàng bán"],
+    "loi_nhuan_gop": ["Lợi nhuận gộp"],
+    "chi_phi_lai_vay": ["Chi phí lãi vay", "Chi phí tài chính (trong đó: chi phí lãi vay)"],
+    "loi_nhuan_truoc_thue": ["Tổng lợi nhuận kế toán trước thuế", "Lợi nhuận trước thuế", "Lợi nhuận trước thuế thu nhập DN"],
+}
+ALIAS_BS = {
+    "tong_tai_san": ["Tổng tài sản"],
+    "von_chu_so_huu": ["Vốn chủ sở hữu", "Vốn CSH"],
+    "no_phai_tra": ["Nợ phải trả"],
+    "tai_san_ngan_han": ["Tài sản ngắn hạn"],
+    "no_ngan_han": ["Nợ ngắn hạn"],
+    "hang_ton_kho": ["Hàng tồn kho"],
+    "tien_tdt": ["Tiền và các khoản tương đương tiền", "Tiền và tương đương tiền"],
+    "phai_thu_kh": ["Phải thu ngắn hạn của khách hàng", "Phải thu khách hàng"],
+    "no_dai_han_den_han": ["Nợ dài hạn đến hạn trả", "Nợ dài hạn đến hạn"],
+}
+ALIAS_CF = {
+    "khau_hao": ["Khấu hao TSCĐ", "Khấu hao", "Chi phí khấu hao"],
+}
+
+def _pick_year_cols(df: pd.DataFrame):
+    """Chọn 2 cột năm gần nhất từ sheet (ưu tiên cột có nhãn là năm)."""
+    numeric_years = []
+    for c in df.columns[1:]:
+        try:
+            y = int(float(str(c).strip()))
+            if 1990 <= y <= 2100:
+                numeric_years.append((y, c))
+        except Exception:
+            continue
+    if numeric_years:
+        numeric_years.sort(key=lambda x: x[0])
+        return numeric_years[-2][1], numeric_years[-1][1]
+    # fallback: 2 cột cuối
+    cols = df.columns[-2:]
+    return cols[0], cols[1]
+
+def _get_row_vals(df: pd.DataFrame, aliases: list[str]):
+    """Tìm dòng theo alias. Trả về (prev, cur) theo 2 cột năm gần nhất."""
+    label_col = df.columns[0]
+    prev_col, cur_col = _pick_year_cols(df)
+    mask = False
+    for alias in aliases:
+        mask = mask | df[label_col].astype(str).str.contains(alias, case=False, na=False)
+    rows = df[mask]
+    if rows.empty:
+        return np.nan, np.nan
+    row = rows.iloc[0]
+
+    def to_num(x):
+        try:
+            # Xóa dấu phẩy, khoảng trắng
+            return float(str(x).replace(",", "").replace(" ", ""))
+        except Exception:
+            return np.nan
+
+    return to_num(row[prev_col]), to_num(row[cur_col])
+
+def compute_ratios_from_three_sheets(xlsx_file) -> pd.DataFrame:
+    """Đọc 3 sheet CDKT/BCTN/LCTT và tính X1..X14 theo yêu cầu."""
+    bs = pd.read_excel(xlsx_file, sheet_name="CDKT", engine="openpyxl")
+    is_ = pd.read_excel(xlsx_file, sheet_name="BCTN", engine="openpyxl")
+    cf = pd.read_excel(xlsx_file, sheet_name="LCTT", engine="openpyxl")
+
+    # ---- Tính toán các biến số tài chính (GIỮ NGUYÊN CÁCH TÍNH)
+    DTT_prev, DTT_cur         = _get_row_vals(is_, ALIAS_IS["doanh_thu_thuan"])
+    GVHB_prev, GVHB_cur = _get_row_vals(is_, ALIAS_IS["gia_von"])
+    LNG_prev, LNG_cur         = _get_row_vals(is_, ALIAS_IS["loi_nhuan_gop"])
+    LNTT_prev, LNTT_cur = _get_row_vals(is_, ALIAS_IS["loi_nhuan_truoc_thue"])
+    LV_prev, LV_cur           = _get_row_vals(is_, ALIAS_IS["chi_phi_lai_vay"])
+    TTS_prev, TTS_cur           = _get_row_vals(bs, ALIAS_BS["tong_tai_san"])
+    VCSH_prev, VCSH_cur         = _get_row_vals(bs, ALIAS_BS["von_chu_so_huu"])
+    NPT_prev, NPT_cur           = _get_row_vals(bs, ALIAS_BS["no_phai_tra"])
+    TSNH_prev, TSNH_cur         = _get_row_vals(bs, ALIAS_BS["tai_san_ngan_han"])
+    NNH_prev, NNH_cur           = _get_row_vals(bs, ALIAS_BS["no_ngan_han"])
+    HTK_prev, HTK_cur           = _get_row_vals(bs, ALIAS_BS["hang_ton_kho"])
+    Tien_prev, Tien_cur         = _get_row_vals(bs, ALIAS_BS["tien_tdt"])
+    KPT_prev, KPT_cur           = _get_row_vals(bs, ALIAS_BS["phai_thu_kh"])
+    NDH_prev, NDH_cur           = _get_row_vals(bs, ALIAS_BS["no_dai_han_den_han"])
+    KH_prev, KH_cur = _get_row_vals(cf, ALIAS_CF["khau_hao"])
+
+    if pd.notna(GVHB_cur): GVHB_cur = abs(GVHB_cur)
+    if pd.notna(LV_cur):      LV_cur     = abs(LV_cur)
+    if pd.notna(KH_cur):      KH_cur     = abs(KH_cur)
+
+    def avg(a, b):
+        if pd.isna(a) and pd.isna(b): return np.nan
+        if pd.isna(a): return b
+        if pd.isna(b): return a
+        return (a + b) / 2.0
+    TTS_avg    = avg(TTS_cur,    TTS_prev)
+    VCSH_avg = avg(VCSH_cur, VCSH_prev)
+    HTK_avg    = avg(HTK_cur,    HTK_prev)
+    KPT_avg    = avg(KPT_cur,    KPT_prev)
+
+    EBIT_cur = (LNTT_cur + LV_cur) if (pd.notna(LNTT_cur) and pd.notna(LV_cur)) else np.nan
+    NDH_cur = 0.0 if pd.isna(NDH_cur) else NDH_cur
+
+    def div(a, b):
+        return np.nan if (b is None or pd.isna(b) or b == 0) else a / b
+
+    # ==== TÍNH X1..X14 ==== (GIỮ NGUYÊN CÔNG THỨC)
+    X1  = div(LNG_cur, DTT_cur)
+    X2  = div(LNTT_cur, DTT_cur)
+    X3  = div(LNTT_cur, TTS_avg)
+    X4  = div(LNTT_cur, VCSH_avg)
+    X5  = div(NPT_cur,  TTS_cur)
+    X6  = div(NPT_cur,  VCSH_cur)
+    X7  = div(TSNH_cur, NNH_cur)
+    X8  = div((TSNH_cur - HTK_cur) if pd.notna(TSNH_cur) and pd.notna(HTK_cur) else np.nan, NNH_cur)
+    X9  = div(EBIT_cur, LV_cur)
+    X10 = div((EBIT_cur + (KH_cur if pd.notna(KH_cur) else 0.0)), (LV_cur + NDH_cur) if pd.notna(LV_cur) else np.nan)
+    X11 = div(Tien_cur, VCSH_cur)
+    X12 = div(GVHB_cur, HTK_avg)
+    turnover = div(DTT_cur, KPT_avg)
+    X13 = div(365.0, turnover) if pd.notna(turnover) and turnover != 0 else np.nan
+    X14 = div(DTT_cur, TTS_avg)
+
+    # Khởi tạo DataFrame với tên cột tiếng Việt mới
+    ratios = pd.DataFrame([[X1, X2, X3, X4, X5, X6, X7, X8, X9, X10, X11, X12, X13, X14]],
+                          columns=COMPUTED_COLS)
+                          
+    # Thêm cột X_1..X_14 ẩn để phục vụ việc dự báo mô hình
+    ratios[[f"X_{i}" for i in range(1, 15)]] = ratios.values
+    return ratios
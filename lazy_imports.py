@@ -0,0 +1,52 @@
+"""
+Import trễ các thư viện nặng để ứng dụng khởi động nhanh.
+
+ED.py chỉ cần streamlit, pandas và mô hình để vẽ trang đầu tiên; python-docx, google-genai, feedparser,
+seaborn và matplotlib.pyplot chỉ được import khi thực sự dùng (xuất Word, gọi AI, đọc tin, vẽ biểu đồ).
+
+    _FEEDPARSER_OK = has_module("feedparser")   # kiểm tra đã cài chưa mà không import
+    feedparser = lazy_module("feedparser")       # import ở lần đầu truy cập thuộc tính
+"""
+import importlib
+import importlib.util
+import threading
+
+
+def has_module(name: str) -> bool:
+    """Thư viện đã được cài hay chưa (dùng find_spec nên không chạy code của thư viện)"""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        # Package cha không tồn tại (ví dụ 'google' khi chưa cài google-genai)
+        return False
+
+
+class LazyModule:
+    """Đại diện cho 1 module, chỉ import thật ở lần đầu truy cập thuộc tính (an toàn giữa các thread)"""
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "đã import" if self._module is not None else "chưa import"
+        return f"<LazyModule '{self._name}' ({state})>"
+
+
+def lazy_module(name: str) -> LazyModule:
+    return LazyModule(name)
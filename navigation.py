@@ -0,0 +1,76 @@
+"""
+Điều hướng giữa các trang (view) của ứng dụng: chỉ trang đang mở được chạy và vẽ.
+
+st.tabs luôn chạy code của cả 7 tab trong mỗi lần rerun (tin RSS, ~12 biểu đồ dashboard, ảnh tác giả...)
+dù người dùng chỉ xem 1 tab. Ở đây thanh chọn trang là 1 widget st.radio (giao diện giống tab), ED.py
+chỉ chạy khối `if active_view == ...` của trang đang chọn.
+
+Streamlit xóa state của các widget không được vẽ trong 1 lần rerun, nên khi chuyển trang:
+- keep_widget_state() gán lại giá trị các widget có key để giữ nguyên khi quay lại
+- persistent_file_uploader() giữ bản sao file đã upload (file_uploader không gán lại được qua session_state)
+"""
+from io import BytesIO
+from typing import Any, Dict, List
+
+import streamlit as st
+
+VIEW_KEY = "active_view"
+_UPLOAD_PREFIX = "_saved_upload_"
+
+
+def view_selector(views: List[str], key: str = VIEW_KEY) -> str:
+    """Thanh chọn trang dạng tab ngang, trả về trang đang mở (mặc định trang đầu tiên)"""
+    return st.radio("Trang", views, horizontal=True, key=key, label_visibility="collapsed")
+
+
+def go_to_view(view: str, key: str = VIEW_KEY):
+    """Chuyển sang trang khác; dùng làm on_click của st.button (callback chạy trước khi vẽ lại radio)"""
+    st.session_state[key] = view
+
+
+def keep_widget_state(defaults: Dict[str, Any]):
+    """
+    Giữ state của các widget thuộc trang đang ẩn (gọi ở đầu script, trước khi vẽ các trang).
+
+    Args:
+        defaults: key widget -> giá trị ban đầu (None = widget tự lấy mặc định). Giá trị ban đầu đặt ở đây
+            thay vì tham số value=... của widget, vì Streamlit cảnh báo khi widget vừa có value vừa được gán state.
+    """
+    for key, default in defaults.items():
+        if key in st.session_state:
+            st.session_state[key] = st.session_state[key]
+        elif default is not None:
+            st.session_state[key] = default
+
+
+def persistent_file_uploader(label: str, key: str, **kwargs):
+    """
+    st.file_uploader giữ được file đã tải khi người dùng chuyển sang trang khác rồi quay lại.
+
+    Returns:
+        File upload hiện tại, hoặc BytesIO (có .name) của file đã tải trước đó, hoặc None
+    """
+    was_rendered = key in st.session_state
+    uploaded = st.file_uploader(label, key=key, **kwargs)
+    store_key = _UPLOAD_PREFIX + key
+    saved = st.session_state.get(store_key)
+
+    if uploaded is not None:
+        st.session_state[store_key] = {"name": uploaded.name, "data": uploaded.getvalue(), "live": True}
+        return uploaded
+
+    if saved is None:
+        return None
+    if saved["live"] and was_rendered:
+        # Widget vẫn đang hiển thị file ở lần trước và nay trống: người dùng đã bấm xóa file
+        del st.session_state[store_key]
+        return None
+
+    # Widget bị reset do chuyển trang: dùng lại bản đã lưu
+    saved["live"] = False
+    col_name, col_forget = st.columns([4, 1])
+    col_name.caption(f"📎 Đang dùng file đã tải trước đó: **{saved['name']}**")
+    col_forget.button("✖️ Bỏ file", key=f"{key}_forget", on_click=st.session_state.pop, args=(store_key, None))
+    buffer = BytesIO(saved["data"])
+    buffer.name = saved["name"]
+    return buffer
@@ -0,0 +1,98 @@
+"""
+Phân vị của 14 chỉ số tài chính so với dữ liệu huấn luyện.
+
+Biểu đồ radar trước đây chuẩn hóa min-max trên chính 14 giá trị của 1 doanh nghiệp nên hình dạng không có mốc so
+sánh (chỉ số nhỏ nhất của hồ sơ luôn = 0, lớn nhất luôn = 1). Ở đây mỗi chỉ số được xếp hạng trên phân phối của
+tập train:
+- Dựng 1 lần cho mỗi mô hình (cache cùng get_trained_models trong ED.py): mảng giá trị đã sắp xếp của từng cột
+  (bỏ NaN)
+- Phân vị = hạng trung bình (midrank) qua 2 lần np.searchsorted (side='left' / 'right'), O(log n) mỗi giá trị,
+  vector hóa theo cột nên 1 hồ sơ hay hàng triệu dòng đều chỉ là 14 lần gọi searchsorted
+- Chiều rủi ro của từng chỉ số (giá trị cao làm tăng hay giảm khả năng vỡ nợ) lấy từ chính tập train: so sánh
+  phân vị trung bình của nhóm vỡ nợ và không vỡ nợ
+"""
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from stacking_model import MODEL_COLS
+
+# Chênh lệch phân vị trung bình (điểm %) giữa 2 nhóm dưới mức này thì coi chỉ số không có chiều rủi ro rõ ràng
+MIN_DIRECTION_GAP = 5.0
+
+
+class PercentileIndex:
+    """Mảng giá trị đã sắp xếp của X_1..X_14 trên tập train, xếp hạng phân vị (0-100) cho số dòng bất kỳ."""
+
+    def __init__(self, X: pd.DataFrame, y=None, min_direction_gap: float = MIN_DIRECTION_GAP):
+        values = X[MODEL_COLS].to_numpy(dtype=np.float64)
+        self.sorted_values = [np.sort(col[~np.isnan(col)]) for col in values.T]
+
+        # +1: giá trị cao = rủi ro cao, -1: giá trị thấp = rủi ro cao, 0: không rõ (hoặc không có nhãn)
+        self.direction = np.zeros(len(MODEL_COLS), dtype=np.int8)
+        if y is not None:
+            y = np.asarray(y)
+            if 0 < y.sum() < len(y):
+                pct = self.rank(values)
+                with np.errstate(all="ignore"):
+                    gap = np.nanmean(pct[y == 1], axis=0) - np.nanmean(pct[y == 0], axis=0)
+                self.direction = np.where(np.abs(np.nan_to_num(gap)) >= min_direction_gap,
+                                          np.sign(gap), 0).astype(np.int8)
+
+    def rank(self, values) -> np.ndarray:
+        """
+        Phân vị (0-100) của từng giá trị so với tập train.
+
+        Args:
+            values: (n, 14) hoặc (14,) theo thứ tự MODEL_COLS (mảng hoặc DataFrame có đủ cột MODEL_COLS)
+
+        Returns:
+            Mảng (n, 14); giá trị thiếu hoặc cột train rỗng = NaN
+        """
+        if isinstance(values, pd.DataFrame):
+            values = values[MODEL_COLS].to_numpy(dtype=np.float64)
+        values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+        out = np.full(values.shape, np.nan)
+        for j, ref in enumerate(self.sorted_values):
+            if len(ref) == 0:
+                continue
+            col = values[:, j]
+            left = np.searchsorted(ref, col, side="left")
+            right = np.searchsorted(ref, col, side="right")
+            out[:, j] = (left + right) * (50.0 / len(ref))
+        out[np.isnan(values)] = np.nan
+        return out
+
+    def value_at(self, percentiles) -> np.ndarray:
+        """
+        Ngược của rank(): giá trị tại phân vị (0-100) của từng chỉ số, nội suy tuyến tính trên mảng đã sắp xếp.
+
+        Args:
+            percentiles: (n, 14) hoặc (14,) theo thứ tự MODEL_COLS
+
+        Returns:
+            Mảng (n, 14); cột train rỗng = NaN
+        """
+        percentiles = np.atleast_2d(np.asarray(percentiles, dtype=np.float64))
+        out = np.full(percentiles.shape, np.nan)
+        for j, ref in enumerate(self.sorted_values):
+            if len(ref) == 0:
+                continue
+            # Phân vị midrank của phần tử thứ i (không trùng) là (i + 0.5) / n * 100
+            positions = np.clip(percentiles[:, j] / 100.0 * len(ref) - 0.5, 0, len(ref) - 1)
+            out[:, j] = np.interp(positions, np.arange(len(ref)), ref)
+        return out
+
+    def rank_frame(self, X: pd.DataFrame) -> pd.DataFrame:
+        """rank() dạng DataFrame (cùng index với X, cột = MODEL_COLS)."""
+        return pd.DataFrame(self.rank(X), index=X.index, columns=MODEL_COLS)
+
+    def risk_rank(self, percentiles: np.ndarray) -> np.ndarray:
+        """Quy phân vị về thang rủi ro (cao = bất lợi) theo chiều của từng chỉ số; chỉ số không rõ chiều = NaN."""
+        percentiles = np.asarray(percentiles, dtype=np.float64)
+        risk = np.where(self.direction > 0, percentiles, 100.0 - percentiles)
+        return np.where(self.direction == 0, np.nan, risk)
+
+    def directions(self) -> Dict[str, int]:
+        return dict(zip(MODEL_COLS, self.direction.tolist()))
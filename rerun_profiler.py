@@ -0,0 +1,148 @@
+"""
+Đo thời gian và bộ nhớ từng công đoạn của mỗi lần rerun Streamlit (bảng điều khiển cho developer).
+
+Streamlit chạy lại toàn bộ ED.py mỗi lần người dùng tương tác, nên cần biết công đoạn nào
+(đọc dữ liệu, huấn luyện, tính chỉ số, chấm điểm, vẽ biểu đồ, gọi AI) làm chậm 1 lần bấm.
+
+Cách dùng trong ED.py:
+
+    profiler = start_rerun(enabled=st.sidebar.toggle(...))
+    with profiler.stage("train"):
+        ...
+    finish_rerun(profiler)   # cuối script: vẽ bảng ở sidebar + nút tải JSON
+
+Khi tắt (mặc định), stage() không đo gì và tracemalloc không chạy, nên không ảnh hưởng hiệu năng.
+"""
+import json
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from typing import Dict, Any, List
+
+import pandas as pd
+import streamlit as st
+
+MAX_RERUNS = 20
+_HISTORY_KEY = "_rerun_profiler_history"
+_CURRENT_KEY = "_rerun_profiler_current"
+
+
+class RerunProfiler:
+    """Ghi thời gian (wall time) và bộ nhớ Python (tracemalloc) của từng công đoạn trong 1 rerun"""
+
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.stages: List[Dict[str, Any]] = []
+        self.total_ms = None
+        self._start = time.perf_counter()
+        # Stack các công đoạn đang chạy để tính peak đúng khi lồng nhau (tracemalloc chỉ có 1 peak)
+        self._stack: List[Dict[str, float]] = []
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Đo 1 công đoạn: wall time (ms), bộ nhớ tăng thêm và peak (KB) trong công đoạn"""
+        if not self.enabled:
+            yield
+            return
+
+        current, peak = tracemalloc.get_traced_memory()
+        if self._stack:
+            self._stack[-1]["peak"] = max(self._stack[-1]["peak"], peak)
+        tracemalloc.reset_peak()
+        frame = {"mem_start": current, "peak": current}
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            current, peak = tracemalloc.get_traced_memory()
+            self._stack.pop()
+            frame["peak"] = max(frame["peak"], peak)
+            if self._stack:
+                self._stack[-1]["peak"] = max(self._stack[-1]["peak"], frame["peak"])
+            self.stages.append({
+                "stage": name,
+                "wall_ms": round(elapsed * 1000, 2),
+                "mem_delta_kb": round((current - frame["mem_start"]) / 1024, 1),
+                "mem_peak_kb": round((frame["peak"] - frame["mem_start"]) / 1024, 1),
+            })
+
+    def finish(self):
+        if self.total_ms is None:
+            self.total_ms = round((time.perf_counter() - self._start) * 1000, 2)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"started_at": self.started_at, "total_ms": self.total_ms, "stages": list(self.stages)}
+
+
+def _history() -> deque:
+    if _HISTORY_KEY not in st.session_state:
+        st.session_state[_HISTORY_KEY] = deque(maxlen=MAX_RERUNS)
+    return st.session_state[_HISTORY_KEY]
+
+
+def start_rerun(enabled: bool) -> RerunProfiler:
+    """Tạo profiler cho rerun hiện tại và lưu vào lịch sử N rerun gần nhất (nếu bật)"""
+    profiler = RerunProfiler(enabled)
+    st.session_state[_CURRENT_KEY] = profiler
+    if enabled:
+        _history().append(profiler)
+    elif tracemalloc.is_tracing():
+        tracemalloc.stop()
+    return profiler
+
+
+def current_profiler() -> RerunProfiler:
+    """Profiler của rerun hiện tại (profiler tắt nếu chưa gọi start_rerun)"""
+    return st.session_state.get(_CURRENT_KEY) or RerunProfiler(False)
+
+
+def profiled(name: str):
+    """Decorator đo 1 hàm như 1 công đoạn của rerun hiện tại (dùng cho các hàm gọi AI)"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with current_profiler().stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def finish_rerun(profiler: RerunProfiler):
+    """Chốt tổng thời gian rerun và hiển thị bảng N rerun gần nhất ở sidebar"""
+    if not profiler.enabled:
+        return
+    profiler.finish()
+    history = [p for p in _history() if p.total_ms is not None]
+
+    with st.sidebar.expander(f"🧪 Profiling {len(history)} rerun gần nhất", expanded=True):
+        rows = []
+        for i, p in enumerate(history, start=1):
+            row = {"#": i, "Thời điểm": p.started_at[11:], "Tổng (ms)": p.total_ms}
+            for s in p.stages:
+                row[s["stage"]] = round(row.get(s["stage"], 0) + s["wall_ms"], 2)
+            rows.append(row)
+        st.markdown("**Wall time (ms) theo công đoạn**")
+        st.dataframe(pd.DataFrame(rows).set_index("#").iloc[::-1], use_container_width=True)
+
+        st.markdown("**Rerun hiện tại**")
+        if profiler.stages:
+            st.dataframe(pd.DataFrame(profiler.stages).set_index("stage"), use_container_width=True)
+        else:
+            st.caption("Không có công đoạn nào được đo.")
+
+        st.download_button(
+            "💾 Tải JSON",
+            data=json.dumps([p.to_dict() for p in history], ensure_ascii=False, indent=2),
+            file_name=f"rerun_profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+            mime="application/json",
+            key="download_rerun_profile",
+            use_container_width=True,
+        )
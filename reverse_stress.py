@@ -0,0 +1,193 @@
+"""
+Kiểm định sức chịu đựng ngược (reverse stress test): cú sốc nhỏ nhất đẩy PD qua 1 mốc cho trước.
+
+Tab Mô phỏng kịch bản xấu trả lời "PD sau cú sốc X là bao nhiêu?". Ở đây là bài toán ngược: với mỗi doanh nghiệp,
+tìm mức sốc s (%) nhỏ nhất theo chiều bất lợi của các tham số kịch bản (SCENARIO_GROUPS) để PD chạm mốc hạng kế tiếp
+của classify_pd (2%, 5%, 10%, 20%) hoặc ngưỡng Default. Có 6 hướng sốc: cả 5 nhóm cùng lúc ("uniform") và từng nhóm
+riêng lẻ.
+
+Cách tìm (vector hóa cho cả danh mục, mọi hướng và mọi mốc cùng lúc):
+1. Dò lưới: GRID_POINTS + 1 mức sốc cách đều trong [0, MAX_SHOCK] cho mọi (doanh nghiệp, hướng) -> 1 lần chấm
+2. Với mỗi mốc, lấy khoảng lưới đầu tiên mà PD vượt mốc: PD(lo) < mốc <= PD(hi)
+3. Chia đôi BISECTION_STEPS lần, mỗi lần chấm điểm giữa của mọi bài toán trong 1 lần predict_proba
+=> 1 + BISECTION_STEPS lần chấm theo lô, sai số cú sốc MAX_SHOCK / GRID_POINTS / 2^BISECTION_STEPS (~0.05%).
+PD không nhất thiết đơn điệu theo cú sốc (mô hình cây), kết quả là mức sốc nhỏ nhất vượt mốc theo độ phân giải lưới.
+"""
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from calibration import apply_calibration
+from stacking_model import MODEL_COLS
+from tree_engine import ArrayScorer, feature_array
+
+# Tham số kịch bản -> (chỉ số, chiều tác động): X *= (1 + chiều * tham số / 100), giống tab Mô phỏng kịch bản xấu
+SCENARIO_GROUPS: Dict[str, List[Tuple[str, int]]] = {
+    "roa_roe": [("X_12", 1), ("X_13", 1)],
+    "debt_equity": [("X_4", 1)],
+    "liquidity": [("X_1", 1), ("X_2", 1), ("X_3", 1)],
+    "revenue_profit": [("X_9", 1), ("X_10", 1), ("X_11", 1)],
+    # Chi phí lãi vay tăng làm giảm Net Profit Margin (X_11)
+    "interest": [("X_11", -1)],
+}
+SCENARIO_PARAMS = list(SCENARIO_GROUPS)
+SCENARIO_LABELS = {
+    "uniform": "Đồng loạt 5 yếu tố",
+    "roa_roe": "ROA/ROE",
+    "debt_equity": "Nợ/VCSH",
+    "liquidity": "Khả năng thanh toán (CR/QR)",
+    "revenue_profit": "Doanh thu/LN gộp",
+    "interest": "Chi phí lãi vay",
+}
+# Chiều bất lợi của từng tham số (giảm sinh lời/thanh khoản/doanh thu, tăng đòn bẩy/lãi vay)
+ADVERSE_SIGN = {"roa_roe": -1, "debt_equity": 1, "liquidity": -1, "revenue_profit": -1, "interest": 1}
+# Mốc PD giữa các hạng của classify_pd trong ED.py
+PD_BOUNDARIES = (0.02, 0.05, 0.10, 0.20)
+
+MAX_SHOCK = 100.0
+GRID_POINTS = 16
+BISECTION_STEPS = 7
+_CHUNK_ROWS = 50_000
+
+# (5, 14): hệ số chiều tác động của từng tham số lên từng chỉ số
+_IMPACT = np.zeros((len(SCENARIO_PARAMS), len(MODEL_COLS)))
+for _g, _name in enumerate(SCENARIO_PARAMS):
+    for _col, _sign in SCENARIO_GROUPS[_name]:
+        _IMPACT[_g, MODEL_COLS.index(_col)] = _sign
+
+
+def apply_scenario(X: np.ndarray, params: np.ndarray) -> np.ndarray:
+    """
+    Áp tham số kịch bản (%) lên ma trận chỉ số.
+
+    Args:
+        X: (n, 14) theo thứ tự MODEL_COLS
+        params: (n, 5) hoặc (5,) theo thứ tự SCENARIO_PARAMS, đơn vị %
+
+    Returns:
+        Ma trận (n, 14) sau kịch bản
+    """
+    X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+    params = np.atleast_2d(np.asarray(params, dtype=np.float64))
+    factors = np.ones((max(len(X), len(params)), X.shape[1]))
+    for g in range(len(SCENARIO_PARAMS)):
+        factors *= 1.0 + _IMPACT[g] * params[:, g:g + 1] / 100.0
+    return X * factors
+
+
+def next_boundary(pd_values) -> np.ndarray:
+    """Mốc PD của hạng kế tiếp (xấu hơn) trong classify_pd; đã ở hạng cuối (>= 20%) = NaN."""
+    pd_values = np.asarray(pd_values, dtype=np.float64)
+    bounds = np.asarray(PD_BOUNDARIES)
+    idx = np.searchsorted(bounds, pd_values, side="right")
+    return np.where(idx < len(bounds), bounds[np.minimum(idx, len(bounds) - 1)], np.nan)
+
+
+def _directions(scenarios: Sequence[str]) -> np.ndarray:
+    """(D, 5): tham số kịch bản ứng với mức sốc 1% theo từng hướng."""
+    out = np.zeros((len(scenarios), len(SCENARIO_PARAMS)))
+    for d, name in enumerate(scenarios):
+        for g, param in enumerate(SCENARIO_PARAMS):
+            if name == "uniform" or name == param:
+                out[d, g] = ADVERSE_SIGN[param]
+    return out
+
+
+def _score(model, matrix: np.ndarray, calibration) -> np.ndarray:
+    # ArrayScorer chấm thẳng mảng float32 (cùng đường với PD hiển thị ở tab dự báo/kịch bản), mô hình khác nhận DataFrame
+    as_array = isinstance(model, ArrayScorer)
+    out = np.empty(len(matrix))
+    for start in range(0, len(matrix), _CHUNK_ROWS):
+        rows = matrix[start:start + _CHUNK_ROWS]
+        chunk = feature_array(rows, MODEL_COLS) if as_array else pd.DataFrame(rows, columns=MODEL_COLS)
+        out[start:start + _CHUNK_ROWS] = model.predict_proba(chunk)[:, 1]
+    return apply_calibration(out, calibration)
+
+
+def reverse_stress(model, X, targets, calibration: Optional[Dict[str, Any]] = None,
+                   scenarios: Sequence[str] = ("uniform", *SCENARIO_PARAMS), max_shock: float = MAX_SHOCK,
+                   grid_points: int = GRID_POINTS, steps: int = BISECTION_STEPS) -> Dict[str, Any]:
+    """
+    Cú sốc nhỏ nhất theo từng hướng để PD đạt từng mốc.
+
+    Args:
+        model: Stacking: ArrayScorer (mảng float32 theo MODEL_COLS) hoặc mô hình có predict_proba nhận DataFrame
+        X: (n, 14) hoặc DataFrame có MODEL_COLS
+        targets: (n, T) hoặc (T,) mốc PD cần chạm (NaN = bỏ qua)
+        calibration: Bảng tra hiệu chỉnh PD (calibration.py)
+        scenarios: Các hướng sốc ("uniform" và/hoặc tên trong SCENARIO_PARAMS)
+
+    Returns:
+        dict gồm base_pd (n,), shock (n, D, T: % sốc nhỏ nhất; 0 = đã vượt mốc, NaN = không đạt trong max_shock),
+        pd (n, D, T: PD tại mức sốc đó), scenarios, targets (n, T), n_calls (số lần predict_proba theo lô)
+    """
+    if isinstance(X, pd.DataFrame):
+        X = X[MODEL_COLS].to_numpy(dtype=np.float64)
+    X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+    n = len(X)
+    targets = np.asarray(targets, dtype=np.float64)
+    targets = np.broadcast_to(targets, (n, targets.shape[-1])) if targets.ndim == 1 else targets
+    scenarios = list(scenarios)
+    dirs = _directions(scenarios)
+    D, T = len(scenarios), targets.shape[1]
+
+    def stressed_pd(rows: np.ndarray, direction: np.ndarray, shock: np.ndarray) -> np.ndarray:
+        return _score(model, apply_scenario(X[rows], dirs[direction] * shock[:, None]), calibration)
+
+    # 1. Lưới mức sốc cho mọi (doanh nghiệp, hướng): cột 0 = không sốc
+    levels = np.linspace(0.0, max_shock, grid_points + 1)
+    rows, direction, level = (a.ravel() for a in np.meshgrid(np.arange(n), np.arange(D), np.arange(grid_points + 1),
+                                                             indexing="ij"))
+    curve = stressed_pd(rows, direction, levels[level]).reshape(n, D, grid_points + 1)
+    base_pd = curve[:, 0, 0]
+
+    # 2. Khoảng lưới đầu tiên vượt mốc cho mọi (doanh nghiệp, hướng, mốc)
+    crossed = curve[:, :, None, :] >= targets[:, None, :, None]          # (n, D, T, G + 1)
+    reachable = crossed.any(axis=3) & ~np.isnan(targets)[:, None, :]
+    first = np.argmax(crossed, axis=3)
+    shock = np.full((n, D, T), np.nan)
+    pd_at = np.full((n, D, T), np.nan)
+    already = reachable & (first == 0)
+    shock[already] = 0.0
+    pd_at[already] = np.broadcast_to(base_pd[:, None, None], (n, D, T))[already]
+
+    # 3. Chia đôi trong khoảng [lo, hi] cho mọi bài toán còn lại cùng lúc
+    active = np.argwhere(reachable & (first > 0))
+    n_calls = 1
+    if len(active):
+        i, d, t = active.T
+        lo, hi = levels[first[i, d, t] - 1], levels[first[i, d, t]]
+        pd_hi = curve[i, d, first[i, d, t]]
+        goal = targets[i, t]
+        for _ in range(steps):
+            mid = 0.5 * (lo + hi)
+            pd_mid = stressed_pd(i, d, mid)
+            up = pd_mid >= goal
+            hi, pd_hi = np.where(up, mid, hi), np.where(up, pd_mid, pd_hi)
+            lo = np.where(up, lo, mid)
+            n_calls += 1
+        shock[i, d, t] = hi
+        pd_at[i, d, t] = pd_hi
+
+    return {"base_pd": base_pd, "shock": shock, "pd": pd_at, "scenarios": scenarios, "targets": targets,
+            "n_calls": n_calls}
+
+
+def stress_targets(pd_values, threshold: float) -> np.ndarray:
+    """Mốc mặc định (n, 2): hạng kế tiếp của classify_pd và ngưỡng Default (NaN nếu PD đã vượt ngưỡng)."""
+    pd_values = np.asarray(pd_values, dtype=np.float64)
+    default_target = np.where(pd_values < threshold, threshold, np.nan)
+    return np.column_stack([next_boundary(pd_values), default_target])
+
+
+def reverse_stress_table(result: Dict[str, Any], row: int = 0) -> pd.DataFrame:
+    """Bảng 1 doanh nghiệp: mỗi dòng 1 hướng sốc, mỗi mốc 2 cột (cú sốc %, PD tại cú sốc đó)."""
+    columns = {}
+    for t in range(result["targets"].shape[1]):
+        target = result["targets"][row, t]
+        if np.isnan(target):
+            continue
+        columns[f"Sốc để PD ≥ {target:.1%}"] = result["shock"][row, :, t]
+        columns[f"PD tại mức sốc (mốc {target:.1%})"] = result["pd"][row, :, t]
+    return pd.DataFrame(columns, index=[SCENARIO_LABELS[name] for name in result["scenarios"]])
@@ -0,0 +1,202 @@
+"""
+Thẻ điểm (scorecard) WoE cho X_1..X_14: bin đơn điệu, Weight of Evidence, Logistic trên WoE, bảng điểm theo bin.
+
+Stacking là hộp đen, còn ngân hàng quen đọc thẻ điểm: mỗi chỉ số rơi vào 1 khoảng giá trị và được cộng 1 số điểm
+nguyên, tổng điểm quy ra PD. Dựng 1 lần cho mỗi mô hình (cache cùng get_trained_models trong ED.py):
+- Bin đơn điệu: chia FINE_BINS khoảng theo phân vị, gộp khoảng liền kề theo pool adjacent violators để tỷ lệ vỡ nợ
+  đơn điệu theo chiều tương quan hạng của chỉ số (nghiệm bình phương tối thiểu có ràng buộc đơn điệu), sau đó gộp
+  khoảng ít hơn MIN_BIN_SHARE số quan sát vào khoảng liền kề có tỷ lệ gần nhất
+- WoE = ln(%tốt / %xấu) của từng bin (cộng 0.5 vào số đếm để bin chỉ có 1 lớp không ra vô cùng), giá trị thiếu
+  có bin riêng (WoE = 0 nếu tập train không có giá trị thiếu)
+- Logistic cùng cấu hình model_logistic (bỏ class_weight để giữ đúng odds thực tế) trên WoE của các chỉ số có
+  IV >= MIN_IV; chỉ số có hệ số sai dấu (do đa cộng tuyến) bị loại rồi fit lại
+- Điểm theo thang PDO: Điểm = OFFSET + FACTOR x ln(odds tốt), phần hằng số chia đều cho các chỉ số, làm tròn từng
+  ô thành số nguyên
+- Chấm: mỗi chỉ số 1 np.searchsorted trên mép bin + tra bảng điểm nguyên, vector hóa cho cả danh mục
+"""
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+from scipy.stats import spearmanr
+from sklearn.base import clone
+
+from attribution import RATIO_LABELS
+from stacking_model import MODEL_COLS
+
+FINE_BINS = 20
+MIN_BIN_SHARE = 0.05
+MIN_IV = 0.02
+# Thang điểm: BASE_SCORE điểm tại odds tốt/xấu = BASE_ODDS, cứ thêm PDO điểm thì odds tăng gấp đôi
+BASE_SCORE = 600
+BASE_ODDS = 50
+PDO = 20
+FACTOR = PDO / np.log(2)
+OFFSET = BASE_SCORE - FACTOR * np.log(BASE_ODDS)
+MISSING_LABEL = "Thiếu"
+
+
+def _bin_index(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Chỉ số bin: 0..len(edges) theo [mép trái, mép phải), len(edges) + 1 = giá trị thiếu."""
+    idx = np.searchsorted(edges, values, side="right")
+    idx[np.isnan(values)] = len(edges) + 1
+    return idx
+
+
+def _monotone_bins(x: np.ndarray, y: np.ndarray, fine_bins: int, min_share: float) -> np.ndarray:
+    """Mép bin (đã sắp xếp) sao cho tỷ lệ vỡ nợ đơn điệu theo chiều tương quan hạng của x với y."""
+    edges = np.unique(np.quantile(x, np.linspace(0, 1, fine_bins + 1)[1:-1]))
+    idx = np.searchsorted(edges, x, side="right")
+    counts = np.bincount(idx, minlength=len(edges) + 1)
+    bads = np.bincount(idx, weights=y, minlength=len(edges) + 1)
+    rho = spearmanr(x, y)[0] if len(np.unique(x)) > 1 else 0.0
+    increasing = not (rho < 0)
+
+    # Pool adjacent violators: mỗi khối = [bin đầu, bin cuối, số quan sát, số vỡ nợ]
+    blocks: List[List[float]] = []
+    for i in range(len(counts)):
+        # Bin rỗng gộp vào khối trước (bin rỗng ở đầu gộp vào khối đầu tiên)
+        if counts[i] == 0:
+            if blocks:
+                blocks[-1][1] = i
+            continue
+        blocks.append([i if blocks else 0, i, counts[i], bads[i]])
+        while len(blocks) > 1:
+            prev, last = blocks[-2][3] / blocks[-2][2], blocks[-1][3] / blocks[-1][2]
+            if (prev < last) if increasing else (prev > last):
+                break
+            end, n, b = blocks[-1][1], blocks[-1][2], blocks[-1][3]
+            blocks.pop()
+            blocks[-1][1], blocks[-1][2], blocks[-1][3] = end, blocks[-1][2] + n, blocks[-1][3] + b
+
+    # Gộp khối quá nhỏ vào khối liền kề có tỷ lệ vỡ nợ gần nhất (gộp 2 khối liền kề vẫn giữ tính đơn điệu)
+    min_count = min_share * len(x)
+    while len(blocks) > 1:
+        k = min(range(len(blocks)), key=lambda i: blocks[i][2])
+        if blocks[k][2] >= min_count:
+            break
+        rate = blocks[k][3] / blocks[k][2]
+        neighbours = [j for j in (k - 1, k + 1) if 0 <= j < len(blocks)]
+        j = min(neighbours, key=lambda i: abs(blocks[i][3] / blocks[i][2] - rate))
+        lo, hi = min(j, k), max(j, k)
+        blocks[lo] = [blocks[lo][0], blocks[hi][1], blocks[lo][2] + blocks[hi][2], blocks[lo][3] + blocks[hi][3]]
+        del blocks[hi]
+    # Mép trái của khối thứ 2 trở đi
+    return edges[[int(block[0]) - 1 for block in blocks[1:]]]
+
+
+def _bin_labels(edges: np.ndarray) -> List[str]:
+    if len(edges) == 0:
+        return ["Mọi giá trị", MISSING_LABEL]
+    labels = [f"< {edges[0]:.4g}"]
+    labels += [f"[{a:.4g}, {b:.4g})" for a, b in zip(edges[:-1], edges[1:])]
+    labels.append(f"≥ {edges[-1]:.4g}")
+    return labels + [MISSING_LABEL]
+
+
+class Scorecard:
+    """Thẻ điểm WoE: mép bin và điểm nguyên từng bin của các chỉ số được chọn, tổng điểm -> PD."""
+
+    def __init__(self, X: pd.DataFrame, y, model_logistic, fine_bins: int = FINE_BINS,
+                 min_bin_share: float = MIN_BIN_SHARE, min_iv: float = MIN_IV):
+        values = X[MODEL_COLS].to_numpy(dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        n_bad = y.sum()
+        n_good = len(y) - n_bad
+
+        self.edges: Dict[str, np.ndarray] = {}
+        self.woe: Dict[str, np.ndarray] = {}
+        self.iv: Dict[str, float] = {}
+        rows = []
+        for j, col in enumerate(MODEL_COLS):
+            x = values[:, j]
+            present = ~np.isnan(x)
+            edges = _monotone_bins(x[present], y[present], fine_bins, min_bin_share) if present.any() else np.empty(0)
+            idx = _bin_index(x, edges)
+            counts = np.bincount(idx, minlength=len(edges) + 2)
+            bads = np.bincount(idx, weights=y, minlength=len(edges) + 2)
+            goods = counts - bads
+            woe = np.log(((goods + 0.5) / n_good) / ((bads + 0.5) / n_bad))
+            woe[counts == 0] = 0.0
+            iv = float(np.sum((goods / n_good - bads / n_bad) * woe))
+            self.edges[col], self.woe[col], self.iv[col] = edges, woe, iv
+            with np.errstate(invalid="ignore"):
+                bad_rate = bads / counts
+            rows.append(pd.DataFrame({"feature": col, "label": RATIO_LABELS[col], "bin": _bin_labels(edges),
+                                      "count": counts, "bad_rate": bad_rate, "woe": woe}))
+
+        # Logistic trên WoE, loại dần chỉ số có hệ số sai dấu (WoE cao = tốt nên hệ số phải âm)
+        lr = clone(model_logistic)
+        if "class_weight" in lr.get_params():
+            lr.set_params(class_weight=None)
+        features = [col for col in MODEL_COLS if self.iv[col] >= min_iv]
+        while features:
+            design = np.column_stack([self.woe[col][_bin_index(values[:, MODEL_COLS.index(col)], self.edges[col])]
+                                      for col in features])
+            lr.fit(design, y.astype(int))
+            wrong = [col for col, coef in zip(features, lr.coef_[0]) if coef >= 0]
+            if not wrong:
+                break
+            features = [col for col in features if col not in wrong]
+        self.features = features
+        self.coef = dict(zip(features, lr.coef_[0])) if features else {}
+        self.intercept = float(lr.intercept_[0]) if features else float(np.log(n_bad / n_good))
+
+        # Điểm nguyên từng bin; chỉ số không được chọn = 0 điểm
+        share = (OFFSET - FACTOR * self.intercept) / max(len(features), 1)
+        self.points = {col: (np.rint(-FACTOR * self.coef[col] * self.woe[col] + share).astype(np.int64)
+                             if col in self.coef else np.zeros(len(self.woe[col]), dtype=np.int64))
+                       for col in MODEL_COLS}
+        # Không chỉ số nào được chọn: toàn bộ hằng số dồn vào điểm gốc
+        self.base_points = 0 if features else int(np.rint(share))
+        table = pd.concat(rows, ignore_index=True)
+        table["points"] = np.concatenate([self.points[col] for col in MODEL_COLS])
+        table["selected"] = table["feature"].isin(features)
+        self.table = table
+
+    def points_matrix(self, X) -> np.ndarray:
+        """(n, 14) điểm nguyên của từng chỉ số."""
+        if isinstance(X, pd.DataFrame):
+            X = X[MODEL_COLS].to_numpy(dtype=np.float64)
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        out = np.zeros(X.shape, dtype=np.int64)
+        for j, col in enumerate(MODEL_COLS):
+            if col in self.coef:
+                out[:, j] = self.points[col][_bin_index(X[:, j], self.edges[col])]
+        return out
+
+    def score(self, X) -> np.ndarray:
+        """Tổng điểm nguyên (n,)."""
+        return self.points_matrix(X).sum(axis=1) + self.base_points
+
+    @staticmethod
+    def score_to_pd(score) -> np.ndarray:
+        return 1.0 / (1.0 + np.exp((np.asarray(score, dtype=np.float64) - OFFSET) / FACTOR))
+
+    def predict_pd(self, X) -> np.ndarray:
+        return self.score_to_pd(self.score(X))
+
+    def breakdown(self, x) -> Dict[str, Any]:
+        """
+        Thẻ điểm của 1 doanh nghiệp (báo cáo Word).
+
+        Args:
+            x: 14 chỉ số theo thứ tự MODEL_COLS (mảng, Series hoặc DataFrame 1 dòng)
+
+        Returns:
+            dict gồm score, pd và rows (list dict: feature, label, value, bin, points) cho các chỉ số được chọn
+        """
+        if isinstance(x, pd.Series):
+            x = x[MODEL_COLS].to_numpy(dtype=np.float64)
+        points = self.points_matrix(x)[0]
+        values = x[MODEL_COLS].to_numpy(dtype=np.float64)[0] if isinstance(x, pd.DataFrame) \
+            else np.asarray(x, dtype=np.float64).ravel()
+        rows = []
+        for j, col in enumerate(MODEL_COLS):
+            if col not in self.coef:
+                continue
+            b = int(_bin_index(values[j:j + 1], self.edges[col])[0])
+            rows.append({"feature": col, "label": RATIO_LABELS[col], "value": float(values[j]),
+                         "bin": _bin_labels(self.edges[col])[b], "points": int(points[j])})
+        score = int(points.sum()) + self.base_points
+        return {"score": score, "pd": float(self.score_to_pd(score)), "rows": rows}
@@ -0,0 +1,124 @@
+"""
+Độ nhạy của PD Stacking theo từng chỉ số (one-at-a-time) và partial dependence trên toàn danh mục.
+
+Câu hỏi "chỉ số nào làm PD của doanh nghiệp này thay đổi nhiều nhất?" được trả lời bằng cách giữ nguyên 13 chỉ số,
+cho chỉ số còn lại chạy trên khoảng giá trị của tập train:
+- Lưới GRID_POINTS điểm cách đều từ phân vị P1 đến P99 của từng chỉ số (bỏ đuôi cực đoan như X_9, X_13), cộng
+  2 điểm P10/P90 cho biểu đồ tornado, tính sẵn 1 lần cho mỗi mô hình
+- Cả ma trận (1 + 14 x (GRID_POINTS + 2)) hồ sơ của 1 doanh nghiệp được chấm trong 1 lần predict_proba
+- Partial dependence: trung bình PD khi gán X_j = giá trị lưới cho cả 1 mẫu con PDP_SAMPLE doanh nghiệp của tập train,
+  chấm theo khối lớn và chỉ tính 1 lần (lưu trong engine, cache cùng get_trained_models trong ED.py)
+PD đều đã qua bảng hiệu chỉnh (calibration.py) nên so sánh được trực tiếp với ngưỡng Default.
+"""
+import threading
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from calibration import apply_calibration
+from stacking_model import MODEL_COLS
+
+GRID_POINTS = 25
+GRID_QUANTILES = (0.01, 0.99)
+TORNADO_QUANTILES = (0.10, 0.90)
+PDP_SAMPLE = 200
+# Số dòng tối đa mỗi lần predict_proba khi tính partial dependence
+_CHUNK_ROWS = 50_000
+
+
+class SensitivityEngine:
+    """Lưới giá trị của 14 chỉ số trên tập train và hàm chấm độ nhạy PD theo lô."""
+
+    def __init__(self, model, X_train: pd.DataFrame, calibration: Optional[Dict[str, Any]] = None,
+                 grid_points: int = GRID_POINTS, pdp_sample: int = PDP_SAMPLE, seed: int = 42):
+        self.model = model
+        self.calibration = calibration
+        values = X_train[MODEL_COLS].to_numpy(dtype=np.float64)
+        with np.errstate(all="ignore"):
+            lo, hi = np.nanquantile(values, GRID_QUANTILES, axis=0)
+            self.low, self.high = np.nanquantile(values, TORNADO_QUANTILES, axis=0)
+        # (14, G): hàng j là các giá trị thử của X_j
+        self.grid = np.linspace(lo, hi, grid_points).T
+
+        rng = np.random.default_rng(seed)
+        take = rng.choice(len(values), size=min(pdp_sample, len(values)), replace=False)
+        self._pdp_rows = values[np.sort(take)]
+        self._pdp: Optional[pd.DataFrame] = None
+        self._lock = threading.Lock()
+
+    @property
+    def grid_points(self) -> int:
+        return self.grid.shape[1]
+
+    @property
+    def pdp_sample_size(self) -> int:
+        return len(self._pdp_rows)
+
+    def _score(self, matrix: np.ndarray) -> np.ndarray:
+        """PD đã hiệu chỉnh của 1 ma trận (n, 14), chấm theo khối _CHUNK_ROWS dòng."""
+        out = np.empty(len(matrix))
+        for start in range(0, len(matrix), _CHUNK_ROWS):
+            chunk = pd.DataFrame(matrix[start:start + _CHUNK_ROWS], columns=MODEL_COLS)
+            out[start:start + _CHUNK_ROWS] = self.model.predict_proba(chunk)[:, 1]
+        return apply_calibration(out, self.calibration)
+
+    def company(self, x) -> Dict[str, Any]:
+        """
+        Độ nhạy PD của 1 doanh nghiệp.
+
+        Args:
+            x: 14 chỉ số theo thứ tự MODEL_COLS (mảng, Series hoặc DataFrame 1 dòng)
+
+        Returns:
+            dict gồm base_pd, curves (DataFrame G dòng: PD khi X_j = grid[j, g], cột = MODEL_COLS),
+            grid (DataFrame cùng dạng: giá trị thử), tornado (DataFrame theo chỉ số: value, low_value, high_value,
+            pd_low, pd_high, swing; sắp giảm dần theo swing)
+        """
+        if isinstance(x, pd.DataFrame):
+            x = x[MODEL_COLS].to_numpy(dtype=np.float64)[0]
+        elif isinstance(x, pd.Series):
+            x = x[MODEL_COLS].to_numpy(dtype=np.float64)
+        x = np.asarray(x, dtype=np.float64)
+        p, g = self.grid.shape
+
+        # Dòng 0 = hồ sơ gốc; mỗi chỉ số j chiếm 1 khối (G + 2) dòng: G điểm lưới, rồi P10, P90
+        values = np.column_stack([self.grid, self.low, self.high])
+        matrix = np.tile(x, (1 + p * (g + 2), 1))
+        rows = 1 + np.arange(p * (g + 2)).reshape(p, g + 2)
+        matrix[rows, np.arange(p)[:, None]] = values
+        pd_all = self._score(matrix)
+        block = pd_all[1:].reshape(p, g + 2)
+
+        tornado = pd.DataFrame({
+            "value": x,
+            "low_value": self.low,
+            "high_value": self.high,
+            "pd_low": block[:, g],
+            "pd_high": block[:, g + 1],
+        }, index=MODEL_COLS)
+        tornado["swing"] = (tornado["pd_high"] - tornado["pd_low"]).abs()
+        return {
+            "base_pd": float(pd_all[0]),
+            "curves": pd.DataFrame(block[:, :g].T, columns=MODEL_COLS),
+            "grid": pd.DataFrame(self.grid.T, columns=MODEL_COLS),
+            "tornado": tornado.sort_values("swing", ascending=False),
+        }
+
+    def partial_dependence(self) -> pd.DataFrame:
+        """
+        Partial dependence trên mẫu con của tập train: PD trung bình khi X_j = grid[j, g] cho mọi doanh nghiệp.
+
+        Returns:
+            DataFrame G dòng, cột = MODEL_COLS (tính ở lần gọi đầu, các lần sau dùng lại)
+        """
+        with self._lock:
+            if self._pdp is None:
+                p, g = self.grid.shape
+                n = len(self._pdp_rows)
+                # (p, g, n, 14): mỗi (chỉ số, điểm lưới) là 1 bản sao mẫu con với X_j bị thay thế
+                matrix = np.broadcast_to(self._pdp_rows, (p, g, n, p)).copy()
+                matrix[np.arange(p), :, :, np.arange(p)] = self.grid[:, :, None]
+                pd_all = self._score(matrix.reshape(-1, p)).reshape(p, g, n)
+                self._pdp = pd.DataFrame(pd_all.mean(axis=2).T, columns=MODEL_COLS)
+            return self._pdp
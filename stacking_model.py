@@ -0,0 +1,117 @@
+"""
+Huấn luyện mô hình Stacking (Logistic + RandomForest + XGBoost, meta-model Logistic).
+
+Tách riêng khỏi ED.py để dùng chung cho ứng dụng Streamlit và benchmark.
+"""
+from typing import Dict, Any
+
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from sklearn.linear_model import LogisticRegression
+from sklearn.ensemble import RandomForestClassifier, StackingClassifier
+from xgboost import XGBClassifier
+
+from calibration import apply_calibration, calibrate_model
+from evaluation import evaluate_split
+from threshold_optimizer import EXPOSURE_COLS, optimize_threshold
+
+# Tên cột cho việc huấn luyện (phải giữ nguyên X_1..X_14)
+MODEL_COLS = [f"X_{i}" for i in range(1, 15)]
+
+
+def build_base_models() -> Dict[str, Any]:
+    """Khởi tạo 3 base models (Logistic, RandomForest, XGBoost)."""
+    return {
+        'logistic': LogisticRegression(random_state=42, max_iter=1000, class_weight="balanced", solver="lbfgs"),
+        'random_forest': RandomForestClassifier(n_estimators=100, random_state=42, max_depth=10, class_weight="balanced"),
+        'xgboost': XGBClassifier(n_estimators=100, random_state=42, max_depth=6, learning_rate=0.1,
+                                 use_label_encoder=False, eval_metric='logloss'),
+    }
+
+
+def build_stacking_model(base_models: Dict[str, Any]) -> StackingClassifier:
+    """Tạo StackingClassifier với LogisticRegression làm meta-model."""
+    return StackingClassifier(
+        estimators=list(base_models.items()),
+        final_estimator=LogisticRegression(random_state=42, max_iter=1000),
+        cv=5,  # Cross-validation 5-fold
+        stack_method='predict_proba',  # Dùng probability để stack
+        n_jobs=-1  # Sử dụng tất cả CPU cores
+    )
+
+
+def suffixed_metrics(evaluation: Dict[str, Any], suffix: str) -> Dict[str, float]:
+    """Metrics của 1 tập (kết quả evaluate_split) với key có hậu tố '_in' hoặc '_out'."""
+    return {f"{name}_{suffix}": value for name, value in evaluation["metrics"].items()}
+
+
+def train_models(df: pd.DataFrame) -> Dict[str, Any]:
+    """
+    Chia train/test 80/20 (stratified), huấn luyện Stacking và 3 base models riêng biệt.
+
+    Args:
+        df: DataFrame có cột 'default' và X_1..X_14
+
+    Returns:
+        Dict gồm các model đã huấn luyện, tập train/test, dự báo trên test, metrics in/out-sample
+        (kèm ROC/PR và khoảng tin cậy bootstrap trong "evaluation"),
+        bảng tra hiệu chỉnh PD và ngưỡng Default tối ưu (kèm đường cong chi phí/F1)
+    """
+    X = df[MODEL_COLS]  # Chỉ lấy các cột X_1..X_14
+    y = df['default'].astype(int)
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y
+    )
+
+    base_models = build_base_models()
+    model = build_stacking_model(base_models)
+
+    # Train tất cả models
+    model.fit(X_train, y_train)
+
+    # 1 lần predict_proba mỗi tập cho Stacking (Model chính), mọi metric bên dưới suy ra từ 2 vector này
+    y_proba_in = model.predict_proba(X_train)[:, 1]
+    y_proba_out = model.predict_proba(X_test)[:, 1]
+
+    # Train riêng 3 base models để lấy PD riêng biệt (để hiển thị)
+    for base in base_models.values():
+        base.fit(X_train, y_train)
+
+    # Bảng tra hiệu chỉnh PD (fit trên điểm out-of-fold của tập train, xem calibration.py)
+    calibration = calibrate_model(model, X_train, y_train)
+    pd_in, pd_out = apply_calibration(y_proba_in, calibration), apply_calibration(y_proba_out, calibration)
+
+    # Ngưỡng Default tối ưu trên PD đã hiệu chỉnh của tập test (chi phí LGD x EAD nếu dữ liệu có 2 cột này)
+    exposure = df.loc[X_test.index, EXPOSURE_COLS] if set(EXPOSURE_COLS) <= set(df.columns) else None
+    threshold = optimize_threshold(
+        y_test, pd_out,
+        lgd=None if exposure is None else exposure['LGD'],
+        ead=None if exposure is None else exposure['EAD'],
+    )
+
+    # Đánh giá: AUC/KS/Gini/Brier và ROC/PR trên PD thô; nhãn dự báo (Accuracy/F1, ma trận nhầm lẫn, CI bootstrap)
+    # theo đúng quyết định của ứng dụng: PD đã hiệu chỉnh so với ngưỡng Default tối ưu
+    cutoff = threshold["threshold"]
+    y_pred_out = (pd_out >= cutoff).astype(int)
+    evaluation = {"train": evaluate_split(y_train, y_proba_in, cutoff, decision=pd_in),
+                  "test": evaluate_split(y_test, y_proba_out, cutoff, decision=pd_out)}
+
+    return {
+        "model": model,
+        "model_logistic": base_models['logistic'],
+        "model_rf": base_models['random_forest'],
+        "model_xgb": base_models['xgboost'],
+        "X_train": X_train,
+        "X_test": X_test,
+        "y_train": y_train,
+        "y_test": y_test,
+        "y_pred_out": y_pred_out,
+        "y_proba_in": y_proba_in,
+        "y_proba_out": y_proba_out,
+        "metrics_in": suffixed_metrics(evaluation["train"], "in"),
+        "metrics_out": suffixed_metrics(evaluation["test"], "out"),
+        "evaluation": evaluation,
+        "calibration": calibration,
+        "threshold": threshold,
+    }
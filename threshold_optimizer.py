@@ -0,0 +1,118 @@
+"""
+Chọn ngưỡng PD để gán nhãn Default thay cho mốc cố định 15%.
+
+Điểm PD của tập test được sắp xếp giảm dần đúng 1 lần; với mỗi ngưỡng t (= từng giá trị PD khác nhau),
+"PD >= t thì Default" nghĩa là lấy k dòng đầu của mảng đã sắp xếp. Vì vậy TP/FP, tổn thất bắt được và
+dư nợ khách hàng tốt bị từ chối tại mọi ngưỡng đều là tổng tích lũy (np.cumsum) - O(n log n) cho cả đường
+cong thay vì chấm lại confusion matrix O(n) ở từng ngưỡng.
+
+Chi phí kỳ vọng (tính trên 1 khách hàng) tại ngưỡng t:
+- Bỏ sót khách hàng vỡ nợ (FN): mất LGD x EAD
+- Từ chối nhầm khách hàng tốt (FP): mất thu nhập REJECT_COST_RATE x EAD
+
+Ngưỡng đã chọn được lưu cùng mô hình (ED.py và model_stacking.pkl của backend). File này và
+credit-risk-app/backend/threshold_optimizer.py phải giống hệt nhau, sửa 1 bản thì chép sang bản kia.
+"""
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# Ngưỡng cũ, dùng khi không tối ưu được (ví dụ tập test chỉ có 1 lớp)
+DEFAULT_THRESHOLD = 0.15
+# Thu nhập ròng mất đi (theo tỷ lệ dư nợ) khi từ chối 1 khách hàng không vỡ nợ
+REJECT_COST_RATE = 0.05
+CRITERIA = ("cost", "f1")
+# Cột tỷ lệ tổn thất và dư nợ tại thời điểm vỡ nợ trong dữ liệu huấn luyện (không dùng làm biến của mô hình)
+EXPOSURE_COLS = ['LGD', 'EAD']
+
+
+def threshold_curve(y_true, scores, lgd=None, ead=None, reject_cost_rate: float = REJECT_COST_RATE) -> pd.DataFrame:
+    """
+    Confusion counts, Precision/Recall/F1 và chi phí kỳ vọng tại mọi ngưỡng trong 1 lượt tổng tích lũy.
+
+    Args:
+        y_true: Nhãn default 0/1
+        scores: PD (đã hiệu chỉnh) của cùng các dòng
+        lgd, ead: Tỷ lệ tổn thất và dư nợ tại thời điểm vỡ nợ của từng dòng (None = 1 cho mọi dòng)
+        reject_cost_rate: Chi phí từ chối khách hàng tốt theo tỷ lệ EAD
+
+    Returns:
+        DataFrame, mỗi dòng 1 ngưỡng (giảm dần, dòng đầu = không gán Default cho ai): threshold, tp, fp, fn, tn,
+        precision, recall, f1, expected_cost
+    """
+    y = np.asarray(y_true, dtype=np.float64)
+    s = np.asarray(scores, dtype=np.float64)
+    # LGD/EAD thiếu hoặc âm (lỗi dữ liệu) coi như không có tổn thất
+    lgd = np.ones_like(s) if lgd is None else np.clip(np.nan_to_num(np.asarray(lgd, dtype=np.float64)), 0.0, None)
+    ead = np.ones_like(s) if ead is None else np.clip(np.nan_to_num(np.asarray(ead, dtype=np.float64)), 0.0, None)
+
+    order = np.argsort(-s, kind="stable")
+    s, y, lgd, ead = s[order], y[order], lgd[order], ead[order]
+    # Các dòng cùng PD luôn cùng nhãn dự báo: chỉ lấy vị trí cuối của mỗi nhóm PD bằng nhau
+    last = np.r_[np.flatnonzero(s[1:] != s[:-1]), len(s) - 1]
+
+    # Thêm điểm 0 ở đầu (ngưỡng cao hơn mọi PD: không ai bị gán Default)
+    tp = np.r_[0.0, np.cumsum(y)[last]]
+    fp = np.r_[0.0, np.cumsum(1.0 - y)[last]]
+    loss_caught = np.r_[0.0, np.cumsum(y * lgd * ead)[last]]
+    good_ead_rejected = np.r_[0.0, np.cumsum((1.0 - y) * ead)[last]]
+
+    n_pos, n_neg = tp[-1], fp[-1]
+    fn, tn = n_pos - tp, n_neg - fp
+    missed_loss = loss_caught[-1] - loss_caught
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 1.0)
+        recall = np.where(n_pos > 0, tp / n_pos, 0.0)
+        f1 = np.where(2 * tp + fp + fn > 0, 2 * tp / (2 * tp + fp + fn), 0.0)
+
+    top = np.nextafter(s[0], np.inf) if len(s) else 1.0
+    return pd.DataFrame({
+        "threshold": np.r_[top, s[last]],
+        "tp": tp.astype(np.int64),
+        "fp": fp.astype(np.int64),
+        "fn": fn.astype(np.int64),
+        "tn": tn.astype(np.int64),
+        "precision": precision,
+        "recall": recall,
+        "f1": f1,
+        "expected_cost": (missed_loss + reject_cost_rate * good_ead_rejected) / max(len(s), 1),
+    })
+
+
+def optimize_threshold(y_true, scores, lgd=None, ead=None, criterion: Optional[str] = None,
+                       reject_cost_rate: float = REJECT_COST_RATE) -> Dict[str, Any]:
+    """
+    Chọn ngưỡng Default tốt nhất trên tập test.
+
+    Args:
+        criterion: 'cost' (chi phí kỳ vọng nhỏ nhất) hoặc 'f1' (F1 lớn nhất).
+            None = 'cost' khi có LGD/EAD, ngược lại 'f1'
+
+    Returns:
+        dict gồm threshold, criterion, reject_cost_rate, chỉ số tại ngưỡng đã chọn (best) và đường cong (curve)
+    """
+    if criterion is None:
+        criterion = "cost" if lgd is not None and ead is not None else "f1"
+    if criterion not in CRITERIA:
+        raise ValueError(f"Tiêu chí không hợp lệ: {criterion}. Chỉ hỗ trợ: {list(CRITERIA)}")
+
+    curve = threshold_curve(y_true, scores, lgd, ead, reject_cost_rate)
+    if curve["tp"].iloc[-1] == 0 or curve["fp"].iloc[-1] == 0:
+        # Tập test chỉ có 1 lớp: không có gì để đánh đổi, giữ ngưỡng cũ
+        best_idx, threshold = None, DEFAULT_THRESHOLD
+    else:
+        values = curve["expected_cost"].to_numpy() if criterion == "cost" else -curve["f1"].to_numpy()
+        best_idx = int(np.argmin(values))
+        # Đặt ngưỡng ở giữa PD đã chọn và PD thấp hơn kế tiếp: cùng kết quả trên tập test, bớt nhạy với dữ liệu mới
+        thresholds = curve["threshold"].to_numpy()
+        threshold = thresholds[best_idx] if best_idx == 0 or best_idx + 1 >= len(thresholds) \
+            else 0.5 * (thresholds[best_idx] + thresholds[best_idx + 1])
+
+    return {
+        "threshold": float(threshold),
+        "criterion": criterion,
+        "reject_cost_rate": reject_cost_rate,
+        "best": None if best_idx is None else curve.iloc[best_idx].to_dict(),
+        "curve": curve,
+    }
@@ -0,0 +1,162 @@
+"""
+Đường hồi quy logistic theo từng biến X_1..X_14 cho biểu đồ phân tán ở tab Xây dựng mô hình.
+
+Trước đây mỗi lần đổi biến trong selectbox lại fit 1 LogisticRegression mới trên df[[col]]. Ở đây cả 14
+mô hình 1 biến (intercept + hệ số, L2 với C=1 như mặc định của sklearn, intercept không phạt) được fit
+cùng lúc bằng Newton vector hóa, tính sẵn đường cong 100 điểm, bảng describe() và 1 mẫu con cho lớp
+scatter. Kết quả được cache cùng mô hình đã huấn luyện (xem get_trained_models trong ED.py).
+"""
+from typing import Dict, Any, Tuple
+
+import numpy as np
+import pandas as pd
+
+from stacking_model import MODEL_COLS
+
+TARGET_COL = 'default'
+GRID_POINTS = 100
+MAX_SCATTER_POINTS = 5_000
+_CHUNK_ROWS = 16_384
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 0.5 * (1.0 + np.tanh(0.5 * z))
+
+
+def _chunks(X: np.ndarray, y: np.ndarray):
+    """Chia theo khối dòng để giới hạn bộ nhớ tạm; dòng thiếu giá trị của biến nào thì bỏ khỏi mô hình biến đó."""
+    has_nan = np.isnan(X).any()
+    for start in range(0, len(X), _CHUNK_ROWS):
+        x = X[start:start + _CHUNK_ROWS]
+        valid = ~np.isnan(x) if has_nan else None
+        yield (np.where(valid, x, 0.0) if has_nan else x), y[start:start + _CHUNK_ROWS, None], valid
+
+
+def _loss(X: np.ndarray, y: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Log-loss (chưa nhân C) của từng biến."""
+    total = np.zeros_like(a)
+    for x, yc, valid in _chunks(X, y):
+        z = a + x * b
+        # log(1 + e^z) - y*z, ổn định số học với z lớn
+        loss = np.logaddexp(0.0, z) - yc * z
+        total += (np.where(valid, loss, 0.0) if valid is not None else loss).sum(axis=0)
+    return total
+
+
+def _newton_terms(X: np.ndarray, y: np.ndarray, a: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """Gradient và Hessian 2x2 của log-loss cho từng biến."""
+    g_a, g_b, h_aa, h_ab, h_bb = (np.zeros_like(a) for _ in range(5))
+    for x, yc, valid in _chunks(X, y):
+        p = _sigmoid(a + x * b)
+        r = p - yc
+        w = p * (1.0 - p)
+        if valid is not None:
+            r = np.where(valid, r, 0.0)
+            w = np.where(valid, w, 0.0)
+        wx = w * x
+        g_a += r.sum(axis=0)
+        g_b += (r * x).sum(axis=0)
+        h_aa += w.sum(axis=0)
+        h_ab += wx.sum(axis=0)
+        h_bb += (wx * x).sum(axis=0)
+    return g_a, g_b, h_aa, h_ab, h_bb
+
+
+def fit_univariate_logistic(X: np.ndarray, y: np.ndarray, C: float = 1.0,
+                            max_iter: int = 100, tol: float = 1e-10) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fit đồng thời p mô hình logistic 1 biến P(y=1) = sigmoid(a_j + b_j * x_j).
+
+    Hàm mục tiêu giống LogisticRegression(C=C) của sklearn: C * log-loss + 0.5 * b_j^2 (intercept không phạt).
+    Mỗi biến được chia cho độ lệch chuẩn trước khi giải (hệ số phạt quy đổi tương ứng nên nghiệm không đổi),
+    bước Newton được rút ngắn (backtracking) riêng cho từng biến đến khi hàm mục tiêu giảm.
+
+    Args:
+        X: Ma trận (n, p), có thể chứa NaN
+        y: Nhãn 0/1, độ dài n
+
+    Returns:
+        (intercept, coef): 2 mảng độ dài p
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    scale = np.nanstd(X, axis=0)
+    scale = np.where(np.isfinite(scale) & (scale > 0), scale, 1.0)
+    Xs = X / scale
+    # Với biến đã chuẩn hóa, hệ số b_s = b * scale nên phạt 0.5 * b^2 = 0.5 * b_s^2 / scale^2
+    penalty = 1.0 / (C * scale ** 2)
+
+    def objective(cols, a, b):
+        return _loss(Xs[:, cols], y, a, b) + 0.5 * penalty[cols] * b ** 2
+
+    # Khởi tạo intercept = logit tỷ lệ default, hệ số = 0
+    rate = np.clip(y.mean(), 1e-6, 1 - 1e-6)
+    a = np.full(X.shape[1], np.log(rate / (1 - rate)))
+    b = np.zeros(X.shape[1])
+    cols = np.arange(X.shape[1])
+    current = objective(cols, a, b)
+    for _ in range(max_iter):
+        # Chỉ tính tiếp các biến chưa hội tụ (biến có đuôi dài như X_9 cần nhiều vòng hơn)
+        Xa = Xs[:, cols]
+        g_a, g_b, h_aa, h_ab, h_bb = _newton_terms(Xa, y, a[cols], b[cols])
+        g_b += penalty[cols] * b[cols]
+        h_bb += penalty[cols]
+        # Giải hệ 2x2 [h_aa h_ab; h_ab h_bb] * step = g cho từng biến
+        det = np.maximum(h_aa * h_bb - h_ab ** 2, np.finfo(float).tiny)
+        step_a = (h_bb * g_a - h_ab * g_b) / det
+        step_b = (h_aa * g_b - h_ab * g_a) / det
+        decrement = step_a * g_a + step_b * g_b
+
+        # Backtracking (Armijo) vector hóa: biến nào chưa giảm đủ thì chia đôi bước của biến đó
+        t = np.ones(len(cols))
+        for _ in range(30):
+            candidate = _loss(Xa, y, a[cols] - t * step_a, b[cols] - t * step_b) \
+                + 0.5 * penalty[cols] * (b[cols] - t * step_b) ** 2
+            ok = candidate <= current[cols] - 1e-4 * t * decrement
+            if ok.all():
+                break
+            t = np.where(ok, t, 0.5 * t)
+        a[cols] -= t * step_a
+        b[cols] -= t * step_b
+        current[cols] = candidate
+        # Hội tụ khi Newton decrement (≈ 2 lần khoảng cách tới cực tiểu của hàm mục tiêu) nhỏ so với
+        # chính hàm mục tiêu (tổng trên n dòng nên sai số làm tròn tăng theo n)
+        cols = cols[decrement > tol * (1.0 + np.abs(candidate))]
+        if len(cols) == 0:
+            break
+    return a, b / scale
+
+
+def build_univariate_summary(df: pd.DataFrame, grid_points: int = GRID_POINTS,
+                             max_scatter_points: int = MAX_SCATTER_POINTS, seed: int = 0) -> Dict[str, Any]:
+    """
+    Tính sẵn mọi thứ tab Xây dựng mô hình cần cho 14 biến.
+
+    Returns:
+        dict gồm:
+        - coef: DataFrame (index = biến) với intercept, coef
+        - x_grid, y_curve: DataFrame (grid_points dòng, cột = biến) của đường logistic
+        - describe: df[MODEL_COLS].describe()
+        - scatter: mẫu con tối đa max_scatter_points dòng (biến + default) để vẽ scatter
+    """
+    X = df[MODEL_COLS].to_numpy(dtype=np.float64)
+    y = df[TARGET_COL].to_numpy(dtype=np.float64)
+    intercept, coef = fit_univariate_logistic(X, y)
+
+    t = np.linspace(0.0, 1.0, grid_points)[:, None]
+    lo, hi = np.nanmin(X, axis=0), np.nanmax(X, axis=0)
+    x_grid = lo + t * (hi - lo)
+    y_curve = _sigmoid(intercept + x_grid * coef)
+
+    scatter = df[MODEL_COLS + [TARGET_COL]]
+    if len(scatter) > max_scatter_points:
+        scatter = scatter.sample(n=max_scatter_points, random_state=seed)
+
+    return {
+        "coef": pd.DataFrame({"intercept": intercept, "coef": coef}, index=MODEL_COLS),
+        "x_grid": pd.DataFrame(x_grid, columns=MODEL_COLS),
+        "y_curve": pd.DataFrame(y_curve, columns=MODEL_COLS),
+        "describe": df[MODEL_COLS].describe(),
+        "scatter": scatter.reset_index(drop=True),
+        "n_rows": len(df),
+    }
@@ -0,0 +1,308 @@
+"""
+Xuất báo cáo Word đánh giá rủi ro tín dụng.
+
+Tách riêng khỏi ED.py để dùng chung cho ứng dụng Streamlit, xuất báo cáo hàng loạt và benchmark.
+"""
+from datetime import datetime
+from io import BytesIO
+import os
+import pandas as pd
+
+from lazy_imports import has_module
+
+# Thư viện Word Export: chỉ kiểm tra đã cài, python-docx được import trong hàm khi xuất báo cáo
+_WORD_OK = has_module("docx")
+
+# =========================
+# HÀM TẠO WORD REPORT
+# =========================
+
+def _chart_buffer(chart):
+    """Nhận ảnh PNG (bytes, ví dụ từ charts.CHART_CACHE) hoặc Matplotlib figure, trả về buffer PNG."""
+    if isinstance(chart, (bytes, bytearray)):
+        return BytesIO(chart)
+    buffer = BytesIO()
+    chart.savefig(buffer, format='png', dpi=150, bbox_inches='tight')
+    buffer.seek(0)
+    return buffer
+
+LOGO_PATH = "logo-agribank.jpg"
+
+
+def build_report_template(logo_path: str = LOGO_PATH):
+    """
+    Tạo phần cố định của báo cáo: margin, style tiêu đề mục, logo, tiêu đề và subtitle.
+
+    Tách riêng để khi xuất hàng loạt (batch_reports.py) chỉ cần tạo 1 lần cho mỗi process,
+    lưu thành bytes rồi mở lại cho từng báo cáo thay vì đọc logo và định dạng lại từ đầu.
+
+    Returns:
+    - Document đã có phần header
+    """
+    if not _WORD_OK:
+        raise Exception("Thiếu thư viện python-docx. Vui lòng cài đặt: pip install python-docx Pillow")
+    from docx import Document
+    from docx.shared import Inches, Pt, RGBColor
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+
+    # Tạo document mới
+    doc = Document()
+
+    # Cấu hình margin cho document
+    sections = doc.sections
+    for section in sections:
+        section.top_margin = Inches(0.8)
+        section.bottom_margin = Inches(0.8)
+        section.left_margin = Inches(1)
+        section.right_margin = Inches(1)
+
+    # Màu tiêu đề các mục (Heading 1) đặt 1 lần trên style thay vì từng run
+    doc.styles['Heading 1'].font.color.rgb = RGBColor(255, 107, 157)  # #ff6b9d
+
+    # ===== 1. HEADER VỚI LOGO VÀ TIÊU ĐỀ =====
+    # Thêm logo nếu có
+    try:
+        if os.path.exists(logo_path):
+            doc.add_picture(logo_path, width=Inches(2.5))
+            last_paragraph = doc.paragraphs[-1]
+            last_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    except Exception:
+        pass
+
+    # Tiêu đề chính
+    title = doc.add_heading('BÁO CÁO ĐÁNH GIÁ RỦI RO TÍN DỤNG', 0)
+    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    title_run = title.runs[0]
+    title_run.font.size = Pt(20)
+    title_run.font.color.rgb = RGBColor(194, 24, 91)  # #c2185b
+    title_run.font.bold = True
+
+    # Subtitle
+    subtitle = doc.add_paragraph('Dự báo Xác suất Vỡ nợ KHDN (PD) & Phân tích AI Chuyên sâu')
+    subtitle.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    subtitle_run = subtitle.runs[0]
+    subtitle_run.font.size = Pt(13)
+    subtitle_run.font.color.rgb = RGBColor(255, 107, 157)  # #ff6b9d
+    subtitle_run.font.bold = True
+
+    return doc
+
+
+def generate_word_report(ratios_display, pd_value, pd_label, ai_analysis, fig_bar, fig_radar, company_name="KHÁCH HÀNG DOANH NGHIỆP", template=None,
+                         improvement_plan=None, scorecard=None):
+    """
+    Tạo báo cáo Word chuyên nghiệp từ kết quả phân tích tín dụng.
+
+    Parameters:
+    - ratios_display: DataFrame chứa 14 chỉ số tài chính (index = tên chỉ số, column = giá trị)
+    - pd_value: Xác suất vỡ nợ (PD) dưới dạng số float (0-1) hoặc NaN
+    - pd_label: Nhãn dự đoán ("Default" hoặc "Non-Default")
+    - ai_analysis: Text phân tích từ AI
+    - fig_bar: Ảnh PNG (bytes) hoặc Matplotlib figure của bar chart
+    - fig_radar: Ảnh PNG (bytes) hoặc Matplotlib figure của radar chart
+    - company_name: Tên công ty (mặc định)
+    - template: Bytes của template từ build_report_template() (None = tạo mới)
+    - improvement_plan: Kết quả CounterfactualPlanner.plan() (tùy chọn) để thêm mục kế hoạch cải thiện chỉ số
+    - scorecard: Kết quả Scorecard.breakdown() (tùy chọn) để thêm mục thẻ điểm WoE (khoảng giá trị và điểm từng chỉ số)
+
+    Returns:
+    - BytesIO object chứa Word document
+    """
+
+    if not _WORD_OK:
+        raise Exception("Thiếu thư viện python-docx. Vui lòng cài đặt: pip install python-docx Pillow")
+    from docx import Document
+    from docx.shared import Inches, Pt, RGBColor
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    from docx.oxml.ns import qn
+    from docx.oxml import OxmlElement
+
+    doc = Document(BytesIO(template)) if template is not None else build_report_template()
+
+    # Thông tin thời gian
+    date_info = doc.add_paragraph(f"Ngày xuất báo cáo: {datetime.now().strftime('%d/%m/%Y %H:%M')}")
+    date_info.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    date_run = date_info.runs[0]
+    date_run.font.size = Pt(10)
+
+    # Thông tin khách hàng
+    company_info = doc.add_paragraph()
+    company_info.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    company_run = company_info.add_run(f"Tên khách hàng: {company_name}")
+    company_run.font.size = Pt(11)
+    company_run.font.bold = True
+
+    doc.add_paragraph()  # Spacer
+
+    # ===== 2. KẾT QUẢ DỰ BÁO PD =====
+    doc.add_heading('1. KẾT QUẢ DỰ BÁO XÁC SUẤT VỠ NỢ (PD)', level=1)
+
+    pd_para = doc.add_paragraph()
+    if pd.notna(pd_value):
+        pd_para.add_run(f"Xác suất Vỡ nợ (PD): ").bold = True
+        pd_para.add_run(f"{pd_value:.2%}\n")
+        pd_para.add_run("Phân loại: ").bold = True
+        pd_para.add_run(f"{pd_label}\n")
+
+        if "Default" in pd_label and "Non-Default" not in pd_label:
+            risk_run = pd_para.add_run("⚠️ RỦI RO CAO - CẦN XEM XÉT KỸ LƯỠNG")
+            risk_run.bold = True
+            risk_run.font.color.rgb = RGBColor(220, 53, 69)  # Red
+        else:
+            safe_run = pd_para.add_run("✓ RỦI RO THẤP - KHẢ QUAN")
+            safe_run.bold = True
+            safe_run.font.color.rgb = RGBColor(40, 167, 69)  # Green
+    else:
+        pd_para.add_run("Xác suất Vỡ nợ (PD): ").bold = True
+        pd_para.add_run("Không có dữ liệu")
+
+    doc.add_paragraph()  # Spacer
+
+    # ===== 3. BẢNG CHỈ SỐ TÀI CHÍNH =====
+    doc.add_heading('2. CHỈ SỐ TÀI CHÍNH CHI TIẾT', level=1)
+
+    # Tạo bảng
+    table = doc.add_table(rows=1, cols=2)
+    table.style = 'Light Grid Accent 1'
+
+    # Header row
+    hdr_cells = table.rows[0].cells
+    hdr_cells[0].text = 'Chỉ số Tài chính'
+    hdr_cells[1].text = 'Giá trị'
+
+    # Style header
+    for cell in hdr_cells:
+        cell_para = cell.paragraphs[0]
+        cell_run = cell_para.runs[0]
+        cell_run.font.bold = True
+        cell_run.font.size = Pt(11)
+        cell_run.font.color.rgb = RGBColor(255, 255, 255)
+        # Set background color
+        shading_elm = OxmlElement('w:shd')
+        shading_elm.set(qn('w:fill'), 'FF6B9D')  # Pink
+        cell._element.get_or_add_tcPr().append(shading_elm)
+        cell_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+
+    # Data rows
+    for idx, row in ratios_display.iterrows():
+        row_cells = table.add_row().cells
+        row_cells[0].text = str(idx)
+        value = row['Giá trị']
+        row_cells[1].text = f"{value:.4f}" if pd.notna(value) else "N/A"
+        row_cells[1].paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.RIGHT
+
+    doc.add_paragraph()  # Spacer
+
+    # Các mục con của phần 2 (tùy chọn) được đánh số theo thứ tự xuất hiện
+    subsection = 1
+
+    # Kế hoạch cải thiện chỉ số (chỉ khi PD chưa đạt mục tiêu)
+    if improvement_plan is not None and improvement_plan["pd_before"] >= improvement_plan["target_pd"]:
+        doc.add_heading(f"2.{subsection}. Kế hoạch cải thiện chỉ số (PD mục tiêu < {improvement_plan['target_pd']:.0%})", level=2)
+        subsection += 1
+        status = "đạt mục tiêu" if improvement_plan["achieved"] else "chưa đạt mục tiêu trong khoảng dữ liệu lịch sử"
+        doc.add_paragraph(f"PD hiện tại {improvement_plan['pd_before']:.2%} → {improvement_plan['pd_after']:.2%} "
+                          f"sau khi điều chỉnh ({status}).")
+        plan_table = doc.add_table(rows=1, cols=4)
+        plan_table.style = 'Light Grid Accent 1'
+        for cell, title in zip(plan_table.rows[0].cells, ['Chỉ số', 'Hành động', 'Hiện tại', 'Mục tiêu']):
+            cell.text = title
+            cell.paragraphs[0].runs[0].font.bold = True
+        for row in improvement_plan["plan"].itertuples():
+            cells = plan_table.add_row().cells
+            cells[0].text = str(row.label)
+            cells[1].text = str(row.action)
+            cells[2].text = f"{row.current:.4f}"
+            cells[3].text = f"{row.target:.4f}"
+            for cell in cells[2:]:
+                cell.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.RIGHT
+        doc.add_paragraph()  # Spacer
+
+    # Thẻ điểm WoE: khoảng giá trị và điểm nguyên của từng chỉ số, tổng điểm quy ra PD
+    if scorecard is not None:
+        doc.add_heading(f"2.{subsection}. Thẻ điểm (Scorecard WoE)", level=2)
+        subsection += 1
+        score_para = doc.add_paragraph()
+        score_para.add_run("Tổng điểm: ").bold = True
+        score_para.add_run(f"{scorecard['score']} điểm (PD theo thẻ điểm: {scorecard['pd']:.2%})")
+        score_table = doc.add_table(rows=1, cols=4)
+        score_table.style = 'Light Grid Accent 1'
+        for cell, title in zip(score_table.rows[0].cells, ['Chỉ số', 'Giá trị', 'Khoảng giá trị', 'Điểm']):
+            cell.text = title
+            cell.paragraphs[0].runs[0].font.bold = True
+        for row in scorecard["rows"]:
+            cells = score_table.add_row().cells
+            cells[0].text = str(row["label"])
+            cells[1].text = f"{row['value']:.4f}" if pd.notna(row["value"]) else "N/A"
+            cells[2].text = str(row["bin"])
+            cells[3].text = str(row["points"])
+            for cell in (cells[1], cells[3]):
+                cell.paragraphs[0].alignment = WD_ALIGN_PARAGRAPH.RIGHT
+        doc.add_paragraph()  # Spacer
+
+    # ===== 4. BIỂU ĐỒ VISUALIZATION =====
+    # Bỏ qua khi không có biểu đồ (ví dụ xuất hàng loạt với --no-charts)
+    if fig_bar is not None or fig_radar is not None:
+        doc.add_page_break()
+        doc.add_heading('3. TRỰC QUAN HÓA DỮ LIỆU', level=1)
+
+        # Bar chart
+        try:
+            doc.add_heading('3.1. Biểu đồ Cột - Giá trị các Chỉ số', level=2)
+            doc.add_picture(_chart_buffer(fig_bar), width=Inches(6))
+            last_paragraph = doc.paragraphs[-1]
+            last_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+            doc.add_paragraph()  # Spacer
+        except Exception as e:
+            doc.add_paragraph(f"Không thể tạo biểu đồ cột: {str(e)}")
+
+        # Radar chart
+        try:
+            doc.add_heading('3.2. Biểu đồ Radar - Phân tích Đa chiều', level=2)
+            doc.add_picture(_chart_buffer(fig_radar), width=Inches(5))
+            last_paragraph = doc.paragraphs[-1]
+            last_paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        except Exception as e:
+            doc.add_paragraph(f"Không thể tạo biểu đồ radar: {str(e)}")
+
+    # ===== 5. PHÂN TÍCH AI =====
+    doc.add_page_break()
+    doc.add_heading('4. PHÂN TÍCH AI & KHUYẾN NGHỊ TÍN DỤNG', level=1)
+
+    if ai_analysis and ai_analysis.strip():
+        # Chia thành các đoạn và thêm vào document
+        analysis_paragraphs = ai_analysis.split('\n')
+        for para_text in analysis_paragraphs:
+            if para_text.strip():
+                para = doc.add_paragraph(para_text)
+                # Highlight keywords
+                if "CHO VAY" in para_text and "KHÔNG CHO VAY" not in para_text:
+                    for run in para.runs:
+                        if "CHO VAY" in run.text:
+                            run.font.color.rgb = RGBColor(40, 167, 69)  # Green
+                            run.bold = True
+                elif "KHÔNG CHO VAY" in para_text:
+                    for run in para.runs:
+                        if "KHÔNG CHO VAY" in run.text:
+                            run.font.color.rgb = RGBColor(220, 53, 69)  # Red
+                            run.bold = True
+    else:
+        doc.add_paragraph("Chưa có phân tích từ AI. Vui lòng click nút 'Yêu cầu AI Phân tích & Đề xuất' để nhận khuyến nghị.")
+
+    # ===== 6. FOOTER =====
+    doc.add_paragraph()
+    footer = doc.add_paragraph(
+        f"Báo cáo này được tạo tự động bởi Hệ thống Đánh giá Rủi ro Tín dụng - Powered by AI & Machine Learning\n"
+        f"© {datetime.now().year} Credit Risk Assessment System | Version 2.0 Premium"
+    )
+    footer.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    footer_run = footer.runs[0]
+    footer_run.font.size = Pt(8)
+    footer_run.font.italic = True
+    footer_run.font.color.rgb = RGBColor(128, 128, 128)  # Grey
+
+    # Save to buffer
+    buffer = BytesIO()
+    doc.save(buffer)
+    buffer.seek(0)
+    return buffer